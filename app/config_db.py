@@ -1,34 +1,14 @@
+import json
 import os
 import sqlite3
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-
-CONFIG_DB_PATH = Path(os.getenv("CONFIG_DB_PATH", "config/config.db"))
+from typing import Any, Dict, List, Optional, Tuple
 
+from app.db import migrations, pool
 
-def ensure_db() -> None:
-    CONFIG_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(CONFIG_DB_PATH) as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS settings (
-                key TEXT PRIMARY KEY,
-                value TEXT
-            );
-            CREATE TABLE IF NOT EXISTS roots (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                path TEXT NOT NULL,
-                label TEXT NOT NULL,
-                type TEXT NOT NULL DEFAULT 'file',
-                active INTEGER NOT NULL DEFAULT 1,
-                created_at TEXT DEFAULT (datetime('now')),
-                updated_at TEXT DEFAULT (datetime('now'))
-            );
-            """
-        )
-        seed_defaults(conn)
-        conn.commit()
+CONFIG_DB_PATH = Path(os.getenv("CONFIG_DB_PATH", "config/config.db"))
+POOL_SIZE = pool.pool_size("config", 2)
 
 
 def seed_defaults(conn: sqlite3.Connection) -> None:
@@ -58,21 +38,82 @@ def seed_defaults(conn: sqlite3.Connection) -> None:
             "INSERT OR IGNORE INTO settings(key, value) VALUES (?, ?)",
             (key, value),
         )
-    # ensure type column exists on existing DBs
+
+
+def _migrate_base(conn: sqlite3.Connection) -> None:
+    migrations.run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS roots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            path TEXT NOT NULL,
+            label TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT 'file',
+            active INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT DEFAULT (datetime('now')),
+            updated_at TEXT DEFAULT (datetime('now'))
+        );
+        """,
+    )
+    # type-Spalte fehlt in frühen Config-DBs
     cols = {row[1] for row in conn.execute("PRAGMA table_info(roots)").fetchall()}
     if "type" not in cols:
         conn.execute("ALTER TABLE roots ADD COLUMN type TEXT NOT NULL DEFAULT 'file'")
+    seed_defaults(conn)
+
+
+def _migrate_index_commands(conn: sqlite3.Connection) -> None:
+    migrations.run_script(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS index_commands (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            command TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            result TEXT,
+            created_at TEXT DEFAULT (datetime('now')),
+            claimed_at TEXT,
+            finished_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_index_commands_status ON index_commands(status, id);
+        """,
+    )
+
+
+MIGRATIONS: List[migrations.Migration] = [
+    (1, "Einstellungen, Quellen, Defaults", _migrate_base),
+    (2, "Befehlswarteschlange für den Indexer-Worker", _migrate_index_commands),
+]
+
+
+def _migrate() -> None:
+    CONFIG_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(CONFIG_DB_PATH)
+    try:
+        migrations.apply_migrations(conn, MIGRATIONS, "config")
+    finally:
+        conn.close()
+
+
+def ensure_db() -> None:
+    migrations.ensure_migrated("config", CONFIG_DB_PATH, _migrate)
+
+
+def _open(path: Path) -> sqlite3.Connection:
+    return sqlite3.connect(path, check_same_thread=False)
 
 
 @contextmanager
 def get_conn():
     ensure_db()
-    conn = sqlite3.connect(CONFIG_DB_PATH)
-    try:
+    with pool.get_pool("config", CONFIG_DB_PATH, _open, POOL_SIZE).connection() as conn:
         yield conn
         conn.commit()
-    finally:
-        conn.close()
 
 
 def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
@@ -192,3 +233,77 @@ def update_root_active(root_id: int, active: bool) -> None:
             "UPDATE roots SET active = ?, updated_at = datetime('now') WHERE id = ?",
             (1 if active else 0, root_id),
         )
+
+
+# Befehls-Warteschlange Web -> Indexer-Worker (INDEXER_MODE=external)
+def enqueue_index_command(command: str, payload: Optional[Dict[str, Any]] = None) -> int:
+    with get_conn() as conn:
+        cur = conn.execute(
+            "INSERT INTO index_commands(command, payload) VALUES (?, ?)",
+            (command, json.dumps(payload or {})),
+        )
+        return cur.lastrowid
+
+
+def find_queued_index_command(command: str) -> Optional[int]:
+    with get_conn() as conn:
+        row = conn.execute(
+            "SELECT id FROM index_commands WHERE command = ? AND status = 'queued' ORDER BY id LIMIT 1",
+            (command,),
+        ).fetchone()
+        return row[0] if row else None
+
+
+def claim_index_command() -> Optional[Tuple[int, str, Dict[str, Any]]]:
+    with get_conn() as conn:
+        rows = conn.execute(
+            """
+            UPDATE index_commands SET status = 'running', claimed_at = datetime('now')
+            WHERE id = (SELECT id FROM index_commands WHERE status = 'queued' ORDER BY id LIMIT 1)
+            RETURNING id, command, payload
+            """
+        ).fetchall()
+    if not rows:
+        return None
+    row = rows[0]
+    try:
+        payload = json.loads(row[2] or "{}")
+    except Exception:
+        payload = {}
+    return row[0], row[1], payload
+
+
+def finish_index_command(command_id: int, status: str, result: Optional[str] = None) -> None:
+    with get_conn() as conn:
+        conn.execute(
+            "UPDATE index_commands SET status = ?, result = ?, finished_at = datetime('now') WHERE id = ?",
+            (status, result, command_id),
+        )
+
+
+def fail_stale_index_commands(reason: str) -> int:
+    """
+    Markiert Befehle, die ein abgestürzter Worker nicht abgeschlossen hat, als Fehler.
+    """
+    with get_conn() as conn:
+        cur = conn.execute(
+            "UPDATE index_commands SET status = 'error', result = ?, finished_at = datetime('now') WHERE status = 'running'",
+            (reason,),
+        )
+        return cur.rowcount
+
+
+def list_index_commands(limit: int = 20) -> List[Dict[str, Any]]:
+    with get_conn() as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute(
+            "SELECT id, command, payload, status, result, created_at, claimed_at, finished_at FROM index_commands ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def count_queued_index_commands() -> int:
+    with get_conn() as conn:
+        row = conn.execute("SELECT COUNT(*) FROM index_commands WHERE status = 'queued'").fetchone()
+        return int(row[0] or 0)
@@ -33,6 +33,9 @@ class IndexerConfig(BaseModel):
     run_interval_cron: Optional[str] = None
     max_file_size_mb: Optional[int] = None
     exclude_dirs: list[str] = []
+    parallel_runs: int = 2
+    worker_budget: Optional[int] = None
+    bulk_load: bool = True
 
     @field_validator("worker_count")
     def validate_worker(cls, value: int) -> int:
@@ -40,6 +43,18 @@ class IndexerConfig(BaseModel):
             raise ValueError("worker_count muss >=1 sein")
         return value
 
+    @field_validator("parallel_runs")
+    def validate_parallel_runs(cls, value: int) -> int:
+        if value < 1:
+            raise ValueError("parallel_runs muss >=1 sein")
+        return value
+
+    @field_validator("worker_budget")
+    def validate_worker_budget(cls, value: Optional[int]) -> Optional[int]:
+        if value is not None and value < 1:
+            raise ValueError("worker_budget muss >=1 sein")
+        return value
+
     @field_validator("max_file_size_mb")
     def validate_size(cls, value: Optional[int]) -> Optional[int]:
         if value is not None and value < 0:
@@ -66,8 +81,8 @@ class UIConfig(BaseModel):
     @field_validator("search_default_mode")
     def validate_mode(cls, value: str) -> str:
         value = (value or "standard").strip().lower()
-        if value not in {"strict", "standard", "loose"}:
-            raise ValueError("search_default_mode muss strict|standard|loose sein")
+        if value not in {"strict", "standard", "loose", "substring", "fuzzy"}:
+            raise ValueError("search_default_mode muss strict|standard|loose|substring|fuzzy sein")
         return value
 
     @field_validator("search_prefix_minlen")
@@ -149,11 +164,17 @@ def load_config(path: Path = Path("config/central_config.ini"), use_env: bool =
         trimmed = item.strip()
         if trimmed:
             exclude_dirs.append(trimmed)
+    parallel_runs_raw = int(os.getenv("INDEX_PARALLEL_RUNS", "2") or 2) if use_env else 2
+    worker_budget_raw = int(os.getenv("INDEX_WORKER_BUDGET", "0") or 0) if use_env else 0
+    bulk_load = (os.getenv("INDEX_BULK_LOAD", "1") if use_env else "1").strip().lower() not in {"0", "false", "no", "off"}
     indexer_cfg = IndexerConfig(
         worker_count=worker_raw,
         run_interval_cron=None,
         max_file_size_mb=max_size_raw or None,
         exclude_dirs=exclude_dirs,
+        parallel_runs=max(1, parallel_runs_raw),
+        worker_budget=worker_budget_raw or None,
+        bulk_load=bulk_load,
     )
 
     smtp_host = os.getenv("SMTP_HOST", "") if use_env else ""
@@ -1,12 +1,24 @@
+import base64
+import fcntl
+import json
+import logging
 import os
+import re
+import secrets
 import sqlite3
 import datetime
+import time
+import unicodedata
+import zlib
 from contextlib import contextmanager
 from dataclasses import dataclass, asdict
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
+from app.db import migrations, pool
+
 DB_PATH = Path(os.getenv("DB_PATH", "data/index.db"))
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -52,13 +64,62 @@ class QuarantineEntry:
     cleanup_deleted_at: Optional[str] = None
 
 
-def connect() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+# Extrahierter Text liegt zlib-komprimiert in documents_content (id = doc_id = FTS-rowid);
+# documents_fts ist external content über die View documents_fts_content.
+CONTENT_COMPRESS_MIN_BYTES = 128
+CONTENT_COMPRESS_LEVEL = 6
+
+
+def compress_text(text: Optional[str]) -> Optional[Any]:
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    # kurze Texte unkomprimiert (TEXT), zlib lohnt sich erst ab einigen hundert Bytes
+    if len(raw) < CONTENT_COMPRESS_MIN_BYTES:
+        return text
+    return zlib.compress(raw, CONTENT_COMPRESS_LEVEL)
+
+
+def decompress_text(value: Any) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return zlib.decompress(value).decode("utf-8")
+
+
+def connect(path: Optional[Path] = None, check_same_thread: bool = True) -> sqlite3.Connection:
+    path = Path(path or DB_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    is_new = not path.exists()
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
     conn.row_factory = sqlite3.Row
+    if is_new:
+        # nur auf leerer DB wirksam; freie Seiten gibt die Wartung schrittweise zurück
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA busy_timeout=10000;")
     conn.execute("PRAGMA foreign_keys=ON;")
+    conn.create_function("zdecompress", 1, decompress_text, deterministic=True)
+    return conn
+
+
+# Verbindungs-Pools: Request-Handler holen vorkonfigurierte Verbindungen statt je Anfrage neu zu öffnen.
+# Lese-Verbindungen sind query_only mit größerem Seiten-Cache und mmap; Indexer und Bulk-Load
+# öffnen weiterhin eigene Verbindungen über connect().
+READ_POOL_SIZE = pool.pool_size("read", 8)
+WRITE_POOL_SIZE = pool.pool_size("write", 2)
+READ_CACHE_KIB = int(os.getenv("DB_READ_CACHE_KIB", "16384") or 16384)
+READ_MMAP_BYTES = int(os.getenv("DB_READ_MMAP_MB", "256") or 256) * 1024 * 1024
+
+
+def _open_writer(path: Path) -> sqlite3.Connection:
+    return connect(path, check_same_thread=False)
+
+
+def _open_reader(path: Path) -> sqlite3.Connection:
+    conn = connect(path, check_same_thread=False)
+    conn.execute("PRAGMA query_only=1;")
+    conn.execute(f"PRAGMA cache_size=-{READ_CACHE_KIB};")
+    conn.execute(f"PRAGMA mmap_size={READ_MMAP_BYTES};")
     return conn
 
 
@@ -71,135 +132,807 @@ def _ensure_column(conn: sqlite3.Connection, table: str, column: str, col_type:
 
 
 @contextmanager
-def get_conn():
-    conn = connect()
-    try:
+def get_conn(path: Optional[Path] = None):
+    # nach Reset/Löschen der Datei Schema neu anlegen; sonst nur Cache-Treffer
+    path = Path(path or DB_PATH)
+    init_db(path)
+    writers = pool.get_pool("index-write", path, _open_writer, WRITE_POOL_SIZE, row_factory=sqlite3.Row)
+    with writers.connection() as conn:
         yield conn
         conn.commit()
-    finally:
-        conn.close()
 
 
-def init_db() -> None:
-    with get_conn() as conn:
-        conn.executescript(
+@contextmanager
+def read_conn(path: Optional[Path] = None):
+    """Nur-Lese-Verbindung aus dem Pool (Suche, Vorschau, Status)."""
+    path = Path(path or DB_PATH)
+    init_db(path)
+    readers = pool.get_pool("index-read", path, _open_reader, READ_POOL_SIZE, row_factory=sqlite3.Row)
+    with readers.connection() as conn:
+        yield conn
+
+
+SCHEMA_V1 = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    filename TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    ctime REAL NOT NULL,
+    mtime REAL NOT NULL,
+    atime REAL,
+    owner TEXT,
+    last_editor TEXT,
+    msg_from TEXT,
+    msg_to TEXT,
+    msg_cc TEXT,
+    msg_subject TEXT,
+    msg_date TEXT,
+    msg_message_id TEXT,
+    msg_attachments TEXT,
+    tags TEXT
+);
+
+
+CREATE TABLE IF NOT EXISTS index_runs (
+    id INTEGER PRIMARY KEY,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    status TEXT NOT NULL,
+    scanned_files INTEGER DEFAULT 0,
+    added INTEGER DEFAULT 0,
+    updated INTEGER DEFAULT 0,
+    removed INTEGER DEFAULT 0,
+    errors INTEGER DEFAULT 0,
+    message TEXT,
+    source TEXT
+);
+
+CREATE TABLE IF NOT EXISTS file_errors (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER,
+    path TEXT NOT NULL,
+    error_type TEXT NOT NULL,
+    message TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    ignored INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY(run_id) REFERENCES index_runs(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS scanned_paths (
+    run_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    PRIMARY KEY(run_id, path)
+);
+
+CREATE TABLE IF NOT EXISTS index_run_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    path TEXT NOT NULL,
+    source TEXT,
+    ts TEXT NOT NULL,
+    actor TEXT NOT NULL DEFAULT 'indexer',
+    message TEXT,
+    FOREIGN KEY(run_id) REFERENCES index_runs(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_index_run_events_run_id ON index_run_events(run_id);
+
+CREATE TABLE IF NOT EXISTS quarantine_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    doc_id INTEGER,
+    source TEXT NOT NULL,
+    source_root TEXT NOT NULL,
+    original_path TEXT NOT NULL,
+    quarantine_path TEXT NOT NULL UNIQUE,
+    original_filename TEXT NOT NULL,
+    moved_at TEXT NOT NULL,
+    actor TEXT NOT NULL,
+    size_bytes INTEGER,
+    hash TEXT,
+    status TEXT NOT NULL DEFAULT 'quarantined',
+    restored_path TEXT,
+    restored_at TEXT,
+    hard_deleted_at TEXT,
+    cleanup_deleted_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_quarantine_status ON quarantine_entries(status);
+CREATE INDEX IF NOT EXISTS idx_quarantine_moved_at ON quarantine_entries(moved_at);
+"""
+
+
+CONTENT_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS documents_content (
+    id INTEGER PRIMARY KEY,
+    content BLOB,
+    title_or_subject TEXT
+)
+"""
+FTS_CONTENT_VIEW_SQL = """
+CREATE VIEW IF NOT EXISTS documents_fts_content AS
+SELECT id, id AS doc_id, zdecompress(content) AS content, title_or_subject FROM documents_content
+"""
+MIGRATION_BATCH = 500
+
+
+@dataclass(frozen=True)
+class FtsProfile:
+    detail: str = "full"  # full | column | none
+    columnsize: bool = True
+    prefix: bool = False
+
+
+# full: Phrasen/NEAR, Standard. prefix: zusätzlich Präfix-Indizes für die Such-Modi.
+# compact: nur Spalten-Treffer (keine Phrasen). minimal: nur Dokument-Treffer, keine Spaltenfilter.
+FTS_PROFILES: Dict[str, FtsProfile] = {
+    "full": FtsProfile(),
+    "prefix": FtsProfile(prefix=True),
+    "compact": FtsProfile(detail="column"),
+    "minimal": FtsProfile(detail="none", columnsize=False),
+}
+DEFAULT_FTS_PROFILE = "full"
+
+
+def fts_profile_name(value: Optional[str] = None) -> str:
+    name = (value or os.getenv("INDEX_FTS_PROFILE", "") or DEFAULT_FTS_PROFILE).strip().lower()
+    if name not in FTS_PROFILES:
+        logger.warning("Unbekanntes FTS-Profil %s, verwende %s", name, DEFAULT_FTS_PROFILE)
+        return DEFAULT_FTS_PROFILE
+    return name
+
+
+def fts_prefix_lengths() -> List[int]:
+    # Präfix-Index greift nur bei exakt passender Länge: Mindestlänge (standard) und die zwei folgenden
+    try:
+        minlen = max(1, int(os.getenv("SEARCH_PREFIX_MINLEN", "4") or 4))
+    except ValueError:
+        minlen = 4
+    return [minlen, minlen + 1, minlen + 2]
+
+
+def fts_table_sql(profile: Optional[str] = None) -> str:
+    prof = FTS_PROFILES[fts_profile_name(profile)]
+    options = [
+        "content = 'documents_fts_content'",
+        "content_rowid = 'id'",
+        "tokenize = 'unicode61 remove_diacritics 2'",
+    ]
+    if prof.detail != "full":
+        options.append(f"detail = {prof.detail}")
+    if not prof.columnsize:
+        options.append("columnsize = 0")
+    if prof.prefix:
+        options.append(f"prefix = '{' '.join(str(n) for n in fts_prefix_lengths())}'")
+    return (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(doc_id UNINDEXED, content, title_or_subject, "
+        + ", ".join(options)
+        + ")"
+    )
+
+
+def _normalize_sql(sql: str) -> str:
+    return " ".join((sql or "").replace("IF NOT EXISTS ", "").split())
+
+
+def _ensure_fts_profile(conn: sqlite3.Connection, profile: Optional[str] = None) -> None:
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'documents_fts'").fetchone()
+    if row is not None and _normalize_sql(row[0]) == _normalize_sql(fts_table_sql(profile)):
+        return
+    started = datetime.datetime.now()
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _rebuild_fts_index(conn, profile)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(
+        "FTS-Index mit Profil %s neu aufgebaut in %.1fs",
+        fts_profile_name(profile),
+        (datetime.datetime.now() - started).total_seconds(),
+    )
+
+
+def _rebuild_fts_index(conn: sqlite3.Connection, profile: Optional[str] = None) -> None:
+    """
+    Legt documents_fts mit dem gewünschten Profil neu an. Der Text liegt in documents_content,
+    daher wird nur neu tokenisiert, nicht neu extrahiert.
+    """
+    conn.execute("DROP TABLE IF EXISTS documents_fts")
+    conn.execute(FTS_CONTENT_VIEW_SQL)
+    conn.execute(fts_table_sql(profile))
+    conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('rebuild')")
+
+
+def _migrate_external_content(conn: sqlite3.Connection) -> None:
+    """
+    Überführt den alten FTS-Aufbau (Text als gespeicherte FTS-Spalte) in documents_content
+    (komprimiert) + external-content FTS. Der Index wird aus der Content-Tabelle neu aufgebaut.
+    Freie Seiten gibt erst die DB-Wartung bzw. ein VACUUM zurück.
+    """
+    conn.execute(CONTENT_TABLE_SQL)
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'documents_fts'").fetchone()
+    if row is None or "documents_fts_content" in (row[0] or ""):
+        conn.execute(FTS_CONTENT_VIEW_SQL)
+        conn.execute(fts_table_sql())
+        return
+    conn.execute("DELETE FROM documents_content")
+    last_rowid = 0
+    moved = 0
+    while True:
+        rows = conn.execute(
+            """
+            SELECT f.rowid, f.doc_id, f.content, f.title_or_subject
+            FROM documents_fts f JOIN documents d ON d.id = f.doc_id
+            WHERE f.rowid > ? ORDER BY f.rowid LIMIT ?
+            """,
+            (last_rowid, MIGRATION_BATCH),
+        ).fetchall()
+        if not rows:
+            break
+        last_rowid = rows[-1][0]
+        conn.executemany(
+            "INSERT OR REPLACE INTO documents_content (id, content, title_or_subject) VALUES (?, ?, ?)",
+            [(r[1], compress_text(r[2]), r[3]) for r in rows],
+        )
+        moved += len(rows)
+    _rebuild_fts_index(conn)
+    logger.info("FTS auf komprimierten External-Content umgestellt: %s Dokumente", moved)
+
+
+# Kompaktes Dokumentschema: wiederkehrende Zeichenketten (Quelle, Endung, Besitzer, Verzeichnis)
+# als Integer-Schlüssel in Lookup-Tabellen, der Pfad relativ zu seinem Verzeichnis.
+# Die View `documents` liefert die bisherigen Spalten; geschrieben wird nur in documents_data.
+DICTIONARY_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS doc_sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS doc_extensions (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS doc_owners (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS doc_dirs (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+
+CREATE TABLE IF NOT EXISTS documents_data (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL,
+    dir_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    filename TEXT,
+    extension_id INTEGER NOT NULL,
+    size_bytes INTEGER NOT NULL,
+    ctime REAL NOT NULL,
+    mtime REAL NOT NULL,
+    atime REAL,
+    owner_id INTEGER,
+    last_editor_id INTEGER,
+    msg_from TEXT,
+    msg_to TEXT,
+    msg_cc TEXT,
+    msg_subject TEXT,
+    msg_date TEXT,
+    msg_message_id TEXT,
+    msg_attachments TEXT,
+    tags TEXT,
+    UNIQUE(dir_id, name)
+);
+CREATE INDEX IF NOT EXISTS idx_documents_data_source ON documents_data(source_id);
+CREATE INDEX IF NOT EXISTS idx_documents_data_extension ON documents_data(extension_id);
+"""
+
+# filename NULL = letzter Pfadbestandteil (Normalfall), nur abweichende Anzeigenamen werden gespeichert
+DOCUMENT_COLUMNS_SQL = """
+    d.id, s.name AS source, p.path || d.name AS path, COALESCE(d.filename, d.name) AS filename,
+    e.name AS extension, d.size_bytes, d.ctime, d.mtime, d.atime, o.name AS owner, le.name AS last_editor,
+    d.msg_from, d.msg_to, d.msg_cc, d.msg_subject, d.msg_date, d.msg_message_id, d.msg_attachments, d.tags
+"""
+DOCUMENT_JOINS_SQL = """
+    JOIN doc_sources s ON s.id = d.source_id
+    JOIN doc_dirs p ON p.id = d.dir_id
+    JOIN doc_extensions e ON e.id = d.extension_id
+    LEFT JOIN doc_owners o ON o.id = d.owner_id
+    LEFT JOIN doc_owners le ON le.id = d.last_editor_id
+"""
+DOCUMENTS_VIEW_SQL = f"CREATE VIEW IF NOT EXISTS documents AS SELECT {DOCUMENT_COLUMNS_SQL} FROM documents_data d {DOCUMENT_JOINS_SQL}"
+
+DOCUMENT_PASSTHROUGH_COLUMNS = (
+    "atime", "msg_from", "msg_to", "msg_cc", "msg_subject", "msg_date", "msg_message_id", "msg_attachments", "tags",
+)
+DOCUMENT_TABLES = ("doc_sources", "doc_extensions", "doc_owners", "doc_dirs", "documents_data")
+_ID_BY_PATH_SQL = "SELECT d.id FROM documents_data d JOIN doc_dirs p ON p.id = d.dir_id WHERE p.path = ? AND d.name = ?"
+
+
+def split_path(path: str) -> Tuple[str, str]:
+    """(Verzeichnis inkl. Trenner, Name); Verzeichnis || Name ergibt wieder den Pfad."""
+    cut = max(path.rfind("/"), path.rfind("\\")) + 1
+    return path[:cut], path[cut:]
+
+
+def _dict_id(conn: sqlite3.Connection, table: str, value: Optional[str], column: str = "name") -> Optional[int]:
+    if value is None:
+        return None
+    row = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()
+    if row is not None:
+        return row[0]
+    return conn.execute(f"INSERT INTO {table} ({column}) VALUES (?)", (value,)).lastrowid
+
+
+def _dict_ids(conn: sqlite3.Connection, table: str, values: List[str]) -> List[int]:
+    # nur lesen: unbekannte Werte haben keine Dokumente
+    if not values:
+        return []
+    rows = conn.execute(f"SELECT id FROM {table} WHERE name IN ({','.join('?' * len(values))})", values).fetchall()
+    return [row[0] for row in rows]
+
+
+def _document_id_by_path(conn: sqlite3.Connection, path: str) -> Optional[int]:
+    row = conn.execute(_ID_BY_PATH_SQL, split_path(path)).fetchone()
+    return row[0] if row else None
+
+
+def _data_params(conn: sqlite3.Connection, meta: DocumentMeta) -> Dict[str, Any]:
+    params = asdict(meta)
+    directory, name = split_path(meta.path)
+    params.update(
+        source_id=_dict_id(conn, "doc_sources", meta.source),
+        dir_id=_dict_id(conn, "doc_dirs", directory, column="path"),
+        name=name,
+        filename=None if meta.filename == name else meta.filename,
+        extension_id=_dict_id(conn, "doc_extensions", meta.extension),
+        owner_id=_dict_id(conn, "doc_owners", meta.owner),
+        last_editor_id=_dict_id(conn, "doc_owners", meta.last_editor),
+    )
+    return params
+
+
+def _migrate_dictionary_schema(conn: sqlite3.Connection) -> None:
+    """
+    Überführt die Tabelle documents in documents_data + Lookup-Tabellen und legt die View documents an.
+    IDs bleiben erhalten (documents_content/FTS hängen daran).
+    """
+    migrations.run_script(conn, DICTIONARY_SCHEMA_SQL)
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'documents'").fetchone()
+    if row is not None and row[0] == "table":
+        conn.create_function("split_dir", 1, lambda p: split_path(p)[0], deterministic=True)
+        conn.create_function("split_name", 1, lambda p: split_path(p)[1], deterministic=True)
+        conn.execute("INSERT OR IGNORE INTO doc_sources (name) SELECT DISTINCT source FROM documents")
+        conn.execute("INSERT OR IGNORE INTO doc_extensions (name) SELECT DISTINCT extension FROM documents")
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO doc_owners (name)
+            SELECT owner FROM documents WHERE owner IS NOT NULL
+            UNION SELECT last_editor FROM documents WHERE last_editor IS NOT NULL
+            """
+        )
+        conn.execute("INSERT OR IGNORE INTO doc_dirs (path) SELECT DISTINCT split_dir(path) FROM documents")
+        # sehr alte DBs haben nicht alle Mail-Spalten
+        present = set(_table_columns(conn, "main", "documents"))
+        passthrough = [c for c in DOCUMENT_PASSTHROUGH_COLUMNS if c in present]
+        moved = conn.execute(
+            f"""
+            INSERT INTO documents_data (id, source_id, dir_id, name, filename, extension_id, size_bytes, ctime, mtime,
+                                        owner_id, last_editor_id, {', '.join(passthrough)})
+            SELECT doc.id, s.id, p.id, split_name(doc.path),
+                   NULLIF(doc.filename, split_name(doc.path)), e.id, doc.size_bytes, doc.ctime, doc.mtime,
+                   o.id, le.id, {', '.join('doc.' + c for c in passthrough)}
+            FROM documents doc
+            JOIN doc_sources s ON s.name = doc.source
+            JOIN doc_dirs p ON p.path = split_dir(doc.path)
+            JOIN doc_extensions e ON e.name = doc.extension
+            LEFT JOIN doc_owners o ON o.name = doc.owner
+            LEFT JOIN doc_owners le ON le.name = doc.last_editor
             """
-            CREATE TABLE IF NOT EXISTS documents (
-                id INTEGER PRIMARY KEY,
-                source TEXT NOT NULL,
-                path TEXT NOT NULL UNIQUE,
-                filename TEXT NOT NULL,
-                extension TEXT NOT NULL,
-                size_bytes INTEGER NOT NULL,
-                ctime REAL NOT NULL,
-                mtime REAL NOT NULL,
-                atime REAL,
-                owner TEXT,
-                last_editor TEXT,
-                msg_from TEXT,
-                msg_to TEXT,
-                msg_cc TEXT,
-                msg_subject TEXT,
-                msg_date TEXT,
-                msg_message_id TEXT,
-                msg_attachments TEXT,
-                tags TEXT
-            );
-
-            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
-                doc_id UNINDEXED,
-                content,
-                title_or_subject,
-                tokenize = 'unicode61 remove_diacritics 2'
-            );
-
-            CREATE TABLE IF NOT EXISTS index_runs (
-                id INTEGER PRIMARY KEY,
-                started_at TEXT NOT NULL,
-                finished_at TEXT,
-                status TEXT NOT NULL,
-                scanned_files INTEGER DEFAULT 0,
-                added INTEGER DEFAULT 0,
-                updated INTEGER DEFAULT 0,
-                removed INTEGER DEFAULT 0,
-                errors INTEGER DEFAULT 0,
-                message TEXT
-            );
-
-            CREATE TABLE IF NOT EXISTS file_errors (
-                id INTEGER PRIMARY KEY,
-                run_id INTEGER,
-                path TEXT NOT NULL,
-                error_type TEXT NOT NULL,
-                message TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                ignored INTEGER NOT NULL DEFAULT 0,
-                FOREIGN KEY(run_id) REFERENCES index_runs(id) ON DELETE CASCADE
-            );
-
-            CREATE TABLE IF NOT EXISTS scanned_paths (
-                run_id INTEGER NOT NULL,
-                path TEXT NOT NULL,
-                PRIMARY KEY(run_id, path)
-            );
-
-            CREATE TABLE IF NOT EXISTS index_run_events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                run_id INTEGER NOT NULL,
-                action TEXT NOT NULL,
-                path TEXT NOT NULL,
-                source TEXT,
-                ts TEXT NOT NULL,
-                actor TEXT NOT NULL DEFAULT 'indexer',
-                message TEXT,
-                FOREIGN KEY(run_id) REFERENCES index_runs(id) ON DELETE CASCADE
-            );
-            CREATE INDEX IF NOT EXISTS idx_index_run_events_run_id ON index_run_events(run_id);
-
-            CREATE TABLE IF NOT EXISTS quarantine_entries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                doc_id INTEGER,
-                source TEXT NOT NULL,
-                source_root TEXT NOT NULL,
-                original_path TEXT NOT NULL,
-                quarantine_path TEXT NOT NULL UNIQUE,
-                original_filename TEXT NOT NULL,
-                moved_at TEXT NOT NULL,
-                actor TEXT NOT NULL,
-                size_bytes INTEGER,
-                hash TEXT,
-                status TEXT NOT NULL DEFAULT 'quarantined',
-                restored_path TEXT,
-                restored_at TEXT,
-                hard_deleted_at TEXT,
-                cleanup_deleted_at TEXT
-            );
-            CREATE INDEX IF NOT EXISTS idx_quarantine_status ON quarantine_entries(status);
-            CREATE INDEX IF NOT EXISTS idx_quarantine_moved_at ON quarantine_entries(moved_at);
+        ).rowcount
+        conn.execute("DROP TABLE documents")
+        logger.info("Dokumente auf kompaktes Schema umgestellt: %s Einträge", moved)
+    conn.execute(DOCUMENTS_VIEW_SQL)
+
+
+# Verlaufstabellen: Indizes für Fehlerlisten/Zähler und verdichtete Zählwerte alter Läufe
+HISTORY_SCHEMA_SQL = """
+CREATE INDEX IF NOT EXISTS idx_file_errors_run_created ON file_errors(run_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_file_errors_created ON file_errors(created_at);
+CREATE INDEX IF NOT EXISTS idx_file_errors_open ON file_errors(created_at) WHERE ignored = 0;
+DROP INDEX IF EXISTS idx_index_run_events_run_id;
+CREATE INDEX IF NOT EXISTS idx_index_run_events_run_action ON index_run_events(run_id, action);
+CREATE INDEX IF NOT EXISTS idx_index_runs_started ON index_runs(started_at);
+
+CREATE TABLE IF NOT EXISTS index_run_counts (
+    run_id INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (run_id, kind, key),
+    FOREIGN KEY(run_id) REFERENCES index_runs(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+
+def _migrate_history_tables(conn: sqlite3.Connection) -> None:
+    migrations.run_script(conn, HISTORY_SCHEMA_SQL)
+    _ensure_column(conn, "index_runs", "compacted_at", "TEXT")
+
+
+# Materialisierte Statistik: Dokumente/Bytes je (Quelle, Endung) und offene Fehler, von den Schreib-
+# und Löschpfaden unten in derselben Transaktion gepflegt. Status-Abfragen lesen nur diese kleinen
+# Tabellen; reconcile_stats (Wartungsaufgabe "stats") gleicht sie gegen die Quelltabellen ab.
+# Bewusst keine Trigger: ein Trigger erzwingt je INSERT einen Statement-Savepoint, und FTS5 schreibt
+# bei jedem Savepoint seine Pending-Terms als eigenes Segment weg (Bulk-Load doppelt so langsam).
+STATS_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS doc_stats (
+    source_id INTEGER NOT NULL,
+    extension_id INTEGER NOT NULL,
+    docs INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (source_id, extension_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS index_counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _stats_add(conn: sqlite3.Connection, source_id: int, extension_id: int, docs: int, size: int) -> None:
+    conn.execute(
         """
+        INSERT INTO doc_stats (source_id, extension_id, docs, bytes) VALUES (?, ?, ?, ?)
+        ON CONFLICT(source_id, extension_id) DO UPDATE SET docs = docs + excluded.docs, bytes = bytes + excluded.bytes
+        """,
+        (source_id, extension_id, docs, size),
+    )
+
+
+def _open_errors_add(conn: sqlite3.Connection, delta: int) -> None:
+    if delta:
+        conn.execute("UPDATE index_counters SET value = value + ? WHERE name = 'open_errors'", (delta,))
+
+
+def _bump_doc_generation(conn: sqlite3.Connection) -> None:
+    # jede sichtbare Änderung an Dokumenten; der Such-Cache verwirft Einträge älterer Generationen
+    conn.execute("UPDATE index_counters SET value = value + 1 WHERE name = 'generation'")
+
+
+def cache_generation(conn: sqlite3.Connection) -> Tuple[Tuple[int, int], int]:
+    """
+    Liefert ((Umschalt-Generation, DB-Kennung), Zähler). Der erste Teil ändert sich bei
+    Schattentausch und Reset, der Zähler mit jedem Commit, der Dokumente ändert.
+    Snapshots übernehmen Kennung und Zähler der Primär-DB.
+    """
+    values = dict(conn.execute("SELECT name, value FROM index_counters WHERE name IN ('db_id', 'generation')").fetchall())
+    return (_generation, int(values.get("db_id", 0))), int(values.get("generation", 0))
+
+
+def _stats_snapshot(conn: sqlite3.Connection) -> Dict[str, int]:
+    docs, size = conn.execute("SELECT COALESCE(SUM(docs), 0), COALESCE(SUM(bytes), 0) FROM doc_stats").fetchone()
+    row = conn.execute("SELECT value FROM index_counters WHERE name = 'open_errors'").fetchone()
+    return {"docs": int(docs), "bytes": int(size), "open_errors": int(row[0]) if row else 0}
+
+
+def reconcile_stats(conn: sqlite3.Connection) -> Dict[str, int]:
+    """
+    Berechnet doc_stats und Zähler aus documents_data/file_errors neu und liefert die Abweichung
+    (neu minus alt). Ohne eigene Transaktionssteuerung: Aufrufer hält die Schreibsperre.
+    """
+    before = _stats_snapshot(conn)
+    conn.execute("DELETE FROM doc_stats")
+    conn.execute(
+        """
+        INSERT INTO doc_stats (source_id, extension_id, docs, bytes)
+        SELECT source_id, extension_id, COUNT(*), COALESCE(SUM(size_bytes), 0)
+        FROM documents_data GROUP BY source_id, extension_id
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO index_counters (name, value)
+        VALUES ('open_errors', (SELECT COUNT(*) FROM file_errors WHERE ignored = 0))
+        """
+    )
+    after = _stats_snapshot(conn)
+    return {key: after[key] - before[key] for key in after}
+
+
+def _migrate_stats_tables(conn: sqlite3.Connection) -> None:
+    migrations.run_script(conn, STATS_SCHEMA_SQL)
+    reconcile_stats(conn)
+
+
+def _migrate_generation_counter(conn: sqlite3.Connection) -> None:
+    # zufällige Kennung: eine neu angelegte DB (Reset, Schattenaufbau) trifft keine alten Cache-Einträge
+    conn.execute(
+        "INSERT OR IGNORE INTO index_counters (name, value) VALUES ('generation', 0), ('db_id', ?)",
+        (secrets.randbits(62),),
+    )
+
+
+# Sortierte und gefilterte Suche: ORDER BY mtime (Standard für "*") und Zeitfilter über Indizes,
+# Quelle/Endung mit mtime kombiniert (ersetzen die einspaltigen Indizes aus Version 4);
+# fts5vocab liefert Trefferzahlen je Begriff für die Wahl der Strategie in search_documents
+SEARCH_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_documents_data_mtime ON documents_data(mtime);
+CREATE INDEX IF NOT EXISTS idx_documents_data_source_mtime ON documents_data(source_id, mtime);
+CREATE INDEX IF NOT EXISTS idx_documents_data_extension_mtime ON documents_data(extension_id, mtime);
+DROP INDEX IF EXISTS idx_documents_data_source;
+DROP INDEX IF EXISTS idx_documents_data_extension;
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts_vocab USING fts5vocab(documents_fts, 'row');
+"""
+
+
+def _migrate_search_indexes(conn: sqlite3.Connection) -> None:
+    migrations.run_script(conn, SEARCH_INDEX_SQL)
+
+
+# Teilwortsuche (Modus substring): zweiter FTS5-Index mit Trigramm-Tokenizer. documents_content.trigram
+# hält je Dokument, was indiziert ist (0 nichts, 1 Titel, 2 Titel und Inhalt), damit 'delete' genau die
+# indizierten Werte austrägt, auch wenn sich die Konfiguration seitdem geändert hat.
+FTS_TABLE = "documents_fts"
+TRIGRAM_TABLE = "documents_trigram"
+SEARCH_TABLES = (FTS_TABLE, TRIGRAM_TABLE)
+TRIGRAM_TITLE = 1
+TRIGRAM_CONTENT = 2
+TRIGRAM_CONTENT_VIEW_SQL = """
+CREATE VIEW IF NOT EXISTS documents_trigram_content AS
+SELECT id, CASE WHEN trigram = 2 THEN zdecompress(content) END AS content, title_or_subject
+FROM documents_content WHERE trigram > 0
+"""
+TRIGRAM_TABLE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS documents_trigram USING fts5(
+    content, title_or_subject,
+    content = 'documents_trigram_content', content_rowid = 'id', tokenize = 'trigram'
+)
+"""
+
+
+def _trigram_sources(value: str) -> Optional[set]:
+    # None = alle Quellen
+    labels = {part.strip().lower() for part in (value or "").split(",") if part.strip()}
+    return None if "*" in labels else labels
+
+
+def trigram_config() -> Tuple[str, str]:
+    """
+    (Quellen mit Titel-Trigrammen, Quellen mit Inhalts-Trigrammen); kommagetrennte Labels, * = alle.
+    """
+    return (
+        os.getenv("INDEX_TRIGRAM_SOURCES", "*").strip(),
+        os.getenv("INDEX_TRIGRAM_CONTENT_SOURCES", "").strip(),
+    )
+
+
+def trigram_level(source: Optional[str], config: Optional[Tuple[str, str]] = None) -> int:
+    titles, contents = config or trigram_config()
+    label = (source or "").lower()
+    for value, level in ((contents, TRIGRAM_CONTENT), (titles, TRIGRAM_TITLE)):
+        labels = _trigram_sources(value)
+        if labels is None or label in labels:
+            return level
+    return 0
+
+
+def _migrate_trigram_index(conn: sqlite3.Connection) -> None:
+    # ohne Default-UPDATE: ADD COLUMN mit DEFAULT schreibt keine Zeile um; befüllt wird in _ensure_trigram_config
+    _ensure_column(conn, "documents_content", "trigram", "INTEGER NOT NULL DEFAULT 0")
+    conn.execute(TRIGRAM_CONTENT_VIEW_SQL)
+    conn.execute(TRIGRAM_TABLE_SQL)
+
+
+# Vom Bulk-Load entfernte Indizes; migrate legt sie wieder an, falls der Lauf abbrach, bevor
+# finish_bulk_load sie neu erstellen konnte
+BULK_DEFERRED_SQL = """
+CREATE TABLE IF NOT EXISTS bulk_deferred_indexes (
+    name TEXT PRIMARY KEY,
+    sql TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def _migrate_bulk_deferred_indexes(conn: sqlite3.Connection) -> None:
+    migrations.run_script(conn, BULK_DEFERRED_SQL)
+
+
+# Pfade, die Datei-Aktionen (Umbenennen, Verschieben, Kopieren, Quarantäne) im Index geändert haben;
+# publish_shadow_db gleicht sie vor dem Umschalten mit der Live-DB ab
+PATH_CHANGES_SQL = """
+CREATE TABLE IF NOT EXISTS path_changes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL
+);
+"""
+
+
+def _migrate_path_changes(conn: sqlite3.Connection) -> None:
+    migrations.run_script(conn, PATH_CHANGES_SQL)
+
+
+def _trigram_signature(config: Tuple[str, str]) -> int:
+    return zlib.crc32("\n".join(config).encode("utf-8"))
+
+
+def _ensure_trigram_config(conn: sqlite3.Connection) -> None:
+    """
+    Baut den Trigramm-Index neu auf, wenn sich INDEX_TRIGRAM_SOURCES/INDEX_TRIGRAM_CONTENT_SOURCES
+    seit dem letzten Aufbau geändert haben (Prüfsumme in index_counters). Neue Dokumente folgen der
+    Konfiguration beim Schreiben.
+    """
+    config = trigram_config()
+    signature = _trigram_signature(config)
+    row = conn.execute("SELECT value FROM index_counters WHERE name = 'trigram_config'").fetchone()
+    if row is not None and int(row[0]) == signature:
+        return
+    started = datetime.datetime.now()
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for source_id, name in conn.execute("SELECT id, name FROM doc_sources").fetchall():
+            level = trigram_level(name, config)
+            conn.execute(
+                "UPDATE documents_content SET trigram = ? WHERE trigram != ? AND id IN "
+                "(SELECT id FROM documents_data WHERE source_id = ?)",
+                (level, level, source_id),
+            )
+        conn.execute("INSERT INTO documents_trigram(documents_trigram) VALUES ('rebuild')")
+        conn.execute(
+            "INSERT OR REPLACE INTO index_counters (name, value) VALUES ('trigram_config', ?)", (signature,)
         )
-        _ensure_column(conn, "file_errors", "ignored", "INTEGER NOT NULL DEFAULT 0", default=0)
-        _ensure_column(conn, "documents", "msg_message_id", "TEXT")
-        _ensure_column(conn, "documents", "msg_attachments", "TEXT")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(
+        "Trigramm-Index aufgebaut in %.1fs (Titel: %s, Inhalt: %s)",
+        (datetime.datetime.now() - started).total_seconds(),
+        config[0] or "-",
+        config[1] or "-",
+    )
+
+
+def _migrate_legacy_columns(conn: sqlite3.Connection) -> None:
+    _ensure_column(conn, "file_errors", "ignored", "INTEGER NOT NULL DEFAULT 0", default=0)
+    _ensure_column(conn, "documents", "msg_message_id", "TEXT")
+    _ensure_column(conn, "documents", "msg_attachments", "TEXT")
+    _ensure_column(conn, "index_runs", "source", "TEXT")
+
+
+# Neue Schemaänderungen nur als weitere Einträge anhängen, bestehende nie ändern
+MIGRATIONS: List[migrations.Migration] = [
+    (1, "Grundschema", lambda conn: migrations.run_script(conn, SCHEMA_V1)),
+    (2, "Spalten aus älteren Versionen", _migrate_legacy_columns),
+    (3, "komprimierter External-Content für documents_fts", _migrate_external_content),
+    (4, "Dokumente mit Lookup-Tabellen (Quelle, Endung, Besitzer, Verzeichnis)", _migrate_dictionary_schema),
+    (5, "Indizes und Verdichtung für Verlaufstabellen", _migrate_history_tables),
+    (6, "Materialisierte Statistik (doc_stats, Fehlerzähler)", _migrate_stats_tables),
+    (7, "Index-Generation für den Such-Cache", _migrate_generation_counter),
+    (8, "Indizes für sortierte und gefilterte Suche, fts5vocab", _migrate_search_indexes),
+    (9, "Trigramm-Index für die Teilwortsuche", _migrate_trigram_index),
+    (10, "Vormerkung der beim Bulk-Load entfernten Indizes", _migrate_bulk_deferred_indexes),
+    (11, "Pfad-Journal der Datei-Aktionen für den Schattenaufbau", _migrate_path_changes),
+]
+
+
+def migrate(path: Optional[Path] = None, fts_profile: Optional[str] = None) -> List[int]:
+    conn = connect(path)
+    try:
+        applied = migrations.apply_migrations(conn, MIGRATIONS, "index")
+        restored = restore_deferred_indexes(conn)
+        if restored:
+            logger.warning("Indizes eines abgebrochenen Bulk-Loads wiederhergestellt: %s", ", ".join(restored))
+        _ensure_fts_profile(conn, fts_profile)
+        _ensure_trigram_config(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return applied
+
+
+def check_published(path: Path) -> None:
+    """
+    Prüft einen übernommenen Snapshot nur lesend (Follower), statt ihn zu migrieren: ein anderes
+    Schema wird abgelehnt, ein abweichendes FTS-Profil bzw. andere Trigramm-Quellen nur gemeldet.
+    Es gilt der Aufbau der Primär-Instanz.
+    """
+    conn = sqlite3.connect(f"file:{Path(path)}?mode=ro", uri=True)
+    try:
+        version, latest = migrations.schema_version(conn), migrations.latest_version(MIGRATIONS)
+        if version != latest:
+            raise RuntimeError(f"Snapshot hat Schema-Version {version}, erwartet {latest}")
+        row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'documents_fts'").fetchone()
+        if row is None or _normalize_sql(row[0]) != _normalize_sql(fts_table_sql()):
+            logger.warning(
+                "FTS-Profil des Snapshots %s weicht von INDEX_FTS_PROFILE=%s ab, wird nicht neu aufgebaut",
+                Path(path).name,
+                fts_profile_name(),
+            )
+        row = conn.execute("SELECT value FROM index_counters WHERE name = 'trigram_config'").fetchone()
+        if row is None or int(row[0]) != _trigram_signature(trigram_config()):
+            logger.warning(
+                "Trigramm-Quellen des Snapshots %s weichen von INDEX_TRIGRAM_* ab, wird nicht neu aufgebaut",
+                Path(path).name,
+            )
+    finally:
+        conn.close()
+
+
+def init_db(path: Optional[Path] = None, fts_profile: Optional[str] = None) -> None:
+    """
+    Bringt die Index-DB auf den aktuellen Stand; je Prozess und Datei nur einmal (Start, CLI, neue Datei).
+    """
+    path = Path(path or DB_PATH)
+    migrations.ensure_migrated("index", path, lambda: migrate(path, fts_profile))
+
+
+def _fts_insert(
+    conn: sqlite3.Connection, doc_id: int, content: Optional[str], title_or_subject: Optional[str], trigram: int = 0
+) -> None:
+    conn.execute(
+        "INSERT INTO documents_content (id, content, title_or_subject, trigram) VALUES (?, ?, ?, ?)",
+        (doc_id, compress_text(content), title_or_subject, trigram),
+    )
+    conn.execute(
+        "INSERT INTO documents_fts (rowid, doc_id, content, title_or_subject) VALUES (?, ?, ?, ?)",
+        (doc_id, doc_id, content, title_or_subject),
+    )
+    if trigram:
+        conn.execute(
+            "INSERT INTO documents_trigram (rowid, content, title_or_subject) VALUES (?, ?, ?)",
+            (doc_id, content if trigram == TRIGRAM_CONTENT else None, title_or_subject),
+        )
+
+
+def _fts_delete(conn: sqlite3.Connection, doc_ids: Iterable[int]) -> None:
+    # external content: FTS-Einträge mit den gespeicherten Werten austragen, bevor der Inhalt verschwindet
+    ids = list(doc_ids)
+    for start in range(0, len(ids), MIGRATION_BATCH):
+        chunk = ids[start:start + MIGRATION_BATCH]
+        placeholders = ",".join("?" * len(chunk))
+        conn.execute(
+            f"""
+            INSERT INTO documents_fts (documents_fts, rowid, doc_id, content, title_or_subject)
+            SELECT 'delete', id, id, zdecompress(content), title_or_subject
+            FROM documents_content WHERE id IN ({placeholders})
+            """,
+            chunk,
+        )
+        conn.execute(
+            f"""
+            INSERT INTO documents_trigram (documents_trigram, rowid, content, title_or_subject)
+            SELECT 'delete', id, content, title_or_subject
+            FROM documents_trigram_content WHERE id IN ({placeholders})
+            """,
+            chunk,
+        )
+        conn.execute(f"DELETE FROM documents_content WHERE id IN ({placeholders})", chunk)
+
+
+DATA_INSERT_SQL = """
+    INSERT INTO documents_data (source_id, dir_id, name, filename, extension_id, size_bytes, ctime, mtime, atime,
+                                owner_id, last_editor_id, msg_from, msg_to, msg_cc, msg_subject, msg_date,
+                                msg_message_id, msg_attachments, tags)
+    VALUES (:source_id, :dir_id, :name, :filename, :extension_id, :size_bytes, :ctime, :mtime, :atime,
+            :owner_id, :last_editor_id, :msg_from, :msg_to, :msg_cc, :msg_subject, :msg_date,
+            :msg_message_id, :msg_attachments, :tags)
+"""
 
 
 def upsert_document(conn: sqlite3.Connection, meta: DocumentMeta) -> int:
+    params = _data_params(conn, meta)
+    previous = conn.execute(
+        "SELECT source_id, extension_id, size_bytes FROM documents_data WHERE dir_id = ? AND name = ?",
+        (params["dir_id"], params["name"]),
+    ).fetchone()
     cursor = conn.execute(
-        """
-        INSERT INTO documents (source, path, filename, extension, size_bytes, ctime, mtime, atime, owner, last_editor,
-                               msg_from, msg_to, msg_cc, msg_subject, msg_date, msg_message_id, msg_attachments, tags)
-        VALUES (:source, :path, :filename, :extension, :size_bytes, :ctime, :mtime, :atime, :owner, :last_editor,
-                :msg_from, :msg_to, :msg_cc, :msg_subject, :msg_date, :msg_message_id, :msg_attachments, :tags)
-        ON CONFLICT(path) DO UPDATE SET
-            source=excluded.source,
+        DATA_INSERT_SQL
+        + """
+        ON CONFLICT(dir_id, name) DO UPDATE SET
+            source_id=excluded.source_id,
             filename=excluded.filename,
-            extension=excluded.extension,
+            extension_id=excluded.extension_id,
             size_bytes=excluded.size_bytes,
             ctime=excluded.ctime,
             mtime=excluded.mtime,
             atime=excluded.atime,
-            owner=excluded.owner,
-            last_editor=excluded.last_editor,
+            owner_id=excluded.owner_id,
+            last_editor_id=excluded.last_editor_id,
             msg_from=excluded.msg_from,
             msg_to=excluded.msg_to,
             msg_cc=excluded.msg_cc,
@@ -210,34 +943,430 @@ def upsert_document(conn: sqlite3.Connection, meta: DocumentMeta) -> int:
             tags=excluded.tags
         RETURNING id;
         """,
-        asdict(meta),
+        params,
     )
     doc_id = cursor.fetchone()[0]
-    conn.execute("DELETE FROM documents_fts WHERE doc_id = ?", (doc_id,))
-    conn.execute(
-        "INSERT INTO documents_fts (doc_id, content, title_or_subject) VALUES (?, ?, ?)",
-        (doc_id, meta.content, meta.title_or_subject),
-    )
+    if previous is not None:
+        _stats_add(conn, previous[0], previous[1], -1, -previous[2])
+    _stats_add(conn, params["source_id"], params["extension_id"], 1, meta.size_bytes)
+    _bump_doc_generation(conn)
+    _fts_delete(conn, [doc_id])
+    _fts_insert(conn, doc_id, meta.content, meta.title_or_subject, trigram_level(meta.source))
     return doc_id
 
 
+# Bulk-Load für leere Datenbanken (Erstaufbau, Schattenaufbau ohne Übernahme)
+BULK_DEFERRED_INDEX_TABLES = ("documents_data", "index_run_events")
+
+
+def is_index_empty(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT 1 FROM documents_data LIMIT 1").fetchone() is None
+
+
+def apply_bulk_pragmas(conn: sqlite3.Connection) -> None:
+    # gelten je Verbindung; nach einem Neuöffnen während des Bulk-Loads erneut setzen
+    conn.execute("PRAGMA synchronous=OFF;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    conn.execute("PRAGMA cache_size=-65536;")
+    conn.execute("PRAGMA wal_autocheckpoint=10000;")
+
+
+def begin_bulk_load(conn: sqlite3.Connection) -> List[str]:
+    """
+    Lockert Durability-Pragmas und entfernt Sekundärindizes der Massentabellen. Ihre CREATE-Statements
+    werden in derselben Transaktion in bulk_deferred_indexes vorgemerkt. Liefert die Namen.
+    """
+    apply_bulk_pragmas(conn)
+    placeholders = ",".join("?" * len(BULK_DEFERRED_INDEX_TABLES))
+    rows = conn.execute(
+        f"SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+        BULK_DEFERRED_INDEX_TABLES,
+    ).fetchall()
+    for row in rows:
+        conn.execute("INSERT OR REPLACE INTO bulk_deferred_indexes (name, sql) VALUES (?, ?)", (row[0], row[1]))
+        conn.execute(f'DROP INDEX IF EXISTS "{row[0]}"')
+    conn.commit()
+    return [row[0] for row in rows]
+
+
+def restore_deferred_indexes(conn: sqlite3.Connection) -> List[str]:
+    """
+    Legt vorgemerkte Indizes an, die noch fehlen, und löscht die Vormerkung. Liefert die neu angelegten.
+    """
+    created = []
+    for name, sql in conn.execute("SELECT name, sql FROM bulk_deferred_indexes ORDER BY name").fetchall():
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (name,)).fetchone() is None:
+            conn.execute(sql)
+            created.append(name)
+        conn.execute("DELETE FROM bulk_deferred_indexes WHERE name = ?", (name,))
+    conn.commit()
+    return created
+
+
+def insert_document_bulk(conn: sqlite3.Connection, meta: DocumentMeta) -> int:
+    """
+    Einfügen ohne Konfliktbehandlung.
+    Bei vorhandenem Pfad (IntegrityError) ist upsert_document zu verwenden.
+    """
+    params = _data_params(conn, meta)
+    cursor = conn.execute(DATA_INSERT_SQL, params)
+    doc_id = cursor.lastrowid
+    _stats_add(conn, params["source_id"], params["extension_id"], 1, meta.size_bytes)
+    _bump_doc_generation(conn)
+    _fts_insert(conn, doc_id, meta.content, meta.title_or_subject, trigram_level(meta.source))
+    return doc_id
+
+
+def finish_bulk_load(conn: sqlite3.Connection) -> None:
+    restore_deferred_indexes(conn)
+    conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+    conn.execute("INSERT INTO documents_trigram(documents_trigram) VALUES ('optimize')")
+    conn.commit()
+    conn.execute("PRAGMA optimize;")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+
+
+def _delete_documents(conn: sqlite3.Connection, ids: List[int]) -> None:
+    if ids:
+        _bump_doc_generation(conn)
+    _fts_delete(conn, ids)
+    for start in range(0, len(ids), MIGRATION_BATCH):
+        chunk = ids[start:start + MIGRATION_BATCH]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(
+            f"""
+            SELECT source_id, extension_id, COUNT(*), SUM(size_bytes) FROM documents_data
+            WHERE id IN ({placeholders}) GROUP BY source_id, extension_id
+            """,
+            chunk,
+        ).fetchall():
+            _stats_add(conn, row[0], row[1], -row[2], -row[3])
+        conn.execute(f"DELETE FROM documents_data WHERE id IN ({placeholders})", chunk)
+
+
 def remove_documents_by_paths(conn: sqlite3.Connection, missing_paths: Iterable[str]) -> int:
-    paths = list(missing_paths)
-    if not paths:
-        return 0
-    cursor = conn.execute(
-        f"SELECT id FROM documents WHERE path IN ({','.join('?' * len(paths))})", paths
-    )
-    ids = [row[0] for row in cursor.fetchall()]
+    ids = [doc_id for doc_id in (_document_id_by_path(conn, p) for p in missing_paths) if doc_id is not None]
     if ids:
-        conn.execute(f"DELETE FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids)
-        conn.execute(f"DELETE FROM documents_fts WHERE doc_id IN ({','.join('?' * len(ids))})", ids)
+        _delete_documents(conn, ids)
     return len(ids)
 
 
 def remove_document_by_id(conn: sqlite3.Connection, doc_id: int) -> None:
-    conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
-    conn.execute("DELETE FROM documents_fts WHERE doc_id = ?", (doc_id,))
+    _delete_documents(conn, [doc_id])
+
+
+SORT_COLUMNS = {
+    "filename": "COALESCE(d.filename, d.name)",
+    "source": "s.name",
+    "extension": "e.name",
+    "size_bytes": "d.size_bytes",
+    "mtime": "d.mtime",
+}
+
+
+def _search_order(
+    query: str, sort_key: Optional[str], sort_dir: Optional[str], table: str = FTS_TABLE
+) -> Tuple[str, str, str]:
+    """
+    Liefert (Kennung, Sortierausdruck, Richtung); d.id entscheidet bei Gleichstand.
+    """
+    if sort_key in SORT_COLUMNS:
+        direction = "DESC" if sort_dir == "desc" else "ASC"
+        return f"{sort_key}:{direction}", SORT_COLUMNS[sort_key], direction
+    if query.strip() == "*":
+        return "mtime:DESC", "d.mtime", "DESC"
+    return "rank:ASC", f"bm25({table})", "ASC"
+
+
+def encode_search_cursor(query: str, sort_key: Optional[str], sort_dir: Optional[str], row: sqlite3.Row) -> str:
+    """
+    Cursor hinter der Trefferzeile row (aus search_documents, enthält sort_value).
+    """
+    order_id = _search_order(query, sort_key, sort_dir)[0]
+    payload = json.dumps([order_id, row["sort_value"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_search_cursor(cursor: str, order_id: str) -> Tuple[Any, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_order, value, doc_id = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Ungültiger Cursor") from exc
+    if cursor_order != order_id or not isinstance(doc_id, int) or not isinstance(value, (int, float, str)):
+        raise ValueError("Cursor passt nicht zur Sortierung")
+    return value, doc_id
+
+
+SEARCH_STRATEGIES = ("fts", "filter")
+# gelesene Indexzeile (filter) gegen Treffer aus FTS5 (fts), gemessen mit bench_search_planner.py
+PLANNER_WALK_COST = 4
+PLANNER_TIME_COUNT_CAP = 100000
+_match_estimates: Dict[str, int] = {}
+_match_estimates_key: Any = None
+
+
+def fold_term(text: str) -> str:
+    # wie unicode61 remove_diacritics: Kleinbuchstaben, Akzente entfernt (ä -> a, ß bleibt)
+    decomposed = unicodedata.normalize("NFD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _estimate_word(conn: sqlite3.Connection, word: str, prefix: bool, total: int) -> int:
+    if prefix:
+        # breite Präfixe nicht aufsummieren (jede Erweiterung liest ihre Doclist)
+        rows = conn.execute(
+            "SELECT doc FROM documents_fts_vocab WHERE term >= ? AND term < ? LIMIT 65",
+            (word, word + "\uffff"),
+        ).fetchall()
+        return total if len(rows) > 64 else min(total, sum(row[0] for row in rows))
+    row = conn.execute("SELECT doc FROM documents_fts_vocab WHERE term = ?", (word,)).fetchone()
+    return int(row[0]) if row else 0
+
+
+def _estimate_term(conn: sqlite3.Connection, term: str, total: int) -> int:
+    # Phrase (auch ein Begriff, den unicode61 in mehrere Wörter zerlegt): höchstens das seltenste Wort
+    prefix = term.endswith("*")
+    words = re.findall(r"[^\W_]+", fold_term(term))
+    if not words:
+        return total if prefix else 0
+    counts = [_estimate_word(conn, word, False, total) for word in words[:-1]]
+    counts.append(_estimate_word(conn, words[-1], prefix, total))
+    return min(counts)
+
+
+def _split_query(query: str, operator: str) -> List[str]:
+    # nur auf oberster Ebene trennen, nicht in Klammern oder Phrasen
+    parts, depth, quoted, start, pos = [], 0, False, 0, 0
+    while pos < len(query):
+        char = query[pos]
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char in "()":
+            depth += 1 if char == "(" else -1
+        elif not quoted and not depth and query.startswith(operator, pos):
+            parts.append(query[start:pos])
+            pos += len(operator)
+            start = pos
+            continue
+        pos += 1
+    parts.append(query[start:])
+    return parts
+
+
+def _estimate_query(conn: sqlite3.Connection, query: str, total: int) -> int:
+    estimate = 0
+    for part in _split_query(query, " OR "):
+        counts = []
+        for term in _split_query(part, " AND "):
+            term = term.strip()
+            if term.startswith("(") and term.endswith(")"):
+                counts.append(_estimate_query(conn, term[1:-1], total))
+                continue
+            if term not in _match_estimates:
+                _match_estimates[term] = _estimate_term(conn, term, total)
+            counts.append(_match_estimates[term])
+        estimate += min(counts) if counts else 0
+    return min(total, estimate)
+
+
+def estimate_matches(conn: sqlite3.Connection, query: str, total: Optional[int] = None) -> int:
+    """
+    Geschätzte Trefferzahl eines FTS-Ausdrucks aus build_search_plan, auch nach narrow_query bzw.
+    expand_query (Begriffe, Phrasen und Klammergruppen mit AND oder OR) über fts5vocab:
+    AND = Minimum, OR = Summe. Je Begriff zwischengespeichert bis zum nächsten Commit, der
+    Dokumente ändert.
+    """
+    global _match_estimates_key
+    if total is None:
+        total = _stats_snapshot(conn)["docs"]
+    key = cache_generation(conn)
+    if key != _match_estimates_key or len(_match_estimates) > 4096:
+        _match_estimates.clear()
+        _match_estimates_key = key
+    return _estimate_query(conn, query, total)
+
+
+def vocab_generation(conn: sqlite3.Connection) -> Tuple[Tuple[int, int], int]:
+    """
+    Stand für die Begriffsstatistik (search_vocab): ändert sich mit jedem abgeschlossenen
+    Indexlauf sowie bei Schattentausch und Reset, nicht mit einzelnen Commits.
+    """
+    row = conn.execute("SELECT COALESCE(MAX(id), 0) FROM index_runs WHERE finished_at IS NOT NULL").fetchone()
+    return cache_generation(conn)[0], int(row[0])
+
+
+def iter_vocab(conn: sqlite3.Connection) -> Iterable[Tuple[str, int]]:
+    # (Begriff, Dokumente) in Sortierreihenfolge; fts5vocab liest dafür jede Doclist einmal
+    for row in conn.execute("SELECT term, doc FROM documents_fts_vocab"):
+        yield row[0], row[1]
+
+
+def iter_recent_titles(conn: sqlite3.Connection, limit: int) -> Iterable[str]:
+    # Titel/Betreff der zuletzt geänderten Dokumente (Vorschläge), über idx_documents_data_mtime
+    rows = conn.execute(
+        """
+        SELECT c.title_or_subject FROM documents_data d JOIN documents_content c ON c.id = d.id
+        WHERE c.title_or_subject <> '' ORDER BY d.mtime DESC LIMIT ?
+        """,
+        (limit,),
+    )
+    for row in rows:
+        yield row[0]
+
+
+def _estimate_filtered(
+    conn: sqlite3.Connection,
+    source_ids: List[int],
+    extension_ids: List[int],
+    time_clause: Optional[str],
+    time_params: List[Any],
+    total: int,
+) -> int:
+    clauses, params = [], []
+    if source_ids:
+        clauses.append(f"source_id IN ({','.join('?' * len(source_ids))})")
+        params.extend(source_ids)
+    if extension_ids:
+        clauses.append(f"extension_id IN ({','.join('?' * len(extension_ids))})")
+        params.extend(extension_ids)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    filtered = int(conn.execute(f"SELECT COALESCE(SUM(docs), 0) FROM doc_stats {where}", params).fetchone()[0])
+    if time_clause and total:
+        # Zählen über idx_documents_data_mtime, gedeckelt; Quelle/Endung als unabhängig angenommen
+        in_range = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM documents_data d WHERE {time_clause} LIMIT ?)",
+            [*time_params, PLANNER_TIME_COUNT_CAP],
+        ).fetchone()[0]
+        filtered = filtered * in_range // total
+    return filtered
+
+
+def _choose_strategy(
+    conn: sqlite3.Connection,
+    query: str,
+    order_expr: str,
+    source_ids: List[int],
+    extension_ids: List[int],
+    time_clause: Optional[str],
+    time_params: List[Any],
+    needed: int,
+) -> str:
+    """
+    fts: FTS5 liefert die Treffer, Filter und Sortierung danach (Kosten ~ Trefferzahl M).
+    filter: documents_data wird über einen (Quelle|Endung, mtime)-Index in Sortierreihenfolge
+    gelesen und gegen die Treffermenge geprüft; Kosten ~ M für die Treffermenge plus die gelesenen
+    Zeilen, bis `needed` Treffer gefunden sind (N/M je Treffer bei unabhängiger Verteilung).
+    Nur für mtime-Sortierung: bm25 gibt es nur am FTS-Cursor, andere Sortierungen bräuchten
+    einen Sortierschritt über alle gefilterten Zeilen.
+    """
+    if order_expr != "d.mtime" or len(source_ids) > 1 or len(extension_ids) > 1:
+        return "fts"
+    total = _stats_snapshot(conn)["docs"]
+    matches = estimate_matches(conn, query, total)
+    if not matches or not total:
+        return "fts"
+    filtered = _estimate_filtered(conn, source_ids, extension_ids, time_clause, time_params, total)
+    walk = min(filtered, needed * total // matches)
+    return "filter" if walk * PLANNER_WALK_COST < matches else "fts"
+
+
+def _search_page_query(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int,
+    offset: int,
+    filters: Dict[str, Any],
+    sort_key: Optional[str],
+    sort_dir: Optional[str],
+    cursor: Optional[str],
+    strategy: Optional[str],
+    table: str = FTS_TABLE,
+) -> Optional[Tuple[str, List[Any]]]:
+    """
+    Phase-1-Abfrage (id, sort_value) der Seite; None, wenn ein Filter nichts treffen kann.
+    """
+    order_id, order_expr, direction = _search_order(query, sort_key, sort_dir, table)
+    after = _decode_search_cursor(cursor, order_id) if cursor else None
+    where_clauses = []
+    params: List[Any] = []
+    sources_filter: List[str] = []
+    if "source_labels" in filters:
+        sources_filter = [s for s in filters["source_labels"] if s]
+    elif "source" in filters and filters["source"]:
+        sources_filter = [filters["source"]]
+    # Filter vergleichen Integer-Schlüssel; unbekannte Werte können nichts treffen
+    source_ids: List[int] = []
+    extension_ids: List[int] = []
+    if sources_filter:
+        source_ids = _dict_ids(conn, "doc_sources", sources_filter)
+        if not source_ids:
+            return None
+        where_clauses.append(f"d.source_id IN ({','.join('?' * len(source_ids))})")
+        params.extend(source_ids)
+    if "extension" in filters:
+        extension_ids = _dict_ids(conn, "doc_extensions", [filters["extension"]])
+        if not extension_ids:
+            return None
+        where_clauses.append("d.extension_id = ?")
+        params.append(extension_ids[0])
+    time_clause, time_params = None, []
+    if "time_filter" in filters:
+        time_clause, value = _time_filter_clause(filters["time_filter"])
+        if time_clause:
+            time_params = list(value) if isinstance(value, (tuple, list)) else [value]
+            where_clauses.append(time_clause)
+            params.extend(time_params)
+
+    if after is not None:
+        # Zeilenwert-Vergleich: SQLite nutzt dafür auch Indizes auf (Spalte, id)
+        where_clauses.append(f"({order_expr}, d.id) {'<' if direction == 'DESC' else '>'} (?, ?)")
+        params.extend(after)
+
+    where_sql = " AND ".join(where_clauses)
+    if where_sql:
+        where_sql = "AND " + where_sql
+    order_by = f"ORDER BY sort_value {direction}, d.id {direction}"
+
+    # Phase 1: nur (id, Sortierwert) der Seite; Spalten und Snippets berechnet SQLite sonst für
+    # jede Zeile, die den LIMIT-Puffer passiert
+    page_joins = """
+        JOIN doc_sources s ON s.id = d.source_id
+        JOIN doc_extensions e ON e.id = d.extension_id
+    """
+    if query.strip() == "*":
+        source_sql, match_params = "FROM documents_data d", []
+    else:
+        if order_id == "rank:ASC":
+            strategy = "fts"
+        elif strategy is None and table != FTS_TABLE:
+            # Schätzung über fts5vocab gibt es nur für documents_fts
+            strategy = "fts"
+        elif strategy is None:
+            strategy = _choose_strategy(
+                conn, query, order_expr, source_ids, extension_ids, time_clause, time_params, limit + offset
+            )
+        if strategy == "filter":
+            # +d.id: kein Rowid-Zugriff über die Treffermenge, sondern Prüfung je Zeile des Index
+            source_sql = "FROM documents_data d"
+            where_sql = f"AND +d.id IN (SELECT rowid FROM {table} WHERE {table} MATCH ?) " + where_sql
+        else:
+            # CROSS JOIN legt die Reihenfolge fest: sonst wählt SQLite bei mtime-Sortierung mit Filter
+            # den (Quelle, mtime)-Index außen und fragt FTS5 je Zeile per rowid ab (ms je Zeile)
+            source_sql = f"FROM {table} CROSS JOIN documents_data d ON d.id = {table}.rowid"
+            where_sql = f"AND {table} MATCH ? " + where_sql
+        match_params = [query]
+    sql = f"""
+        SELECT d.id, {order_expr} AS sort_value
+        {source_sql}
+        {page_joins}
+        WHERE 1=1
+        {where_sql}
+        {order_by}
+        LIMIT ? OFFSET ?;
+    """
+    return sql, [*match_params, *params, limit, offset]
 
 
 def search_documents(
@@ -248,68 +1377,213 @@ def search_documents(
     filters: Optional[Dict[str, Any]] = None,
     sort_key: Optional[str] = None,
     sort_dir: Optional[str] = None,
+    cursor: Optional[str] = None,
+    snippets: bool = True,
+    strategy: Optional[str] = None,
+    table: str = FTS_TABLE,
 ) -> List[sqlite3.Row]:
+    """
+    Treffer inkl. sort_value (Wert des Sortierausdrucks). Mit cursor (encode_search_cursor)
+    beginnt die Seite hinter dem letzten Treffer der vorigen; die Kosten hängen dann nicht
+    von der Seitentiefe ab. ValueError bei ungültigem Cursor. snippets=False liefert leere
+    Snippets (nachladen per search_snippets). strategy (fts|filter) übersteuert die Wahl
+    von _choose_strategy. table = TRIGRAM_TABLE sucht im Trigramm-Index (Modus substring).
+    """
     if not query or not str(query).strip():
         return []
+    if strategy is not None and strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unbekannte Strategie: {strategy}")
+    if table not in SEARCH_TABLES:
+        raise ValueError(f"Unbekannter Suchindex: {table}")
+    built = _search_page_query(conn, query, limit, offset, filters or {}, sort_key, sort_dir, cursor, strategy, table)
+    if built is None:
+        return []
+    page = conn.execute(*built).fetchall()
+    if query.strip() == "*":
+        return _hydrate_documents(conn, page)
+    return _hydrate_documents(conn, page, query if snippets else None, table)
+
+
+def explain_search(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = 50,
+    offset: int = 0,
+    filters: Optional[Dict[str, Any]] = None,
+    sort_key: Optional[str] = None,
+    sort_dir: Optional[str] = None,
+    strategy: Optional[str] = None,
+    table: str = FTS_TABLE,
+) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN der Phase-1-Abfrage von search_documents (eine Zeile je Schritt).
+    """
+    built = _search_page_query(conn, query, limit, offset, filters or {}, sort_key, sort_dir, None, strategy, table)
+    if built is None:
+        return []
+    sql, params = built
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()]
+
+
+SNIPPET_SQL = "snippet(documents_fts, 1, '<mark>', '</mark>', '...', 10)"
+# Trigramm-Index: viele Dokumente nur mit Titel indiziert, Spalte mit dem Treffer wählt FTS5 selbst;
+# ein Token ist hier ein Zeichen, daher das Maximum von 64
+TRIGRAM_SNIPPET_SQL = "snippet(documents_trigram, -1, '<mark>', '</mark>', '...', 64)"
+
+
+def _snippet_sql(table: str) -> str:
+    return TRIGRAM_SNIPPET_SQL if table == TRIGRAM_TABLE else SNIPPET_SQL
+
+
+def _hydrate_documents(
+    conn: sqlite3.Connection,
+    page: List[Tuple[int, Any]],
+    snippet_query: Optional[str] = None,
+    table: str = FTS_TABLE,
+) -> List[sqlite3.Row]:
+    """
+    Phase 2: Spalten (und Snippets zu snippet_query) nur für die Treffer der Seite, in deren Reihenfolge.
+    """
+    if not page:
+        return []
+    values = ",".join("(?, ?, ?)" for _ in page)
+    params: List[Any] = [v for pos, (doc_id, sort_value) in enumerate(page) for v in (doc_id, sort_value, pos)]
+    if snippet_query is None:
+        snippet_sql, fts_join, fts_where = "''", "", ""
+    else:
+        snippet_sql = _snippet_sql(table)
+        fts_join = f"JOIN {table} ON {table}.rowid = page.id"
+        fts_where = f"WHERE {table} MATCH ?"
+        params.append(snippet_query)
+    return conn.execute(
+        f"""
+        WITH page(id, sort_value, pos) AS (VALUES {values})
+        SELECT {DOCUMENT_COLUMNS_SQL}, {snippet_sql} AS snippet, page.sort_value
+        FROM page
+        JOIN documents_data d ON d.id = page.id
+        {DOCUMENT_JOINS_SQL}
+        {fts_join}
+        {fts_where}
+        ORDER BY page.pos;
+        """,
+        params,
+    ).fetchall()
+
+
+def search_snippets(
+    conn: sqlite3.Connection, query: str, doc_ids: Iterable[int], table: str = FTS_TABLE
+) -> Dict[int, str]:
+    """
+    Snippets zu einer FTS-Abfrage für einzelne Treffer (nachgeladen zu search_documents(snippets=False)).
+    """
+    ids = sorted({int(doc_id) for doc_id in doc_ids})
+    if not ids or not query.strip() or query.strip() == "*":
+        return {}
+    if table not in SEARCH_TABLES:
+        raise ValueError(f"Unbekannter Suchindex: {table}")
+    rows = conn.execute(
+        f"""
+        SELECT rowid, {_snippet_sql(table)} FROM {table}
+        WHERE {table} MATCH ? AND rowid IN ({','.join('?' * len(ids))})
+        """,
+        [query, *ids],
+    ).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+FACETS = ("source", "extension", "year")
+# darüber Stichprobe: GROUP BY sortiert die ganze Treffermenge (~1,5 µs je Treffer)
+FACETS_SAMPLE_ABOVE = 20000
+
+
+def search_facets(
+    conn: sqlite3.Connection,
+    query: str,
+    filters: Optional[Dict[str, Any]] = None,
+    names: Iterable[str] = FACETS,
+    sample_above: int = FACETS_SAMPLE_ABOVE,
+    table: str = FTS_TABLE,
+) -> Dict[str, Any]:
+    """
+    Trefferzahlen je Quelle, Endung und Jahr (mtime) in einem Durchlauf über die Treffermenge.
+    Quellen- und Endungsfilter gelten jeweils nur für die anderen Facetten, damit Alternativen
+    sichtbar bleiben; der Zeitfilter gilt für alle. Über sample_above Treffern (geschätzt, ohne
+    Zähldurchlauf) wird jede n-te ID gezählt und hochgerechnet (approximate=True).
+    """
+    if table not in SEARCH_TABLES:
+        raise ValueError(f"Unbekannter Suchindex: {table}")
+    names = [name for name in FACETS if name in set(names)]
     filters = filters or {}
-    where_clauses = []
+    wildcard = query.strip() == "*"
+    where_clauses: List[str] = []
     params: List[Any] = []
-    sources_filter: List[str] = []
-    if "source_labels" in filters:
-        sources_filter = [s for s in filters["source_labels"] if s]
-    elif "source" in filters and filters["source"]:
-        sources_filter = [filters["source"]]
-    if sources_filter:
-        where_clauses.append(f"d.source IN ({','.join('?' * len(sources_filter))})")
-        params.extend(sources_filter)
-    if "extension" in filters:
-        where_clauses.append("d.extension = ?")
-        params.append(filters["extension"])
     if "time_filter" in filters:
         clause, value = _time_filter_clause(filters["time_filter"])
         if clause:
             where_clauses.append(clause)
-            if isinstance(value, (tuple, list)):
-                params.extend(value)
-            else:
-                params.append(value)
+            params.extend(value if isinstance(value, (tuple, list)) else [value])
+    step = _facet_sample_step(conn, query, table, sample_above) if sample_above > 0 else 1
+    if step > 1:
+        where_clauses.append("d.id % ? = 0")
+        params.append(step)
+    where_sql = "".join(f" AND {clause}" for clause in where_clauses)
+    source_sql = "FROM documents_data d WHERE 1=1" if wildcard else (
+        f"FROM {table} CROSS JOIN documents_data d ON d.id = {table}.rowid WHERE {table} MATCH ?"
+    )
+    rows = conn.execute(
+        f"""
+        SELECT d.source_id, d.extension_id, CAST(strftime('%Y', d.mtime, 'unixepoch') AS INTEGER), COUNT(*)
+        {source_sql}{where_sql}
+        GROUP BY 1, 2, 3
+        """,
+        params if wildcard else [query, *params],
+    ).fetchall()
 
-    where_sql = " AND ".join(where_clauses)
-    if where_sql:
-        where_sql = "AND " + where_sql
+    sources = dict(conn.execute("SELECT id, name FROM doc_sources").fetchall())
+    extensions = dict(conn.execute("SELECT id, name FROM doc_extensions").fetchall())
+    wanted_sources = set(filters.get("source_labels") or ([filters["source"]] if filters.get("source") else []))
+    wanted_extension = filters.get("extension")
+    counts: Dict[str, Dict[Any, int]] = {name: {} for name in names}
+    for source_id, extension_id, year, count in rows:
+        source = sources.get(source_id)
+        extension = extensions.get(extension_id)
+        source_ok = not wanted_sources or source in wanted_sources
+        extension_ok = not wanted_extension or extension == wanted_extension
+        for name, value, applies in (
+            ("source", source, extension_ok),
+            ("extension", extension, source_ok),
+            ("year", year, source_ok and extension_ok),
+        ):
+            if name in counts and applies:
+                counts[name][value] = counts[name].get(value, 0) + count * step
+
+    result: Dict[str, Any] = {"approximate": step > 1}
+    for name, values in counts.items():
+        ordered = sorted(values.items(), key=lambda item: (-item[0], 0) if name == "year" else (-item[1], item[0]))
+        result[name] = [{"value": value, "count": count} for value, count in ordered]
+    return result
 
-    order_by = "ORDER BY bm25(documents_fts)"
-    if sort_key in {"filename", "source", "extension", "size_bytes", "mtime"}:
-        direction = "DESC" if sort_dir == "desc" else "ASC"
-        order_by = f"ORDER BY d.{sort_key} {direction}"
 
+def _facet_sample_step(conn: sqlite3.Connection, query: str, table: str, sample_above: int) -> int:
+    """
+    Schrittweite der Facetten-Stichprobe ohne eigenen Zähldurchlauf: Schätzung aus doc_stats bzw.
+    fts5vocab wie im Suchplaner; liegt sie über sample_above, bestätigt ein nach sample_above + 1
+    Treffern abbrechender Lauf, dass die Treffermenge tatsächlich so groß ist (AND-Schätzung = Minimum).
+    """
+    total = _stats_snapshot(conn)["docs"]
     if query.strip() == "*":
-        order_by_nofts = order_by if order_by.startswith("ORDER BY d.") else "ORDER BY d.mtime DESC"
-        cursor = conn.execute(
-            f"""
-            SELECT d.*, '' AS snippet
-            FROM documents d
-            WHERE 1=1
-            {where_sql}
-            {order_by_nofts}
-            LIMIT ? OFFSET ?;
-            """,
-            [*params, limit, offset],
-        )
+        estimate = total
     else:
-        cursor = conn.execute(
-            f"""
-            SELECT d.*, snippet(documents_fts, 1, '<mark>', '</mark>', '...', 10) AS snippet
-            FROM documents_fts
-            JOIN documents d ON d.id = documents_fts.doc_id
-            WHERE documents_fts MATCH ?
-            {where_sql}
-            {order_by}
-            LIMIT ? OFFSET ?;
-            """,
-            [query, *params, limit, offset],
-        )
-    return cursor.fetchall()
+        # Teilwortindex hat keine Begriffsstatistik: Obergrenze ist der Bestand
+        estimate = estimate_matches(conn, query, total) if table == FTS_TABLE else total
+        if estimate > sample_above:
+            found = conn.execute(
+                f"SELECT COUNT(*) FROM (SELECT rowid FROM {table} WHERE {table} MATCH ? LIMIT ?)",
+                (query, sample_above + 1),
+            ).fetchone()[0]
+            if found <= sample_above:
+                return 1
+    return -(-estimate // sample_above) if estimate > sample_above else 1
 
 
 def _time_filter_clause(key: str) -> Tuple[Optional[str], Optional[Any]]:
@@ -348,18 +1622,26 @@ def get_document(conn: sqlite3.Connection, doc_id: int) -> Optional[sqlite3.Row]
 
 
 def get_document_by_path(conn: sqlite3.Connection, path: str) -> Optional[sqlite3.Row]:
-    cursor = conn.execute("SELECT * FROM documents WHERE path = ?", (path,))
-    return cursor.fetchone()
+    doc_id = _document_id_by_path(conn, path)
+    return get_document(conn, doc_id) if doc_id is not None else None
+
+
+def get_size_mtime_by_path(conn: sqlite3.Connection, path: str) -> Optional[Tuple[int, float]]:
+    row = conn.execute(
+        "SELECT d.size_bytes, d.mtime FROM documents_data d JOIN doc_dirs p ON p.id = d.dir_id WHERE p.path = ? AND d.name = ?",
+        split_path(path),
+    ).fetchone()
+    return (row[0], row[1]) if row else None
 
 
 def get_document_content(conn: sqlite3.Connection, doc_id: int) -> Optional[str]:
-    cursor = conn.execute("SELECT content FROM documents_fts WHERE doc_id = ?", (doc_id,))
+    cursor = conn.execute("SELECT content FROM documents_content WHERE id = ?", (doc_id,))
     row = cursor.fetchone()
-    return row[0] if row else None
+    return decompress_text(row[0]) if row else None
 
 
 def get_document_title(conn: sqlite3.Connection, doc_id: int) -> Optional[str]:
-    cursor = conn.execute("SELECT title_or_subject FROM documents_fts WHERE doc_id = ?", (doc_id,))
+    cursor = conn.execute("SELECT title_or_subject FROM documents_content WHERE id = ?", (doc_id,))
     row = cursor.fetchone()
     return row[0] if row else None
 
@@ -381,17 +1663,28 @@ def update_document_metadata(
     cols = []
     params: List[Any] = []
     if path is not None:
-        cols.append("path = ?")
-        params.append(path)
-    if source is not None:
-        cols.append("source = ?")
-        params.append(source)
+        directory, name = split_path(path)
+        cols.append("dir_id = ?")
+        params.append(_dict_id(conn, "doc_dirs", directory, column="path"))
+        cols.append("name = ?")
+        params.append(name)
+        if filename is None:
+            # bisherigen Anzeigenamen behalten (SET sieht die alten Werte)
+            filename_expr = "COALESCE(filename, name)"
+            cols.append(f"filename = CASE WHEN {filename_expr} = ? THEN NULL ELSE {filename_expr} END")
+            params.append(name)
     if filename is not None:
-        cols.append("filename = ?")
-        params.append(filename)
+        cols.append("filename = CASE WHEN ? = name THEN NULL ELSE ? END" if path is None else "filename = ?")
+        if path is None:
+            params.extend([filename, filename])
+        else:
+            params.append(None if filename == split_path(path)[1] else filename)
+    if source is not None:
+        cols.append("source_id = ?")
+        params.append(_dict_id(conn, "doc_sources", source))
     if extension is not None:
-        cols.append("extension = ?")
-        params.append(extension)
+        cols.append("extension_id = ?")
+        params.append(_dict_id(conn, "doc_extensions", extension))
     if size_bytes is not None:
         cols.append("size_bytes = ?")
         params.append(size_bytes)
@@ -406,14 +1699,34 @@ def update_document_metadata(
         params.append(atime)
 
     if cols:
-        result = conn.execute(f"UPDATE documents SET {', '.join(cols)} WHERE id = ?", (*params, doc_id))
+        stats_sql = "SELECT source_id, extension_id, size_bytes FROM documents_data WHERE id = ?"
+        touches_stats = source is not None or extension is not None or size_bytes is not None
+        previous = conn.execute(stats_sql, (doc_id,)).fetchone() if touches_stats else None
+        result = conn.execute(f"UPDATE documents_data SET {', '.join(cols)} WHERE id = ?", (*params, doc_id))
         if result.rowcount == 0:
             return False
-
-    if title_or_subject is not None:
-        conn.execute("UPDATE documents_fts SET title_or_subject = ? WHERE doc_id = ?", (title_or_subject, doc_id))
-
-    return bool(cols or title_or_subject is not None)
+        if previous is not None:
+            current = conn.execute(stats_sql, (doc_id,)).fetchone()
+            _stats_add(conn, previous[0], previous[1], -1, -previous[2])
+            _stats_add(conn, current[0], current[1], 1, current[2])
+
+    if title_or_subject is not None or source is not None:
+        row = conn.execute(
+            "SELECT content, title_or_subject, trigram FROM documents_content WHERE id = ?", (doc_id,)
+        ).fetchone()
+        if row is not None:
+            # Quellenwechsel kann den Trigramm-Umfang ändern
+            level = trigram_level(source) if source is not None else row[2]
+            if title_or_subject is not None or level != row[2]:
+                title = title_or_subject if title_or_subject is not None else row[1]
+                content = decompress_text(row[0])
+                _fts_delete(conn, [doc_id])
+                _fts_insert(conn, doc_id, content, title, level)
+
+    changed = bool(cols or title_or_subject is not None)
+    if changed:
+        _bump_doc_generation(conn)
+    return changed
 
 
 def insert_quarantine_entry(conn: sqlite3.Connection, entry: QuarantineEntry) -> int:
@@ -505,14 +1818,21 @@ def mark_quarantine_cleanup_deleted(conn: sqlite3.Connection, entry_id: int, del
 
 
 def record_index_run_start(
-    conn: sqlite3.Connection, started_at: str, status: str = "running"
+    conn: sqlite3.Connection, started_at: str, status: str = "running", source: Optional[str] = None
 ) -> int:
     cur = conn.execute(
-        "INSERT INTO index_runs (started_at, status) VALUES (?, ?)", (started_at, status)
+        "INSERT INTO index_runs (started_at, status, source) VALUES (?, ?, ?)", (started_at, status, source)
     )
     return cur.lastrowid
 
 
+def list_running_runs(conn: sqlite3.Connection) -> List[sqlite3.Row]:
+    cursor = conn.execute(
+        "SELECT * FROM index_runs WHERE status = 'running' AND finished_at IS NULL ORDER BY started_at DESC"
+    )
+    return cursor.fetchall()
+
+
 def record_index_run_finish(
     conn: sqlite3.Connection,
     run_id: int,
@@ -545,25 +1865,42 @@ def record_file_error(
         """,
         (run_id, path, error_type, message, created_at, 1 if ignored else 0),
     )
+    if not ignored:
+        _open_errors_add(conn, 1)
 
 
 def get_status(conn: sqlite3.Connection) -> Dict[str, Any]:
-    total_docs = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+    totals = _stats_snapshot(conn)
     last_run = conn.execute(
         "SELECT * FROM index_runs ORDER BY started_at DESC LIMIT 1"
     ).fetchone()
     recent_runs = conn.execute(
         "SELECT * FROM index_runs ORDER BY started_at DESC LIMIT 10"
     ).fetchall()
-    ext_counts = conn.execute("SELECT extension, COUNT(*) AS c FROM documents GROUP BY extension").fetchall()
-    return {"total_docs": total_docs, "last_run": last_run, "recent_runs": recent_runs, "ext_counts": ext_counts}
+    ext_counts = conn.execute(
+        """
+        SELECT e.name AS extension, SUM(st.docs) AS c FROM doc_stats st
+        JOIN doc_extensions e ON e.id = st.extension_id
+        GROUP BY st.extension_id HAVING c > 0
+        """
+    ).fetchall()
+    return {
+        "total_docs": totals["docs"],
+        "total_bytes": totals["bytes"],
+        "last_run": last_run,
+        "recent_runs": recent_runs,
+        "ext_counts": ext_counts,
+    }
 
 
 def list_paths_by_sources(conn: sqlite3.Connection, sources: List[str]) -> List[str]:
     if not sources:
         return []
     cursor = conn.execute(
-        f"SELECT path FROM documents WHERE source IN ({','.join('?' * len(sources))})",
+        f"""
+        SELECT p.path || d.name FROM documents_data d JOIN doc_dirs p ON p.id = d.dir_id
+        WHERE d.source_id IN (SELECT id FROM doc_sources WHERE name IN ({','.join('?' * len(sources))}))
+        """,
         sources,
     )
     return [row[0] for row in cursor.fetchall()]
@@ -574,7 +1911,10 @@ def count_documents_by_source(conn: sqlite3.Connection, sources: List[str]) -> D
         return {}
     placeholders = ",".join("?" * len(sources))
     cursor = conn.execute(
-        f"SELECT source, COUNT(*) FROM documents WHERE source IN ({placeholders}) GROUP BY source",
+        f"""
+        SELECT s.name, SUM(st.docs) AS c FROM doc_stats st JOIN doc_sources s ON s.id = st.source_id
+        WHERE s.name IN ({placeholders}) GROUP BY s.name HAVING c > 0
+        """,
         sources,
     )
     return {row[0]: row[1] for row in cursor.fetchall()}
@@ -585,13 +1925,52 @@ def get_sample_paths_by_source(conn: sqlite3.Connection, sources: List[str]) ->
         return {}
     result: Dict[str, str] = {}
     for src in sources:
-        cur = conn.execute("SELECT path FROM documents WHERE source = ? LIMIT 1", (src,))
+        cur = conn.execute(
+            """
+            SELECT p.path || d.name FROM documents_data d JOIN doc_dirs p ON p.id = d.dir_id
+            WHERE d.source_id = (SELECT id FROM doc_sources WHERE name = ?) LIMIT 1
+            """,
+            (src,),
+        )
         row = cur.fetchone()
         if row and row[0]:
             result[src] = row[0]
     return result
 
 
+_SAMPLE_COLUMNS_SQL = """
+    d.id, s.name AS source, p.path || d.name AS path, e.name AS extension, d.size_bytes, d.mtime
+    FROM documents_data d
+    JOIN doc_sources s ON s.id = d.source_id
+    JOIN doc_dirs p ON p.id = d.dir_id
+    JOIN doc_extensions e ON e.id = d.extension_id
+"""
+
+
+def sample_documents(conn: sqlite3.Connection, limit: int, after_id: Optional[int] = None) -> List[sqlite3.Row]:
+    """
+    Stichprobe für den Abgleich: after_id gesetzt = die nächsten Dokumente nach id (rotierend),
+    sonst zufällig.
+    """
+    if after_id is not None:
+        sql = f"SELECT {_SAMPLE_COLUMNS_SQL} WHERE d.id > ? ORDER BY d.id LIMIT ?"
+        return conn.execute(sql, (after_id, limit)).fetchall()
+    sql = f"SELECT {_SAMPLE_COLUMNS_SQL} WHERE d.id IN (SELECT id FROM documents_data ORDER BY random() LIMIT ?)"
+    return conn.execute(sql, (limit,)).fetchall()
+
+
+def sample_dirs(conn: sqlite3.Connection, limit: int, after_id: Optional[int] = None) -> List[sqlite3.Row]:
+    if after_id is not None:
+        return conn.execute("SELECT id, path FROM doc_dirs WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)).fetchall()
+    return conn.execute("SELECT id, path FROM doc_dirs ORDER BY random() LIMIT ?", (limit,)).fetchall()
+
+
+def list_documents_in_dir(conn: sqlite3.Connection, dir_path: str) -> Dict[str, sqlite3.Row]:
+    """Indizierte Dateien eines Verzeichnisses (Pfad mit abschließendem Trenner) nach Dateiname."""
+    sql = f"SELECT {_SAMPLE_COLUMNS_SQL} WHERE d.dir_id = (SELECT id FROM doc_dirs WHERE path = ?)"
+    return {row["path"][len(dir_path):]: row for row in conn.execute(sql, (dir_path,)).fetchall()}
+
+
 def add_scanned_path(conn: sqlite3.Connection, run_id: int, path: str) -> None:
     conn.execute(
         "INSERT OR IGNORE INTO scanned_paths (run_id, path) VALUES (?, ?)",
@@ -609,17 +1988,19 @@ def remove_documents_not_scanned(conn: sqlite3.Connection, run_id: int, sources:
     placeholders = ",".join("?" * len(sources))
     cursor = conn.execute(
         f"""
-        SELECT id, path, source FROM documents
-        WHERE source IN ({placeholders})
-        AND path NOT IN (SELECT path FROM scanned_paths WHERE run_id = ?)
+        SELECT d.id, p.path || d.name AS path, s.name AS source
+        FROM documents_data d
+        JOIN doc_sources s ON s.id = d.source_id
+        JOIN doc_dirs p ON p.id = d.dir_id
+        WHERE s.name IN ({placeholders})
+        AND p.path || d.name NOT IN (SELECT path FROM scanned_paths WHERE run_id = ?)
         """,
         [*sources, run_id],
     )
     rows = cursor.fetchall()
     ids = [row["id"] for row in rows]
     if ids:
-        conn.execute(f"DELETE FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids)
-        conn.execute(f"DELETE FROM documents_fts WHERE doc_id IN ({','.join('?' * len(ids))})", ids)
+        _delete_documents(conn, ids)
         now_iso = datetime.datetime.now(datetime.timezone.utc).isoformat()
         for row in rows:
             conn.execute(
@@ -658,11 +2039,14 @@ def get_last_run(conn: sqlite3.Connection) -> Optional[sqlite3.Row]:
 
 
 def error_count(conn: sqlite3.Connection) -> int:
-    return conn.execute("SELECT COUNT(*) FROM file_errors WHERE ignored = 0").fetchone()[0]
+    row = conn.execute("SELECT value FROM index_counters WHERE name = 'open_errors'").fetchone()
+    return int(row[0]) if row else 0
 
 
 def list_existing_meta(conn: sqlite3.Connection) -> Dict[str, Tuple[float, float]]:
-    cursor = conn.execute("SELECT path, size_bytes, mtime FROM documents")
+    cursor = conn.execute(
+        "SELECT p.path || d.name AS path, d.size_bytes, d.mtime FROM documents_data d JOIN doc_dirs p ON p.id = d.dir_id"
+    )
     return {row["path"]: (row["size_bytes"], row["mtime"]) for row in cursor.fetchall()}
 
 
@@ -670,11 +2054,13 @@ def delete_documents_by_source(conn: sqlite3.Connection, sources: List[str]) ->
     if not sources:
         return 0
     placeholders = ",".join("?" * len(sources))
-    cursor = conn.execute(f"SELECT id FROM documents WHERE source IN ({placeholders})", sources)
+    cursor = conn.execute(
+        f"SELECT id FROM documents_data WHERE source_id IN (SELECT id FROM doc_sources WHERE name IN ({placeholders}))",
+        sources,
+    )
     ids = [row[0] for row in cursor.fetchall()]
     if ids:
-        conn.execute(f"DELETE FROM documents WHERE id IN ({','.join('?' * len(ids))})", ids)
-        conn.execute(f"DELETE FROM documents_fts WHERE doc_id IN ({','.join('?' * len(ids))})", ids)
+        _delete_documents(conn, ids)
     return len(ids)
 
 
@@ -772,18 +2158,333 @@ def list_all_run_errors(conn: sqlite3.Connection, run_id: int, include_ignored:
     return cur.fetchall()
 
 
+def run_action_counts(conn: sqlite3.Connection, run_id: int) -> Dict[str, int]:
+    # verdichtete Läufe: Zählwerte statt Einzelereignisse
+    counts = {
+        row[0]: row[1]
+        for row in conn.execute("SELECT key, count FROM index_run_counts WHERE run_id = ? AND kind = 'action'", (run_id,))
+    }
+    for row in conn.execute("SELECT action, COUNT(*) FROM index_run_events WHERE run_id = ? GROUP BY action", (run_id,)):
+        counts[row[0]] = counts.get(row[0], 0) + row[1]
+    return counts
+
+
 def summarize_run(conn: sqlite3.Connection, run_id: int) -> Dict[str, Any]:
     run = conn.execute("SELECT * FROM index_runs WHERE id = ?", (run_id,)).fetchone()
     if not run:
         return {}
-    action_counts: Dict[str, int] = {}
-    for row in conn.execute(
-        "SELECT action, COUNT(*) as c FROM index_run_events WHERE run_id = ? GROUP BY action", (run_id,)
-    ):
-        action_counts[row["action"]] = row["c"]
     error_count = conn.execute("SELECT COUNT(*) FROM file_errors WHERE run_id = ? AND ignored = 0", (run_id,)).fetchone()[0]
+    compacted = conn.execute(
+        "SELECT COALESCE(SUM(count), 0) FROM index_run_counts WHERE run_id = ? AND kind = 'error'", (run_id,)
+    ).fetchone()[0]
     return {
         "run": dict(run),
-        "actions": action_counts,
-        "error_count": error_count,
+        "actions": run_action_counts(conn, run_id),
+        "error_count": error_count + compacted,
     }
+
+
+# Aufbewahrung der Verlaufstabellen (Wartungsaufgabe "retention"); gelöscht wird in kleinen Batches,
+# damit Schreibsperren kurz bleiben
+HISTORY_BATCH = 2000
+
+
+def history_prune_candidates(
+    conn: sqlite3.Connection, keep_runs: int, keep_days: int, compact: bool, now: Optional[datetime.datetime] = None
+) -> List[int]:
+    """
+    Abgeschlossene Läufe außerhalb der Aufbewahrung, älteste zuerst. Behalten werden immer die letzten
+    keep_runs Läufe und alle Läufe der letzten keep_days Tage (0 = Kriterium aus; beide 0 = nichts löschen).
+    compact: bereits vollständig verdichtete Läufe auslassen.
+    """
+    if keep_runs <= 0 and keep_days <= 0:
+        return []
+    clauses = ["finished_at IS NOT NULL"]
+    params: List[Any] = []
+    if keep_runs > 0:
+        clauses.append("id NOT IN (SELECT id FROM index_runs ORDER BY started_at DESC LIMIT ?)")
+        params.append(keep_runs)
+    if keep_days > 0:
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        clauses.append("started_at < ?")
+        params.append((now - datetime.timedelta(days=keep_days)).isoformat())
+    if compact:
+        clauses.append(
+            """(compacted_at IS NULL
+                OR EXISTS (SELECT 1 FROM index_run_events e WHERE e.run_id = r.id)
+                OR EXISTS (SELECT 1 FROM file_errors f WHERE f.run_id = r.id))"""
+        )
+    rows = conn.execute(
+        f"SELECT id FROM index_runs r WHERE {' AND '.join(clauses)} ORDER BY started_at", params
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _delete_run_rows(conn: sqlite3.Connection, table: str, run_id: int, batch: int) -> int:
+    if table == "file_errors":
+        rows = conn.execute(
+            "DELETE FROM file_errors WHERE id IN (SELECT id FROM file_errors WHERE run_id = ? LIMIT ?) RETURNING ignored",
+            (run_id, batch),
+        ).fetchall()
+        _open_errors_add(conn, -sum(1 for row in rows if not row[0]))
+        conn.commit()
+        return len(rows)
+    cur = conn.execute(
+        f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE run_id = ? LIMIT ?)", (run_id, batch)
+    )
+    conn.commit()
+    return cur.rowcount
+
+
+def prune_run_history(
+    conn: sqlite3.Connection,
+    run_id: int,
+    compact: bool,
+    deadline: Optional[float] = None,
+    batch: int = HISTORY_BATCH,
+) -> Tuple[int, bool]:
+    """
+    Entfernt Ereignisse und Fehler eines Laufs in Batches (je Batch ein Commit).
+    compact: vorher Zählwerte je Aktion/Fehlertyp in index_run_counts sichern, der Lauf bleibt erhalten;
+    sonst wird der Lauf selbst gelöscht. Liefert (gelöschte Zeilen, vollständig).
+    """
+    if compact:
+        row = conn.execute("SELECT compacted_at FROM index_runs WHERE id = ?", (run_id,)).fetchone()
+        if row is not None and row[0] is None:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO index_run_counts (run_id, kind, key, count)
+                SELECT run_id, 'action', action, COUNT(*) FROM index_run_events WHERE run_id = ? GROUP BY action
+                """,
+                (run_id,),
+            )
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO index_run_counts (run_id, kind, key, count)
+                SELECT run_id, CASE WHEN ignored THEN 'ignored' ELSE 'error' END, error_type, COUNT(*)
+                FROM file_errors WHERE run_id = ? GROUP BY ignored, error_type
+                """,
+                (run_id,),
+            )
+            conn.execute(
+                "UPDATE index_runs SET compacted_at = ? WHERE id = ?",
+                (datetime.datetime.now(datetime.timezone.utc).isoformat(), run_id),
+            )
+            conn.commit()
+    deleted = 0
+    for table in ("index_run_events", "file_errors"):
+        while True:
+            if deadline is not None and time.monotonic() >= deadline:
+                return deleted, False
+            removed = _delete_run_rows(conn, table, run_id, batch)
+            deleted += removed
+            if removed < batch:
+                break
+    if not compact:
+        conn.execute("DELETE FROM index_runs WHERE id = ?", (run_id,))
+        conn.commit()
+    return deleted, True
+
+
+def prune_orphan_errors(conn: sqlite3.Connection, keep_days: int, batch: int = HISTORY_BATCH) -> int:
+    # Fehler ohne Lauf (Datei-Aktionen) nur nach Alter
+    if keep_days <= 0:
+        return 0
+    cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=keep_days)).isoformat()
+    rows = conn.execute(
+        """
+        DELETE FROM file_errors WHERE id IN (
+            SELECT id FROM file_errors WHERE run_id IS NULL AND created_at < ? LIMIT ?
+        ) RETURNING ignored
+        """,
+        (cutoff, batch),
+    ).fetchall()
+    _open_errors_add(conn, -sum(1 for row in rows if not row[0]))
+    conn.commit()
+    return len(rows)
+
+
+# Schattenaufbau: neuer Index in eigener Datei, Live-DB bleibt bis zum Umschalten unverändert
+SHADOW_HISTORY_TABLES = ("index_runs", "file_errors", "index_run_events")
+_generation = 0
+
+
+def index_generation() -> int:
+    """
+    Zähler, der nach jedem Umschalten auf einen neu aufgebauten Index steigt (für Caches).
+    """
+    return _generation
+
+
+def bump_generation() -> int:
+    global _generation
+    _generation += 1
+    return _generation
+
+
+def shadow_db_path(base: Optional[Path] = None) -> Path:
+    base = Path(base or DB_PATH)
+    return base.with_name(f"{base.stem}.shadow{base.suffix}")
+
+
+def remove_db_files(path: Path) -> None:
+    migrations.reset_cache(path)
+    pool.close_all(path)
+    for p in (path, path.with_suffix(path.suffix + "-wal"), path.with_suffix(path.suffix + "-shm")):
+        if p.exists():
+            p.unlink()
+
+
+@contextmanager
+def file_action_lock(exclusive: bool = False, base: Optional[Path] = None):
+    """
+    Prozessübergreifende Sperre (flock) neben der DB: Datei-Aktionen halten sie geteilt für ihre
+    Index-Änderung, publish_shadow_db exklusiv für Abgleich und Umschalten.
+    """
+    base = Path(base or DB_PATH)
+    path = base.with_name(f"{base.stem}.swap.lock")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_action_conn(*paths: Any):
+    """
+    Schreibverbindung für Datei-Aktionen: vermerkt die betroffenen Pfade in path_changes (gleiche
+    Transaktion) und hält dabei file_action_lock, damit kein Umschalten dazwischenkommt.
+    """
+    with file_action_lock(), get_conn() as conn:
+        conn.executemany("INSERT INTO path_changes (path) VALUES (?)", [(str(p),) for p in paths if p])
+        yield conn
+
+
+def _replay_path_changes(conn: sqlite3.Connection, live_conn: sqlite3.Connection, after_id: int) -> int:
+    # je Pfad gilt der Stand der Live-DB: dort fehlende Dokumente entfernen, vorhandene übernehmen
+    rows = live_conn.execute("SELECT id, path FROM path_changes WHERE id > ? ORDER BY id", (after_id,)).fetchall()
+    for path in dict.fromkeys(row[1] for row in rows):
+        doc_id = _document_id_by_path(conn, path)
+        if doc_id is not None:
+            _delete_documents(conn, [doc_id])
+        row = get_document_by_path(live_conn, path)
+        if row is not None:
+            fields = {key: row[key] for key in row.keys() if key != "id"}
+            meta = DocumentMeta(
+                **fields,
+                content=get_document_content(live_conn, row["id"]) or "",
+                title_or_subject=get_document_title(live_conn, row["id"]),
+            )
+            upsert_document(conn, meta)
+    return len(rows)
+
+
+def _table_columns(conn: sqlite3.Connection, schema: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+
+def _copy_table(conn: sqlite3.Connection, table: str, where: str = "", params: Iterable[Any] = (), keep_id: bool = True) -> int:
+    live_cols = set(_table_columns(conn, "live", table))
+    cols = [c for c in _table_columns(conn, "main", table) if c in live_cols and (keep_id or c != "id")]
+    if not cols:
+        return 0
+    col_sql = ", ".join(cols)
+    cur = conn.execute(f"INSERT INTO main.{table} ({col_sql}) SELECT {col_sql} FROM live.{table} {where}", list(params))
+    return cur.rowcount
+
+
+def prepare_shadow_db(shadow: Path, live: Optional[Path] = None, reuse_content: bool = True) -> Dict[str, int]:
+    """
+    Legt die Schatten-DB an und übernimmt Verlauf, Quarantäne und (reuse_content) alle Dokumente
+    samt FTS-Inhalt aus der Live-DB. Unveränderte Dateien werden dadurch nicht neu extrahiert.
+    Liefert die höchsten übernommenen IDs je Verlaufstabelle für publish_shadow_db.
+    """
+    live = Path(live or DB_PATH)
+    remove_db_files(shadow)
+    page_size = 4096
+    if live.exists():
+        with get_conn(live) as live_conn:
+            page_size = int(live_conn.execute("PRAGMA page_size").fetchone()[0])
+    # Seitengröße muss vor WAL/Tabellen gesetzt sein, sonst scheitert das Backup in die Live-DB
+    raw = sqlite3.connect(shadow)
+    try:
+        raw.execute(f"PRAGMA page_size={page_size}")
+        raw.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        raw.execute("VACUUM")
+    finally:
+        raw.close()
+    init_db(shadow)
+    marks: Dict[str, int] = {}
+    if not live.exists():
+        return marks
+    # alte Live-DB vorher auf den aktuellen Aufbau bringen (documents_content)
+    init_db(live)
+    with get_conn(live) as live_conn:
+        # Marke vor dem Kopieren: spätere Datei-Aktionen spielt publish_shadow_db nach
+        marks["path_changes"] = int(live_conn.execute("SELECT COALESCE(MAX(id), 0) FROM path_changes").fetchone()[0])
+        live_conn.execute("DELETE FROM path_changes WHERE id <= ?", (marks["path_changes"],))
+    with get_conn(shadow) as conn:
+        conn.execute("ATTACH DATABASE ? AS live", (str(live),))
+        try:
+            for table in SHADOW_HISTORY_TABLES:
+                _copy_table(conn, table)
+                marks[table] = int(conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM main.{table}").fetchone()[0])
+            _copy_table(conn, "index_run_counts")
+            _copy_table(conn, "quarantine_entries")
+            if reuse_content:
+                for table in DOCUMENT_TABLES:
+                    _copy_table(conn, table)
+                # Inhalt bleibt komprimiert, nur der FTS-Index wird neu tokenisiert
+                _copy_table(conn, "documents_content", "WHERE id IN (SELECT id FROM live.documents_data)")
+                conn.execute("INSERT INTO main.documents_fts(documents_fts) VALUES ('rebuild')")
+                conn.execute("INSERT INTO main.documents_trigram(documents_trigram) VALUES ('rebuild')")
+            # kopierte Zeilen laufen an den Zählern vorbei
+            reconcile_stats(conn)
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE live")
+    return marks
+
+
+def publish_shadow_db(shadow: Path, live: Optional[Path] = None, marks: Optional[Dict[str, int]] = None) -> None:
+    """
+    Schaltet atomar auf die Schatten-DB um: Änderungen aus der Bauzeit (Quarantäne, Datei-Aktionen
+    laut path_changes) nachziehen, dann per Backup-API in einer einzigen Schreibtransaktion in die
+    Live-Datei kopieren. Datei-Aktionen warten solange (file_action_lock).
+    Leser sehen bis zum Commit den alten, danach den neuen Stand; offene Verbindungen bleiben gültig.
+    """
+    live = Path(live or DB_PATH)
+    marks = marks or {}
+    with file_action_lock(exclusive=True, base=live):
+        with get_conn(shadow) as conn:
+            if live.exists():
+                with get_conn(live) as live_conn:
+                    replayed = _replay_path_changes(conn, live_conn, marks.get("path_changes", 0))
+                if replayed:
+                    logger.info("Schattenaufbau: %s Datei-Aktionen aus der Bauzeit übernommen", replayed)
+                conn.commit()
+                conn.execute("ATTACH DATABASE ? AS live", (str(live),))
+                try:
+                    conn.execute("DELETE FROM main.quarantine_entries")
+                    _copy_table(conn, "quarantine_entries")
+                    for table in ("file_errors", "index_run_events"):
+                        if table in marks:
+                            _copy_table(conn, table, "WHERE id > ?", (marks[table],), keep_id=False)
+                    reconcile_stats(conn)
+                    conn.commit()
+                finally:
+                    conn.execute("DETACH DATABASE live")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        src = connect(shadow)
+        dst = connect(live)
+        try:
+            src.backup(dst)
+            dst.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            dst.close()
+            src.close()
+    remove_db_files(shadow)
+    bump_generation()
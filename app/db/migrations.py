@@ -0,0 +1,145 @@
+"""
+Versionierte Schema-Migrationen über PRAGMA user_version.
+
+Jede DB (Index, Metriken, Config) hat eine geordnete Liste (version, beschreibung, funktion).
+Ausstehende Migrationen laufen beim Start bzw. per CLI; danach prüft ein Prozess je Datei nur noch
+einen Cache-Eintrag, Request-Handler führen kein DDL mehr aus.
+
+    python -m app.db.migrations [--status]
+"""
+import argparse
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+# (Art, Pfad) -> (st_dev, st_ino) der migrierten Datei
+_migrated: Dict[Tuple[str, str], Tuple[int, int]] = {}
+_lock = threading.Lock()
+
+
+def latest_version(migrations: Sequence[Migration]) -> int:
+    return max((m[0] for m in migrations), default=0)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def run_script(conn: sqlite3.Connection, script: str) -> None:
+    # wie executescript, aber ohne implizites COMMIT: bleibt in der Transaktion der Migration
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: Sequence[Migration], name: str) -> List[int]:
+    """
+    Wendet alle Migrationen mit version > user_version in einer Transaktion an; liefert die angewendeten Versionen.
+    Mehrere Prozesse serialisieren über BEGIN IMMEDIATE, der zweite findet die DB bereits aktuell vor.
+    """
+    ordered = sorted(migrations, key=lambda m: m[0])
+    if schema_version(conn) >= latest_version(ordered):
+        return []
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    applied: List[Tuple[int, str]] = []
+    try:
+        current = schema_version(conn)
+        for version, description, fn in ordered:
+            if version <= current:
+                continue
+            try:
+                fn(conn)
+            except Exception:
+                logger.error("Migration %s/%s (%s) fehlgeschlagen", name, version, description)
+                raise
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            applied.append((version, description))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    for version, description in applied:
+        logger.info("Migration %s/%s angewendet: %s", name, version, description)
+    return [version for version, _ in applied]
+
+
+def _file_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+def ensure_migrated(kind: str, path: Path, run: Callable[[], None]) -> bool:
+    """
+    Ruft run() nur auf, wenn diese Datei in diesem Prozess noch nicht migriert wurde.
+    Eine neu angelegte Datei (anderer Inode) wird erneut geprüft.
+    """
+    path = Path(path)
+    cache_key = (kind, str(path.resolve()))
+    key = _file_key(path)
+    if key is not None and _migrated.get(cache_key) == key:
+        return False
+    with _lock:
+        key = _file_key(path)
+        if key is not None and _migrated.get(cache_key) == key:
+            return False
+        run()
+        key = _file_key(path)
+        if key is not None:
+            _migrated[cache_key] = key
+    return True
+
+
+def reset_cache(path: Optional[Path] = None) -> None:
+    with _lock:
+        if path is None:
+            _migrated.clear()
+            return
+        resolved = str(Path(path).resolve())
+        for cache_key in [k for k in _migrated if k[1] == resolved]:
+            _migrated.pop(cache_key, None)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app import config_db, metrics_db
+    from app.db import datenbank as db
+
+    parser = argparse.ArgumentParser(description="Schema-Migrationen für Index-, Metrik- und Config-DB")
+    parser.add_argument("--status", action="store_true", help="nur Versionen anzeigen")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    targets = [
+        ("index", db.DB_PATH, db.MIGRATIONS, db.init_db),
+        ("metrics", metrics_db.METRICS_DB_PATH, metrics_db.MIGRATIONS, metrics_db.init_db),
+        ("config", config_db.CONFIG_DB_PATH, config_db.MIGRATIONS, config_db.ensure_db),
+    ]
+    for name, path, migrations, migrate in targets:
+        if not args.status:
+            migrate()
+        version = 0
+        if Path(path).exists():
+            conn = sqlite3.connect(path)
+            try:
+                version = schema_version(conn)
+            finally:
+                conn.close()
+        print(f"{name:8} {path}  Version {version}/{latest_version(migrations)}")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,220 @@
+"""
+Begrenzter Verbindungs-Pool je SQLite-Datei.
+
+Verbindungen werden einmal konfiguriert (Pragmas, Funktionen) und nach Gebrauch zurückgelegt,
+Seiten-Cache und vorbereitete Statements bleiben erhalten. Ist der Pool erschöpft, wird bis
+`timeout` gewartet und danach eine Überlauf-Verbindung geöffnet, die beim Zurückgeben schließt;
+verschachtelte Nutzung im selben Thread kann so nicht verklemmen.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+def _file_key(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_dev, st.st_ino
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        name: str,
+        path: Path,
+        factory: Callable[[Path], sqlite3.Connection],
+        size: int = 4,
+        timeout: float = 1.0,
+        row_factory: Optional[Any] = None,
+    ):
+        self.name = name
+        self.row_factory = row_factory
+        self.path = Path(path)
+        self.size = max(1, int(size))
+        self.timeout = max(0.0, float(timeout))
+        self._factory = factory
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._file_key = _file_key(self.path)
+        self._stats = {"acquires": 0, "hits": 0, "created": 0, "overflow": 0, "discarded": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _check_file(self) -> None:
+        # Datei gelöscht/ersetzt (Reset): alte Verbindungen zeigen auf den verwaisten Inode
+        key = _file_key(self.path)
+        if key == self._file_key:
+            return
+        with self._lock:
+            if key == self._file_key:
+                return
+            self._file_key = key
+            self._drain_locked()
+
+    def _drain_locked(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._created -= 1
+            self._stats["discarded"] += 1
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+
+    def _open(self) -> sqlite3.Connection:
+        conn = self._factory(self.path)
+        if self._file_key is None:
+            self._file_key = _file_key(self.path)
+        return conn
+
+    def acquire(self) -> Tuple[sqlite3.Connection, bool]:
+        """
+        Liefert (Verbindung, pooled). pooled=False bei Überlauf: release schließt sie.
+        """
+        self._check_file()
+        started = time.perf_counter()
+        with self._lock:
+            self._stats["acquires"] += 1
+            try:
+                conn = self._idle.get_nowait()
+                self._stats["hits"] += 1
+                return conn, True
+            except queue.Empty:
+                pass
+            if self._created < self.size:
+                self._created += 1
+                self._stats["created"] += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self._open(), True
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+            self._record_wait(time.perf_counter() - started)
+            with self._lock:
+                self._stats["hits"] += 1
+            return conn, True
+        except queue.Empty:
+            self._record_wait(time.perf_counter() - started)
+            with self._lock:
+                self._stats["overflow"] += 1
+            return self._factory(self.path), False
+
+    def _record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def release(self, conn: sqlite3.Connection, pooled: bool, broken: bool = False) -> None:
+        if pooled and not broken:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.row_factory = self.row_factory
+            except sqlite3.Error:
+                broken = True
+        if not pooled or broken:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            if pooled:
+                with self._lock:
+                    self._created -= 1
+                    self._stats["discarded"] += 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn, pooled = self.acquire()
+        broken = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError as exc:
+            # z. B. "database disk image is malformed" nach Austausch der Datei: nicht wiederverwenden
+            broken = not isinstance(exc, (sqlite3.IntegrityError, sqlite3.OperationalError))
+            raise
+        finally:
+            self.release(conn, pooled, broken)
+
+    def close(self) -> None:
+        with self._lock:
+            self._drain_locked()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            acquires = self._stats["acquires"]
+            return {
+                "name": self.name,
+                "path": str(self.path),
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / acquires, 4) if acquires else None,
+                "wait_ms_total": round(self._wait_total * 1000, 3),
+                "wait_ms_avg": round(self._wait_total * 1000 / acquires, 4) if acquires else None,
+                "wait_ms_max": round(self._wait_max * 1000, 3),
+            }
+
+
+_pools: Dict[Tuple[str, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def pool_size(kind: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(f"DB_POOL_{kind.upper()}_SIZE", "") or default))
+    except ValueError:
+        return default
+
+
+def get_pool(
+    name: str,
+    path: Path,
+    factory: Callable[[Path], sqlite3.Connection],
+    size: int,
+    timeout: float = 1.0,
+    row_factory: Optional[Any] = None,
+) -> ConnectionPool:
+    key = (name, str(Path(path).resolve()))
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(name, Path(path), factory, size=size, timeout=timeout, row_factory=row_factory)
+            _pools[key] = pool
+    return pool
+
+
+def all_stats() -> List[Dict[str, Any]]:
+    return [pool.stats() for pool in list(_pools.values())]
+
+
+def close_all(path: Optional[Path] = None) -> None:
+    resolved = str(Path(path).resolve()) if path is not None else None
+    with _pools_lock:
+        for key, pool in list(_pools.items()):
+            if resolved is None or key[1] == resolved:
+                pool.close()
+                _pools.pop(key, None)
@@ -0,0 +1,363 @@
+"""
+Index-Snapshots für mehrere Such-Instanzen mit einem Indexer.
+
+Primär-Instanz (APP_ROLE=primary, Standard): veröffentlicht nach Indexläufen und im Intervall eine
+konsistente Kopie der Index-DB per SQLite-Backup-API nach INDEX_SNAPSHOT_DIR; manifest.json zeigt
+auf die aktuelle Generation. Unveränderte DBs werden nicht erneut kopiert.
+
+Follower (APP_ROLE=follower): prüft das Manifest, kopiert neue Generationen in ein lokales
+Verzeichnis und schaltet DB_PATH atomar um. Das Wörterbuch der Tippfehlersuche wird mitkopiert,
+Follower bauen es nicht selbst. Laufende Anfragen lesen ihre alte Datei zu Ende;
+die vorletzte Generation wird erst beim nächsten Wechsel entfernt.
+"""
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app import search_fuzzy
+from app.db import datenbank as db
+from app.db import migrations, pool
+
+logger = logging.getLogger(__name__)
+
+ROLES = ("primary", "follower")
+MANIFEST_NAME = "manifest.json"
+# veröffentlichte Generationen im Snapshot-Verzeichnis (Follower kopieren innerhalb eines Poll-Intervalls)
+KEEP_PUBLISHED = 3
+_publish_lock = threading.Lock()
+_published_fingerprint: Dict[str, Tuple] = {}
+
+
+def app_role() -> str:
+    role = (os.getenv("APP_ROLE") or "primary").strip().lower()
+    if role not in ROLES:
+        logger.warning("Unbekannte APP_ROLE %s, verwende primary", role)
+        return "primary"
+    return role
+
+
+def is_follower() -> bool:
+    return app_role() == "follower"
+
+
+def snapshot_dir() -> Optional[Path]:
+    raw = (os.getenv("INDEX_SNAPSHOT_DIR") or "").strip()
+    return Path(raw) if raw else None
+
+
+def local_dir() -> Path:
+    return Path(os.getenv("INDEX_SNAPSHOT_LOCAL_DIR", "data/snapshots") or "data/snapshots")
+
+
+def _env_seconds(name: str, default: float) -> float:
+    try:
+        return max(1.0, float(os.getenv(name, "") or default))
+    except ValueError:
+        return default
+
+
+def publish_interval() -> float:
+    return _env_seconds("INDEX_SNAPSHOT_INTERVAL_SEC", 300)
+
+
+def poll_interval() -> float:
+    return _env_seconds("INDEX_SNAPSHOT_POLL_SEC", 10)
+
+
+def _fingerprint(path: Path) -> Tuple:
+    # jeder Commit ändert DB oder WAL; ein Checkpoint erzeugt höchstens eine überflüssige Generation
+    parts = []
+    for candidate in (path, path.with_suffix(path.suffix + "-wal")):
+        try:
+            st = candidate.stat()
+            parts.append((st.st_ino, st.st_mtime_ns, st.st_size))
+        except OSError:
+            parts.append(None)
+    return tuple(parts)
+
+
+def _snapshot_name(generation: int) -> str:
+    return f"index-{generation:06d}.db"
+
+
+def _fsync(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    _fsync(tmp)
+    os.replace(tmp, path)
+
+
+def read_manifest(directory: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    directory = directory or snapshot_dir()
+    if directory is None:
+        return None
+    try:
+        return json.loads((Path(directory) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _prune_published(directory: Path, keep: int) -> None:
+    files = sorted(directory.glob("index-*.db"))
+    for old in files[:-keep] if keep > 0 else []:
+        for candidate in (old, search_fuzzy.index_path(old)):
+            try:
+                candidate.unlink(missing_ok=True)
+            except OSError as exc:
+                logger.warning("Alter Snapshot %s konnte nicht gelöscht werden: %s", candidate, exc)
+
+
+def _copy_atomic(source: Path, target: Path) -> bool:
+    # Wörterbuch wird von search_fuzzy.build atomar ersetzt: copyfile liest eine vollständige Datei
+    tmp = target.with_name(target.name + ".tmp")
+    try:
+        shutil.copyfile(source, tmp)
+    except FileNotFoundError:
+        return False
+    os.replace(tmp, target)
+    return True
+
+
+def publish_snapshot(
+    source: Optional[Path] = None, target: Optional[Path] = None, force: bool = False
+) -> Optional[Dict[str, Any]]:
+    """
+    Kopiert die Index-DB per Backup-API als neue Generation nach target und aktualisiert das Manifest.
+    Liefert das Manifest oder None (kein Ziel konfiguriert bzw. DB seit der letzten Generation unverändert).
+    """
+    source = Path(source or db.DB_PATH)
+    target = Path(target) if target else snapshot_dir()
+    if target is None or not source.exists():
+        return None
+    with _publish_lock:
+        key = str(source.resolve())
+        fingerprint = _fingerprint(source)
+        if not force and _published_fingerprint.get(key) == fingerprint:
+            return None
+        target.mkdir(parents=True, exist_ok=True)
+        generation = int((read_manifest(target) or {}).get("generation") or 0) + 1
+        name = _snapshot_name(generation)
+        tmp = target / (name + ".tmp")
+        started = time.perf_counter()
+        src = db.connect(source)
+        dest = sqlite3.connect(tmp)
+        try:
+            # ein Schritt = eine Lesetransaktion: konsistenter Stand, Writer laufen im WAL weiter
+            src.backup(dest)
+            version = int(dest.execute("PRAGMA user_version").fetchone()[0])
+            # eigenständige Datei ohne -wal/-shm
+            dest.execute("PRAGMA journal_mode=DELETE")
+            dest.commit()
+        except Exception:
+            dest.close()
+            tmp.unlink(missing_ok=True)
+            raise
+        finally:
+            src.close()
+        dest.close()
+        _fsync(tmp)
+        os.replace(tmp, target / name)
+        fuzzy = search_fuzzy.index_path(target / name)
+        manifest = {
+            "generation": generation,
+            "file": name,
+            "fuzzy": fuzzy.name if _copy_atomic(search_fuzzy.index_path(source), fuzzy) else None,
+            "published_at": datetime.now(timezone.utc).isoformat(),
+            "size_bytes": (target / name).stat().st_size,
+            "schema_version": version,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+        _write_json_atomic(target / MANIFEST_NAME, manifest)
+        _prune_published(target, KEEP_PUBLISHED)
+        _published_fingerprint[key] = fingerprint
+    logger.info(
+        "Index-Snapshot %s veröffentlicht (%.1f MB, %s ms)",
+        generation,
+        manifest["size_bytes"] / 1e6,
+        manifest["duration_ms"],
+    )
+    return manifest
+
+
+def publish_if_enabled() -> Optional[Dict[str, Any]]:
+    if snapshot_dir() is None or is_follower():
+        return None
+    try:
+        return publish_snapshot()
+    except Exception:
+        logger.exception("Index-Snapshot konnte nicht veröffentlicht werden")
+        return None
+
+
+def _age_seconds(published_at: Optional[str]) -> Optional[float]:
+    if not published_at:
+        return None
+    try:
+        ts = datetime.fromisoformat(published_at)
+    except ValueError:
+        return None
+    return round((datetime.now(timezone.utc) - ts).total_seconds(), 1)
+
+
+def _remove_db_files(path: Path) -> None:
+    pool.close_all(path)
+    migrations.reset_cache(path)
+    for candidate in (path, path.with_suffix(path.suffix + "-wal"), path.with_suffix(path.suffix + "-shm")):
+        try:
+            candidate.unlink(missing_ok=True)
+        except OSError as exc:
+            logger.warning("Snapshot-Datei %s konnte nicht gelöscht werden: %s", candidate, exc)
+
+
+class SnapshotFollower:
+    """
+    Übernimmt veröffentlichte Snapshots in ein lokales Verzeichnis und stellt DB_PATH darauf um.
+    """
+
+    def __init__(self, source: Optional[Path] = None, target: Optional[Path] = None, interval: Optional[float] = None):
+        self.source = Path(source) if source else snapshot_dir()
+        self.target = Path(target) if target else local_dir()
+        self.interval = interval or poll_interval()
+        self.generation = 0
+        self.published_at: Optional[str] = None
+        self.adopted_at: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def adopt_latest(self) -> bool:
+        """
+        Kopiert eine neuere Generation lokal und schaltet um; False, wenn nichts Neues vorliegt.
+        """
+        manifest = read_manifest(self.source) if self.source else None
+        if not manifest or int(manifest.get("generation") or 0) <= self.generation:
+            return False
+        with self._lock:
+            generation = int(manifest["generation"])
+            if generation <= self.generation:
+                return False
+            self.target.mkdir(parents=True, exist_ok=True)
+            local = self.target / _snapshot_name(generation)
+            tmp = local.with_name(local.name + ".tmp")
+            shutil.copyfile(self.source / manifest["file"], tmp)
+            if tmp.stat().st_size != int(manifest.get("size_bytes") or 0):
+                tmp.unlink(missing_ok=True)
+                raise RuntimeError(f"Snapshot {generation} unvollständig kopiert")
+            os.replace(tmp, local)
+            if manifest.get("fuzzy"):
+                _copy_atomic(self.source / manifest["fuzzy"], search_fuzzy.index_path(local))
+            # nur prüfen, nie migrieren oder neu tokenisieren; gilt danach als migriert (auch für read_conn)
+            migrations.ensure_migrated("index", local, lambda: db.check_published(local))
+            previous = Path(db.DB_PATH)
+            db.DB_PATH = local
+            self.generation = generation
+            self.published_at = manifest.get("published_at")
+            self.adopted_at = datetime.now(timezone.utc).isoformat()
+            self.last_error = None
+            self._cleanup(keep={local, previous})
+        logger.info("Index-Snapshot %s übernommen", generation)
+        return True
+
+    def _cleanup(self, keep: set) -> None:
+        for old in sorted(self.target.glob("index-*.db")):
+            if old not in keep:
+                _remove_db_files(old)
+                search_fuzzy.index_path(old).unlink(missing_ok=True)
+
+    def status(self) -> Dict[str, Any]:
+        manifest = read_manifest(self.source) if self.source else None
+        latest = int((manifest or {}).get("generation") or 0)
+        return {
+            "role": "follower",
+            "dir": str(self.source) if self.source else None,
+            "generation": self.generation or None,
+            "latest_generation": latest or None,
+            "behind": max(0, latest - self.generation),
+            "published_at": self.published_at,
+            "adopted_at": self.adopted_at,
+            "lag_seconds": _age_seconds(self.published_at),
+            "last_error": self.last_error,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        logger.info("Snapshot-Follower gestartet (%s)", self.source)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.adopt_latest()
+            except Exception as exc:
+                self.last_error = str(exc)
+                logger.error("Snapshot-Übernahme fehlgeschlagen: %s", exc)
+            self._stop_event.wait(self.interval)
+
+
+class SnapshotPublisher:
+    """
+    Veröffentlicht im Intervall, sofern sich die DB geändert hat und kein Indexlauf aktiv ist.
+    """
+
+    def __init__(self, active_runs: Callable[[], int], interval: Optional[float] = None):
+        self._active_runs = active_runs
+        self.interval = interval or publish_interval()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        logger.info("Snapshot-Veröffentlichung gestartet (%s)", snapshot_dir())
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _run_loop(self):
+        while not self._stop_event.wait(self.interval):
+            if self._active_runs() == 0:
+                publish_if_enabled()
+
+
+def primary_status() -> Dict[str, Any]:
+    directory = snapshot_dir()
+    manifest = read_manifest(directory) or {}
+    return {
+        "role": "primary",
+        "dir": str(directory) if directory else None,
+        "generation": manifest.get("generation"),
+        "published_at": manifest.get("published_at"),
+        "size_bytes": manifest.get("size_bytes"),
+        "duration_ms": manifest.get("duration_ms"),
+        "lag_seconds": _age_seconds(manifest.get("published_at")),
+    }
+
@@ -0,0 +1,450 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app import config_db
+from app.auto_index_scheduler import compute_next_run
+from app.db import datenbank as db
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "documents_fts"
+FTS_STRUCTURE_ROWID = 10
+FTS_STRUCTURE_V2 = b"\xff\x00\x00\x01"
+MERGE_PAGES = 500
+VACUUM_STEP_PAGES = 2000
+# ab diesem Anteil freier Seiten wird eine DB ohne auto_vacuum einmalig umgestellt (VACUUM)
+FULL_VACUUM_FREE_RATIO = 0.25
+AFTER_RUN_BUDGET_SEC = 30.0
+# Reihenfolge: Verlauf zuerst kürzen (freie Seiten für vacuum), incremental_vacuum schreibt ins WAL,
+# daher Checkpoint zuletzt
+TASKS = ("retention", "stats", "fts_merge", "optimize", "vacuum", "checkpoint")
+HISTORY_MODES = ("delete", "compact")
+_run_lock = threading.Lock()
+
+
+@dataclass
+class MaintenanceConfig:
+    enabled: bool = False
+    mode: str = "daily"  # daily | weekly | interval
+    time: str = "04:00"
+    weekday: int = 6
+    interval_hours: int = 24
+    budget_seconds: int = 300
+    after_run: bool = True
+    allow_full_vacuum: bool = False
+    history_keep_runs: int = 50
+    history_keep_days: int = 90
+    history_mode: str = "delete"  # delete | compact
+
+
+def _read_varint(buf: bytes, pos: int) -> tuple[int, int]:
+    # SQLite-Varint: 7 Bit je Byte (Big Endian), das 9. Byte zählt voll
+    value = 0
+    for i in range(9):
+        byte = buf[pos + i]
+        if i == 8:
+            return (value << 8) | byte, pos + 9
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    return value, pos + 9
+
+
+def decode_fts_structure(block: bytes) -> Dict[str, Any]:
+    """
+    Dekodiert den FTS5-Strukturdatensatz (%_data, id=10): Ebenen und Segmente je Ebene.
+    """
+    pos = 4  # Cookie
+    v2 = block[pos:pos + 4] == FTS_STRUCTURE_V2
+    if v2:
+        pos += 4
+    n_level, pos = _read_varint(block, pos)
+    n_segment, pos = _read_varint(block, pos)
+    _write_counter, pos = _read_varint(block, pos)
+    levels: List[int] = []
+    for _ in range(n_level):
+        _n_merge, pos = _read_varint(block, pos)
+        n_seg, pos = _read_varint(block, pos)
+        for _ in range(n_seg):
+            # iSegid, pgnoFirst, pgnoLast (+ v2: origin1, origin2, nPgTombstone, nEntryTombstone, nEntry)
+            for _ in range(8 if v2 else 3):
+                _val, pos = _read_varint(block, pos)
+        levels.append(n_seg)
+    return {"segments": n_segment, "levels": n_level, "segments_per_level": levels}
+
+
+def fts_structure(conn: sqlite3.Connection) -> Optional[Dict[str, Any]]:
+    try:
+        row = conn.execute(f"SELECT block FROM {FTS_TABLE}_data WHERE id = ?", (FTS_STRUCTURE_ROWID,)).fetchone()
+        if not row or row[0] is None:
+            return None
+        return decode_fts_structure(bytes(row[0]))
+    except Exception as exc:
+        logger.warning("FTS-Struktur nicht lesbar: %s", exc)
+        return None
+
+
+def collect_stats(path: Optional[Path] = None) -> Dict[str, Any]:
+    path = Path(path or db.DB_PATH)
+    wal = path.with_suffix(path.suffix + "-wal")
+    stats: Dict[str, Any] = {
+        "db_bytes": path.stat().st_size if path.exists() else 0,
+        "wal_bytes": wal.stat().st_size if wal.exists() else 0,
+    }
+    if not path.exists():
+        return stats
+    with db.get_conn(path) as conn:
+        page_size = int(conn.execute("PRAGMA page_size").fetchone()[0])
+        page_count = int(conn.execute("PRAGMA page_count").fetchone()[0])
+        freelist = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+        auto_vacuum = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+        structure = fts_structure(conn)
+    stats.update(
+        {
+            "page_size": page_size,
+            "page_count": page_count,
+            "freelist_pages": freelist,
+            "freelist_bytes": freelist * page_size,
+            "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(auto_vacuum, str(auto_vacuum)),
+            "fts_segments": structure["segments"] if structure else None,
+            "fts_levels": structure["segments_per_level"] if structure else None,
+        }
+    )
+    return stats
+
+
+def _merge_segments(conn: sqlite3.Connection, table: str, deadline: float) -> Tuple[int, bool]:
+    steps = 0
+    while time.monotonic() < deadline:
+        changes = conn.total_changes
+        conn.execute(f"INSERT INTO {table}({table}, rank) VALUES ('merge', ?)", (MERGE_PAGES,))
+        conn.commit()
+        steps += 1
+        # nur die Steuerzeile selbst gezählt: nichts mehr zusammenzuführen
+        if conn.total_changes - changes <= 1:
+            return steps, True
+    return steps, False
+
+
+def _task_fts_merge(conn: sqlite3.Connection, deadline: float) -> Dict[str, Any]:
+    before = fts_structure(conn)
+    steps, done = _merge_segments(conn, FTS_TABLE, deadline)
+    if done:
+        # der Trigramm-Index bekommt vom Indexer dieselben kleinen Segmente
+        trigram_steps, done = _merge_segments(conn, db.TRIGRAM_TABLE, deadline)
+        steps += trigram_steps
+    after = fts_structure(conn)
+    return {
+        "steps": steps,
+        "complete": done,
+        "segments_before": before["segments"] if before else None,
+        "segments_after": after["segments"] if after else None,
+    }
+
+
+def _task_optimize(conn: sqlite3.Connection, deadline: float) -> Dict[str, Any]:
+    conn.execute("PRAGMA analysis_limit=1000;")
+    conn.execute("PRAGMA optimize;")
+    return {"complete": True}
+
+
+def _task_checkpoint(conn: sqlite3.Connection, deadline: float) -> Dict[str, Any]:
+    busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone()
+    return {"complete": not busy, "busy": bool(busy), "log_frames": log_frames, "checkpointed": checkpointed}
+
+
+def _task_retention(conn: sqlite3.Connection, deadline: float, cfg: MaintenanceConfig) -> Dict[str, Any]:
+    compact = cfg.history_mode == "compact"
+    runs = db.history_prune_candidates(conn, cfg.history_keep_runs, cfg.history_keep_days, compact=compact)
+    done = 0
+    deleted = 0
+    complete = True
+    for run_id in runs:
+        if time.monotonic() >= deadline:
+            complete = False
+            break
+        removed, finished = db.prune_run_history(conn, run_id, compact=compact, deadline=deadline)
+        deleted += removed
+        if not finished:
+            complete = False
+            break
+        done += 1
+    orphans = 0
+    if complete:
+        while time.monotonic() < deadline:
+            removed = db.prune_orphan_errors(conn, cfg.history_keep_days)
+            orphans += removed
+            if removed < db.HISTORY_BATCH:
+                break
+        else:
+            complete = False
+    return {
+        "complete": complete,
+        "mode": cfg.history_mode,
+        "runs": done,
+        "pending_runs": len(runs) - done,
+        "deleted_rows": deleted,
+        "orphan_errors": orphans,
+    }
+
+
+def _task_stats(conn: sqlite3.Connection, deadline: float) -> Dict[str, Any]:
+    # Abgleich der mitgezählten Statistik; unter Schreibsperre, damit kein Writer dazwischen zählt
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        drift = db.reconcile_stats(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    if any(drift.values()):
+        logger.warning("Index-Statistik korrigiert: %s", drift)
+    return {"complete": True, "drift": drift}
+
+
+def _task_vacuum(conn: sqlite3.Connection, deadline: float, allow_full: bool = False) -> Dict[str, Any]:
+    auto_vacuum = int(conn.execute("PRAGMA auto_vacuum").fetchone()[0])
+    freelist = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+    page_count = int(conn.execute("PRAGMA page_count").fetchone()[0]) or 1
+    if auto_vacuum != 2:
+        if allow_full and freelist / page_count >= FULL_VACUUM_FREE_RATIO:
+            # einmalige Umstellung; VACUUM ist nicht unterbrechbar und ignoriert das Zeitbudget
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
+            conn.execute("VACUUM;")
+            return {"complete": True, "full_vacuum": True, "freed_pages": freelist}
+        return {"complete": True, "skipped": "auto_vacuum nicht inkrementell", "freelist_pages": freelist}
+    freed = 0
+    while freelist > 0 and time.monotonic() < deadline:
+        step = min(VACUUM_STEP_PAGES, freelist)
+        conn.execute(f"PRAGMA incremental_vacuum({step});").fetchall()
+        conn.commit()
+        remaining = int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+        freed += freelist - remaining
+        if remaining >= freelist:
+            break
+        freelist = remaining
+    return {"complete": freelist == 0, "freed_pages": freed, "freelist_pages": freelist}
+
+
+def run_maintenance(
+    tasks: Optional[List[str]] = None,
+    budget_seconds: float = 300.0,
+    allow_full_vacuum: bool = False,
+    path: Optional[Path] = None,
+    reason: str = "manual",
+) -> Dict[str, Any]:
+    """
+    Führt Wartungsaufgaben nacheinander im Zeitbudget aus; nicht begonnene Aufgaben werden
+    als übersprungen gemeldet. Ergebnis wird in der Config-DB abgelegt.
+    """
+    tasks = [t for t in TASKS if t in (tasks or TASKS)]
+    if not _run_lock.acquire(blocking=False):
+        return {"status": "busy"}
+    started = datetime.now(timezone.utc)
+    deadline = time.monotonic() + max(1.0, float(budget_seconds))
+    results: Dict[str, Any] = {}
+    status = "completed"
+    try:
+        before = collect_stats(path)
+        conn = db.connect(path)
+        try:
+            for task in tasks:
+                if time.monotonic() >= deadline:
+                    results[task] = {"skipped": "Zeitbudget erschöpft"}
+                    status = "partial"
+                    continue
+                t0 = time.monotonic()
+                try:
+                    if task == "retention":
+                        res = _task_retention(conn, deadline, load_config_from_db())
+                    elif task == "stats":
+                        res = _task_stats(conn, deadline)
+                    elif task == "fts_merge":
+                        res = _task_fts_merge(conn, deadline)
+                    elif task == "optimize":
+                        res = _task_optimize(conn, deadline)
+                    elif task == "checkpoint":
+                        res = _task_checkpoint(conn, deadline)
+                    else:
+                        res = _task_vacuum(conn, deadline, allow_full=allow_full_vacuum)
+                except sqlite3.Error as exc:
+                    logger.error("Wartung %s fehlgeschlagen: %s", task, exc)
+                    res = {"error": str(exc)}
+                    status = "error"
+                res["seconds"] = round(time.monotonic() - t0, 3)
+                if not res.get("complete", True) and status == "completed":
+                    status = "partial"
+                results[task] = res
+        finally:
+            conn.close()
+        after = collect_stats(path)
+    finally:
+        _run_lock.release()
+    summary = {
+        "status": status,
+        "reason": reason,
+        "started_at": started.isoformat(),
+        "duration_sec": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+        "tasks": results,
+        "before": before,
+        "after": after,
+    }
+    logger.info(
+        "DB-Wartung (%s) %s in %.1fs: Segmente %s→%s, WAL %s→%s Bytes",
+        reason,
+        status,
+        summary["duration_sec"],
+        before.get("fts_segments"),
+        after.get("fts_segments"),
+        before.get("wal_bytes"),
+        after.get("wal_bytes"),
+    )
+    try:
+        config_db.set_setting("maintenance_last_result", json.dumps(summary))
+    except Exception as exc:
+        logger.error("Wartungsergebnis nicht gespeichert: %s", exc)
+    return summary
+
+
+def run_after_index(active_runs: Callable[[], int]) -> Optional[Dict[str, Any]]:
+    """
+    Kurze Wartung nach einem Indexlauf (Verlauf kürzen, Merge, Checkpoint, ANALYZE), nur wenn kein Lauf mehr aktiv ist.
+    """
+    cfg = load_config_from_db()
+    if not cfg.after_run or active_runs() > 0:
+        return None
+    return run_maintenance(
+        ["retention", "fts_merge", "checkpoint", "optimize"],
+        budget_seconds=min(AFTER_RUN_BUDGET_SEC, cfg.budget_seconds),
+        reason="after_run",
+    )
+
+
+def load_config_from_db() -> MaintenanceConfig:
+    defaults = MaintenanceConfig()
+    raw = {k: config_db.get_setting(f"maintenance_{k}", None) for k in asdict(defaults)}
+
+    def as_bool(val: Optional[str], default: bool) -> bool:
+        return default if val in (None, "") else str(val).lower() in {"1", "true"}
+
+    def as_int(val: Optional[str], default: int) -> int:
+        try:
+            return int(val) if val not in (None, "") else default
+        except ValueError:
+            return default
+
+    history_mode = (raw["history_mode"] or defaults.history_mode).strip().lower()
+    return MaintenanceConfig(
+        enabled=as_bool(raw["enabled"], defaults.enabled),
+        mode=(raw["mode"] or defaults.mode).strip().lower(),
+        time=raw["time"] or defaults.time,
+        weekday=as_int(raw["weekday"], defaults.weekday),
+        interval_hours=as_int(raw["interval_hours"], defaults.interval_hours),
+        budget_seconds=max(1, as_int(raw["budget_seconds"], defaults.budget_seconds)),
+        after_run=as_bool(raw["after_run"], defaults.after_run),
+        allow_full_vacuum=as_bool(raw["allow_full_vacuum"], defaults.allow_full_vacuum),
+        history_keep_runs=max(0, as_int(raw["history_keep_runs"], defaults.history_keep_runs)),
+        history_keep_days=max(0, as_int(raw["history_keep_days"], defaults.history_keep_days)),
+        history_mode=history_mode if history_mode in HISTORY_MODES else defaults.history_mode,
+    )
+
+
+def persist_config(cfg: MaintenanceConfig) -> None:
+    for key, value in asdict(cfg).items():
+        if isinstance(value, bool):
+            value = "1" if value else "0"
+        config_db.set_setting(f"maintenance_{key}", str(value))
+
+
+def load_last_result() -> Optional[Dict[str, Any]]:
+    raw = config_db.get_setting("maintenance_last_result", "") or ""
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def status_snapshot() -> Dict[str, Any]:
+    try:
+        stats = collect_stats()
+    except Exception as exc:
+        stats = {"error": str(exc)}
+    return {
+        "stats": stats,
+        "last": load_last_result(),
+        "next_run_at": config_db.get_setting("maintenance_next_run_at", "") or None,
+        "config": asdict(load_config_from_db()),
+    }
+
+
+class MaintenanceScheduler:
+    def __init__(self, active_runs: Callable[[], int]):
+        self._active_runs = active_runs
+        self._stop_event = threading.Event()
+        self._poke_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        logger.info("Wartungs-Scheduler gestartet")
+
+    def stop(self):
+        self._stop_event.set()
+        self._poke_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        logger.info("Wartungs-Scheduler gestoppt")
+
+    def update_config(self, cfg: MaintenanceConfig):
+        persist_config(cfg)
+        self._poke_event.set()
+
+    def _set_next(self, next_run: Optional[datetime]) -> None:
+        config_db.set_setting("maintenance_next_run_at", next_run.isoformat() if next_run else "")
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                cfg = load_config_from_db()
+                next_run = compute_next_run(cfg)
+                self._set_next(next_run)
+                if not next_run:
+                    self._wait_for(60)
+                    continue
+                wait_sec = max(1, (next_run - datetime.now(timezone.utc)).total_seconds())
+                if self._wait_for(wait_sec):
+                    continue
+                # während eines Indexlaufs verschieben; neue Konfiguration wird neu eingeplant
+                poked = False
+                while self._active_runs() > 0:
+                    if self._wait_for(60):
+                        poked = True
+                        break
+                if poked or self._stop_event.is_set():
+                    continue
+                run_maintenance(
+                    budget_seconds=cfg.budget_seconds,
+                    allow_full_vacuum=cfg.allow_full_vacuum,
+                    reason="scheduled",
+                )
+            except Exception as exc:
+                logger.error("Wartungs-Scheduler-Loop Fehler: %s", exc)
+                self._wait_for(30)
+
+    def _wait_for(self, seconds: float) -> bool:
+        self._poke_event.clear()
+        return self._poke_event.wait(timeout=seconds) or self._stop_event.is_set()
@@ -1,6 +1,8 @@
 let currentDocId = null;
 let searchTimer = null;
 let currentSearchController = null;
+let suggestTimer = null;
+let suggestController = null;
 let sortState = { key: null, dir: "asc" };
 let resizingColumn = false;
 let resizingPreview = false;
@@ -15,8 +17,10 @@ const DEFAULT_ZEN_STEP_IDX = 0;
 const SEARCH_LIMIT = 200;
 const MIN_QUERY_LENGTH = 2;
 const SEARCH_DEBOUNCE_MS = 400;
+const SUGGEST_DEBOUNCE_MS = 60;
+const FACETS_DELAY_MS = 800;
 const SEARCH_MODE_KEY = "searchMode";
-const SEARCH_MODE_SET = new Set(["strict", "standard", "loose"]);
+const SEARCH_MODE_SET = new Set(["strict", "standard", "loose", "substring", "fuzzy"]);
 const DEFAULT_SEARCH_MODE = normalizeSearchMode(window.searchDefaultMode) || "standard";
 const TYPE_FILTER_KEY = "searchTypeFilter";
 const TYPE_FILTER_SET = new Set(["", ".pdf", ".rtf", ".msg", ".eml", ".txt"]);
@@ -29,6 +33,11 @@ const TIME_PRIMARY_OPTIONS = ["", "yesterday", "last7", "last30"];
 const TIME_MORE_OPTIONS = ["last365", ...Array.from({ length: TIME_YEAR_MAX - TIME_YEAR_MIN + 1 }, (_, i) => String(TIME_YEAR_MAX - i))];
 const TIME_FILTER_ORDER = [...TIME_PRIMARY_OPTIONS, ...TIME_MORE_OPTIONS];
 let searchOffset = 0;
+let searchCursor = null;
+let searchFacets = null;
+let facetsTimer = null;
+let facetsController = null;
+let searchSeq = 0;
 let searchHasMore = false;
 let searchLoading = false;
 let zenModeEnabled = false;
@@ -585,6 +594,40 @@ function renderSourceFilter() {
         });
         container.appendChild(btn);
     });
+    renderFacetCounts();
+}
+
+function setFacetCount(btn, count, approximate) {
+    let badge = btn.querySelector(".facet-count");
+    if (count === null) {
+        if (badge) badge.remove();
+        return;
+    }
+    if (!badge) {
+        badge = document.createElement("span");
+        badge.className = "facet-count";
+        btn.appendChild(badge);
+    }
+    badge.textContent = approximate ? `~${count}` : String(count);
+}
+
+// Trefferzahlen der aktuellen Suche an Quellen- und Typfilter; ohne Suche ausblenden
+function renderFacetCounts() {
+    const facets = searchFacets;
+    const approximate = Boolean(facets && facets.approximate);
+    const bySource = new Map(((facets && facets.source) || []).map((f) => [f.value, f.count]));
+    const byExt = new Map(((facets && facets.extension) || []).map((f) => [f.value, f.count]));
+    let total = 0;
+    byExt.forEach((count) => {
+        total += count;
+    });
+    document.querySelectorAll("#source-filter .source-chip").forEach((btn) => {
+        setFacetCount(btn, facets ? bySource.get(btn.dataset.label) || 0 : null, approximate);
+    });
+    document.querySelectorAll("#type-filter button").forEach((btn) => {
+        const ext = normalizeTypeFilter(btn.dataset.ext);
+        setFacetCount(btn, facets ? (ext ? byExt.get(ext) || 0 : total) : null, approximate);
+    });
 }
 
 async function setupSourceFilter() {
@@ -1393,7 +1436,12 @@ async function search({ append = false } = {}) {
 
     if (!append) {
         searchOffset = 0;
+        searchCursor = null;
         searchHasMore = false;
+        searchFacets = null;
+        if (facetsTimer) clearTimeout(facetsTimer);
+        if (facetsController) facetsController.abort();
+        renderFacetCounts();
         if (zenModeEnabled) {
             resetZenLimit();
             applyZenVisibility();
@@ -1435,7 +1483,13 @@ async function search({ append = false } = {}) {
     currentSearchController = new AbortController();
 
     const activeMode = normalizeSearchMode(currentSearchMode) || DEFAULT_SEARCH_MODE;
-    const params = new URLSearchParams({ q, limit: SEARCH_LIMIT, offset: append ? searchOffset : 0 });
+    const params = new URLSearchParams({ q, limit: SEARCH_LIMIT });
+    // Cursor: jede Folgeseite kostet gleich viel; offset nur als Rückfall
+    if (append && searchCursor) {
+        params.append("cursor", searchCursor);
+    } else {
+        params.append("offset", append ? searchOffset : 0);
+    }
     if (ext) params.append("extension", ext.toLowerCase());
     if (time) params.append("time_filter", time);
     if (sources.length) {
@@ -1446,6 +1500,11 @@ async function search({ append = false } = {}) {
         params.append("sort_dir", sortState.dir);
     }
     params.append("mode", activeMode);
+    // Snippets getrennt nachladen: Trefferliste erscheint ohne Snippet-Berechnung
+    const lazySnippets = trimmed !== "*";
+    if (lazySnippets) params.append("snippets", "false");
+    // Folgeseiten behalten die Nummer: ausstehende Snippets der ersten Seite bleiben gültig
+    const seq = append ? searchSeq : ++searchSeq;
 
     searchLoading = true;
     updateLoadMoreButton();
@@ -1467,7 +1526,14 @@ async function search({ append = false } = {}) {
             return;
         }
         renderResults(rows, { append });
+        if (lazySnippets) loadSnippets(rows, q, activeMode, seq);
         searchOffset = append ? searchOffset + rows.length : rows.length;
+        searchCursor = data.next_cursor || null;
+        if (!append) {
+            loadFacets({ q, mode: activeMode, ext, time, sources, rows, complete: !searchHasMore }, seq);
+            if (data.narrowed && data.narrowed.length) showNarrowedTerms(data.narrowed);
+            if (data.expanded && data.expanded.length) showExpandedTerms(data.expanded);
+        }
         updateLoadMoreButton();
         updateSortIndicators();
     } catch (err) {
@@ -1483,11 +1549,56 @@ async function search({ append = false } = {}) {
     }
 }
 
+function showNarrowedTerms(narrowed) {
+    // Server hat sehr breite Präfixe auf die häufigsten Wörter beschränkt
+    const parts = narrowed.map((item) => `${item.term} → ${item.kept.join(", ")} (von ${item.expansions} Wörtern)`);
+    showToast({ type: "info", title: "Suche eingeschränkt", message: parts.join("; "), timeout: 7000 });
+}
+
+function showExpandedTerms(expanded) {
+    // Modus unscharf: ähnliche Schreibweisen, die der Server mitgesucht hat
+    const parts = expanded.map((item) => `${item.term} → ${item.similar.join(", ")}`);
+    showToast({ type: "info", title: "Auch gesucht", message: parts.join("; "), timeout: 7000 });
+}
+
 function debounceSearch() {
     if (searchTimer) clearTimeout(searchTimer);
     searchTimer = setTimeout(() => search({ append: false }), SEARCH_DEBOUNCE_MS);
 }
 
+function debounceSuggestions() {
+    if (suggestTimer) clearTimeout(suggestTimer);
+    suggestTimer = setTimeout(loadSuggestions, SUGGEST_DEBOUNCE_MS);
+}
+
+async function loadSuggestions() {
+    // Vervollständigung des letzten Worts und passende Titel aus dem Speicher des Servers
+    const list = document.getElementById("search-suggestions");
+    const q = document.getElementById("search-input").value || "";
+    if (!list) return;
+    if (suggestController) suggestController.abort();
+    if (q.trim().length < MIN_QUERY_LENGTH) {
+        list.replaceChildren();
+        return;
+    }
+    suggestController = new AbortController();
+    try {
+        const res = await fetch(`/api/suggest?${new URLSearchParams({ q })}`, { signal: suggestController.signal });
+        if (!res.ok) return;
+        const data = await res.json();
+        const values = new Set([...(data.terms || []).map((item) => item.query), ...(data.titles || [])]);
+        list.replaceChildren(
+            ...Array.from(values, (value) => {
+                const option = document.createElement("option");
+                option.value = value;
+                return option;
+            })
+        );
+    } catch (err) {
+        // abgebrochen oder nicht erreichbar: ohne Vorschläge weiter
+    }
+}
+
 async function sendClientMetric(payload) {
     if (!METRICS_ENABLED) return;
     try {
@@ -1634,6 +1745,70 @@ function renderResults(results, { append = false } = {}) {
     applyZenVisibility();
 }
 
+// Trefferzahlen für die Filter: vollständige erste Seite ohne Quellen-/Typfilter lokal zählen,
+// sonst erst nach einer Eingabepause getrennt nachladen statt mit jeder Suche
+function loadFacets({ q, mode, ext, time, sources, rows, complete }, seq) {
+    if (facetsTimer) clearTimeout(facetsTimer);
+    if (facetsController) facetsController.abort();
+    facetsTimer = null;
+    facetsController = null;
+    if (complete && !ext && !sources.length) {
+        const bySource = new Map();
+        const byExt = new Map();
+        rows.forEach((row) => {
+            const extension = (row.extension || "").toLowerCase();
+            bySource.set(row.source, (bySource.get(row.source) || 0) + 1);
+            byExt.set(extension, (byExt.get(extension) || 0) + 1);
+        });
+        const toList = (counts) => Array.from(counts, ([value, count]) => ({ value, count }));
+        searchFacets = { approximate: false, source: toList(bySource), extension: toList(byExt) };
+        renderFacetCounts();
+        return;
+    }
+    const params = new URLSearchParams({ q, mode, facets: "source,extension" });
+    if (ext) params.append("extension", ext.toLowerCase());
+    if (time) params.append("time_filter", time);
+    sources.forEach((label) => params.append("source_labels", label));
+    facetsTimer = setTimeout(async () => {
+        facetsTimer = null;
+        facetsController = new AbortController();
+        try {
+            const res = await fetch(`/api/search/facets?${params.toString()}`, { signal: facetsController.signal });
+            if (!res.ok || seq !== searchSeq) return;
+            const data = await res.json();
+            if (seq !== searchSeq) return;
+            searchFacets = data.facets || null;
+            renderFacetCounts();
+        } catch (_) {
+            /* Trefferzahlen sind optional */
+        }
+    }, FACETS_DELAY_MS);
+}
+
+async function loadSnippets(rows, q, mode, seq) {
+    const ids = rows.map((row) => row.id).filter(Boolean);
+    if (!ids.length) return;
+    const params = new URLSearchParams({ q, mode });
+    ids.forEach((id) => params.append("ids", id));
+    try {
+        const res = await fetch(`/api/search/snippets?${params.toString()}`);
+        if (!res.ok || seq !== searchSeq) return;
+        const data = await res.json();
+        if (seq !== searchSeq) return;
+        const snippets = data.snippets || {};
+        document.querySelectorAll("#results-table tbody tr[data-id]").forEach((tr) => {
+            const snippet = snippets[tr.dataset.id];
+            const cell = tr.querySelector("td.snippet");
+            if (!snippet || !cell) return;
+            cell.title = stripTags(snippet);
+            const content = cell.querySelector(".snippet-content");
+            if (content) content.innerHTML = sanitizeSnippet(snippet) || "";
+        });
+    } catch (_) {
+        /* Snippets sind optional */
+    }
+}
+
 function renderMessageRow(text) {
     const tbody = document.querySelector("#results-table tbody");
     if (tbody) {
@@ -2072,6 +2247,7 @@ setupMoveDialog();
 setupUploadUi();
 refreshAdminStatus();
 document.getElementById("search-input").addEventListener("input", debounceSearch);
+document.getElementById("search-input").addEventListener("input", debounceSuggestions);
 setupSearchFavorites();
 setupAboutOverlay();
 const zenToggle = document.getElementById("zen-toggle");
@@ -1,17 +1,50 @@
+import argparse
+import dataclasses
+import fcntl
+import os
+import signal
 import threading
 import logging
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Callable, Iterable
+from typing import Any, Optional, Callable, Dict, Iterable, List
 
+from app import config_db, db_maintenance, reconciler, search_fuzzy
+from app.auto_index_scheduler import AutoIndexScheduler, load_config_from_db
 from app.config_loader import CentralConfig, load_config
-from app.indexer.index_lauf_service import run_index_lauf, RUN_STATUS_FILE, HEARTBEAT_FILE, LIVE_STATUS_FILE
+from app.indexer import index_lauf_service
+from app.indexer.index_lauf_service import (
+    run_index_lauf,
+    RUN_STATUS_FILE,
+    HEARTBEAT_FILE,
+    LIVE_STATUS_FILE,
+    LIVE_RUNS_FILE,
+)
 from app.db import datenbank as db
+from app.db import migrations, pool, snapshot
 from app.services import readiness
 
 logger = logging.getLogger(__name__)
 
+# exklusiver Lock für Reset/Voll-Neuaufbau; normale Läufe sperren nur ihre Quelle
 index_lock = threading.Lock()
+_source_locks: Dict[str, threading.Lock] = {}
+_source_locks_guard = threading.Lock()
+# Prüfen und Belegen beim Start: exklusiver Lauf und Quellen-Läufe schließen sich gegenseitig aus
+_start_guard = threading.Lock()
+_run_slots: Optional[threading.BoundedSemaphore] = None
+_run_slots_size = 0
+# Quelle eines laufenden Bulk-Loads (leere DB); wird unter _start_guard vergeben, weitere Starts sind busy
+_bulk_source: Optional[str] = None
+
+INDEXER_MODES = {"inprocess", "external"}
+REBUILD_MODES = {"shadow", "clear"}
+WORKER_STALE_SECONDS = 30
+# True im Prozess von `python -m app.index_runner --serve`
+_worker_active = False
+_maintenance_scheduler: Optional[db_maintenance.MaintenanceScheduler] = None
+_reconcile_scheduler: Optional[reconciler.ReconcileScheduler] = None
 
 
 def check_sources_readiness_for_index(roots: Iterable[tuple[Path, str, str]]):
@@ -29,15 +62,105 @@ def check_sources_readiness_for_index(roots: Iterable[tuple[Path, str, str]]):
     return readiness.check_sources_ready(file_roots + maildir_roots, counts, samples)
 
 
+def resolve_active_roots(config: CentralConfig) -> list[tuple[Path, str, str]]:
+    """
+    Liefert aktive Roots aus der Config-DB, andernfalls die env/INI-Roots.
+    Validiert Basis-Pfad und Existenz, fällt aber nicht stillschweigend auf /data zurück.
+    """
+    env_val = os.getenv("DATA_CONTAINER_PATH")
+    if env_val == "/":
+        raise ValueError("Ungültiger Basis-Pfad für Daten (DATA_CONTAINER_PATH)")
+    base_raw = config_db.get_setting("base_data_root", None) or env_val or "/data"
+    base_root = Path(base_raw).resolve()
+    if str(base_root) in {"", "/"}:
+        raise ValueError("Ungültiger Basis-Pfad für Daten (DATA_CONTAINER_PATH)")
+    if not base_root.exists() or not base_root.is_dir():
+        raise ValueError(f"Basis-Ordner nicht gefunden: {base_root}")
+
+    db_roots = config_db.list_roots(active_only=False)
+    if db_roots:
+        active = [(path, label, rid, active, type_) for path, label, rid, active, type_ in db_roots if active]
+        if not active:
+            raise ValueError("Keine aktiven Quellen konfiguriert")
+        resolved: list[tuple[Path, str, str]] = []
+        for path, label, _rid, _active, type_ in active:
+            p = Path(path).resolve()
+            try:
+                p.relative_to(base_root)
+            except ValueError:
+                continue
+            if not p.exists() or not p.is_dir():
+                logger.warning("Aktiver Root nicht gefunden: %s", p)
+                continue
+            resolved.append((p, label or p.name, type_ or "file"))
+        if resolved:
+            return resolved
+        raise ValueError("Keine aktiven Quellen verfügbar")
+
+    # Fallback: env/INI-Roots
+    if config.paths.roots:
+        fallback: list[tuple[Path, str, str]] = []
+        for entry in config.paths.roots:
+            try:
+                p, lbl, type_val = entry
+            except Exception:
+                p, lbl = entry
+                type_val = "file"
+            fallback.append((Path(p), lbl, type_val or "file"))
+        return fallback
+
+    raise ValueError("Keine aktiven Quellen konfiguriert")
+
+
+def scheduler_readiness():
+    try:
+        cfg_local = load_config()
+        roots_local = resolve_active_roots(cfg_local)
+    except Exception as exc:
+        base_path = config_db.get_setting("base_data_root", "/data") or "/data"
+        issue = readiness.ReadinessIssue(source="*", path=str(base_path), reason=str(exc))
+        return readiness.ReadinessResult(ok=False, issues=[issue])
+    return check_sources_readiness_for_index(roots_local)
+
+
+def indexer_mode() -> str:
+    """
+    inprocess: Indexlauf als Thread im Web-Prozess; external: Web-Prozess reiht nur Befehle ein.
+    """
+    mode = (os.getenv("INDEXER_MODE") or "inprocess").strip().lower()
+    if mode not in INDEXER_MODES:
+        logger.warning("Unbekannter INDEXER_MODE %s, verwende inprocess", mode)
+        return "inprocess"
+    return mode
+
+
+def rebuild_mode(value: Optional[str] = None) -> str:
+    """
+    shadow: Neuaufbau in Schatten-DB mit Umschalten am Ende; clear: Index vorher löschen.
+    """
+    mode = (value or os.getenv("INDEX_REBUILD_MODE") or "shadow").strip().lower()
+    return mode if mode in REBUILD_MODES else "shadow"
+
+
+def is_external() -> bool:
+    return indexer_mode() == "external" and not _worker_active
+
+
 def clear_index_files() -> None:
     base = Path(getattr(db, "DB_PATH", Path("data/index.db")))
+    shadow = db.shadow_db_path(base)
     candidates = [
         base,
         base.with_suffix(base.suffix + "-wal"),
         base.with_suffix(base.suffix + "-shm"),
+        shadow,
+        shadow.with_suffix(shadow.suffix + "-wal"),
+        shadow.with_suffix(shadow.suffix + "-shm"),
+        search_fuzzy.index_path(base),
         RUN_STATUS_FILE,
         HEARTBEAT_FILE,
         LIVE_STATUS_FILE,
+        LIVE_RUNS_FILE,
     ]
     for p in candidates:
         try:
@@ -46,22 +169,215 @@ def clear_index_files() -> None:
         except Exception as exc:
             logger.error("Index-Datei konnte nicht gelöscht werden: %s", exc)
             raise
+    migrations.reset_cache(base)
+    pool.close_all(base)
+    pool.close_all(shadow)
+    index_lauf_service.reset_live_status()
 
 
-def start_index_run(
-    full_reset: bool = False,
-    cfg_override: Optional[CentralConfig] = None,
-    roots_override: Optional[Iterable[tuple[Path, str, str]]] = None,
-    reason: str = "manual",
-    on_finish: Optional[Callable[[str, datetime, datetime, Optional[str]], None]] = None,
-    resolve_roots: Optional[Callable[[CentralConfig], Iterable[tuple[Path, str, str]]]] = None,
-) -> str:
+def _source_lock(label: str) -> threading.Lock:
+    with _source_locks_guard:
+        lock = _source_locks.get(label)
+        if lock is None:
+            lock = threading.Lock()
+            _source_locks[label] = lock
+        return lock
+
+
+def running_sources() -> List[str]:
+    if is_external():
+        return list(worker_status().get("running_sources") or [])
+    with _source_locks_guard:
+        return sorted(label for label, lock in _source_locks.items() if lock.locked())
+
+
+def lease_path(base: Optional[Path] = None) -> Path:
+    base = Path(base or db.DB_PATH)
+    return base.with_name(f"{base.stem}.lock")
+
+
+def acquire_lease(exclusive: bool = False) -> Optional[int]:
     """
-    Startet einen Indexlauf in einem eigenen Thread und verhindert parallele Läufe.
-    on_finish(status, started_at, finished_at, error_msg)
+    Prozessübergreifende Sperre neben der DB (flock): Läufe, Reset und Abgleich halten sie geteilt,
+    ein verteilter Lauf (eigener Prozess) exklusiv. None, wenn die andere Art gehalten wird; das
+    Betriebssystem gibt sie spätestens mit dem Prozess frei.
     """
-    if not index_lock.acquire(blocking=False):
-        return "busy"
+    path = lease_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def release_lease(fd: Optional[int]) -> None:
+    if fd is not None:
+        os.close(fd)
+
+
+@dataclasses.dataclass
+class SourceClaim:
+    locks: List[threading.Lock]
+    lease: Optional[int] = None
+
+
+def claim_sources(labels: Iterable[str], lease: bool = True) -> Optional[SourceClaim]:
+    """
+    Belegt alle Quellen gemeinsam für Arbeiten außerhalb von start_index_run (Abgleich, verteilter Lauf),
+    dazu die geteilte Sperre (lease=False, wenn der Aufrufer die exklusive hält). None, wenn ein
+    exklusiver Lauf aktiv oder eine der Quellen bereits belegt ist.
+    """
+    claim = SourceClaim([])
+    with _start_guard:
+        if index_lock.locked():
+            return None
+        if lease:
+            claim.lease = acquire_lease()
+            if claim.lease is None:
+                return None
+        for label in labels:
+            lock = _source_lock(label)
+            if not lock.acquire(blocking=False):
+                release_sources(claim, maintain=False)
+                return None
+            claim.locks.append(lock)
+    return claim
+
+
+def release_sources(claim: SourceClaim, maintain: bool = True) -> None:
+    """
+    Gibt mit claim_sources belegte Quellen frei; maintain stößt die Nachbereitung wie nach jedem Lauf an.
+    """
+    for lock in claim.locks:
+        lock.release()
+    claim.locks = []
+    if maintain:
+        _maintain_after_runs()
+    release_lease(claim.lease)
+    claim.lease = None
+
+
+def _index_is_empty() -> bool:
+    try:
+        db.init_db()
+        with db.get_conn() as conn:
+            return db.is_index_empty(conn)
+    except Exception as exc:
+        logger.error("Index-DB nicht lesbar, kein Bulk-Load: %s", exc)
+        return False
+
+
+def _get_run_slots(size: int) -> threading.BoundedSemaphore:
+    global _run_slots, _run_slots_size
+    with _source_locks_guard:
+        busy = any(lock.locked() for lock in _source_locks.values())
+        if _run_slots is None or (_run_slots_size != size and not busy):
+            _run_slots = threading.BoundedSemaphore(size)
+            _run_slots_size = size
+        return _run_slots
+
+
+def _normalize_root(entry) -> tuple[Path, str, str]:
+    try:
+        root, label, type_val = entry
+    except Exception:
+        root, label = entry
+        type_val = "file"
+    return Path(root), str(label), type_val or "file"
+
+
+def _notify_finish(
+    on_finish: Optional[Callable[[str, datetime, datetime, Optional[str]], None]],
+    status: str,
+    started_at: datetime,
+    err: Optional[str],
+) -> None:
+    if not on_finish:
+        return
+    try:
+        on_finish(status, started_at, datetime.now(timezone.utc), err)
+    except Exception:
+        logger.exception("Auto-Index Status-Callback fehlgeschlagen")
+
+
+def active_runs() -> int:
+    return index_lauf_service.active_run_count() + len(running_sources()) + (1 if index_lock.locked() else 0)
+
+
+def _maintain_after_runs() -> None:
+    try:
+        db_maintenance.run_after_index(active_runs)
+    except Exception:
+        logger.exception("DB-Wartung nach Indexlauf fehlgeschlagen")
+    if active_runs() == 0:
+        # Wörterbuch der Tippfehlersuche zum neuen Stand; der Web-Prozess mappt die Datei
+        search_fuzzy.rebuild()
+        snapshot.publish_if_enabled()
+
+
+def run_reconcile(reason: str = "manual") -> Dict[str, Any]:
+    """
+    Stichproben-Abgleich über die aktiven Quellen; nicht erreichbare Quellen bleiben unangetastet.
+    """
+    if active_runs() > 0:
+        return {"status": "busy", "detail": "Indexlauf aktiv"}
+    cfg = load_config()
+    roots = resolve_active_roots(cfg)
+    result = check_sources_readiness_for_index(roots)
+    blocked = {issue.source for issue in result.issues}
+    if "*" in blocked:
+        return {"status": "not_ready", "detail": result.message}
+    ready = [root for root in roots if root[1] not in blocked]
+    if blocked:
+        logger.warning("Abgleich ohne nicht bereite Quellen: %s", ", ".join(sorted(blocked)))
+    # Reparaturen nur unter den Quellen-Locks: kein Lauf und kein Schattenaufbau (Tausch verwirft sie) dazwischen
+    claim = claim_sources(root[1] for root in ready)
+    if claim is None:
+        return {"status": "busy", "detail": "Indexlauf aktiv"}
+    try:
+        return reconciler.run_reconcile(cfg, ready, reason=reason)
+    finally:
+        release_sources(claim, maintain=False)
+
+
+def reset_index() -> str:
+    """
+    Leert den Index exklusiv wie ein Vollaufbau: "busy", solange ein Lauf (auch ein verteilter in
+    einem anderen Prozess) aktiv ist; kein Lauf kann zwischen Prüfung und Löschen starten.
+    """
+    with _start_guard:
+        if not index_lock.acquire(blocking=False):
+            return "busy"
+        lease = None if running_sources() else acquire_lease()
+        if lease is None:
+            index_lock.release()
+            return "busy"
+    try:
+        clear_index_files()
+    finally:
+        index_lock.release()
+        release_lease(lease)
+    return "cleared"
+
+
+def _start_exclusive_run(
+    cfg_override: Optional[CentralConfig],
+    roots_override: Optional[Iterable[tuple[Path, str, str]]],
+    reason: str,
+    on_finish: Optional[Callable[[str, datetime, datetime, Optional[str]], None]],
+    resolve_roots: Optional[Callable[[CentralConfig], Iterable[tuple[Path, str, str]]]],
+    shadow: bool = True,
+) -> str:
+    with _start_guard:
+        if not index_lock.acquire(blocking=False):
+            return "busy"
+        lease = None if running_sources() else acquire_lease()
+        if lease is None:
+            index_lock.release()
+            return "busy"
 
     start_ts = datetime.now(timezone.utc)
 
@@ -80,27 +396,332 @@ def start_index_run(
                 status = "error"
                 err = str(exc)
                 return
-            if full_reset:
-                try:
-                    clear_index_files()
-                except Exception as exc:
-                    logger.error("Reset fehlgeschlagen: %s", exc)
-                    status = "error"
-                    err = str(exc)
-                    return
+            if shadow:
+                index_lauf_service.run_shadow_rebuild(cfg)
+                return
+            try:
+                clear_index_files()
+            except Exception as exc:
+                logger.error("Reset fehlgeschlagen: %s", exc)
+                status = "error"
+                err = str(exc)
+                return
             run_index_lauf(cfg)
         except Exception as exc:
             status = "error"
             err = str(exc)
             logger.error("Indexlauf fehlgeschlagen (%s): %s", reason, exc)
         finally:
-            finish_ts = datetime.now(timezone.utc)
             index_lock.release()
-            if on_finish:
-                try:
-                    on_finish(status, start_ts, finish_ts, err)
-                except Exception:
-                    logger.exception("Auto-Index Status-Callback fehlgeschlagen")
+            _notify_finish(on_finish, status, start_ts, err)
+            _maintain_after_runs()
+            release_lease(lease)
 
     threading.Thread(target=runner, daemon=True).start()
     return "started"
+
+
+def start_index_run(
+    full_reset: bool = False,
+    cfg_override: Optional[CentralConfig] = None,
+    roots_override: Optional[Iterable[tuple[Path, str, str]]] = None,
+    reason: str = "manual",
+    on_finish: Optional[Callable[[str, datetime, datetime, Optional[str]], None]] = None,
+    resolve_roots: Optional[Callable[[CentralConfig], Iterable[tuple[Path, str, str]]]] = None,
+    shadow: Optional[bool] = None,
+) -> str:
+    """
+    Startet je Quelle einen eigenen Indexlauf (eigener Thread, eigene index_runs-Zeile).
+    Quellen, die bereits indexiert werden, werden übersprungen; "busy" nur, wenn keine Quelle frei ist.
+    Gleichzeitig laufen höchstens indexer.parallel_runs Läufe, Extraktionen teilen sich indexer.worker_budget.
+    on_finish(status, started_at, finished_at, error_msg) wird einmal nach Ende aller Läufe aufgerufen.
+    Im Modus external wird der Lauf nur beim Indexer-Worker eingereiht ("queued").
+    full_reset baut exklusiv neu auf, per Default als Schattenaufbau (siehe rebuild_mode).
+    Auf leerer DB lädt die erste Quelle allein per Bulk-Load; bis dahin sind weitere Starts "busy".
+    """
+    global _bulk_source
+    if shadow is None:
+        shadow = rebuild_mode() == "shadow"
+    if is_external():
+        if on_finish:
+            logger.warning("on_finish wird im Modus external nicht unterstützt (%s)", reason)
+        return enqueue_run(full_reset=full_reset, roots=roots_override, reason=reason, shadow=shadow)
+    if full_reset:
+        return _start_exclusive_run(cfg_override, roots_override, reason, on_finish, resolve_roots, shadow=shadow)
+    if index_lock.locked():
+        return "busy"
+
+    start_ts = datetime.now(timezone.utc)
+    try:
+        cfg = cfg_override or load_config()
+        roots = [_normalize_root(entry) for entry in (roots_override or (resolve_roots(cfg) if resolve_roots else []))]
+        if not roots:
+            raise ValueError("Keine aktiven Quellen konfiguriert")
+    except Exception as exc:
+        logger.error("Indexlauf abgebrochen (%s): %s", reason, exc)
+        err_msg = str(exc)
+        threading.Thread(target=_notify_finish, args=(on_finish, "error", start_ts, err_msg), daemon=True).start()
+        return "started"
+
+    slots = _get_run_slots(cfg.indexer.parallel_runs)
+    index_lauf_service.configure_worker_budget(cfg.indexer.worker_budget or cfg.indexer.worker_count)
+    claimed: List[tuple[tuple[Path, str, str], threading.Lock]] = []
+    bulk_label: Optional[str] = None
+    with _start_guard:
+        # geteilte Sperre: kein verteilter Lauf in einem anderen Prozess
+        lease = None if index_lock.locked() or _bulk_source is not None else acquire_lease()
+        if lease is None:
+            return "busy"
+        idle = not running_sources() and index_lauf_service.active_run_count() == 0
+        for entry in roots:
+            lock = _source_lock(entry[1])
+            if lock.acquire(blocking=False):
+                claimed.append((entry, lock))
+            else:
+                logger.info("Quelle %s wird bereits indexiert, übersprungen (%s)", entry[1], reason)
+        # Bulk-Load nur allein auf leerer DB: die erste Quelle lädt, die übrigen folgen danach
+        if claimed and idle and cfg.indexer.bulk_load and _index_is_empty():
+            bulk_label = _bulk_source = claimed[0][0][1]
+    if not claimed:
+        release_lease(lease)
+        return "busy"
+
+    results: Dict[str, Optional[str]] = {}
+
+    def run_source(entry: tuple[Path, str, str], lock: threading.Lock) -> None:
+        label = entry[1]
+        try:
+            if not slots.acquire(blocking=False):
+                logger.info("Indexlauf für %s wartet auf freien Slot", label)
+                slots.acquire()
+            try:
+                cfg_local = dataclasses.replace(
+                    cfg,
+                    paths=cfg.paths.model_copy(update={"roots": [entry]}),
+                    indexer=cfg.indexer.model_copy(update={"bulk_load": label == bulk_label}),
+                )
+                run_index_lauf(cfg_local)
+                results[label] = None
+            finally:
+                slots.release()
+        except Exception as exc:
+            results[label] = str(exc)
+            logger.error("Indexlauf fehlgeschlagen (%s, %s): %s", reason, label, exc)
+        finally:
+            if label == bulk_label:
+                _end_bulk()
+            lock.release()
+
+    def coordinator():
+        threads = [threading.Thread(target=run_source, args=item, daemon=True) for item in claimed]
+        pending = threads
+        if bulk_label is not None:
+            threads[0].start()
+            threads[0].join()
+            pending = threads[1:]
+        for t in pending:
+            t.start()
+        for t in threads:
+            t.join()
+        errors = [f"{label}: {msg}" for label, msg in results.items() if msg]
+        _notify_finish(on_finish, "error" if errors else "completed", start_ts, "; ".join(errors) or None)
+        _maintain_after_runs()
+        release_lease(lease)
+
+    threading.Thread(target=coordinator, daemon=True).start()
+    return "started"
+
+
+def _end_bulk() -> None:
+    global _bulk_source
+    with _start_guard:
+        _bulk_source = None
+
+
+def _serialize_roots(roots: Optional[Iterable]) -> Optional[List[List[str]]]:
+    if roots is None:
+        return None
+    return [[str(p), label, type_] for p, label, type_ in (_normalize_root(entry) for entry in roots)]
+
+
+def enqueue_run(
+    full_reset: bool = False,
+    roots: Optional[Iterable] = None,
+    reason: str = "manual",
+    shadow: bool = True,
+) -> str:
+    payload = {"full_reset": bool(full_reset), "roots": _serialize_roots(roots), "reason": reason, "shadow": bool(shadow)}
+    # gleichartige, noch nicht abgeholte Läufe zusammenfassen
+    if config_db.find_queued_index_command("run") is not None and not full_reset and roots is None:
+        return "queued"
+    cmd_id = config_db.enqueue_index_command("run", payload)
+    if not worker_status().get("alive"):
+        logger.warning("Indexlauf #%s eingereiht, aber kein Indexer-Worker aktiv", cmd_id)
+    return "queued"
+
+
+def enqueue_command(command: str, payload: Optional[Dict[str, Any]] = None) -> int:
+    return config_db.enqueue_index_command(command, payload)
+
+
+def worker_status() -> Dict[str, Any]:
+    try:
+        raw_hb = config_db.get_setting("indexer_worker_heartbeat", "") or ""
+        heartbeat = int(raw_hb) if raw_hb else None
+        pid = config_db.get_setting("indexer_worker_pid", "") or None
+        sources_raw = config_db.get_setting("indexer_worker_sources", "") or ""
+        queued = config_db.count_queued_index_commands()
+    except Exception as exc:
+        logger.error("Worker-Status nicht lesbar: %s", exc)
+        heartbeat, pid, sources_raw, queued = None, None, "", 0
+    age = max(0, int(time.time()) - heartbeat) if heartbeat else None
+    return {
+        "mode": indexer_mode(),
+        "alive": age is not None and age <= WORKER_STALE_SECONDS,
+        "pid": pid,
+        "heartbeat": heartbeat,
+        "heartbeat_age": age,
+        "running_sources": [s for s in sources_raw.split("\n") if s],
+        "queued_commands": queued,
+    }
+
+
+def _write_worker_heartbeat(pid: Optional[int]) -> None:
+    config_db.set_setting("indexer_worker_heartbeat", str(int(time.time())) if pid else "")
+    config_db.set_setting("indexer_worker_pid", str(pid) if pid else "")
+    config_db.set_setting("indexer_worker_sources", "\n".join(running_sources()) if pid else "")
+
+
+def _handle_command(command: str, payload: Dict[str, Any], scheduler: Optional[AutoIndexScheduler]) -> str:
+    if command == "run":
+        roots = payload.get("roots")
+        roots_override = [tuple(entry) for entry in roots] if roots else None
+        return start_index_run(
+            bool(payload.get("full_reset")),
+            roots_override=roots_override,
+            reason=payload.get("reason") or "manual",
+            resolve_roots=resolve_active_roots,
+            shadow=bool(payload.get("shadow", True)),
+        )
+    if command == "auto_run":
+        if scheduler:
+            return scheduler.trigger_now()
+        return start_index_run(reason="manual", resolve_roots=resolve_active_roots)
+    if command == "stop":
+        stopped = index_lauf_service.request_stop(payload.get("source"))
+        return "stopping" if stopped else "idle"
+    if command == "reset":
+        return reset_index()
+    if command == "schedule":
+        if scheduler:
+            scheduler.update_config(load_config_from_db())
+        if _maintenance_scheduler:
+            _maintenance_scheduler.update_config(db_maintenance.load_config_from_db())
+        if _reconcile_scheduler:
+            _reconcile_scheduler.update_config(reconciler.load_config_from_db())
+        return "ok"
+    if command == "maintenance":
+        if active_runs():
+            return "busy"
+        cfg = db_maintenance.load_config_from_db()
+        threading.Thread(
+            target=db_maintenance.run_maintenance,
+            kwargs={
+                "tasks": payload.get("tasks"),
+                "budget_seconds": float(payload.get("budget_seconds") or cfg.budget_seconds),
+                "allow_full_vacuum": cfg.allow_full_vacuum,
+            },
+            daemon=True,
+        ).start()
+        return "started"
+    if command == "reconcile":
+        if active_runs():
+            return "busy"
+        threading.Thread(target=run_reconcile, daemon=True).start()
+        return "started"
+    raise ValueError(f"Unbekannter Befehl: {command}")
+
+
+def serve(poll_interval: float = 1.0, stop: Optional[threading.Event] = None) -> None:
+    """
+    Indexer-Worker: arbeitet die Befehle aus index_commands ab und führt Auto-Index-, Wartungs- und Abgleich-Scheduler.
+    """
+    global _worker_active, _maintenance_scheduler, _reconcile_scheduler
+    stop = stop or threading.Event()
+    _worker_active = True
+    pid = os.getpid()
+    config_db.ensure_db()
+    db.init_db()
+    stale = config_db.fail_stale_index_commands("Worker neu gestartet")
+    if stale:
+        logger.warning("%s unterbrochene Befehle als Fehler markiert", stale)
+    scheduler: Optional[AutoIndexScheduler] = None
+    if os.getenv("AUTO_INDEX_DISABLE", "").lower() != "1":
+        scheduler = AutoIndexScheduler(
+            lambda **kwargs: start_index_run(resolve_roots=resolve_active_roots, **kwargs),
+            readiness_checker=scheduler_readiness,
+        )
+        scheduler.start()
+    _maintenance_scheduler = db_maintenance.MaintenanceScheduler(active_runs)
+    _maintenance_scheduler.start()
+    _reconcile_scheduler = reconciler.ReconcileScheduler(lambda: run_reconcile("scheduled"), active_runs)
+    _reconcile_scheduler.start()
+    publisher: Optional[snapshot.SnapshotPublisher] = None
+    if snapshot.snapshot_dir() is not None:
+        publisher = snapshot.SnapshotPublisher(active_runs)
+        publisher.start()
+    logger.info("Indexer-Worker gestartet (pid %s)", pid)
+    try:
+        while not stop.is_set():
+            _write_worker_heartbeat(pid)
+            claimed = config_db.claim_index_command()
+            if claimed is None:
+                stop.wait(poll_interval)
+                continue
+            cmd_id, command, payload = claimed
+            try:
+                result = _handle_command(command, payload, scheduler)
+                config_db.finish_index_command(cmd_id, "done", result)
+                logger.info("Befehl #%s (%s) ausgeführt: %s", cmd_id, command, result)
+            except Exception as exc:
+                config_db.finish_index_command(cmd_id, "error", str(exc))
+                logger.error("Befehl #%s (%s) fehlgeschlagen: %s", cmd_id, command, exc)
+    finally:
+        if scheduler:
+            scheduler.stop()
+        _maintenance_scheduler.stop()
+        _maintenance_scheduler = None
+        if publisher:
+            publisher.stop()
+        _reconcile_scheduler.stop()
+        _reconcile_scheduler = None
+        index_lauf_service.request_stop()
+        deadline = time.time() + 30
+        while running_sources() and time.time() < deadline:
+            time.sleep(0.5)
+        try:
+            _write_worker_heartbeat(None)
+        except Exception:
+            pass
+        _worker_active = False
+        logger.info("Indexer-Worker beendet")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Indexer-Worker für INDEXER_MODE=external")
+    parser.add_argument("--serve", action="store_true", help="Befehle aus der Config-DB abarbeiten")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Sekunden zwischen Abfragen")
+    args = parser.parse_args(argv)
+    if not args.serve:
+        parser.print_help()
+        return 2
+    logging.basicConfig(level=logging.INFO)
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: stop.set())
+    serve(poll_interval=args.poll_interval, stop=stop)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -8,8 +8,9 @@ from collections import deque
 from dataclasses import dataclass, asdict
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
 import queue
+import sqlite3
 import threading
 from logging.handlers import RotatingFileHandler
 
@@ -23,15 +24,24 @@ from app import reporting
 
 logger = logging.getLogger("indexer")
 
-stop_event = threading.Event()
-
 
 SUPPORTED_EXTENSIONS = {".pdf", ".rtf", ".msg", ".txt", ".eml"}
 RUN_STATUS_FILE = Path("data/index.run")
 HEARTBEAT_FILE = Path("data/index.heartbeat")
 LIVE_STATUS_FILE = Path("data/index.live.json")
+LIVE_RUNS_FILE = Path("data/index.live_runs.json")
 LIVE_STATUS_LOCK = threading.Lock()
+LIVE_RUNS_MAX = 16
+# Bulk-Load: Commit alle N Einträge bzw. spätestens nach BULK_COMMIT_SECONDS
+BULK_COMMIT_ITEMS = 2000
+BULK_COMMIT_SECONDS = 2.0
 live_status: Optional["LiveStatus"] = None
+live_runs: Dict[int, "LiveStatus"] = {}
+# laufende Läufe mit eigenem Stop-Signal und ihren Quellen; request_stop() stoppt eine Quelle oder alle
+_active_runs: Dict[object, Tuple[Tuple[str, ...], threading.Event]] = {}
+_active_runs_lock = threading.Lock()
+_extract_budget: Optional[threading.BoundedSemaphore] = None
+_extract_budget_size = 0
 WARN_CONTEXT = threading.local()
 LOG_BUFFER_MAX = 2000
 LOG_BUFFER: Deque[Tuple[int, str]] = deque()
@@ -107,6 +117,7 @@ class LiveStatus:
     message: Optional[str] = None
     finished_at: Optional[str] = None
     heartbeat: int = 0
+    source: Optional[str] = None
 
     def to_dict(self) -> Dict[str, Any]:
         data = asdict(self)
@@ -197,15 +208,32 @@ def setup_logging(config: CentralConfig) -> None:
     warnings.showwarning = showwarning
 
 
+def _write_json_atomic(path: Path, payload: Any) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(payload), encoding="utf-8")
+    os.replace(tmp, path)
+
+
 def _persist_live_status(snapshot: LiveStatus) -> None:
     try:
         LIVE_STATUS_FILE.parent.mkdir(parents=True, exist_ok=True)
-        LIVE_STATUS_FILE.write_text(json.dumps(snapshot.to_dict()), encoding="utf-8")
+        with LIVE_STATUS_LOCK:
+            current = snapshot.to_dict()
+            runs = [item.to_dict() for item in live_runs.values()]
+        _write_json_atomic(LIVE_STATUS_FILE, current)
+        _write_json_atomic(LIVE_RUNS_FILE, runs)
     except Exception:
         pass
 
 
-def init_live_status(run_id: int, start_time: str, total_files: int) -> None:
+def reset_live_status() -> None:
+    global live_status
+    with LIVE_STATUS_LOCK:
+        live_status = None
+        live_runs.clear()
+
+
+def init_live_status(run_id: int, start_time: str, total_files: int, source: Optional[str] = None) -> None:
     global live_status
     now_ts = time.time()
     with LIVE_STATUS_LOCK:
@@ -222,7 +250,14 @@ def init_live_status(run_id: int, start_time: str, total_files: int) -> None:
             errors=0,
             skipped=0,
             heartbeat=int(now_ts),
+            source=source,
         )
+        # pro Quelle nur den jüngsten Lauf behalten
+        for rid in [rid for rid, item in live_runs.items() if item.source == source]:
+            live_runs.pop(rid, None)
+        live_runs[run_id] = live_status
+        while len(live_runs) > LIVE_RUNS_MAX:
+            live_runs.pop(min(live_runs))
         snapshot = live_status
     _persist_live_status(snapshot)
 
@@ -234,41 +269,45 @@ def update_live_status(
     message: Optional[str] = None,
     finished: bool = False,
     total_files: Optional[int] = None,
+    run_id: Optional[int] = None,
 ) -> None:
-    global live_status
     now_ts = time.time()
     snapshot = None
     with LIVE_STATUS_LOCK:
-        if live_status is None:
+        target = live_runs.get(run_id) if run_id is not None else live_status
+        if target is None:
             return
-        live_status.scanned = counters.get("scanned", live_status.scanned)
-        live_status.added = counters.get("added", live_status.added)
-        live_status.updated = counters.get("updated", live_status.updated)
-        live_status.removed = counters.get("removed", live_status.removed)
-        live_status.errors = counters.get("errors", live_status.errors)
-        live_status.skipped = counters.get("skipped", live_status.skipped)
+        target.scanned = counters.get("scanned", target.scanned)
+        target.added = counters.get("added", target.added)
+        target.updated = counters.get("updated", target.updated)
+        target.removed = counters.get("removed", target.removed)
+        target.errors = counters.get("errors", target.errors)
+        target.skipped = counters.get("skipped", target.skipped)
         if total_files is not None:
-            live_status.total_files = total_files
+            target.total_files = total_files
         if current_path is not None:
-            live_status.current_path = current_path
+            target.current_path = current_path
         if status:
-            live_status.status = status
+            target.status = status
         if message is not None:
-            live_status.message = message
-        if finished and not live_status.finished_at:
-            live_status.finished_at = datetime.now(timezone.utc).isoformat()
-        live_status.heartbeat = int(now_ts)
-        snapshot = live_status
+            target.message = message
+        if finished and not target.finished_at:
+            target.finished_at = datetime.now(timezone.utc).isoformat()
+        target.heartbeat = int(now_ts)
+        snapshot = target
     if snapshot:
         _persist_live_status(snapshot)
         touch_heartbeat()
 
 
-def get_live_status() -> Optional[Dict[str, Any]]:
-    with LIVE_STATUS_LOCK:
-        if live_status:
-            return live_status.to_dict()
-    if LIVE_STATUS_FILE.exists():
+def get_live_status(source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    runs = get_live_statuses()
+    if source is not None:
+        runs = [item for item in runs if item.get("source") == source]
+    if runs:
+        running = [item for item in runs if item.get("status") in {"running", "stopping"}]
+        return (running or runs)[0]
+    if source is None and LIVE_STATUS_FILE.exists():
         try:
             data = json.loads(LIVE_STATUS_FILE.read_text(encoding="utf-8"))
             if isinstance(data, dict):
@@ -278,9 +317,270 @@ def get_live_status() -> Optional[Dict[str, Any]]:
     return None
 
 
-def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
-    stop_event.clear()
-    db.init_db()
+def get_live_statuses() -> List[Dict[str, Any]]:
+    """
+    Live-Status aller Läufe (neuester zuerst), je Quelle der jüngste Lauf.
+    """
+    with LIVE_STATUS_LOCK:
+        runs = [item.to_dict() for item in live_runs.values()]
+    if not runs and LIVE_RUNS_FILE.exists():
+        try:
+            data = json.loads(LIVE_RUNS_FILE.read_text(encoding="utf-8"))
+            if isinstance(data, list):
+                runs = [item for item in data if isinstance(item, dict)]
+        except Exception:
+            runs = []
+    return sorted(runs, key=lambda item: item.get("run_id") or 0, reverse=True)
+
+
+def active_run_count() -> int:
+    with _active_runs_lock:
+        return len(_active_runs)
+
+
+def _register_run(run_key: object, roots: Iterable[Any] = ()) -> threading.Event:
+    """
+    Meldet einen Lauf an und liefert sein Stop-Signal; ein Stopp gilt nur für diesen Lauf.
+    """
+    sources = tuple(label.strip() for label in (_scope_label(roots) or "").split(",") if label.strip())
+    stop = threading.Event()
+    with _active_runs_lock:
+        _active_runs[run_key] = (sources, stop)
+    return stop
+
+
+def _unregister_run(run_key: object) -> None:
+    with _active_runs_lock:
+        _active_runs.pop(run_key, None)
+
+
+def request_stop(source: Optional[str] = None) -> int:
+    """
+    Stoppt die Läufe einer Quelle (Label oder Bereich wie im Live-Status) bzw. ohne Quelle alle.
+    Liefert die Zahl der betroffenen Läufe.
+    """
+    wanted = {label.strip() for label in (source or "").split(",") if label.strip()}
+    stopped = 0
+    with _active_runs_lock:
+        for sources, stop in _active_runs.values():
+            if wanted and not wanted & set(sources):
+                continue
+            stop.set()
+            stopped += 1
+    return stopped
+
+
+def configure_worker_budget(size: int) -> None:
+    """
+    Globales Budget für gleichzeitige Extraktionen über alle parallelen Läufe.
+    """
+    global _extract_budget, _extract_budget_size
+    size = max(1, int(size or 1))
+    with _active_runs_lock:
+        if _extract_budget is not None and (_extract_budget_size == size or _active_runs):
+            return
+        _extract_budget = threading.BoundedSemaphore(size)
+        _extract_budget_size = size
+
+
+def _acquire_extract_slot(stop: Optional[threading.Event] = None) -> Optional[threading.BoundedSemaphore]:
+    budget = _extract_budget
+    if budget is None:
+        return None
+    while not budget.acquire(timeout=0.5):
+        if stop is not None and stop.is_set():
+            return None
+    return budget
+
+
+def open_writer_conn(db_path: Optional[Path] = None) -> sqlite3.Connection:
+    conn = db.connect(db_path)
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    conn.execute("PRAGMA temp_store=MEMORY;")
+    return conn
+
+
+def _record_item_error(conn, run_id: int, path: str, error_type: str, message: str, counters: Dict[str, int]) -> None:
+    ignored = _should_ignore_error(error_type or "", message or "")
+    try:
+        db.record_file_error(
+            conn,
+            run_id=run_id,
+            path=path or "",
+            error_type=error_type,
+            message=message,
+            created_at=datetime.now(timezone.utc).isoformat(),
+            ignored=ignored,
+        )
+    finally:
+        if not ignored:
+            counters["errors"] += 1
+
+
+def _discard_item(conn, reopen: Callable[[], sqlite3.Connection]):
+    """
+    Verwirft die Schreibvorgänge eines fehlgeschlagenen Eintrags (Savepoint); offene, noch nicht
+    committete Einträge davor bleiben erhalten. Nur eine unbrauchbare Verbindung wird neu geöffnet.
+    """
+    try:
+        conn.execute("ROLLBACK TO work_item")
+        conn.execute("RELEASE work_item")
+        return conn
+    except Exception as exc:
+        logger.error("Schreibverbindung unbrauchbar, wird neu geöffnet: %s", exc)
+    try:
+        conn.close()
+    except Exception:
+        pass
+    return reopen()
+
+
+def apply_work_item(
+    conn,
+    run_id: int,
+    item: Dict[str, Any],
+    counters: Dict[str, int],
+    reopen: Callable[[], sqlite3.Connection] = open_writer_conn,
+    bulk: bool = False,
+):
+    """
+    Schreibt ein Ergebnis (document/unchanged/error) in die Index-DB und zählt mit.
+    Ein fehlschlagendes Dokument wird per Savepoint zurückgenommen, ohne die offene Transaktion
+    (Bulk-Load: bis BULK_COMMIT_ITEMS Einträge) zu verlieren. Liefert die Verbindung zurück.
+    bulk: leere DB, daher reines INSERT und keine scanned_paths (nichts zu entfernen).
+    """
+    kind = item.get("type")
+    path_str = item.get("path")
+    if kind == "error":
+        counters["scanned"] += 1
+        counters["skipped"] += 1
+        if path_str and not bulk:
+            db.add_scanned_path(conn, run_id, path_str)
+        _record_item_error(conn, run_id, path_str or "", item["error_type"], item["message"], counters)
+    elif kind == "unchanged":
+        counters["scanned"] += 1
+        counters["skipped"] += 1
+        if path_str and not bulk:
+            db.add_scanned_path(conn, run_id, path_str)
+    elif kind == "document":
+        meta: DocumentMeta = item["meta"]
+        counters["scanned"] += 1
+        if meta.path and not bulk:
+            db.add_scanned_path(conn, run_id, meta.path)
+        event = "updated" if item.get("existing") else "added"
+        try:
+            # Savepoint innerhalb der laufenden Transaktion; als äußerster würde RELEASE committen
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            conn.execute("SAVEPOINT work_item")
+            if bulk:
+                try:
+                    db.insert_document_bulk(conn, meta)
+                except sqlite3.IntegrityError:
+                    db.upsert_document(conn, meta)
+            else:
+                db.upsert_document(conn, meta)
+            db.record_index_event(conn, run_id, event, meta.path, meta.source, actor="indexer")
+            conn.execute("RELEASE work_item")
+        except Exception as exc:
+            conn = _discard_item(conn, reopen)
+            _record_item_error(conn, run_id, meta.path, type(exc).__name__, str(exc), counters)
+        else:
+            counters[event] += 1
+    return conn
+
+
+def extract_work_item(
+    real_path: Path,
+    original_path: Path,
+    source: str,
+    ext: str,
+    max_file_size_mb: Optional[int],
+    lookup_conn: Optional[Callable[[], Any]] = None,
+    stop: Optional[threading.Event] = None,
+) -> Optional[Dict[str, Any]]:
+    """
+    Liest Metadaten und Inhalt einer Datei; Ergebnis für apply_work_item.
+    None, wenn der Lauf (stop) währenddessen gestoppt wurde.
+    """
+    try:
+        stat = real_path.stat()
+    except FileNotFoundError:
+        return {"type": "error", "path": str(original_path), "error_type": "FileNotFound", "message": "not found"}
+
+    if max_file_size_mb and stat.st_size > max_file_size_mb * 1024 * 1024:
+        return {"type": "unchanged", "path": str(original_path)}
+
+    meta = DocumentMeta(
+        source=source,
+        path=str(original_path),
+        filename=original_path.name,
+        extension=ext,
+        size_bytes=stat.st_size,
+        ctime=stat.st_ctime,
+        mtime=stat.st_mtime,
+        atime=stat.st_atime if hasattr(stat, "st_atime") else None,
+        owner=get_owner(stat),
+        last_editor=get_owner(stat),
+    )
+    meta_existing = False
+    if lookup_conn is not None:
+        try:
+            conn = lookup_conn()
+            existing_row = db.get_size_mtime_by_path(conn, str(original_path))
+            if existing_row and existing_row[0] == meta.size_bytes and existing_row[1] == meta.mtime:
+                return {"type": "unchanged", "path": str(original_path)}
+            meta_existing = bool(existing_row)
+        except Exception:
+            meta_existing = False
+
+    try:
+        WARN_CONTEXT.path = str(original_path)
+        slot = _acquire_extract_slot(stop)
+        try:
+            fill_content(meta, real_path, ext)
+        finally:
+            if slot is not None:
+                slot.release()
+        if stop is not None and stop.is_set():
+            return None
+        return {"type": "document", "path": str(original_path), "meta": meta, "existing": meta_existing}
+    except Exception as exc:
+        logger.error("%s %s %s", type(exc).__name__, original_path, original_path.name)
+        return {
+            "type": "error",
+            "path": str(original_path),
+            "error_type": type(exc).__name__,
+            "message": str(exc),
+        }
+    finally:
+        WARN_CONTEXT.path = None
+
+
+def run_index_lauf(config: CentralConfig, db_path: Optional[Path] = None) -> Dict[str, int]:
+    run_key = object()
+    stop = _register_run(run_key, config.paths.roots)
+    try:
+        return _run_index_lauf(config, db_path, stop)
+    finally:
+        _unregister_run(run_key)
+
+
+def _scope_label(roots: Iterable[Any]) -> Optional[str]:
+    labels: List[str] = []
+    for entry in roots or []:
+        try:
+            label = entry[1]
+        except Exception:
+            continue
+        if label and label not in labels:
+            labels.append(str(label))
+    return ", ".join(labels) if labels else None
+
+
+def _run_index_lauf(config: CentralConfig, db_path: Optional[Path] = None, stop: Optional[threading.Event] = None) -> Dict[str, int]:
+    stop = stop or threading.Event()
+    db.init_db(db_path)
     setup_logging(config)
     touch_heartbeat()
 
@@ -290,8 +590,9 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
     status_override: Optional[str] = None
     existing_counts: Dict[str, int] = {}
 
-    with db.get_conn() as conn:
-        run_id = db.record_index_run_start(conn, start_time)
+    scope = _scope_label(config.paths.roots)
+    with db.get_conn(db_path) as conn:
+        run_id = db.record_index_run_start(conn, start_time, source=scope)
         db.reset_scanned_paths(conn, run_id)
         save_run_id(run_id)
 
@@ -310,7 +611,7 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
 
     combined_labels = [label for _, label, _ in root_entries]
     try:
-        with db.get_conn() as conn:
+        with db.get_conn(db_path) as conn:
             existing_counts = db.count_documents_by_source(conn, combined_labels)
             sample_paths = db.get_sample_paths_by_source(conn, combined_labels)
     except Exception:
@@ -320,9 +621,9 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
     if not readiness_result.ok:
         finish_message = readiness_result.message or "Netzlaufwerk nicht bereit"
         logger.warning("Indexlauf #%s abgebrochen: %s", run_id, finish_message)
-        init_live_status(run_id, start_time, 0)
-        update_live_status(counters, status="error", message=finish_message, finished=True)
-        with db.get_conn() as conn:
+        init_live_status(run_id, start_time, 0, source=scope)
+        update_live_status(counters, status="error", message=finish_message, finished=True, run_id=run_id)
+        with db.get_conn(db_path) as conn:
             db.record_index_run_finish(
                 conn,
                 run_id,
@@ -335,13 +636,13 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
                 0,
                 finish_message,
             )
-        clear_run_id()
+        clear_run_id(run_id)
         return counters
     if not root_entries:
         logger.warning("Keine roots konfiguriert, Indexlauf beendet")
-        init_live_status(run_id, start_time, 0)
-        update_live_status(counters, status="completed", message="keine Wurzelpfade konfiguriert", finished=True)
-        with db.get_conn() as conn:
+        init_live_status(run_id, start_time, 0, source=scope)
+        update_live_status(counters, status="completed", message="keine Wurzelpfade konfiguriert", finished=True, run_id=run_id)
+        with db.get_conn(db_path) as conn:
             db.record_index_run_finish(
                 conn,
                 run_id,
@@ -354,11 +655,20 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
                 0,
                 "keine Wurzelpfade konfiguriert",
             )
+        clear_run_id(run_id)
         return counters
 
     total_files = 0
     logger.info("Indexlauf #%s gestartet, Roots: %s", run_id, ", ".join([str(r[0]) for r in root_entries]))
-    init_live_status(run_id, start_time, total_files)
+    init_live_status(run_id, start_time, total_files, source=scope)
+
+    # index_runner vergibt bulk_load unter seinem Start-Guard; die Prüfung hier gilt für direkte Aufrufe
+    bulk = False
+    if getattr(config.indexer, "bulk_load", True) and active_run_count() <= 1:
+        with db.get_conn(db_path) as conn:
+            bulk = db.is_index_empty(conn)
+    if bulk:
+        logger.info("Indexlauf #%s: leere Datenbank, Bulk-Load aktiv", run_id)
 
     work_queue: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=200)
     last_status_write = 0.0
@@ -367,89 +677,47 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
         nonlocal last_status_write
         now_ts = time.time()
         if force or now_ts - last_status_write >= 0.5:
-            status_value = "stopping" if stop_event.is_set() else None
-            update_live_status(counters, current_path=current_path, status=status_value)
+            status_value = "stopping" if stop.is_set() else None
+            update_live_status(counters, current_path=current_path, status=status_value, run_id=run_id)
             last_status_write = now_ts
 
+    def reopen() -> sqlite3.Connection:
+        conn = open_writer_conn(db_path)
+        if bulk:
+            db.apply_bulk_pragmas(conn)
+        return conn
+
     def writer():
-        conn = db.connect()
+        conn = open_writer_conn(db_path)
+        if bulk:
+            db.begin_bulk_load(conn)
+        pending = 0
+        last_commit = time.time()
         try:
-            conn.execute("PRAGMA synchronous=NORMAL;")
-            conn.execute("PRAGMA temp_store=MEMORY;")
-            processed = 0
             while True:
                 item = work_queue.get()
                 if item is None:
                     break
-                kind = item.get("type")
-                path_str = item.get("path") if item else None
-                if kind == "error":
-                    counters["scanned"] += 1
-                    counters["skipped"] += 1
-                    if path_str:
-                        db.add_scanned_path(conn, run_id, path_str)
-                    ignored = _should_ignore_error(item.get("error_type") or "", item.get("message") or "")
-                    try:
-                        db.record_file_error(
-                            conn,
-                            run_id=run_id,
-                            path=path_str or "",
-                            error_type=item["error_type"],
-                            message=item["message"],
-                            created_at=datetime.now(timezone.utc).isoformat(),
-                            ignored=ignored,
-                        )
-                    finally:
-                        if not ignored:
-                            counters["errors"] += 1
-                elif kind == "unchanged":
-                    counters["scanned"] += 1
-                    counters["skipped"] += 1
-                    if path_str:
-                        db.add_scanned_path(conn, run_id, path_str)
-                elif kind == "document":
-                    meta: DocumentMeta = item["meta"]
-                    counters["scanned"] += 1
-                    if meta.path:
-                        db.add_scanned_path(conn, run_id, meta.path)
-                    try:
-                        db.upsert_document(conn, meta)
-                        if item.get("existing"):
-                            counters["updated"] += 1
-                            db.record_index_event(conn, run_id, "updated", meta.path, meta.source, actor="indexer")
-                        else:
-                            counters["added"] += 1
-                            db.record_index_event(conn, run_id, "added", meta.path, meta.source, actor="indexer")
-                    except Exception as exc:
-                        ignored = _should_ignore_error(type(exc).__name__, str(exc))
-                        try:
-                            db.record_file_error(
-                                conn,
-                                run_id=run_id,
-                                path=meta.path,
-                                error_type=type(exc).__name__,
-                                message=str(exc),
-                                created_at=datetime.now(timezone.utc).isoformat(),
-                                ignored=ignored,
-                            )
-                        finally:
-                            if not ignored:
-                                counters["errors"] += 1
-                        # Attempt to reopen connection if broken
-                        try:
-                            conn.close()
-                        except Exception:
-                            pass
-                        conn = db.connect()
-                        conn.execute("PRAGMA synchronous=NORMAL;")
-                        conn.execute("PRAGMA temp_store=MEMORY;")
+                conn = apply_work_item(conn, run_id, item, counters, reopen=reopen, bulk=bulk)
                 work_queue.task_done()
+                pending += 1
+                if not bulk or pending >= BULK_COMMIT_ITEMS or time.time() - last_commit >= BULK_COMMIT_SECONDS:
+                    try:
+                        conn.commit()
+                    except Exception:
+                        pass
+                    pending = 0
+                    last_commit = time.time()
+                flush_live_status(item.get("path"))
+        finally:
+            if bulk:
+                # Indizes auch nach Abbruch wiederherstellen; nach einem Absturz übernimmt das init_db
                 try:
                     conn.commit()
-                except Exception:
-                    pass
-                flush_live_status(path_str if path_str else None)
-        finally:
+                    logger.info("Indexlauf #%s: Bulk-Load abgeschlossen, Indizes und FTS werden optimiert", run_id)
+                    db.finish_bulk_load(conn)
+                except Exception as exc:
+                    logger.error("Bulk-Load-Abschluss fehlgeschlagen: %s", exc)
             conn.close()
 
     writer_thread = threading.Thread(target=writer, daemon=True)
@@ -460,125 +728,34 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
     def get_thread_conn():
         conn = getattr(thread_local, "conn", None)
         if conn is None:
-            conn = db.connect()
+            conn = db.connect(db_path)
             conn.execute("PRAGMA query_only=1;")
             thread_local.conn = conn
         return conn
 
-    def process_file_task(real_path: Path, original_path: Path, source: str) -> None:
-        if stop_event.is_set():
-            return
-        try:
-            stat = real_path.stat()
-        except FileNotFoundError:
-            work_queue.put({"type": "error", "path": str(original_path), "error_type": "FileNotFound", "message": "not found"})
-            return
+    # leere DB: kein Abgleich size/mtime nötig
+    lookup = None if bulk else get_thread_conn
 
-        max_size = config.indexer.max_file_size_mb
-        if max_size and stat.st_size > max_size * 1024 * 1024:
-            work_queue.put({"type": "unchanged", "path": str(original_path)})
+    def process_file_task(real_path: Path, original_path: Path, source: str) -> None:
+        if stop.is_set():
             return
-
-        ext = real_path.suffix.lower()
-        meta = DocumentMeta(
-            source=source,
-            path=str(original_path),
-            filename=original_path.name,
-            extension=ext,
-            size_bytes=stat.st_size,
-            ctime=stat.st_ctime,
-            mtime=stat.st_mtime,
-            atime=stat.st_atime if hasattr(stat, "st_atime") else None,
-            owner=get_owner(stat),
-            last_editor=get_owner(stat),
-        )
         try:
-            conn = get_thread_conn()
-            cur = conn.execute("SELECT size_bytes, mtime FROM documents WHERE path = ?", (str(original_path),))
-            existing_row = cur.fetchone()
-            if existing_row and existing_row[0] == meta.size_bytes and existing_row[1] == meta.mtime:
-                work_queue.put({"type": "unchanged", "path": str(original_path)})
-                return
-            meta_existing = bool(existing_row)
-        except Exception:
-            meta_existing = False
-
-        try:
-            WARN_CONTEXT.path = str(original_path)
-            fill_content(meta, real_path, ext)
-            if stop_event.is_set():
-                return
-            work_queue.put({"type": "document", "meta": meta, "existing": meta_existing})
-        except Exception as exc:
-            logger.error("%s %s %s", type(exc).__name__, original_path, original_path.name)
-            work_queue.put(
-                {
-                    "type": "error",
-                    "path": str(original_path),
-                    "error_type": type(exc).__name__,
-                    "message": str(exc),
-                }
+            item = extract_work_item(
+                real_path, original_path, source, real_path.suffix.lower(), config.indexer.max_file_size_mb, lookup, stop
             )
+            if item is not None:
+                work_queue.put(item)
         finally:
-            WARN_CONTEXT.path = None
             touch_heartbeat()
 
     def process_mail_task(real_path: Path, source: str) -> None:
-        if stop_event.is_set():
+        if stop.is_set():
             return
         try:
-            stat = real_path.stat()
-        except FileNotFoundError:
-            work_queue.put({"type": "error", "path": str(real_path), "error_type": "FileNotFound", "message": "not found"})
-            return
-
-        max_size = config.indexer.max_file_size_mb
-        if max_size and stat.st_size > max_size * 1024 * 1024:
-            work_queue.put({"type": "unchanged", "path": str(real_path)})
-            return
-
-        ext = ".eml"
-        meta = DocumentMeta(
-            source=source,
-            path=str(real_path),
-            filename=real_path.name,
-            extension=ext,
-            size_bytes=stat.st_size,
-            ctime=stat.st_ctime,
-            mtime=stat.st_mtime,
-            atime=stat.st_atime if hasattr(stat, "st_atime") else None,
-            owner=get_owner(stat),
-            last_editor=get_owner(stat),
-        )
-        try:
-            conn = get_thread_conn()
-            cur = conn.execute("SELECT size_bytes, mtime FROM documents WHERE path = ?", (str(real_path),))
-            existing_row = cur.fetchone()
-            if existing_row and existing_row[0] == meta.size_bytes and existing_row[1] == meta.mtime:
-                work_queue.put({"type": "unchanged", "path": str(real_path)})
-                return
-            meta_existing = bool(existing_row)
-        except Exception:
-            meta_existing = False
-
-        try:
-            WARN_CONTEXT.path = str(real_path)
-            fill_content(meta, real_path, ext)
-            if stop_event.is_set():
-                return
-            work_queue.put({"type": "document", "meta": meta, "existing": meta_existing})
-        except Exception as exc:
-            logger.error("%s %s %s", type(exc).__name__, real_path, real_path.name)
-            work_queue.put(
-                {
-                    "type": "error",
-                    "path": str(real_path),
-                    "error_type": type(exc).__name__,
-                    "message": str(exc),
-                }
-            )
+            item = extract_work_item(real_path, real_path, source, ".eml", config.indexer.max_file_size_mb, lookup, stop)
+            if item is not None:
+                work_queue.put(item)
         finally:
-            WARN_CONTEXT.path = None
             touch_heartbeat()
 
     exclude_set = {p.lower() for p in getattr(config.indexer, "exclude_dirs", []) if p}
@@ -622,11 +799,11 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
     futures: List[concurrent.futures.Future] = []
     with concurrent.futures.ThreadPoolExecutor(max_workers=config.indexer.worker_count) as pool:
         for real_path, original_path, source in iter_files():
-            if stop_event.is_set():
+            if stop.is_set():
                 break
             total_files += 1
             if total_files == 1 or total_files % 200 == 0:
-                update_live_status(counters, total_files=total_files)
+                update_live_status(counters, total_files=total_files, run_id=run_id)
             while len(futures) >= max_outstanding:
                 done, not_done = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
                 futures = list(not_done)
@@ -634,18 +811,18 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
                     pass
             futures.append(pool.submit(process_file_task, real_path, original_path, source))
         for real_path, source in iter_maildir_files():
-            if stop_event.is_set():
+            if stop.is_set():
                 break
             total_files += 1
             if total_files == 1 or total_files % 200 == 0:
-                update_live_status(counters, total_files=total_files)
+                update_live_status(counters, total_files=total_files, run_id=run_id)
             while len(futures) >= max_outstanding:
                 done, not_done = concurrent.futures.wait(futures, return_when=concurrent.futures.FIRST_COMPLETED)
                 futures = list(not_done)
                 for _ in done:
                     pass
             futures.append(pool.submit(process_mail_task, real_path, source))
-        update_live_status(counters, total_files=total_files)
+        update_live_status(counters, total_files=total_files, run_id=run_id)
         for fut in concurrent.futures.as_completed(futures):
             fut.result()
 
@@ -653,8 +830,42 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
     writer_thread.join()
     flush_live_status(force=True)
 
-    with db.get_conn() as conn:
-        post_check = readiness.check_sources_ready(file_entries + maildir_entries, existing_counts)
+    return finish_index_run(
+        config,
+        run_id,
+        start_time,
+        counters,
+        file_entries + maildir_entries,
+        existing_counts,
+        finish_message=finish_message,
+        status_override=status_override,
+        # gestoppt: nicht gescannte Dokumente sind nicht verschwunden, nur nicht erreicht
+        allow_remove=not bulk and not stop.is_set(),
+        db_path=db_path,
+        stop=stop,
+    )
+
+
+def finish_index_run(
+    config: CentralConfig,
+    run_id: int,
+    start_time: str,
+    counters: Dict[str, int],
+    entries: List[tuple[Path, str]],
+    existing_counts: Dict[str, int],
+    finish_message: Optional[str] = None,
+    status_override: Optional[str] = None,
+    allow_remove: bool = True,
+    db_path: Optional[Path] = None,
+    stop: Optional[threading.Event] = None,
+) -> Dict[str, int]:
+    """
+    Abschluss eines Laufs: nicht mehr gefundene Dokumente entfernen, Status und Report schreiben.
+    allow_remove=False überspringt das Entfernen (z. B. wenn Teile des Laufs fehlgeschlagen sind);
+    ein gesetztes stop des Laufs ergibt den Status "stopped".
+    """
+    with db.get_conn(db_path) as conn:
+        post_check = readiness.check_sources_ready(entries, existing_counts)
         if not post_check.ok:
             finish_message = finish_message or post_check.message or "Netzlaufwerk nicht bereit"
             logger.warning("Indexlauf #%s: Cleanup übersprungen: %s", run_id, finish_message)
@@ -662,14 +873,20 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
             counters["removed"] = 0
             status_override = status_override or "error"
             db.cleanup_scanned_paths(conn, run_id)
+        elif not allow_remove:
+            if finish_message:
+                logger.warning("Indexlauf #%s: Entfernen übersprungen: %s", run_id, finish_message)
+            counters["removed"] = 0
+            db.cleanup_scanned_paths(conn, run_id)
         else:
-            removed_entries = db.remove_documents_not_scanned(conn, run_id, [src for _, src in file_entries + maildir_entries])
+            removed_entries = db.remove_documents_not_scanned(conn, run_id, [src for _, src in entries])
             counters["removed"] = len(removed_entries)
             db.cleanup_scanned_paths(conn, run_id)
 
     end_time = datetime.now(timezone.utc).isoformat()
-    status = status_override or ("stopped" if stop_event.is_set() else ("completed" if counters["errors"] == 0 else "completed_with_errors"))
-    update_live_status(counters, status=status, message=finish_message, finished=True)
+    stopped = stop is not None and stop.is_set()
+    status = status_override or ("stopped" if stopped else ("completed" if counters["errors"] == 0 else "completed_with_errors"))
+    update_live_status(counters, status=status, message=finish_message, finished=True, run_id=run_id)
     logger.info(
         "Indexlauf #%s beendet mit Status %s | gescannt=%s, added=%s, updated=%s, removed=%s, errors=%s, skipped=%s",
         run_id,
@@ -681,7 +898,7 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
         counters["errors"],
         counters["skipped"],
     )
-    with db.get_conn() as conn:
+    with db.get_conn(db_path) as conn:
         db.record_index_run_finish(
             conn,
             run_id,
@@ -694,8 +911,50 @@ def run_index_lauf(config: CentralConfig) -> Dict[str, int]:
             counters["errors"],
             finish_message,
         )
-    clear_run_id()
-    send_report_if_configured(config, counters, status, run_id, start_time, end_time)
+    clear_run_id(run_id)
+    # Schattenaufbau: Report erst nach dem Umschalten (siehe run_shadow_rebuild)
+    if db_path is None or Path(db_path) == Path(db.DB_PATH):
+        send_report_if_configured(config, counters, status, run_id, start_time, end_time)
+    return counters
+
+
+def run_shadow_rebuild(config: CentralConfig, reuse_content: bool = True) -> Dict[str, int]:
+    """
+    Neuaufbau ohne Suchausfall: Lauf in die Schatten-DB, Live-DB bedient weiter Suchen.
+    Nur bei erfolgreichem Lauf wird umgeschaltet, sonst bleibt der Live-Index unverändert.
+    """
+    live = Path(db.DB_PATH)
+    shadow = db.shadow_db_path(live)
+    logger.info("Schattenaufbau gestartet: %s (Inhalte übernehmen: %s)", shadow, reuse_content)
+    marks = db.prepare_shadow_db(shadow, live, reuse_content=reuse_content)
+    counters = run_index_lauf(config, db_path=shadow)
+    with db.get_conn(shadow) as conn:
+        row = db.get_last_run(conn)
+        run = dict(row) if row else {}
+    status = run.get("status") or "error"
+    if status not in {"completed", "completed_with_errors"}:
+        message = f"Schattenaufbau verworfen (Status {status}), Live-Index unverändert"
+        logger.warning(message)
+        db.remove_db_files(shadow)
+        with db.get_conn(live) as conn:
+            run_id = db.record_index_run_start(conn, run.get("started_at") or datetime.now(timezone.utc).isoformat(), source=run.get("source"))
+            db.record_index_run_finish(
+                conn,
+                run_id,
+                run.get("finished_at") or datetime.now(timezone.utc).isoformat(),
+                status,
+                counters["scanned"],
+                counters["added"],
+                counters["updated"],
+                counters["removed"],
+                counters["errors"],
+                message,
+            )
+        return counters
+    started = time.monotonic()
+    db.publish_shadow_db(shadow, live, marks)
+    logger.info("Schattenaufbau #%s übernommen (Umschalten %.1fs)", run.get("id"), time.monotonic() - started)
+    send_report_if_configured(config, counters, status, run["id"], run["started_at"], run["finished_at"])
     return counters
 
 
@@ -713,10 +972,13 @@ def load_run_id() -> Optional[int]:
     return None
 
 
-def clear_run_id() -> None:
+def clear_run_id(run_id: Optional[int] = None) -> None:
+    # parallele Läufe: nur die eigene Run-ID entfernen, Heartbeat erst wenn kein Lauf mehr aktiv ist
+    if run_id is not None and load_run_id() not in (None, run_id):
+        return
     if RUN_STATUS_FILE.exists():
         RUN_STATUS_FILE.unlink()
-    if HEARTBEAT_FILE.exists():
+    if HEARTBEAT_FILE.exists() and active_run_count() <= 1:
         HEARTBEAT_FILE.unlink()
 
 
@@ -0,0 +1,546 @@
+"""
+Verteilter Indexlauf für große Erstbefüllungen.
+
+Der Koordinator zerlegt die Quellen in Verzeichnis-Arbeitspakete (work_units) in einer
+eigenen SQLite-Datei. Worker-Prozesse (lokal oder auf anderen Hosts mit derselben Freigabe)
+holen Pakete per Lease ab, extrahieren und legen komprimierte Ergebnisse in work_results ab.
+Nur der Koordinator schreibt in die Index-DB. Abgelaufene Leases werden neu vergeben.
+
+    python -m app.indexer.work_coordinator coordinate --workers 4
+    python -m app.indexer.work_coordinator worker --work-db /data/index.work.db
+"""
+import argparse
+import json
+import logging
+import os
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from dataclasses import asdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config_loader import CentralConfig, load_config
+from app.db import datenbank as db
+from app.db.datenbank import DocumentMeta
+from app.indexer import index_lauf_service as lauf
+from app.services import readiness
+
+logger = logging.getLogger("indexer")
+
+WORK_DB_PATH = Path(os.getenv("INDEX_WORK_DB_PATH", "data/index.work.db"))
+PARTITION_DEPTH = 2
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 3
+RESULT_CHUNK = 200
+
+
+def connect_work_db(path: Optional[Path] = None) -> sqlite3.Connection:
+    path = Path(path or WORK_DB_PATH)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA busy_timeout=30000;")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS work_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            index_run_id INTEGER NOT NULL,
+            index_db_path TEXT NOT NULL,
+            max_file_size_mb INTEGER,
+            exclude_dirs TEXT,
+            status TEXT NOT NULL DEFAULT 'running',
+            created_at TEXT DEFAULT (datetime('now')),
+            finished_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS work_units (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            work_run_id INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            root TEXT NOT NULL,
+            dir_path TEXT NOT NULL,
+            kind TEXT NOT NULL DEFAULT 'file',
+            recursive INTEGER NOT NULL DEFAULT 1,
+            status TEXT NOT NULL DEFAULT 'pending',
+            owner TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            file_count INTEGER,
+            error TEXT,
+            finished_at TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_work_units_claim ON work_units(work_run_id, status, id);
+        CREATE TABLE IF NOT EXISTS work_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            unit_id INTEGER NOT NULL,
+            attempt INTEGER NOT NULL,
+            payload BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_work_results_unit ON work_results(unit_id, attempt);
+        """
+    )
+    return conn
+
+
+def _is_excluded(root: Path, dirpath: Path, name: str, exclude_set: set[str]) -> bool:
+    if name.lower() in exclude_set:
+        return True
+    return str(Path(dirpath, name).relative_to(root)).lower() in exclude_set
+
+
+def partition_root(root: Path, kind: str, exclude_dirs: List[str], depth: int = PARTITION_DEPTH) -> Iterator[Tuple[Path, bool]]:
+    """
+    Zerlegt einen Root in (Verzeichnis, rekursiv)-Pakete: oberhalb von depth nur die direkten
+    Dateien eines Verzeichnisses, ab depth den ganzen Unterbaum.
+    """
+    exclude_set = {d.lower() for d in exclude_dirs if d}
+    if kind == "maildir":
+        exclude_set.add(".quarantine")
+
+    def walk(current: Path, level: int) -> Iterator[Tuple[Path, bool]]:
+        if level >= depth:
+            yield current, True
+            return
+        yield current, False
+        try:
+            children = sorted(e.name for e in os.scandir(current) if e.is_dir(follow_symlinks=False))
+        except OSError as exc:
+            logger.error("Verzeichnis nicht lesbar: %s (%s)", current, exc)
+            return
+        for name in children:
+            if _is_excluded(root, current, name, exclude_set):
+                continue
+            yield from walk(current / name, level + 1)
+
+    yield from walk(root, 0)
+
+
+def iter_unit_files(unit: sqlite3.Row, exclude_dirs: List[str]) -> Iterator[Tuple[Path, str]]:
+    root = Path(unit["root"])
+    start = Path(unit["dir_path"])
+    exclude_set = {d.lower() for d in exclude_dirs if d}
+    maildir = unit["kind"] == "maildir"
+    if maildir:
+        exclude_set.add(".quarantine")
+    if unit["recursive"]:
+        walker = os.walk(start)
+    else:
+        try:
+            walker = iter([next(os.walk(start))])
+        except StopIteration:
+            return
+    for dirpath, dirnames, filenames in walker:
+        dirnames[:] = [d for d in dirnames if not _is_excluded(root, Path(dirpath), d, exclude_set)]
+        if maildir:
+            if Path(dirpath).name.lower() not in {"cur", "new"}:
+                continue
+            for name in filenames:
+                yield Path(dirpath) / name, ".eml"
+        else:
+            for name in filenames:
+                path = Path(dirpath) / name
+                ext = path.suffix.lower()
+                if ext in lauf.SUPPORTED_EXTENSIONS:
+                    yield path, ext
+
+
+def _encode_items(items: List[Dict[str, Any]]) -> bytes:
+    rows = []
+    for item in items:
+        row = dict(item)
+        if "meta" in row:
+            row["meta"] = asdict(row["meta"])
+        rows.append(row)
+    return zlib.compress(json.dumps(rows).encode("utf-8"), 6)
+
+
+def _decode_items(payload: bytes) -> List[Dict[str, Any]]:
+    rows = json.loads(zlib.decompress(payload).decode("utf-8"))
+    for row in rows:
+        if "meta" in row:
+            row["meta"] = DocumentMeta(**row["meta"])
+    return rows
+
+
+def create_work_run(conn: sqlite3.Connection, config: CentralConfig, index_run_id: int, entries: List[Tuple[Path, str, str]]) -> int:
+    exclude_dirs = list(getattr(config.indexer, "exclude_dirs", []) or [])
+    cur = conn.execute(
+        "INSERT INTO work_runs(index_run_id, index_db_path, max_file_size_mb, exclude_dirs) VALUES (?, ?, ?, ?)",
+        (index_run_id, str(Path(db.DB_PATH).resolve()), config.indexer.max_file_size_mb, json.dumps(exclude_dirs)),
+    )
+    work_run_id = cur.lastrowid
+    conn.execute("BEGIN")
+    units = 0
+    for root, label, kind in entries:
+        for dir_path, recursive in partition_root(root, kind, exclude_dirs):
+            conn.execute(
+                "INSERT INTO work_units(work_run_id, source, root, dir_path, kind, recursive) VALUES (?, ?, ?, ?, ?, ?)",
+                (work_run_id, label, str(root), str(dir_path), kind, 1 if recursive else 0),
+            )
+            units += 1
+    conn.execute("COMMIT")
+    logger.info("Verteilter Lauf #%s: %s Arbeitspakete angelegt", index_run_id, units)
+    return work_run_id
+
+
+def claim_unit(
+    conn: sqlite3.Connection, owner: str, lease_seconds: int = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS
+) -> Optional[sqlite3.Row]:
+    """
+    Holt das nächste freie Paket eines laufenden Laufs; abgelaufene Leases zählen als frei,
+    solange das Paket noch keine max_attempts Versuche hatte (sonst markiert fail_expired_units es).
+    """
+    now = time.time()
+    rows = conn.execute(
+        """
+        UPDATE work_units SET status = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1
+        WHERE id = (
+            SELECT u.id FROM work_units u JOIN work_runs r ON r.id = u.work_run_id
+            WHERE r.status = 'running'
+              AND (u.status = 'pending' OR (u.status = 'leased' AND u.lease_until < ? AND u.attempts < ?))
+            ORDER BY u.id LIMIT 1
+        )
+        RETURNING id, work_run_id, source, root, dir_path, kind, recursive, attempts
+        """,
+        (owner, now + lease_seconds, now, max_attempts),
+    ).fetchall()
+    return rows[0] if rows else None
+
+
+def renew_lease(conn: sqlite3.Connection, unit_id: int, owner: str, attempt: int, lease_seconds: int = LEASE_SECONDS) -> bool:
+    cur = conn.execute(
+        "UPDATE work_units SET lease_until = ? WHERE id = ? AND owner = ? AND attempts = ? AND status = 'leased'",
+        (time.time() + lease_seconds, unit_id, owner, attempt),
+    )
+    return cur.rowcount == 1
+
+
+def complete_unit(conn: sqlite3.Connection, unit_id: int, owner: str, attempt: int, file_count: int) -> bool:
+    cur = conn.execute(
+        """
+        UPDATE work_units SET status = 'done', file_count = ?, finished_at = datetime('now')
+        WHERE id = ? AND owner = ? AND attempts = ? AND status = 'leased'
+        """,
+        (file_count, unit_id, owner, attempt),
+    )
+    return cur.rowcount == 1
+
+
+def fail_expired_units(conn: sqlite3.Connection, work_run_id: int, max_attempts: int = MAX_ATTEMPTS) -> int:
+    cur = conn.execute(
+        """
+        UPDATE work_units SET status = 'failed', error = 'Lease mehrfach abgelaufen', finished_at = datetime('now')
+        WHERE work_run_id = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?
+        """,
+        (work_run_id, time.time(), max_attempts),
+    )
+    return cur.rowcount
+
+
+def process_unit(
+    conn: sqlite3.Connection,
+    unit: sqlite3.Row,
+    owner: str,
+    lease_seconds: int = LEASE_SECONDS,
+    stop: Optional[threading.Event] = None,
+) -> bool:
+    """
+    Extrahiert alle Dateien eines Pakets und legt die Ergebnisse ab.
+    False, wenn die Lease zwischenzeitlich verloren ging oder stop gesetzt ist (Ergebnisse werden verworfen).
+    """
+    run = conn.execute("SELECT * FROM work_runs WHERE id = ?", (unit["work_run_id"],)).fetchone()
+    exclude_dirs = json.loads(run["exclude_dirs"] or "[]")
+    # Index-DB nur lesend für den Abgleich size/mtime; fehlt sie auf diesem Host, wird alles extrahiert
+    lookup_db: Optional[sqlite3.Connection] = None
+    if Path(run["index_db_path"]).exists():
+        lookup_db = sqlite3.connect(f"file:{run['index_db_path']}?mode=ro", uri=True, timeout=10)
+    try:
+        lookup = (lambda: lookup_db) if lookup_db else None
+        return _process_unit_files(conn, unit, owner, lease_seconds, run, exclude_dirs, lookup, stop or threading.Event())
+    finally:
+        if lookup_db is not None:
+            lookup_db.close()
+
+
+def _process_unit_files(conn, unit, owner, lease_seconds, run, exclude_dirs, lookup, stop) -> bool:
+    attempt = unit["attempts"]
+    chunk: List[Dict[str, Any]] = []
+    count = 0
+    last_renew = time.time()
+
+    def flush() -> None:
+        if chunk:
+            conn.execute(
+                "INSERT INTO work_results(unit_id, attempt, payload) VALUES (?, ?, ?)",
+                (unit["id"], attempt, _encode_items(chunk)),
+            )
+            chunk.clear()
+
+    for path, ext in iter_unit_files(unit, exclude_dirs):
+        if stop.is_set():
+            return False
+        item = lauf.extract_work_item(path, path, unit["source"], ext, run["max_file_size_mb"], lookup, stop)
+        if item is None:
+            return False
+        chunk.append(item)
+        count += 1
+        if len(chunk) >= RESULT_CHUNK:
+            flush()
+        if time.time() - last_renew > lease_seconds / 3:
+            if not renew_lease(conn, unit["id"], owner, attempt, lease_seconds):
+                logger.warning("Lease für Paket %s verloren, Ergebnisse verworfen", unit["id"])
+                return False
+            last_renew = time.time()
+    flush()
+    return complete_unit(conn, unit["id"], owner, attempt, count)
+
+
+def _has_open_units(conn: sqlite3.Connection) -> bool:
+    row = conn.execute(
+        """
+        SELECT 1 FROM work_units u JOIN work_runs r ON r.id = u.work_run_id
+        WHERE r.status = 'running' AND u.status IN ('pending', 'leased') LIMIT 1
+        """
+    ).fetchone()
+    return row is not None
+
+
+def run_worker(
+    work_db: Optional[Path] = None,
+    owner: Optional[str] = None,
+    lease_seconds: int = LEASE_SECONDS,
+    idle_exit: float = 10.0,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """
+    Worker-Schleife: Pakete abholen bis idle_exit Sekunden lang nichts mehr frei ist oder stop gesetzt wird.
+    """
+    stop = stop or threading.Event()
+    owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+    conn = connect_work_db(work_db)
+    processed = 0
+    seen_run = False
+    idle_since = time.time()
+    try:
+        while not stop.is_set():
+            unit = claim_unit(conn, owner, lease_seconds)
+            if unit is None:
+                # solange noch Leases offen sind, können sie ablaufen und neu vergeben werden
+                if not _has_open_units(conn):
+                    running = conn.execute("SELECT 1 FROM work_runs WHERE status = 'running' LIMIT 1").fetchone()
+                    seen_run = seen_run or running is not None
+                    if (running is None and seen_run) or time.time() - idle_since > idle_exit:
+                        break
+                time.sleep(0.5)
+                continue
+            seen_run = True
+            try:
+                if process_unit(conn, unit, owner, lease_seconds, stop):
+                    processed += 1
+            except Exception as exc:
+                logger.error("Paket %s (%s) fehlgeschlagen: %s", unit["id"], unit["dir_path"], exc)
+                # wie abgelaufene Leases: nach MAX_ATTEMPTS Versuchen endgültig fehlgeschlagen
+                conn.execute(
+                    """
+                    UPDATE work_units SET owner = NULL, lease_until = NULL, error = ?,
+                        status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                        finished_at = CASE WHEN attempts >= ? THEN datetime('now') END
+                    WHERE id = ? AND owner = ? AND attempts = ?
+                    """,
+                    (str(exc), MAX_ATTEMPTS, MAX_ATTEMPTS, unit["id"], owner, unit["attempts"]),
+                )
+            idle_since = time.time()
+    finally:
+        conn.close()
+    logger.info("Worker %s beendet, %s Pakete verarbeitet", owner, processed)
+    return processed
+
+
+def _ingest(work_conn: sqlite3.Connection, index_conn, work_run_id: int, run_id: int, counters: Dict[str, int]):
+    """
+    Übernimmt die Ergebnisse fertiger Pakete (nur aktueller Versuch) in die Index-DB.
+    """
+    rows = work_conn.execute(
+        """
+        SELECT res.id, res.unit_id, res.attempt, res.payload, u.attempts AS unit_attempt
+        FROM work_results res JOIN work_units u ON u.id = res.unit_id
+        WHERE u.work_run_id = ? AND (u.status = 'done' OR res.attempt < u.attempts)
+        ORDER BY res.id LIMIT 50
+        """,
+        (work_run_id,),
+    ).fetchall()
+    for row in rows:
+        if row["attempt"] == row["unit_attempt"]:
+            for item in _decode_items(row["payload"]):
+                index_conn = lauf.apply_work_item(index_conn, run_id, item, counters)
+            index_conn.commit()
+        # verarbeitete oder veraltete Ergebnisse entfernen
+        work_conn.execute("DELETE FROM work_results WHERE id = ?", (row["id"],))
+    return index_conn, len(rows)
+
+
+def _unit_counts(conn: sqlite3.Connection, work_run_id: int) -> Dict[str, int]:
+    rows = conn.execute("SELECT status, COUNT(*) FROM work_units WHERE work_run_id = ? GROUP BY status", (work_run_id,)).fetchall()
+    return {row[0]: int(row[1]) for row in rows}
+
+
+def spawn_local_workers(count: int, work_db: Path) -> List[subprocess.Popen]:
+    procs = []
+    for _ in range(max(0, count)):
+        procs.append(subprocess.Popen([sys.executable, "-m", "app.indexer.work_coordinator", "worker", "--work-db", str(work_db)]))
+    return procs
+
+
+def run_distributed_index(
+    config: CentralConfig,
+    workers: int = 0,
+    work_db: Optional[Path] = None,
+    poll_interval: float = 0.5,
+) -> Dict[str, int]:
+    """
+    Koordinator und einziger Schreiber eines verteilten Laufs.
+    workers > 0 startet zusätzlich lokale Worker-Prozesse; weitere Hosts starten `worker` selbst.
+    Läuft exklusiv über die Sperre neben der DB (index_runner.acquire_lease), auch gegenüber Läufen,
+    Schattenaufbau und Reset in Web- oder Worker-Prozess; RuntimeError, solange einer davon aktiv ist.
+    """
+    from app import index_runner
+
+    entries = lauf.validate_root_entries(
+        [(Path(r[0]), r[1], (r[2] if len(r) > 2 else "file") or "file") for r in config.paths.roots]
+    )
+    lease = index_runner.acquire_lease(exclusive=True)
+    if lease is None:
+        raise RuntimeError("Indexlauf läuft bereits")
+    try:
+        claim = index_runner.claim_sources((label for _, label, _ in entries), lease=False)
+        if claim is None:
+            raise RuntimeError("Indexlauf läuft bereits")
+        try:
+            return _run_distributed(config, entries, workers, Path(work_db or WORK_DB_PATH), poll_interval)
+        finally:
+            index_runner.release_sources(claim)
+    finally:
+        index_runner.release_lease(lease)
+
+
+def _run_distributed(config, entries, workers, work_db, poll_interval) -> Dict[str, int]:
+    db.init_db()
+    start_time = datetime.now(timezone.utc).isoformat()
+    counters = {"scanned": 0, "added": 0, "updated": 0, "removed": 0, "errors": 0, "skipped": 0}
+    scope = lauf._scope_label(entries)
+    with db.get_conn() as conn:
+        run_id = db.record_index_run_start(conn, start_time, source=scope)
+        db.reset_scanned_paths(conn, run_id)
+        labels = [label for _, label, _ in entries]
+        existing_counts = db.count_documents_by_source(conn, labels)
+        sample_paths = db.get_sample_paths_by_source(conn, labels)
+    lauf.save_run_id(run_id)
+    lauf.init_live_status(run_id, start_time, 0, source=scope)
+    simple_entries = [(root, label) for root, label, _ in entries]
+    ready = readiness.check_sources_ready(simple_entries, existing_counts, sample_paths)
+    if not entries or not ready.ok:
+        message = ready.message if not ready.ok else "keine Wurzelpfade konfiguriert"
+        return lauf.finish_index_run(
+            config, run_id, start_time, counters, simple_entries, existing_counts,
+            finish_message=message, status_override="error" if not ready.ok else None, allow_remove=False,
+        )
+
+    run_key = object()
+    stop = lauf._register_run(run_key, entries)
+    try:
+        return _coordinate(config, run_id, start_time, counters, entries, simple_entries, existing_counts, workers, work_db, poll_interval, stop)
+    finally:
+        lauf._unregister_run(run_key)
+
+
+def _coordinate(config, run_id, start_time, counters, entries, simple_entries, existing_counts, workers, work_db, poll_interval, stop):
+    work_conn = connect_work_db(work_db)
+    work_run_id = create_work_run(work_conn, config, run_id, entries)
+    procs = spawn_local_workers(workers, work_db)
+    index_conn = lauf.open_writer_conn()
+    try:
+        while True:
+            index_conn, ingested = _ingest(work_conn, index_conn, work_run_id, run_id, counters)
+            fail_expired_units(work_conn, work_run_id)
+            units = _unit_counts(work_conn, work_run_id)
+            open_units = units.get("pending", 0) + units.get("leased", 0)
+            lauf.update_live_status(counters, total_files=sum(units.values()), run_id=run_id)
+            lauf.touch_heartbeat()
+            if stop.is_set():
+                break
+            if not open_units and not ingested:
+                break
+            if not ingested:
+                time.sleep(poll_interval)
+    finally:
+        work_conn.execute(
+            "UPDATE work_runs SET status = ?, finished_at = datetime('now') WHERE id = ?",
+            ("stopped" if stop.is_set() else "finished", work_run_id),
+        )
+        index_conn.close()
+        for proc in procs:
+            try:
+                proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proc.terminate()
+
+    failed = work_conn.execute(
+        "SELECT dir_path, error FROM work_units WHERE work_run_id = ? AND status != 'done'", (work_run_id,)
+    ).fetchall()
+    work_conn.execute("DELETE FROM work_results WHERE unit_id IN (SELECT id FROM work_units WHERE work_run_id = ?)", (work_run_id,))
+    work_conn.close()
+    finish_message = None
+    if failed:
+        counters["errors"] += len(failed)
+        finish_message = f"{len(failed)} Arbeitspakete nicht abgeschlossen"
+        for row in failed[:20]:
+            logger.error("Paket nicht abgeschlossen: %s (%s)", row["dir_path"], row["error"] or "abgebrochen")
+    return lauf.finish_index_run(
+        config,
+        run_id,
+        start_time,
+        counters,
+        simple_entries,
+        existing_counts,
+        finish_message=finish_message,
+        allow_remove=not failed and not stop.is_set(),
+        stop=stop,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verteilter Indexlauf (Koordinator/Worker)")
+    sub = parser.add_subparsers(dest="role", required=True)
+    coord = sub.add_parser("coordinate", help="Pakete anlegen und Ergebnisse schreiben")
+    coord.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="lokale Worker-Prozesse")
+    coord.add_argument("--work-db", type=Path, default=WORK_DB_PATH)
+    worker = sub.add_parser("worker", help="Pakete abholen und extrahieren")
+    worker.add_argument("--work-db", type=Path, default=WORK_DB_PATH)
+    worker.add_argument("--lease-seconds", type=int, default=LEASE_SECONDS)
+    worker.add_argument("--idle-exit", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    if args.role == "worker":
+        run_worker(args.work_db, lease_seconds=args.lease_seconds, idle_exit=args.idle_exit)
+        return 0
+    from app.index_runner import resolve_active_roots
+
+    cfg = load_config()
+    cfg.paths.roots = resolve_active_roots(cfg)
+    try:
+        result = run_distributed_index(cfg, workers=args.workers, work_db=args.work_db)
+    except RuntimeError as exc:
+        print("Verteilter Indexlauf nicht gestartet:", exc)
+        return 1
+    print("Verteilter Indexlauf abgeschlossen:", result)
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    raise SystemExit(main())
@@ -1,16 +1,18 @@
+import asyncio
 import hashlib
 import hmac
 import logging
 import secrets
 import subprocess
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple
 
 import uvicorn
 from fastapi import Cookie, Depends, FastAPI, HTTPException, Header, Query, Request, Response, UploadFile, File, Form, Body
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from markdown_it import MarkdownIt
 import bleach
 from bs4 import BeautifulSoup
@@ -22,31 +24,49 @@ import time
 from app import api
 from app.config_loader import CentralConfig, ensure_dirs, load_config
 from app.db import datenbank as db
+from app.db import pool as db_pool
+from app.db import snapshot
 from app import index_runner
 from app.indexer.index_lauf_service import (
-    stop_event,
+    request_stop,
     load_run_id,
     get_live_status,
+    get_live_statuses,
     get_log_tail,
     get_log_since,
 )
 from app import metrics
 from app.search_modes import SearchMode, build_search_plan, normalize_mode
-from app import config_db
+from app import config_db, db_maintenance, reconciler, search_budget, search_cache, search_fuzzy, search_vocab
 from app.feedback import MAX_FEEDBACK_CHARS, check_rate_limit, send_feedback_email
-from app.index_runner import start_index_run, check_sources_readiness_for_index
+from app.index_runner import start_index_run, check_sources_readiness_for_index, resolve_active_roots, scheduler_readiness
 from app.auto_index_scheduler import AutoIndexScheduler, AutoIndexConfig, load_config_from_db, load_status_from_db, persist_config
 from app.services import file_ops
 from app.services.file_ops import ConflictError
-from app.services import readiness
 
 logging.basicConfig(level=logging.INFO)
 _metrics_thread_started = False
 _metrics_thread_lock = threading.Lock()
 logger = logging.getLogger(__name__)
 _auto_scheduler: Optional[AutoIndexScheduler] = None
+_maintenance_scheduler: Optional[db_maintenance.MaintenanceScheduler] = None
+_snapshot_worker: Optional[Any] = None
+_reconcile_scheduler: Optional[reconciler.ReconcileScheduler] = None
 ADMIN_SESSION_COOKIE = "admin_session"
 ADMIN_SESSION_TTL_SEC = 12 * 3600
+DISCONNECT_POLL_SEC = 0.1
+# APP_ROLE=follower: schreibende Endpunkte (Index, Datei-Aktionen, Quellen, Wartung) abgelehnt
+FOLLOWER_BLOCKED_PREFIXES = (
+    "/api/admin/index/",
+    "/api/admin/roots",
+    "/api/admin/maintenance/",
+    "/api/admin/reconcile/",
+    "/api/admin/reporting/",
+    "/api/auto-index/",
+    "/api/files/",
+    "/api/upload/",
+    "/api/quarantine/",
+)
 _ADMIN_PASSWORD_CACHE: Optional[str] = None
 _ADMIN_ALWAYS_ON_VALUES = {"1", "true", "yes", "on"}
 _md_renderer = MarkdownIt("commonmark", {"linkify": True, "typographer": True})
@@ -68,56 +88,6 @@ def get_config() -> CentralConfig:
     return load_config()
 
 
-def resolve_active_roots(config: CentralConfig) -> list[tuple[Path, str, str]]:
-    """
-    Liefert aktive Roots aus der Config-DB, andernfalls die env/INI-Roots.
-    Validiert Basis-Pfad und Existenz, fällt aber nicht stillschweigend auf /data zurück.
-    """
-    env_val = os.getenv("DATA_CONTAINER_PATH")
-    if env_val == "/":
-        raise ValueError("Ungültiger Basis-Pfad für Daten (DATA_CONTAINER_PATH)")
-    base_raw = config_db.get_setting("base_data_root", None) or env_val or "/data"
-    base_root = Path(base_raw).resolve()
-    if str(base_root) in {"", "/"}:
-        raise ValueError("Ungültiger Basis-Pfad für Daten (DATA_CONTAINER_PATH)")
-    if not base_root.exists() or not base_root.is_dir():
-        raise ValueError(f"Basis-Ordner nicht gefunden: {base_root}")
-
-    db_roots = config_db.list_roots(active_only=False)
-    if db_roots:
-        active = [(path, label, rid, active, type_) for path, label, rid, active, type_ in db_roots if active]
-        if not active:
-            raise ValueError("Keine aktiven Quellen konfiguriert")
-        resolved: list[tuple[Path, str, str]] = []
-        for path, label, _rid, _active, type_ in active:
-            p = Path(path).resolve()
-            try:
-                p.relative_to(base_root)
-            except ValueError:
-                continue
-            if not p.exists() or not p.is_dir():
-                logger.warning("Aktiver Root nicht gefunden: %s", p)
-                continue
-            resolved.append((p, label or p.name, type_ or "file"))
-        if resolved:
-            return resolved
-        raise ValueError("Keine aktiven Quellen verfügbar")
-
-    # Fallback: env/INI-Roots
-    if config.paths.roots:
-        fallback: list[tuple[Path, str, str]] = []
-        for entry in config.paths.roots:
-            try:
-                p, lbl, type_val = entry
-            except Exception:
-                p, lbl = entry
-                type_val = "file"
-            fallback.append((Path(p), lbl, type_val or "file"))
-        return fallback
-
-    raise ValueError("Keine aktiven Quellen konfiguriert")
-
-
 def ensure_app_secret(env_path: Path = Path(".env")) -> str:
     env_val = os.getenv("APP_SECRET")
     if env_val:
@@ -299,6 +269,75 @@ def get_test_flags(request: Request) -> tuple[bool, Optional[str]]:
     return is_test, test_run_id
 
 
+async def _cancel_on_disconnect(request: Request, cancel: threading.Event) -> None:
+    while not cancel.is_set():
+        if await request.is_disconnected():
+            cancel.set()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SEC)
+
+
+def _aborted_search(reason: str, fts_query: Optional[str], mode: str) -> Dict[str, Any]:
+    search_budget.record(reason)
+    if reason == "cancelled":
+        logger.info("Suche abgebrochen, Client getrennt: %s", fts_query)
+        return {"results": [], "has_more": False, "cancelled": True, "mode": mode}
+    logger.info("Suche über Budget (%s): %s", reason, fts_query)
+    return {
+        "results": [],
+        "has_more": False,
+        "too_broad": True,
+        "reason": reason,
+        "message": "Suche zu breit, bitte Suchbegriff präzisieren oder Filter setzen",
+        "mode": mode,
+    }
+
+
+def _search_filters(
+    source: Optional[str], source_labels: Optional[List[str]], extension: Optional[str], time_filter: Optional[str]
+) -> Dict[str, Any]:
+    filters: Dict[str, Any] = {}
+    label_filter = [s.strip() for s in (source_labels or []) if s and s.strip()]
+    if source and not label_filter:
+        label_filter = [source]
+    if label_filter:
+        filters["source_labels"] = label_filter
+    if extension:
+        filters["extension"] = extension.lower()
+    if time_filter:
+        filters["time_filter"] = time_filter
+    return filters
+
+
+def _facet_names(facets: Optional[str]) -> tuple:
+    if not facets:
+        return ()
+    requested = [name.strip().lower() for name in facets.split(",") if name.strip()]
+    unknown = set(requested) - set(db.FACETS) - {"all"}
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Facette: {', '.join(sorted(unknown))}")
+    return db.FACETS if "all" in requested else tuple(n for n in db.FACETS if n in requested)
+
+
+def _search_table(mode: SearchMode) -> str:
+    return db.TRIGRAM_TABLE if mode == SearchMode.SUBSTRING else db.FTS_TABLE
+
+
+def _narrow_prefixes(conn, fts_query: str, mode: SearchMode) -> Tuple[str, List[Dict[str, Any]]]:
+    # Begriffsstatistik gehört zu documents_fts; Teilwortsuche hat keine Präfixe
+    if mode == SearchMode.SUBSTRING or fts_query == "*" or not search_vocab.max_cost():
+        return fts_query, []
+    return search_vocab.narrow_query(search_vocab.get_vocab(conn), fts_query)
+
+
+def _expand_fuzzy(conn, fts_query: str, mode: SearchMode) -> Tuple[str, List[Dict[str, Any]]]:
+    if mode != SearchMode.FUZZY or fts_query == "*":
+        return fts_query, []
+    # bauen nur, wo auch indexiert wird; sonst nur die Datei des Indexers mappen
+    build = not (index_runner.is_external() or snapshot.is_follower())
+    return search_fuzzy.expand_query(search_fuzzy.get_index(conn, build=build), fts_query)
+
+
 def ensure_metrics_background() -> None:
     global _metrics_thread_started
     with _metrics_thread_lock:
@@ -368,7 +407,9 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
     get_admin_password()
     ensure_app_secret()
     ensure_dirs(config)
-    init_quarantine_state(config)
+    follower = snapshot.is_follower()
+    if not follower:
+        init_quarantine_state(config)
     db.init_db()
     metrics.init_metrics()
     ensure_metrics_background()
@@ -385,22 +426,34 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         detail = result.message or "Netzlaufwerk nicht bereit"
         return JSONResponse({"status": "not_ready", "detail": detail, "issues": issues}, status_code=503)
 
-    global _auto_scheduler
-    if not os.getenv("AUTO_INDEX_DISABLE", "").lower() == "1" and not os.getenv("PYTEST_CURRENT_TEST"):
-        def scheduler_readiness():
-            try:
-                cfg_local = load_config()
-                roots_local = resolve_active_roots(cfg_local)
-            except Exception as exc:
-                base_path = config_db.get_setting("base_data_root", "/data") or "/data"
-                issue = readiness.ReadinessIssue(source="*", path=str(base_path), reason=str(exc))
-                return readiness.ReadinessResult(ok=False, issues=[issue])
-            return check_sources_readiness_for_index(roots_local)
+    global _auto_scheduler, _maintenance_scheduler, _snapshot_worker, _reconcile_scheduler
+    # Follower lesen nur veröffentlichte Snapshots: kein Indexer, keine Scheduler
+    external_indexer = follower or index_runner.indexer_mode() == "external"
+    if follower:
+        _snapshot_worker = snapshot.SnapshotFollower()
+        try:
+            _snapshot_worker.adopt_latest()
+        except Exception as exc:
+            _snapshot_worker.last_error = str(exc)
+            logger.error("Snapshot-Übernahme beim Start fehlgeschlagen: %s", exc)
+        if not os.getenv("PYTEST_CURRENT_TEST"):
+            _snapshot_worker.start()
+    elif not external_indexer and snapshot.snapshot_dir() is not None and not os.getenv("PYTEST_CURRENT_TEST"):
+        _snapshot_worker = snapshot.SnapshotPublisher(index_runner.active_runs)
+        _snapshot_worker.start()
+    if not external_indexer and not os.getenv("AUTO_INDEX_DISABLE", "").lower() == "1" and not os.getenv("PYTEST_CURRENT_TEST"):
         _auto_scheduler = AutoIndexScheduler(
             lambda **kwargs: start_index_run(resolve_roots=resolve_active_roots, **kwargs),
             readiness_checker=scheduler_readiness,
         )
         _auto_scheduler.start()
+    if not external_indexer and not os.getenv("PYTEST_CURRENT_TEST"):
+        _maintenance_scheduler = db_maintenance.MaintenanceScheduler(index_runner.active_runs)
+        _maintenance_scheduler.start()
+        _reconcile_scheduler = reconciler.ReconcileScheduler(
+            lambda: index_runner.run_reconcile("scheduled"), index_runner.active_runs
+        )
+        _reconcile_scheduler.start()
     feedback_enabled = bool(getattr(config, "feedback", None) and config.feedback.enabled)
     feedback_recipients = list(getattr(config.feedback, "recipients", []))
     app_version = read_version()
@@ -409,6 +462,12 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
 
     MAX_SEARCH_LIMIT = 500
     MIN_QUERY_LENGTH = 2
+    # mehr Vorschläge je Präfix sind nicht vorberechnet
+    MAX_SUGGEST_LIMIT = search_vocab.HEAVY_TOP
+    try:
+        FACETS_SAMPLE_ABOVE = max(0, int(os.getenv("SEARCH_FACETS_SAMPLE_ABOVE", "") or db.FACETS_SAMPLE_ABOVE))
+    except ValueError:
+        FACETS_SAMPLE_ABOVE = db.FACETS_SAMPLE_ABOVE
     DEFAULT_SEARCH_MODE = normalize_mode(getattr(config.ui, "search_default_mode", None), SearchMode.STANDARD)
     PREFIX_MINLEN = max(1, int(getattr(config.ui, "search_prefix_minlen", 4) or 4))
 
@@ -424,6 +483,21 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
     app.mount("/static", StaticFiles(directory=base_dir / "frontend/static"), name="static")
     LOG_PAGE_SIZE = 200
 
+    if follower:
+
+        @app.middleware("http")
+        async def follower_read_only(request: Request, call_next):
+            if request.method not in ("GET", "HEAD") and request.url.path.startswith(FOLLOWER_BLOCKED_PREFIXES):
+                return JSONResponse(
+                    {"status": "read_only", "detail": "Follower-Instanz: nur Suche und Vorschau"}, status_code=409
+                )
+            return await call_next(request)
+
+    def snapshot_status() -> Dict[str, Any]:
+        if follower and isinstance(_snapshot_worker, snapshot.SnapshotFollower):
+            return _snapshot_worker.status()
+        return snapshot.primary_status()
+
     @app.get("/manifest.webmanifest")
     def manifest():
         path = pwa_dir / "manifest.webmanifest"
@@ -622,6 +696,8 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
             _auto_scheduler.update_config(cfg)
             st = _auto_scheduler.status()
         else:
+            if index_runner.is_external():
+                index_runner.enqueue_command("schedule")
             st = load_status_from_db()
         return {"config": serialize_config(cfg), "status": serialize_status(st)}
 
@@ -638,7 +714,11 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
             readiness_resp = readiness_error_response(roots)
             if readiness_resp:
                 return readiness_resp
-            res = start_index_run(resolve_roots=resolve_active_roots)
+            if index_runner.is_external():
+                index_runner.enqueue_command("auto_run")
+                res = "queued"
+            else:
+                res = start_index_run(resolve_roots=resolve_active_roots)
         if res == "busy":
             raise HTTPException(status_code=409, detail="Lauf läuft bereits")
         if res == "not_ready":
@@ -650,6 +730,105 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         st = _auto_scheduler.status() if _auto_scheduler else load_status_from_db()
         return {"status": serialize_status(st)}
 
+    @app.get("/api/admin/maintenance/config")
+    def maintenance_get_config(_auth: bool = Depends(require_secret)):
+        return db_maintenance.status_snapshot()
+
+    @app.post("/api/admin/maintenance/config")
+    async def maintenance_set_config(payload: Dict[str, Any], _auth: bool = Depends(require_secret)):
+        mode = (payload.get("mode") or "daily").strip().lower()
+        if mode not in {"daily", "weekly", "interval"}:
+            raise HTTPException(status_code=400, detail="Ungültiger Modus")
+        history_mode = (payload.get("history_mode") or "delete").strip().lower()
+        if history_mode not in db_maintenance.HISTORY_MODES:
+            raise HTTPException(status_code=400, detail="Ungültiger Verlaufsmodus")
+        try:
+            cfg = db_maintenance.MaintenanceConfig(
+                enabled=bool(payload.get("enabled", False)),
+                mode=mode,
+                time=payload.get("time") or "04:00",
+                weekday=int(payload.get("weekday") or 0),
+                interval_hours=int(payload.get("interval_hours") or 24),
+                budget_seconds=max(1, int(payload.get("budget_seconds") or 300)),
+                after_run=bool(payload.get("after_run", True)),
+                allow_full_vacuum=bool(payload.get("allow_full_vacuum", False)),
+                history_keep_runs=max(0, int(payload.get("history_keep_runs", 50))),
+                history_keep_days=max(0, int(payload.get("history_keep_days", 90))),
+                history_mode=history_mode,
+            )
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Ungültige Wartungskonfiguration")
+        if _maintenance_scheduler:
+            _maintenance_scheduler.update_config(cfg)
+        else:
+            db_maintenance.persist_config(cfg)
+            if index_runner.is_external():
+                index_runner.enqueue_command("schedule")
+        return db_maintenance.status_snapshot()
+
+    @app.post("/api/admin/maintenance/run")
+    def maintenance_run(
+        budget_seconds: Optional[int] = Query(None, ge=1, le=86400),
+        tasks: Optional[str] = Query(None, description="Kommagetrennt: retention,stats,fts_merge,optimize,vacuum,checkpoint"),
+        _auth: bool = Depends(require_secret),
+    ):
+        task_list = [t.strip() for t in tasks.split(",") if t.strip()] if tasks else None
+        if task_list and any(t not in db_maintenance.TASKS for t in task_list):
+            raise HTTPException(status_code=400, detail="Unbekannte Wartungsaufgabe")
+        if index_runner.is_external():
+            index_runner.enqueue_command("maintenance", {"tasks": task_list, "budget_seconds": budget_seconds})
+            return {"status": "queued"}
+        if index_runner.active_runs():
+            raise HTTPException(status_code=409, detail="Indexlauf aktiv")
+        cfg = db_maintenance.load_config_from_db()
+        result = db_maintenance.run_maintenance(
+            task_list,
+            budget_seconds=budget_seconds or cfg.budget_seconds,
+            allow_full_vacuum=cfg.allow_full_vacuum,
+        )
+        if result.get("status") == "busy":
+            raise HTTPException(status_code=409, detail="Wartung läuft bereits")
+        return result
+
+    @app.get("/api/admin/reconcile/config")
+    def reconcile_get_config(_auth: bool = Depends(require_secret)):
+        return reconciler.status_snapshot()
+
+    @app.post("/api/admin/reconcile/config")
+    def reconcile_set_config(payload: Dict[str, Any], _auth: bool = Depends(require_secret)):
+        mode = (payload.get("mode") or "rotate").strip().lower()
+        if mode not in reconciler.MODES:
+            raise HTTPException(status_code=400, detail="Ungültiger Modus")
+        try:
+            cfg = reconciler.ReconcileConfig(
+                enabled=bool(payload.get("enabled", False)),
+                interval_minutes=max(1, int(payload.get("interval_minutes") or 60)),
+                sample_docs=max(0, int(payload.get("sample_docs", 2000))),
+                sample_dirs=max(0, int(payload.get("sample_dirs", 50))),
+                mode=mode,
+            )
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Ungültige Abgleich-Konfiguration")
+        if _reconcile_scheduler:
+            _reconcile_scheduler.update_config(cfg)
+        else:
+            reconciler.persist_config(cfg)
+            if index_runner.is_external():
+                index_runner.enqueue_command("schedule")
+        return reconciler.status_snapshot()
+
+    @app.post("/api/admin/reconcile/run")
+    def reconcile_run(_auth: bool = Depends(require_secret)):
+        if index_runner.is_external():
+            index_runner.enqueue_command("reconcile")
+            return {"status": "queued"}
+        result = index_runner.run_reconcile()
+        if result.get("status") == "busy":
+            raise HTTPException(status_code=409, detail=result.get("detail") or "Abgleich läuft bereits")
+        if result.get("status") == "not_ready":
+            raise HTTPException(status_code=503, detail=result.get("detail") or "Netzlaufwerk nicht bereit")
+        return result
+
     @app.post("/api/feedback")
     async def submit_feedback(payload: Dict[str, Any], request: Request, _auth: bool = Depends(require_secret)):
         if not feedback_enabled:
@@ -682,7 +861,8 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         return {"status": "ok"}
 
     @app.get("/api/search")
-    def search(
+    async def search(
+        request: Request,
         q: str = Query("", description="Suchbegriff"),
         source: Optional[str] = None,
         source_labels: Optional[list[str]] = Query(None, alias="source_labels"),
@@ -692,51 +872,218 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         sort_dir: Optional[str] = None,
         limit: int = 200,
         offset: int = 0,
-        mode: Optional[str] = Query(None, description="Suchmodus (strict|standard|loose)"),
+        cursor: Optional[str] = Query(None, description="next_cursor der vorigen Seite (statt offset)"),
+        mode: Optional[str] = Query(None, description="Suchmodus (strict|standard|loose|substring|fuzzy)"),
+        facets: Optional[str] = Query(None, description="Trefferzahlen je source,extension,year (kommagetrennt oder all)"),
+        snippets: bool = Query(True, description="false: Snippets per /api/search/snippets nachladen"),
         _auth: bool = Depends(require_secret),
     ):
         safe_limit = max(1, min(MAX_SEARCH_LIMIT, int(limit or 0)))
-        safe_offset = max(0, int(offset or 0))
-
-        db.init_db()
-        with db.get_conn() as conn:
-            filters = {}
-            label_filter = [s.strip() for s in (source_labels or []) if s and s.strip()]
-            if source and not label_filter:
-                label_filter = [source]
-            if label_filter:
-                filters["source_labels"] = label_filter
-            if extension:
-                filters["extension"] = extension.lower()
-            if time_filter:
-                filters["time_filter"] = time_filter
-
-            raw_q = (q or "").strip()
-            if raw_q and raw_q != "*" and len(raw_q) < MIN_QUERY_LENGTH:
-                return {"results": [], "has_more": False, "message": f"Suchbegriff zu kurz (min. {MIN_QUERY_LENGTH} Zeichen)"}
-
-            effective_mode = normalize_mode(mode, DEFAULT_SEARCH_MODE)
-            plan = build_search_plan(raw_q, effective_mode, PREFIX_MINLEN, allow_wildcard=bool(filters))
-            if plan.empty_reason:
-                return {"results": [], "has_more": False, "message": plan.empty_reason}
-
-            fetch_limit = safe_limit + 1  # eine mehr holen, um has_more zu erkennen
-            rows = db.search_documents(
-                conn,
-                plan.fts_query or "",
-                limit=fetch_limit,
-                offset=safe_offset,
-                filters=filters,
-                sort_key=sort_key,
-                sort_dir=sort_dir,
-            )
-            has_more = len(rows) > safe_limit
-            rows = rows[:safe_limit]
-            return {
-                "results": [dict(row) for row in rows],
-                "has_more": has_more,
-                "mode": effective_mode.value,
-            }
+        safe_offset = 0 if cursor else max(0, int(offset or 0))
+        facet_names = _facet_names(facets)
+
+        def run(cancel: threading.Event) -> Dict[str, Any]:
+            with db.read_conn() as conn:
+                filters = _search_filters(source, source_labels, extension, time_filter)
+
+                raw_q = (q or "").strip()
+                if raw_q and raw_q != "*" and len(raw_q) < MIN_QUERY_LENGTH:
+                    return {"results": [], "has_more": False, "message": f"Suchbegriff zu kurz (min. {MIN_QUERY_LENGTH} Zeichen)"}
+
+                effective_mode = normalize_mode(mode, DEFAULT_SEARCH_MODE)
+                plan = build_search_plan(raw_q, effective_mode, PREFIX_MINLEN, allow_wildcard=bool(filters))
+                if plan.empty_reason:
+                    return {"results": [], "has_more": False, "message": plan.empty_reason}
+                fts_query, expanded = _expand_fuzzy(conn, plan.fts_query or "", effective_mode)
+                fts_query, narrowed = _narrow_prefixes(conn, fts_query, effective_mode)
+
+                cache = search_cache.get_cache()
+                cache_key = search_cache.make_key(
+                    fts_query,
+                    effective_mode.value,
+                    filters,
+                    sort_key,
+                    sort_dir,
+                    safe_limit,
+                    safe_offset,
+                    cursor,
+                    facet_names,
+                    snippets,
+                )
+                # Generation vor der Suche lesen: ein Commit dazwischen macht den Eintrag nur früher ungültig
+                generation = db.cache_generation(conn) if cache.enabled else None
+                cached = cache.get(generation, cache_key) if cache.enabled else None
+                if cached is not None:
+                    return {**cached, "mode": effective_mode.value}
+
+                search_budget.record("searches")
+                budget = search_budget.Budget.from_env(cancel)
+                started = time.perf_counter()
+                fetch_limit = safe_limit + 1  # eine mehr holen, um has_more zu erkennen
+                try:
+                    with budget.guard(conn):
+                        rows = db.search_documents(
+                            conn,
+                            fts_query,
+                            limit=fetch_limit,
+                            offset=safe_offset,
+                            filters=filters,
+                            sort_key=sort_key,
+                            sort_dir=sort_dir,
+                            cursor=cursor,
+                            snippets=snippets,
+                            table=_search_table(effective_mode),
+                        )
+                except ValueError as exc:
+                    raise HTTPException(status_code=400, detail=str(exc))
+                except search_budget.QueryAborted as exc:
+                    return _aborted_search(exc.reason, fts_query, effective_mode.value)
+                has_more = len(rows) > safe_limit
+                rows = rows[:safe_limit]
+                next_cursor = (
+                    db.encode_search_cursor(fts_query, sort_key, sort_dir, rows[-1]) if has_more else None
+                )
+                results = [{k: row[k] for k in row.keys() if k != "sort_value"} for row in rows]
+                payload: Dict[str, Any] = {"results": results, "has_more": has_more, "next_cursor": next_cursor}
+                if narrowed:
+                    payload["narrowed"] = narrowed
+                if expanded:
+                    payload["expanded"] = expanded
+                if facet_names:
+                    try:
+                        with budget.guard(conn):
+                            payload["facets"] = db.search_facets(
+                                conn,
+                                fts_query,
+                                filters,
+                                facet_names,
+                                sample_above=FACETS_SAMPLE_ABOVE,
+                                table=_search_table(effective_mode),
+                            )
+                    except search_budget.QueryAborted as exc:
+                        if exc.reason == "cancelled":
+                            return _aborted_search(exc.reason, fts_query, effective_mode.value)
+                        # Treffer sind vollständig, nur die Zählung fehlt: Teilergebnis, nicht cachen
+                        search_budget.record("partial")
+                        return {**payload, "partial": True, "mode": effective_mode.value}
+                if cache.enabled:
+                    cost = time.perf_counter() - started
+                    cache.put(generation, cache_key, payload, search_cache.estimate_size(results), cost)
+                return {**payload, "mode": effective_mode.value}
+
+        # Frontend bricht veraltete Anfragen per AbortController ab; ohne Wächter liefe die Abfrage
+        # im Threadpool bis zum Ende weiter
+        cancel = threading.Event()
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, cancel))
+        try:
+            return await run_in_threadpool(run, cancel)
+        finally:
+            watcher.cancel()
+
+    @app.get("/api/search/facets")
+    async def search_facets(
+        request: Request,
+        q: str = Query("", description="Suchbegriff wie bei /api/search"),
+        source: Optional[str] = None,
+        source_labels: Optional[list[str]] = Query(None, alias="source_labels"),
+        extension: Optional[str] = None,
+        time_filter: Optional[str] = None,
+        mode: Optional[str] = Query(None, description="Suchmodus (strict|standard|loose|substring|fuzzy)"),
+        facets: str = Query("source,extension", description="source,extension,year (kommagetrennt oder all)"),
+        _auth: bool = Depends(require_secret),
+    ):
+        # Nur Trefferzahlen, ohne Trefferseite: Frontend lädt sie getrennt und nur bei Bedarf nach
+        facet_names = _facet_names(facets)
+        if not facet_names:
+            return {"facets": None}
+
+        def run(cancel: threading.Event) -> Dict[str, Any]:
+            with db.read_conn() as conn:
+                filters = _search_filters(source, source_labels, extension, time_filter)
+                raw_q = (q or "").strip()
+                if raw_q and raw_q != "*" and len(raw_q) < MIN_QUERY_LENGTH:
+                    return {"facets": None}
+                effective_mode = normalize_mode(mode, DEFAULT_SEARCH_MODE)
+                plan = build_search_plan(raw_q, effective_mode, PREFIX_MINLEN, allow_wildcard=bool(filters))
+                if plan.empty_reason:
+                    return {"facets": None}
+                fts_query, _expanded = _expand_fuzzy(conn, plan.fts_query or "", effective_mode)
+                fts_query, _narrowed = _narrow_prefixes(conn, fts_query, effective_mode)
+                table = _search_table(effective_mode)
+                cache = search_cache.get_cache()
+                cache_key = ("facets", search_cache.make_key(fts_query, table, filters, None, None, 0, 0, facets=facet_names))
+                generation = db.cache_generation(conn) if cache.enabled else None
+                cached = cache.get(generation, cache_key) if cache.enabled else None
+                if cached is not None:
+                    return {"facets": cached}
+                started = time.perf_counter()
+                try:
+                    with search_budget.Budget.from_env(cancel).guard(conn):
+                        found = db.search_facets(
+                            conn, fts_query, filters, facet_names, sample_above=FACETS_SAMPLE_ABOVE, table=table
+                        )
+                except search_budget.QueryAborted as exc:
+                    search_budget.record(exc.reason)
+                    flag = "cancelled" if exc.reason == "cancelled" else "too_broad"
+                    return {"facets": None, flag: True}
+                if cache.enabled:
+                    values = sum(len(items) for items in found.values() if isinstance(items, list))
+                    size = search_cache.ENTRY_OVERHEAD + search_cache.FIELD_OVERHEAD * values
+                    cache.put(generation, cache_key, found, size, time.perf_counter() - started)
+                return {"facets": found}
+
+        cancel = threading.Event()
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, cancel))
+        try:
+            return await run_in_threadpool(run, cancel)
+        finally:
+            watcher.cancel()
+
+    @app.get("/api/search/snippets")
+    def search_snippets(
+        q: str = Query("", description="Suchbegriff wie bei /api/search"),
+        ids: list[int] = Query([], description="Dokument-IDs (mehrfach)"),
+        mode: Optional[str] = Query(None, description="Suchmodus (strict|standard|loose|substring|fuzzy)"),
+        _auth: bool = Depends(require_secret),
+    ):
+        doc_ids = tuple(sorted(set(ids)))[:MAX_SEARCH_LIMIT]
+        effective_mode = normalize_mode(mode, DEFAULT_SEARCH_MODE)
+        plan = build_search_plan((q or "").strip(), effective_mode, PREFIX_MINLEN, allow_wildcard=False)
+        if plan.empty_reason or not plan.fts_query or not doc_ids:
+            return {"snippets": {}}
+        with db.read_conn() as conn:
+            fts_query, _expanded = _expand_fuzzy(conn, plan.fts_query, effective_mode)
+            fts_query, _narrowed = _narrow_prefixes(conn, fts_query, effective_mode)
+            cache = search_cache.get_cache()
+            table = _search_table(effective_mode)
+            cache_key = ("snippets", table, fts_query, doc_ids)
+            generation = db.cache_generation(conn) if cache.enabled else None
+            cached = cache.get(generation, cache_key) if cache.enabled else None
+            if cached is not None:
+                return {"snippets": cached}
+            started = time.perf_counter()
+            try:
+                with search_budget.Budget.from_env().guard(conn):
+                    snippets = db.search_snippets(conn, fts_query, doc_ids, table)
+            except search_budget.QueryAborted as exc:
+                search_budget.record(exc.reason)
+                return {"snippets": {}, "too_broad": True}
+            found = {str(doc_id): text for doc_id, text in snippets.items()}
+            if cache.enabled:
+                size = search_cache.ENTRY_OVERHEAD + sum(len(text or "") for text in found.values())
+                cache.put(generation, cache_key, found, size, time.perf_counter() - started)
+            return {"snippets": found}
+
+    @app.get("/api/suggest")
+    def suggest(
+        q: str = Query("", description="Eingabe im Suchfeld"),
+        limit: int = Query(8, description="Höchstzahl je Art (Wörter, Titel)"),
+        _auth: bool = Depends(require_secret),
+    ):
+        # aus der Begriffsstatistik im Speicher, ohne FTS-Abfrage; vor dem ersten Laden leer
+        with db.read_conn() as conn:
+            vocab = search_vocab.get_vocab(conn)
+        return search_vocab.suggest(vocab, q, max(1, min(MAX_SUGGEST_LIMIT, int(limit or 0))))
 
     @app.get("/api/sources")
     def list_sources(_auth: bool = Depends(require_secret)):
@@ -759,7 +1106,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
     def document_details(doc_id: int, request: Request, _auth: bool = Depends(require_secret)):
         t_start = time.perf_counter()
         is_test, test_run_id = get_test_flags(request)
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             row = db.get_document(conn, doc_id)
             if not row:
                 raise HTTPException(status_code=404, detail="Dokument nicht gefunden")
@@ -797,7 +1144,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
     ):
         is_test, test_run_id = get_test_flags(request)
         t_start = time.perf_counter()
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             row = db.get_document(conn, doc_id)
         if not row:
             raise HTTPException(status_code=404, detail="Dokument nicht gefunden")
@@ -1046,7 +1393,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
             status = start_index_run(cfg_override=cfg, roots_override=roots_override, resolve_roots=resolve_active_roots, reason="upload")
             if status == "busy":
                 index_status = "busy"
-            elif status == "started":
+            elif status in {"started", "queued"}:
                 index_status = "indexing"
             else:
                 index_status = status
@@ -1162,10 +1509,6 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
 
     @app.get("/api/admin/status")
     def admin_status(request: Request, _auth: bool = Depends(require_secret)):
-        try:
-            db.init_db()
-        except Exception as exc:
-            logger.error("DB-Init fehlgeschlagen: %s", exc)
         try:
             file_ops.refresh_quarantine_state()
         except Exception as exc:
@@ -1193,7 +1536,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
             ]
         admin_flag = is_admin(request)
         try:
-            with db.get_conn() as conn:
+            with db.read_conn() as conn:
                 status = db.get_status(conn)
                 ext_counts = [
                     {"extension": row["extension"], "count": row["c"]}
@@ -1213,6 +1556,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
                     "quarantine_auto_purge_enabled": ops_state.get("quarantine_auto_purge_enabled"),
                     "index_exclude_dirs": getattr(config.indexer, "exclude_dirs", []),
                     "total_docs": int(status["total_docs"]),
+                    "total_bytes": int(status["total_bytes"]),
                     "ext_counts": ext_counts,
                     "last_run": last_run,
                     "recent_runs": recent_runs,
@@ -1220,6 +1564,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
                     "send_report_enabled": config_db.get_setting("send_report_enabled", "0") == "1",
                     "sources_ready": sources_ready,
                     "source_issues": source_issues,
+                    "snapshot": snapshot_status(),
                 }
         except Exception as exc:
             logger.error("Admin-Status fehlgeschlagen: %s", exc, exc_info=True)
@@ -1328,7 +1673,11 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         return {"status": "ok"}
 
     @app.post("/api/admin/index/run")
-    def trigger_index(full_reset: bool = Query(False), _auth: bool = Depends(require_secret)):
+    def trigger_index(
+        full_reset: bool = Query(False),
+        mode: Optional[str] = Query(None, description="Neuaufbau: shadow|clear"),
+        _auth: bool = Depends(require_secret),
+    ):
         cfg = load_config()
         try:
             roots = resolve_active_roots(cfg)
@@ -1337,7 +1686,13 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         readiness_resp = readiness_error_response(roots)
         if readiness_resp:
             return readiness_resp
-        status = start_index_run(full_reset, cfg_override=cfg, roots_override=roots, resolve_roots=resolve_active_roots)
+        status = start_index_run(
+            full_reset,
+            cfg_override=cfg,
+            roots_override=roots,
+            resolve_roots=resolve_active_roots,
+            shadow=index_runner.rebuild_mode(mode) == "shadow",
+        )
         if status == "busy":
             return JSONResponse({"status": "busy"}, status_code=409)
         if status == "not_ready":
@@ -1346,14 +1701,22 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
 
     @app.post("/api/admin/index/reset")
     def reset_index(_auth: bool = Depends(require_secret)):
+        if index_runner.is_external():
+            index_runner.enqueue_command("reset")
+            return {"status": "queued"}
         try:
-            index_runner.clear_index_files()
+            status = index_runner.reset_index()
         except Exception as exc:
             return JSONResponse({"status": "error", "detail": str(exc)}, status_code=500)
-        return {"status": "cleared"}
+        if status == "busy":
+            return JSONResponse({"status": "busy"}, status_code=409)
+        return {"status": status}
 
     @app.post("/api/admin/index/reset_run")
-    def reset_and_run(_auth: bool = Depends(require_secret)):
+    def reset_and_run(
+        mode: Optional[str] = Query(None, description="shadow: Suche bleibt verfügbar; clear: Index sofort leeren"),
+        _auth: bool = Depends(require_secret),
+    ):
         cfg = load_config()
         try:
             roots = resolve_active_roots(cfg)
@@ -1362,10 +1725,20 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         readiness_resp = readiness_error_response(roots)
         if readiness_resp:
             return readiness_resp
+        if index_runner.rebuild_mode(mode) == "shadow":
+            status = start_index_run(full_reset=True, cfg_override=cfg, roots_override=roots, reason="reset_run", shadow=True)
+            if status == "busy":
+                return JSONResponse({"status": "busy"}, status_code=409)
+            return {"status": status, "mode": "shadow"}
+        if index_runner.is_external():
+            # Worker leert den Index selbst (exklusiver Lauf), solange keine Quelle läuft
+            return {"status": index_runner.enqueue_run(full_reset=True, roots=roots, reason="reset_run", shadow=False)}
         try:
-            index_runner.clear_index_files()
+            status = index_runner.reset_index()
         except Exception as exc:
             return JSONResponse({"status": "error", "detail": str(exc)}, status_code=500)
+        if status == "busy":
+            return JSONResponse({"status": "busy"}, status_code=409)
         status = start_index_run(full_reset=False, cfg_override=cfg, roots_override=roots, reason="reset_run", resolve_roots=resolve_active_roots)
         if status == "busy":
             return JSONResponse({"status": "busy"}, status_code=409)
@@ -1374,10 +1747,15 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         return {"status": status}
 
     @app.post("/api/admin/index/stop")
-    def stop_index(_auth: bool = Depends(require_secret)):
-        stop_event.set()
-        # writer will flush and status will be "stopped"
-        return {"status": "stopping"}
+    def stop_index(
+        source: Optional[str] = Query(None, description="nur die Läufe dieser Quelle stoppen, sonst alle"),
+        _auth: bool = Depends(require_secret),
+    ):
+        if index_runner.is_external():
+            index_runner.enqueue_command("stop", {"source": source} if source else None)
+            return {"status": "stopping"}
+        # Writer schreibt fertig, der Lauf endet mit Status "stopped"; andere Quellen laufen weiter
+        return {"status": "stopping" if request_stop(source) else "idle"}
 
     def get_send_report_enabled() -> bool:
         env_val = os.getenv("SEND_REPORT_ENABLED")
@@ -1409,8 +1787,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
 
     @app.get("/api/admin/errors")
     def admin_errors(limit: int = 50, offset: int = 0, _auth: bool = Depends(require_secret)):
-        db.init_db()
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             rows = db.list_errors(conn, limit=limit, offset=offset)
             total = db.error_count(conn)
             return {"errors": [dict(r) for r in rows], "total": total}
@@ -1464,9 +1841,8 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         heartbeat_age = None
         if heartbeat_ts:
             heartbeat_age = max(0, int(time.time()) - int(heartbeat_ts))
-        db.init_db()
         last_run = None
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             row = db.get_last_run(conn)
             if row:
                 last_run = dict(row)
@@ -1477,6 +1853,11 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
             "last_run": last_run,
             "version": read_version(),
             "live": live,
+            "runs": get_live_statuses(),
+            "running_sources": index_runner.running_sources(),
+            "worker": index_runner.worker_status() if index_runner.is_external() else {"mode": "inprocess"},
+            "maintenance": db_maintenance.status_snapshot(),
+            "reconcile": reconciler.status_snapshot(),
         }
 
     @app.get("/api/admin/index/run/{run_id}/events")
@@ -1487,7 +1868,7 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         action: Optional[str] = Query(None, description="added|updated|removed"),
         _auth: bool = Depends(require_secret),
     ):
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             events = db.list_index_events(conn, run_id, limit=limit, offset=offset, action=action)
         return {"run_id": run_id, "events": [dict(ev) for ev in events]}
 
@@ -1498,13 +1879,13 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
         offset: int = Query(0, ge=0),
         _auth: bool = Depends(require_secret),
     ):
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             rows = db.list_run_errors(conn, run_id, limit=limit, offset=offset)
         return {"run_id": run_id, "errors": [dict(r) for r in rows]}
 
     @app.get("/api/admin/index/run/{run_id}/summary")
     def admin_index_run_summary(run_id: int, _auth: bool = Depends(require_secret)):
-        with db.get_conn() as conn:
+        with db.read_conn() as conn:
             data = db.summarize_run(conn, run_id)
         if not data:
             raise HTTPException(status_code=404, detail="Run nicht gefunden")
@@ -1531,6 +1912,26 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
     def admin_metrics_events(limit: int = Query(200, ge=1, le=1000), is_test: Optional[bool] = Query(None), _auth: bool = Depends(require_secret)):
         return {"events": metrics.get_recent_events(limit=limit, is_test=is_test)}
 
+    @app.get("/api/admin/metrics/db_pools")
+    def admin_metrics_db_pools(_auth: bool = Depends(require_secret)):
+        return {"pools": db_pool.all_stats()}
+
+    @app.get("/api/admin/metrics/search_cache")
+    def admin_metrics_search_cache(_auth: bool = Depends(require_secret)):
+        return search_cache.get_cache().stats()
+
+    @app.get("/api/admin/metrics/search_budget")
+    def admin_metrics_search_budget(_auth: bool = Depends(require_secret)):
+        return search_budget.stats()
+
+    @app.get("/api/admin/metrics/search_vocab")
+    def admin_metrics_search_vocab(_auth: bool = Depends(require_secret)):
+        return search_vocab.stats()
+
+    @app.get("/api/admin/metrics/search_fuzzy")
+    def admin_metrics_search_fuzzy(_auth: bool = Depends(require_secret)):
+        return search_fuzzy.stats()
+
     @app.get("/api/admin/metrics/system")
     def admin_metrics_system(limit: int = Query(240, ge=1, le=1440), _auth: bool = Depends(require_secret)):
         return {"slots": metrics.get_system_slots(limit=limit)}
@@ -1668,12 +2069,14 @@ def create_app(config: Optional[CentralConfig] = None) -> FastAPI:
 
     @app.on_event("shutdown")
     def shutdown_scheduler():
-        global _auto_scheduler
-        if _auto_scheduler:
-            try:
-                _auto_scheduler.stop()
-            except Exception:
-                pass
+        global _auto_scheduler, _maintenance_scheduler, _snapshot_worker, _reconcile_scheduler
+        for worker in (_auto_scheduler, _maintenance_scheduler, _snapshot_worker, _reconcile_scheduler):
+            if worker:
+                try:
+                    worker.stop()
+                except Exception:
+                    pass
+        _auto_scheduler = _maintenance_scheduler = _snapshot_worker = _reconcile_scheduler = None
 
     return app
 
@@ -1,24 +1,28 @@
 import os
 import sqlite3
-import threading
 from contextlib import contextmanager
 from pathlib import Path
+from typing import List
+
+from app.db import migrations, pool
 
 METRICS_DB_PATH = Path(os.getenv("METRICS_DB_PATH", "data/metrics.db"))
-_lock = threading.Lock()
+POOL_SIZE = pool.pool_size("metrics", 2)
+
+
+def _open(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return conn
 
 
 @contextmanager
 def get_conn():
     METRICS_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with _lock:
-        conn = sqlite3.connect(METRICS_DB_PATH)
-        conn.row_factory = sqlite3.Row
-    try:
+    conns = pool.get_pool("metrics", METRICS_DB_PATH, _open, POOL_SIZE, row_factory=sqlite3.Row)
+    with conns.connection() as conn:
         yield conn
         conn.commit()
-    finally:
-        conn.close()
 
 
 def _ensure_column(conn, table: str, column: str, col_type: str) -> None:
@@ -28,67 +32,83 @@ def _ensure_column(conn, table: str, column: str, col_type: str) -> None:
         conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
 
 
-def init_db() -> None:
+SCHEMA_V1 = """
+CREATE TABLE IF NOT EXISTS metrics_events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    endpoint TEXT NOT NULL,
+    doc_id INTEGER,
+    path TEXT,
+    source TEXT,
+    size_bytes INTEGER,
+    extension TEXT,
+    is_test INTEGER DEFAULT 0,
+    test_run_id TEXT,
+    server_ttfb_ms REAL,
+    server_total_ms REAL,
+    smb_first_read_ms REAL,
+    transfer_ms REAL,
+    bytes_sent INTEGER,
+    status_code INTEGER,
+    client_click_ts REAL,
+    client_resp_start_ts REAL,
+    client_resp_end_ts REAL,
+    client_render_end_ts REAL,
+    user_agent TEXT,
+    slot_ts INTEGER,
+    cause TEXT
+);
+
+CREATE TABLE IF NOT EXISTS metrics_system_slots (
+    slot_ts INTEGER PRIMARY KEY,
+    cpu_percent REAL,
+    mem_percent REAL,
+    io_wait_percent REAL,
+    net_bytes_sent INTEGER,
+    net_bytes_recv INTEGER,
+    mem_total_mb REAL,
+    mem_available_mb REAL,
+    swap_total_mb REAL,
+    swap_used_mb REAL,
+    load1 REAL,
+    cpu_steal_percent REAL,
+    disk_read_bytes INTEGER,
+    disk_write_bytes INTEGER,
+    page_faults INTEGER
+);
+"""
+
+
+def _migrate_system_slot_columns(conn) -> None:
+    _ensure_column(conn, "metrics_system_slots", "mem_total_mb", "REAL")
+    _ensure_column(conn, "metrics_system_slots", "mem_available_mb", "REAL")
+    _ensure_column(conn, "metrics_system_slots", "swap_total_mb", "REAL")
+    _ensure_column(conn, "metrics_system_slots", "swap_used_mb", "REAL")
+    _ensure_column(conn, "metrics_system_slots", "load1", "REAL")
+    _ensure_column(conn, "metrics_system_slots", "cpu_steal_percent", "REAL")
+    _ensure_column(conn, "metrics_system_slots", "disk_read_bytes", "INTEGER")
+    _ensure_column(conn, "metrics_system_slots", "disk_write_bytes", "INTEGER")
+    _ensure_column(conn, "metrics_system_slots", "page_faults", "INTEGER")
+
+
+MIGRATIONS: List[migrations.Migration] = [
+    (1, "Grundschema", lambda conn: migrations.run_script(conn, SCHEMA_V1)),
+    (2, "Systemmetriken: Speicher, Last, Disk-I/O", _migrate_system_slot_columns),
+]
+
+
+def _migrate() -> None:
     with get_conn() as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS metrics_events (
-                id INTEGER PRIMARY KEY,
-                ts REAL NOT NULL,
-                endpoint TEXT NOT NULL,
-                doc_id INTEGER,
-                path TEXT,
-                source TEXT,
-                size_bytes INTEGER,
-                extension TEXT,
-                is_test INTEGER DEFAULT 0,
-                test_run_id TEXT,
-                server_ttfb_ms REAL,
-                server_total_ms REAL,
-                smb_first_read_ms REAL,
-                transfer_ms REAL,
-                bytes_sent INTEGER,
-                status_code INTEGER,
-                client_click_ts REAL,
-                client_resp_start_ts REAL,
-                client_resp_end_ts REAL,
-                client_render_end_ts REAL,
-                user_agent TEXT,
-                slot_ts INTEGER,
-                cause TEXT
-            );
-
-            CREATE TABLE IF NOT EXISTS metrics_system_slots (
-                slot_ts INTEGER PRIMARY KEY,
-                cpu_percent REAL,
-                mem_percent REAL,
-                io_wait_percent REAL,
-                net_bytes_sent INTEGER,
-                net_bytes_recv INTEGER,
-                mem_total_mb REAL,
-                mem_available_mb REAL,
-                swap_total_mb REAL,
-                swap_used_mb REAL,
-                load1 REAL,
-                cpu_steal_percent REAL,
-                disk_read_bytes INTEGER,
-                disk_write_bytes INTEGER,
-                page_faults INTEGER
-            );
-            """
-        )
-        _ensure_column(conn, "metrics_system_slots", "mem_total_mb", "REAL")
-        _ensure_column(conn, "metrics_system_slots", "mem_available_mb", "REAL")
-        _ensure_column(conn, "metrics_system_slots", "swap_total_mb", "REAL")
-        _ensure_column(conn, "metrics_system_slots", "swap_used_mb", "REAL")
-        _ensure_column(conn, "metrics_system_slots", "load1", "REAL")
-        _ensure_column(conn, "metrics_system_slots", "cpu_steal_percent", "REAL")
-        _ensure_column(conn, "metrics_system_slots", "disk_read_bytes", "INTEGER")
-        _ensure_column(conn, "metrics_system_slots", "disk_write_bytes", "INTEGER")
-        _ensure_column(conn, "metrics_system_slots", "page_faults", "INTEGER")
+        migrations.apply_migrations(conn, MIGRATIONS, "metrics")
+
+
+def init_db() -> None:
+    migrations.ensure_migrated("metrics", METRICS_DB_PATH, _migrate)
 
 
 def reset_db() -> None:
     if METRICS_DB_PATH.exists():
         METRICS_DB_PATH.unlink()
+    migrations.reset_cache(METRICS_DB_PATH)
+    pool.close_all(METRICS_DB_PATH)
     init_db()
@@ -0,0 +1,386 @@
+"""
+Stichproben-Abgleich zwischen Index und Dateisystem.
+
+Prüft je Durchgang eine Stichprobe von Dokumenten (Existenz, Größe, mtime) und Verzeichnissen
+(neue bzw. verschwundene Dateien) der aktiven, erreichbaren Quellen und repariert Abweichungen
+sofort: gezielte Upserts und Löschungen statt eines Volllaufs. Im Modus "rotate" wandert ein
+Cursor über die IDs, sodass nach ceil(Dokumente / sample_docs) Durchgängen der ganze Bestand
+geprüft ist; "random" zieht zufällig. Die Drift-Rate über die letzten Durchgänge zeigt, wie
+selten Volläufe nötig sind.
+"""
+import json
+import logging
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app import config_db
+from app.config_loader import CentralConfig
+from app.db import datenbank as db
+from app.indexer.index_lauf_service import SUPPORTED_EXTENSIONS, extract_work_item
+
+logger = logging.getLogger(__name__)
+
+MODES = ("rotate", "random")
+# Durchgänge im rollierenden Fenster (stündlich = eine Woche)
+HISTORY_PASSES = 168
+EXAMPLES_MAX = 20
+_run_lock = threading.Lock()
+
+Root = Tuple[Path, str, str]
+
+
+@dataclass
+class ReconcileConfig:
+    enabled: bool = False
+    interval_minutes: int = 60
+    sample_docs: int = 2000
+    sample_dirs: int = 50
+    mode: str = "rotate"  # rotate | random
+
+
+def load_config_from_db() -> ReconcileConfig:
+    defaults = ReconcileConfig()
+    raw = {k: config_db.get_setting(f"reconcile_{k}", None) for k in asdict(defaults)}
+
+    def as_int(val: Optional[str], default: int) -> int:
+        try:
+            return int(val) if val not in (None, "") else default
+        except ValueError:
+            return default
+
+    mode = (raw["mode"] or defaults.mode).strip().lower()
+    return ReconcileConfig(
+        enabled=defaults.enabled if raw["enabled"] in (None, "") else str(raw["enabled"]).lower() in {"1", "true"},
+        interval_minutes=max(1, as_int(raw["interval_minutes"], defaults.interval_minutes)),
+        sample_docs=max(0, as_int(raw["sample_docs"], defaults.sample_docs)),
+        sample_dirs=max(0, as_int(raw["sample_dirs"], defaults.sample_dirs)),
+        mode=mode if mode in MODES else defaults.mode,
+    )
+
+
+def persist_config(cfg: ReconcileConfig) -> None:
+    for key, value in asdict(cfg).items():
+        if isinstance(value, bool):
+            value = "1" if value else "0"
+        config_db.set_setting(f"reconcile_{key}", str(value))
+
+
+def _load_json(key: str) -> Dict[str, Any]:
+    raw = config_db.get_setting(key, "") or ""
+    try:
+        return json.loads(raw) if raw else {}
+    except ValueError:
+        return {}
+
+
+def load_state() -> Dict[str, Any]:
+    return _load_json("reconcile_state")
+
+
+def _save_state(state: Dict[str, Any]) -> None:
+    config_db.set_setting("reconcile_state", json.dumps(state))
+
+
+def _root_for(path: Path, roots: List[Root]) -> Optional[Root]:
+    # längster passender Wurzelpfad
+    best: Optional[Root] = None
+    for root in roots:
+        try:
+            path.relative_to(root[0])
+        except ValueError:
+            continue
+        if best is None or len(root[0].parts) > len(best[0].parts):
+            best = root
+    return best
+
+
+def _excluded(path: Path, root: Path, exclude: set) -> bool:
+    rel = path.relative_to(root)
+    return any(part.lower() in exclude for part in rel.parts) or str(rel).lower() in exclude
+
+
+def _listed_files(directory: Path, maildir: bool) -> Optional[List[str]]:
+    try:
+        with os.scandir(directory) as entries:
+            names = [e.name for e in entries if e.is_file(follow_symlinks=False)]
+    except FileNotFoundError:
+        return None
+    if maildir:
+        return names
+    return [n for n in names if Path(n).suffix.lower() in SUPPORTED_EXTENSIONS]
+
+
+class _Pass:
+    """Ergebnis eines Durchgangs; Reparaturen werden gesammelt und gebündelt geschrieben."""
+
+    def __init__(self, config: CentralConfig):
+        self.max_size = config.indexer.max_file_size_mb
+        self.counts = {"checked_docs": 0, "checked_files": 0, "checked_dirs": 0, "skipped": 0}
+        self.drift = {"missing": 0, "changed": 0, "new": 0}
+        self.repaired = 0
+        self.errors = 0
+        self.examples: List[Dict[str, str]] = []
+        self.removals: Dict[int, str] = {}
+        self.items: List[Dict[str, Any]] = []
+
+    def note(self, kind: str, path: str) -> None:
+        self.drift[kind] += 1
+        if len(self.examples) < EXAMPLES_MAX:
+            self.examples.append({"drift": kind, "path": path})
+
+    def remove(self, doc_id: int, path: str) -> None:
+        if doc_id not in self.removals:
+            self.removals[doc_id] = path
+            self.note("missing", path)
+
+    def reindex(self, path: Path, source: str, ext: str, kind: str) -> None:
+        item = extract_work_item(path, path, source, ext, self.max_size)
+        if item is None:
+            return
+        if item["type"] == "unchanged":
+            # über INDEX_MAX_FILE_SIZE_MB: wie im Indexlauf nicht anfassen
+            self.counts["skipped"] += 1
+            return
+        self.note(kind, str(path))
+        self.items.append(item)
+
+    def apply(self) -> None:
+        now = datetime.now(timezone.utc).isoformat()
+        with db.get_conn() as conn:
+            for doc_id in self.removals:
+                db.remove_document_by_id(conn, doc_id)
+                self.repaired += 1
+            for item in self.items:
+                if item["type"] == "document":
+                    db.upsert_document(conn, item["meta"])
+                    self.repaired += 1
+                else:
+                    self.errors += 1
+                    db.record_file_error(conn, None, item["path"], item["error_type"], item["message"], now)
+
+
+def _check_documents(rows: Iterable[Any], roots: Dict[str, Root], result: _Pass) -> None:
+    for row in rows:
+        root = roots.get(row["source"])
+        path = Path(row["path"])
+        if root is None or _root_for(path, [root]) is None:
+            result.counts["skipped"] += 1
+            continue
+        result.counts["checked_docs"] += 1
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            result.remove(row["id"], row["path"])
+            continue
+        except OSError as exc:
+            logger.warning("Abgleich: %s nicht prüfbar: %s", path, exc)
+            result.errors += 1
+            continue
+        if st.st_size != row["size_bytes"] or st.st_mtime != row["mtime"]:
+            result.reindex(path, row["source"], row["extension"], "changed")
+
+
+def _check_dirs(conn, rows: Iterable[Any], roots: List[Root], exclude: set, result: _Pass) -> None:
+    for row in rows:
+        directory = Path(row["path"])
+        root = _root_for(directory, roots)
+        if root is None or _excluded(directory, root[0], exclude):
+            result.counts["skipped"] += 1
+            continue
+        maildir = (root[2] or "file") == "maildir"
+        if maildir and directory.name.lower() not in {"cur", "new"}:
+            continue
+        result.counts["checked_dirs"] += 1
+        indexed = db.list_documents_in_dir(conn, row["path"])
+        try:
+            on_disk = _listed_files(directory, maildir)
+        except OSError as exc:
+            logger.warning("Abgleich: Verzeichnis %s nicht lesbar: %s", directory, exc)
+            result.errors += 1
+            continue
+        names = set(on_disk or [])
+        result.counts["checked_files"] += len(names | set(indexed))
+        for name, doc in indexed.items():
+            if name not in names:
+                result.remove(doc["id"], doc["path"])
+        for name in sorted(names - set(indexed)):
+            path = directory / name
+            result.reindex(path, root[1], ".eml" if maildir else path.suffix.lower(), "new")
+
+
+def _window(history: List[Dict[str, Any]], total_docs: int, mode: str) -> Dict[str, Any]:
+    checked = sum(h.get("checked", 0) for h in history)
+    drifted = sum(h.get("drift", 0) for h in history)
+    docs = sum(h.get("docs", 0) for h in history)
+    if total_docs <= 0:
+        coverage = 1.0
+    elif mode == "rotate":
+        coverage = min(1.0, docs / total_docs)
+    else:
+        # erwarteter Anteil verschiedener Dokumente bei zufälliger Ziehung
+        coverage = 1.0 - math.exp(-docs / total_docs)
+    return {
+        "passes": len(history),
+        "checked": checked,
+        "drift": drifted,
+        "drift_rate": round(drifted / checked, 6) if checked else None,
+        "coverage": round(coverage, 4),
+    }
+
+
+def run_reconcile(
+    config: CentralConfig,
+    roots: Iterable[Root],
+    cfg: Optional[ReconcileConfig] = None,
+    reason: str = "manual",
+) -> Dict[str, Any]:
+    """
+    Ein Durchgang über die Stichprobe der übergebenen (erreichbaren) Quellen; nicht übergebene
+    Quellen werden nicht angefasst. Ergebnis und Cursor liegen in der Config-DB.
+    """
+    if not _run_lock.acquire(blocking=False):
+        return {"status": "busy"}
+    try:
+        cfg = cfg or load_config_from_db()
+        root_list = [(Path(r[0]), r[1], r[2] if len(r) > 2 else "file") for r in roots]
+        by_label = {r[1]: r for r in root_list}
+        exclude = {p.lower() for p in getattr(config.indexer, "exclude_dirs", []) if p}
+        state = load_state()
+        started = datetime.now(timezone.utc)
+        result = _Pass(config)
+        rotate = cfg.mode == "rotate"
+        with db.read_conn() as conn:
+            total_docs = int(db.get_status(conn)["total_docs"])
+            doc_rows = db.sample_documents(conn, cfg.sample_docs, state.get("doc_cursor", 0) if rotate else None)
+            dir_rows = db.sample_dirs(conn, cfg.sample_dirs, state.get("dir_cursor", 0) if rotate else None)
+            _check_documents(doc_rows, by_label, result)
+            _check_dirs(conn, dir_rows, root_list, exclude, result)
+        if result.removals or result.items:
+            result.apply()
+        if rotate:
+            if len(doc_rows) < cfg.sample_docs:
+                state["doc_cursor"] = 0
+                state["cycles"] = int(state.get("cycles", 0)) + 1
+                state["cycle_finished_at"] = started.isoformat()
+            else:
+                state["doc_cursor"] = doc_rows[-1]["id"]
+            state["dir_cursor"] = dir_rows[-1]["id"] if len(dir_rows) >= cfg.sample_dirs and dir_rows else 0
+        checked = result.counts["checked_docs"] + result.counts["checked_files"]
+        drifted = sum(result.drift.values())
+        history = (state.get("history") or [])[-(HISTORY_PASSES - 1):]
+        history.append({"at": started.isoformat(), "docs": len(doc_rows), "checked": checked, "drift": drifted})
+        state["history"] = history
+        summary = {
+            "status": "completed",
+            "reason": reason,
+            "mode": cfg.mode,
+            "started_at": started.isoformat(),
+            "duration_sec": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+            "sources": sorted(by_label),
+            **result.counts,
+            "drift": result.drift,
+            "drift_rate": round(drifted / checked, 6) if checked else None,
+            "repaired": result.repaired,
+            "errors": result.errors,
+            "examples": result.examples,
+            "window": _window(history, total_docs, cfg.mode),
+        }
+        state["last"] = summary
+        _save_state(state)
+    finally:
+        _run_lock.release()
+    logger.info(
+        "Abgleich (%s): %s Dokumente, %s Verzeichnisse geprüft, Drift %s, %s repariert",
+        reason,
+        summary["checked_docs"],
+        summary["checked_dirs"],
+        result.drift,
+        result.repaired,
+    )
+    return summary
+
+
+def next_run_at(cfg: ReconcileConfig, state: Optional[Dict[str, Any]] = None) -> Optional[datetime]:
+    if not cfg.enabled:
+        return None
+    last = ((state if state is not None else load_state()).get("last") or {}).get("started_at")
+    now = datetime.now(timezone.utc)
+    if not last:
+        return now
+    try:
+        return max(now, datetime.fromisoformat(last) + timedelta(minutes=cfg.interval_minutes))
+    except ValueError:
+        return now
+
+
+def status_snapshot() -> Dict[str, Any]:
+    cfg = load_config_from_db()
+    state = load_state()
+    nxt = next_run_at(cfg, state)
+    return {
+        "config": asdict(cfg),
+        "last": state.get("last"),
+        "cycles": state.get("cycles", 0),
+        "cycle_finished_at": state.get("cycle_finished_at"),
+        "next_run_at": nxt.isoformat() if nxt else None,
+    }
+
+
+class ReconcileScheduler:
+    """
+    Startet den Abgleich im Intervall; während Indexläufen wird verschoben.
+    run: führt einen Durchgang aus (Quellen und Bereitschaft bestimmt der Aufrufer).
+    """
+
+    def __init__(self, run: Callable[[], Dict[str, Any]], active_runs: Callable[[], int]):
+        self._run = run
+        self._active_runs = active_runs
+        self._stop_event = threading.Event()
+        self._poke_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run_loop, daemon=True)
+        self._thread.start()
+        logger.info("Abgleich-Scheduler gestartet")
+
+    def stop(self):
+        self._stop_event.set()
+        self._poke_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def update_config(self, cfg: ReconcileConfig):
+        persist_config(cfg)
+        self._poke_event.set()
+
+    def _run_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                nxt = next_run_at(load_config_from_db())
+                if nxt is None:
+                    self._wait_for(300)
+                    continue
+                wait_sec = (nxt - datetime.now(timezone.utc)).total_seconds()
+                if wait_sec > 0 and self._wait_for(wait_sec):
+                    continue
+                if self._active_runs() > 0:
+                    self._wait_for(60)
+                    continue
+                if (self._run() or {}).get("status") != "completed":
+                    self._wait_for(60)
+            except Exception as exc:
+                logger.error("Abgleich-Scheduler-Loop Fehler: %s", exc)
+                self._wait_for(60)
+
+    def _wait_for(self, seconds: float) -> bool:
+        self._poke_event.clear()
+        return self._poke_event.wait(timeout=seconds) or self._stop_event.is_set()
@@ -208,11 +208,7 @@ def load_run_report_data(run_id: int) -> Dict[str, Any]:
         run = conn.execute("SELECT * FROM index_runs WHERE id = ?", (run_id,)).fetchone()
         if not run:
             raise ValueError(f"Run {run_id} nicht gefunden")
-        action_counts: Dict[str, int] = {}
-        for row in conn.execute(
-            "SELECT action, COUNT(*) as c FROM index_run_events WHERE run_id = ? GROUP BY action", (run_id,)
-        ):
-            action_counts[row["action"]] = row["c"]
+        action_counts = db.run_action_counts(conn, run_id)
         events: Dict[str, List[Dict[str, Any]]] = {"added": [], "updated": [], "removed": []}
         for row in db.list_all_index_events(conn, run_id):
             events.setdefault(row["action"], []).append(dict(row))
@@ -0,0 +1,118 @@
+"""
+Zeit- und Schrittbudget für Suchabfragen.
+
+SQLite ruft den Progress-Handler alle PROGRESS_INTERVAL VM-Schritte auf; liefert er einen Wert
+ungleich 0, bricht die laufende Anweisung mit "interrupted" ab (Wirkung wie sqlite3_interrupt,
+aber an die Verbindung des Aufrufers gebunden, daher kein Wettlauf mit dem Pool, falls die
+Verbindung schon an die nächste Anfrage ging). Geprüft werden Frist, Schrittzahl und ein
+Abbruch-Event, das /api/search setzt, sobald der Client die Verbindung schließt.
+
+FTS5 expandiert Präfixe (wo* OR re*) ohne VM-Schritte: zwischen zwei Prüfungen liegen dort bis
+~100 ms, und das Schrittbudget zählt diese Arbeit nicht mit. Maßgeblich ist daher die Frist.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+PROGRESS_INTERVAL = 1000
+
+
+class QueryAborted(Exception):
+    """
+    Abfrage vorzeitig beendet; reason ist timeout, steps oder cancelled.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, "") or default))
+    except ValueError:
+        return default
+
+
+def timeout_ms() -> int:
+    return _env_int("SEARCH_TIMEOUT_MS", 2000)
+
+
+def max_steps() -> int:
+    return _env_int("SEARCH_MAX_STEPS", 0)
+
+
+class Budget:
+    """
+    Budget einer Anfrage; gilt über alle Anweisungen, die unter guard() laufen (Suche, Facetten).
+    seconds/steps = 0: unbegrenzt.
+    """
+
+    def __init__(self, seconds: float = 0.0, steps: int = 0, cancel: Optional[threading.Event] = None):
+        self.deadline = time.monotonic() + seconds if seconds > 0 else None
+        self.max_steps = max(0, int(steps))
+        self.cancel = cancel
+        self.steps = 0
+        self.reason: Optional[str] = None
+        self._interval = PROGRESS_INTERVAL
+
+    @classmethod
+    def from_env(cls, cancel: Optional[threading.Event] = None) -> "Budget":
+        return cls(timeout_ms() / 1000, max_steps(), cancel)
+
+    def _check(self) -> int:
+        self.steps += self._interval
+        if self.reason is None:
+            if self.cancel is not None and self.cancel.is_set():
+                self.reason = "cancelled"
+            elif self.deadline is not None and time.monotonic() > self.deadline:
+                self.reason = "timeout"
+            elif self.max_steps and self.steps > self.max_steps:
+                self.reason = "steps"
+        return 1 if self.reason else 0
+
+    @contextmanager
+    def guard(self, conn: sqlite3.Connection) -> Iterator["Budget"]:
+        """
+        Überwacht conn für die Dauer des Blocks; ein Abbruch erscheint als QueryAborted.
+        """
+        if self.deadline is None and not self.max_steps and self.cancel is None:
+            yield self
+            return
+        self._interval = PROGRESS_INTERVAL
+        conn.set_progress_handler(self._check, self._interval)
+        try:
+            yield self
+        except sqlite3.OperationalError as exc:
+            if self.reason:
+                raise QueryAborted(self.reason) from exc
+            raise
+        finally:
+            conn.set_progress_handler(None, 0)
+
+
+_stats = {"searches": 0, "timeout": 0, "steps": 0, "cancelled": 0, "partial": 0}
+_stats_lock = threading.Lock()
+
+
+def record(event: str) -> None:
+    with _stats_lock:
+        _stats[event] = _stats.get(event, 0) + 1
+
+
+def stats() -> Dict[str, Any]:
+    """
+    searches zählt ausgeführte Suchen (ohne Cache-Treffer); timeout/steps/cancelled enthalten
+    auch nachgeladene Snippets, partial = Treffer ohne Facetten.
+    """
+    with _stats_lock:
+        return {"timeout_ms": timeout_ms(), "max_steps": max_steps(), **_stats}
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,193 @@
+"""
+In-Process-Cache für Suchergebnisse.
+
+Schlüssel ist die normalisierte Anfrage (FTS-Ausdruck des SearchPlan, Modus, Filter, Sortierung,
+Seite). Gültig ist ein Eintrag nur für die Index-Generation, unter der er entstand: jeder Commit,
+der Dokumente ändert, erhöht den Zähler in index_counters; Schattentausch und Reset ändern
+Umschalt-Generation bzw. DB-Kennung. Sieht der Cache eine neue Generation, verwirft er alle Einträge.
+Verdrängung nach LRU, begrenzt durch geschätzte Größe und Anzahl. Relative Zeitfilter
+(heute, letzte 7 Tage) altern ohne Commit, daher zusätzlich eine Höchstlebensdauer.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# grobe Schätzung je Eintrag/Feld (Dict, Tupel, Schlüssel), genügt für die Speichergrenze
+ENTRY_OVERHEAD = 512
+FIELD_OVERHEAD = 64
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return max(0.0, float(os.getenv(name, "") or default))
+    except ValueError:
+        return default
+
+
+def estimate_size(results: List[Dict[str, Any]]) -> int:
+    size = ENTRY_OVERHEAD
+    for row in results:
+        size += ENTRY_OVERHEAD
+        for key, value in row.items():
+            size += FIELD_OVERHEAD + len(key)
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+    return size
+
+
+def make_key(
+    fts_query: str,
+    mode: str,
+    filters: Dict[str, Any],
+    sort_key: Optional[str],
+    sort_dir: Optional[str],
+    limit: int,
+    offset: int,
+    cursor: Optional[str] = None,
+    facets: Tuple[str, ...] = (),
+    snippets: bool = True,
+) -> Tuple:
+    labels = tuple(sorted(filters.get("source_labels") or ()))
+    return (
+        fts_query,
+        mode,
+        labels,
+        filters.get("extension"),
+        (filters.get("time_filter") or "").lower() or None,
+        (sort_key or "").lower() or None,
+        (sort_dir or "").lower() or None,
+        limit,
+        offset,
+        cursor,
+        tuple(facets),
+        snippets,
+    )
+
+
+class SearchCache:
+    def __init__(self, max_bytes: int, max_entries: int = 2000, ttl: float = 300.0):
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = max(0.0, float(ttl))
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: Any = None
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0, "expired": 0}
+        self._saved = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _sync_generation(self, generation: Any) -> bool:
+        # Aufrufer hält _lock; False, wenn generation älter als die bereits gesehene ist
+        if generation == self._generation:
+            return True
+        if self._generation is not None and _older(generation, self._generation):
+            return False
+        self._stats["invalidations"] += len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        self._generation = generation
+        return True
+
+    def get(self, generation: Any, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            if not self._sync_generation(generation):
+                self._stats["misses"] += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            value, size, stored_at, cost = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._bytes -= size
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            self._saved += cost
+            return value
+
+    def put(self, generation: Any, key: Hashable, value: Any, size: int, cost: float) -> bool:
+        """
+        Legt ein Ergebnis ab; cost = Rechenzeit in Sekunden (für saved_ms).
+        """
+        if not self.enabled or size > self.max_bytes:
+            return False
+        with self._lock:
+            if not self._sync_generation(generation):
+                return False
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, size, time.monotonic(), cost)
+            self._bytes += size
+            self._stats["stores"] += 1
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _key, (_value, old_size, _at, _cost) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._stats["evictions"] += 1
+        return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            generation = self._generation
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "generation": generation[1] if isinstance(generation, tuple) else generation,
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None,
+                "saved_ms": round(self._saved * 1000, 1),
+            }
+
+
+def _older(generation: Any, current: Any) -> bool:
+    # gleiche DB, kleinerer Zähler: Anfrage begann vor dem letzten Commit
+    try:
+        return generation[0] == current[0] and generation[1] < current[1]
+    except (TypeError, IndexError):
+        return False
+
+
+_cache: Optional[SearchCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SearchCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SearchCache(
+                    max_bytes=int(_env_number("SEARCH_CACHE_MB", 64) * 1024 * 1024),
+                    max_entries=int(_env_number("SEARCH_CACHE_ENTRIES", 2000)),
+                    ttl=_env_number("SEARCH_CACHE_TTL_SEC", 300),
+                )
+    return _cache
+
+
+def reset_cache() -> None:
+    global _cache
+    with _cache_lock:
+        _cache = None
@@ -0,0 +1,362 @@
+"""
+Wörterbuch für die tippfehlertolerante Suche (Modus fuzzy).
+
+Symmetric Delete: für jeden Begriff aus documents_fts_vocab werden alle Varianten mit bis zu
+MAX_DISTANCE gelöschten Zeichen gehasht (crc32) und sortiert abgelegt. Eine Eingabe erzeugt ihre
+eigenen Löschvarianten; gleiche Hashes liefern Kandidaten, die per Damerau-Levenshtein (OSA)
+bestätigt werden. So ist `rechnugn` eine Vertauschung von `rechnung`, `mayer` zwei Ersetzungen
+von `meier`.
+
+Gebaut wird nach jedem Indexlauf (index_runner) in eine Datei neben der DB (`index.fuzzy`). Web-
+Prozess und externer Indexer öffnen sie per mmap, ohne etwas neu zu berechnen; die Datei trägt
+DB-Kennung und letzten Lauf, eine veraltete wird im Hintergrund ersetzt. Bis dahin sucht fuzzy
+wie strict. Neben einem externen Indexer und als Follower (Datei kommt mit dem Snapshot) baut der
+Web-Prozess nie selbst.
+"""
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.db import datenbank as db
+from app.search_vocab import fold
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"IXFZ"
+VERSION = 1
+# Kennung, Version, DB-Kennung, letzter Lauf, Begriffe, Einträge, Bytes der Begriffe
+HEADER = struct.Struct("<4sIqqQQQ")
+MAX_DISTANCE = 2
+MIN_TERM_LEN = 3
+MAX_TERM_LEN = 24
+# Begriffe je Eingabewort in der FTS-Anfrage (Eingabe selbst eingeschlossen)
+MAX_EXPANSIONS = 8
+BUCKETS = 256
+# fehlgeschlagener oder noch nicht fertiger Bau zum selben Stand: frühestens nach so vielen Sekunden erneut
+REBUILD_RETRY_SECONDS = 300
+
+
+def max_terms() -> int:
+    try:
+        return max(0, int(os.getenv("SEARCH_FUZZY_MAX_TERMS", "") or 200000))
+    except ValueError:
+        return 200000
+
+
+def max_distance(length: int) -> int:
+    # kurze Wörter hätten bei Abstand 2 fast beliebige Nachbarn
+    if length < 4:
+        return 0
+    return 1 if length == 4 else MAX_DISTANCE
+
+
+def index_path(base: Optional[Path] = None) -> Path:
+    base = Path(base or db.DB_PATH)
+    return base.with_name(f"{base.stem}.fuzzy")
+
+
+def index_key(conn) -> Tuple[int, int]:
+    # (DB-Kennung, letzter abgeschlossener Lauf); anders als vocab_generation über Neustarts stabil
+    (_switch, db_id), run_id = db.vocab_generation(conn)
+    return db_id, run_id
+
+
+def _deletes(word: str, depth: int) -> Set[str]:
+    variants = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier if len(w) > 1 for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+
+def _hash(variant: str) -> int:
+    return zlib.crc32(variant.encode("utf-8"))
+
+
+def distance(a: str, b: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein (Vertauschung benachbarter Zeichen zählt 1); über limit wird abgebrochen
+    und limit + 1 geliefert.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # gemeinsamen Anfang und Schluss abschneiden: Tippfehler sitzen an einer Stelle, die Matrix bleibt klein
+    start = 0
+    while start < min(len(a), len(b)) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < min(len(a), len(b)) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    # nur das Band |i - j| <= limit rechnen, außerhalb liegt der Abstand ohnehin darüber
+    over = limit + 1
+    before: List[int] = []
+    previous = [min(j, over) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        current[0] = min(i, over)
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = min(value, over)
+        if min(current) > limit:
+            return over
+        before, previous = previous, current
+    return previous[-1]
+
+
+def build(conn, path: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Schreibt das Wörterbuch für conn nach path (Standard: neben DB_PATH); atomar per Umbenennen.
+    """
+    path = Path(path or index_path())
+    key = index_key(conn)
+    started = time.perf_counter()
+    rows = [(term, docs) for term, docs in db.iter_vocab(conn) if MIN_TERM_LEN <= len(term) <= MAX_TERM_LEN and term.isalpha()]
+    limit = max_terms()
+    if len(rows) > limit:
+        # seltene Begriffe zuerst weglassen; Reihenfolge bleibt alphabetisch
+        rows = sorted(sorted(rows, key=lambda row: -row[1])[:limit])
+    # nach den oberen Hash-Bits verteilt, damit nie alle Einträge gleichzeitig als Liste sortiert werden
+    buckets = [array("Q") for _ in range(BUCKETS)]
+    for idx, (term, _docs) in enumerate(rows):
+        for variant in _deletes(term, MAX_DISTANCE):
+            value = _hash(variant)
+            buckets[value >> 24].append(value << 32 | idx)
+    blob = bytearray()
+    offsets = array("I", [0])
+    for term, _docs in rows:
+        blob += term.encode("utf-8")
+        offsets.append(len(blob))
+    entries = sum(len(bucket) for bucket in buckets)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(HEADER.pack(MAGIC, VERSION, key[0], key[1], len(rows), entries, len(blob)))
+        array("q", (docs for _term, docs in rows)).tofile(fh)
+        for bucket in buckets:
+            array("Q", sorted(bucket)).tofile(fh)
+        offsets.tofile(fh)
+        fh.write(blob)
+    os.replace(tmp, path)
+    elapsed = (time.perf_counter() - started) * 1000
+    size = path.stat().st_size
+    with _lock:
+        _stats.update(builds=_stats["builds"] + 1, build_ms=round(elapsed, 1), built_at=time.time())
+    logger.info("Wörterbuch für Tippfehlersuche gebaut: %s Begriffe, %.1f MB in %.0f ms", len(rows), size / 1e6, elapsed)
+    return {"terms": len(rows), "entries": entries, "bytes": size, "ms": round(elapsed, 1)}
+
+
+class FuzzyIndex:
+    """
+    Gemapptes Wörterbuch: Dokumentzahlen, sortierte (Hash << 32 | Begriff)-Einträge, Begriffe.
+    """
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as fh:
+            self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError("Wörterbuch unvollständig")
+        magic, version, db_id, run_id, terms, entries, blob_len = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Wörterbuch in unbekanntem Format")
+        if len(self._map) != HEADER.size + 8 * terms + 8 * entries + 4 * (terms + 1) + blob_len:
+            raise ValueError("Wörterbuch unvollständig")
+        self.key = (db_id, run_id)
+        view = memoryview(self._map)
+        pos = HEADER.size
+        self.docs = view[pos:pos + 8 * terms].cast("q")
+        pos += 8 * terms
+        self.entries = view[pos:pos + 8 * entries].cast("Q")
+        pos += 8 * entries
+        self.offsets = view[pos:pos + 4 * (terms + 1)].cast("I")
+        self._blob = view[pos + 4 * (terms + 1):]
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def term(self, idx: int) -> str:
+        return bytes(self._blob[self.offsets[idx]:self.offsets[idx + 1]]).decode("utf-8")
+
+    def lookup(self, word: str) -> List[Tuple[str, int, int]]:
+        """
+        Ähnliche Begriffe als (Begriff, Abstand, Dokumente), nächste und häufigste zuerst.
+        """
+        limit = max_distance(len(word))
+        if not limit:
+            return []
+        seen: Set[int] = set()
+        found = []
+        for variant in _deletes(word, limit):
+            value = _hash(variant)
+            pos = bisect.bisect_left(self.entries, value << 32)
+            while pos < len(self.entries) and self.entries[pos] >> 32 == value:
+                idx = self.entries[pos] & 0xFFFFFFFF
+                pos += 1
+                if idx in seen:
+                    continue
+                seen.add(idx)
+                term = self.term(idx)
+                dist = distance(word, term, limit)
+                if dist <= limit:
+                    found.append((term, dist, self.docs[idx]))
+        found.sort(key=lambda item: (item[1], -item[2], item[0]))
+        return found
+
+
+def expand_query(index: Optional[FuzzyIndex], fts_query: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Ersetzt jedes Wort des FTS-Ausdrucks aus build_search_plan (mit AND verbunden) durch sich und
+    seine ähnlichsten Begriffe; liefert den neuen Ausdruck und die Erweiterungen.
+    """
+    if index is None or not fts_query:
+        return fts_query, []
+    terms = fts_query.split(" AND ")
+    expanded = []
+    for pos, term in enumerate(terms):
+        word = fold(term)
+        if not word.isalpha():
+            continue
+        words = [word] + [candidate for candidate, _dist, _docs in index.lookup(word) if candidate != word]
+        words = words[:MAX_EXPANSIONS]
+        if len(words) < 2:
+            continue
+        terms[pos] = "(" + " OR ".join(f'"{candidate}"' for candidate in words) + ")"
+        expanded.append({"term": term, "similar": words[1:]})
+    if expanded:
+        with _lock:
+            _stats["expanded_terms"] += len(expanded)
+    return " AND ".join(terms), expanded
+
+
+_index: Optional[FuzzyIndex] = None
+_building = False
+# zuletzt gemappte Datei (Pfad, mtime_ns, Größe) und letzter angestoßener Bau (Stand, Zeitpunkt)
+_mapped: Optional[Tuple[str, int, int]] = None
+_attempt: Optional[Tuple[Tuple[int, int], float]] = None
+_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "builds": 0, "build_ms": None, "built_at": None, "loads": 0, "load_ms": None, "expanded_terms": 0,
+}
+
+
+def _file_stamp(path: Path) -> Optional[Tuple[str, int, int]]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return str(path), st.st_mtime_ns, st.st_size
+
+
+def _load(path: Path) -> Optional[FuzzyIndex]:
+    global _mapped
+    stamp = _file_stamp(path)
+    if stamp is None:
+        return None
+    # auch eine unlesbare Datei nur einmal versuchen, bis sie ersetzt wird
+    with _lock:
+        _mapped = stamp
+    started = time.perf_counter()
+    try:
+        index = FuzzyIndex(path)
+    except (OSError, ValueError) as exc:
+        logger.warning("Wörterbuch %s nicht lesbar: %s", path, exc)
+        return None
+    with _lock:
+        _stats.update(loads=_stats["loads"] + 1, load_ms=round((time.perf_counter() - started) * 1000, 2))
+    return index
+
+
+def _use(index: Optional[FuzzyIndex]) -> Optional[FuzzyIndex]:
+    global _index
+    if index is not None:
+        with _lock:
+            _index = index
+    return index
+
+
+def rebuild(path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """
+    Baut das Wörterbuch aus der aktuellen DB neu (nach Indexläufen, im Hintergrund); Fehler werden
+    nur protokolliert, die Suche fällt dann auf strict zurück.
+    """
+    global _building
+    with _lock:
+        if _building:
+            return None
+        _building = True
+    try:
+        path = Path(path or index_path())
+        with db.read_conn() as conn:
+            result = build(conn, path)
+        _use(_load(path))
+        return result
+    except Exception as exc:
+        logger.warning("Wörterbuch für Tippfehlersuche nicht gebaut: %s", exc)
+        return None
+    finally:
+        with _lock:
+            _building = False
+
+
+def get_index(conn, build: bool = True) -> Optional[FuzzyIndex]:
+    """
+    Wörterbuch zum Stand von conn; eine neuere Datei (anderer Prozess) wird gemappt, fehlt sie oder
+    ist sie veraltet, startet der Bau im Hintergrund (je Stand höchstens alle REBUILD_RETRY_SECONDS).
+    Bis dahin gilt das vorige derselben DB. build=False (Web-Prozess neben externem Indexer, Follower)
+    mappt nur, was der Indexer gebaut hat.
+    """
+    global _attempt
+    key = index_key(conn)
+    with _lock:
+        current, mapped = _index, _mapped
+    if current is not None and current.key == key:
+        return current
+    path = index_path()
+    stamp = _file_stamp(path)
+    if stamp is not None and stamp != mapped:
+        loaded = _load(path)
+        if loaded is not None and loaded.key[0] == key[0]:
+            current = _use(loaded)
+            if loaded.key == key:
+                return loaded
+    now = time.monotonic()
+    with _lock:
+        start = build and not _building and (_attempt is None or _attempt[0] != key or now - _attempt[1] > REBUILD_RETRY_SECONDS)
+        if start:
+            _attempt = (key, now)
+    if start:
+        threading.Thread(target=rebuild, name="search-fuzzy", daemon=True).start()
+    if current is not None and current.key[0] == key[0]:
+        return current
+    return None
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "max_terms": max_terms(),
+            "terms": len(_index) if _index is not None else None,
+            "key": list(_index.key) if _index is not None else None,
+            "building": _building,
+            **_stats,
+        }
+
+
+def reset() -> None:
+    global _index, _mapped, _attempt
+    with _lock:
+        _index = None
+        _mapped = None
+        _attempt = None
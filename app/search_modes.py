@@ -8,10 +8,14 @@ class SearchMode(str, Enum):
     STRICT = "strict"
     STANDARD = "standard"
     LOOSE = "loose"
+    SUBSTRING = "substring"
+    FUZZY = "fuzzy"
 
 
 DEFAULT_MODE = SearchMode.STANDARD
 DEFAULT_PREFIX_MINLEN = 4
+# Trigramm-Tokenizer: kürzere Zeichenketten treffen nichts
+SUBSTRING_MIN_LEN = 3
 
 
 @dataclass
@@ -48,7 +52,8 @@ def tokenize_query(raw: str) -> list[str]:
 
 
 def _term_for_mode(token: str, mode: SearchMode, prefix_min_len: int) -> str:
-    if mode == SearchMode.STRICT:
+    # fuzzy: ganze Wörter wie strict, ähnliche Schreibweisen ergänzt search_fuzzy.expand_query
+    if mode in (SearchMode.STRICT, SearchMode.FUZZY):
         return token
     if mode == SearchMode.STANDARD:
         return f"{token}*" if len(token) >= prefix_min_len else token
@@ -72,6 +77,16 @@ def build_search_plan(raw_query: str, mode: SearchMode, prefix_min_len: int, all
     if not tokens:
         return SearchPlan(mode=mode, fts_query=None, tokens=[], empty_reason="Bitte Suchbegriff eingeben.")
 
+    if mode == SearchMode.SUBSTRING:
+        # jede Zeichenkette als Phrase im Trigramm-Index, findet sie auch mitten im Wort
+        parts = [tok for tok in tokens if len(tok) >= SUBSTRING_MIN_LEN]
+        if not parts:
+            return SearchPlan(
+                mode=mode, fts_query=None, tokens=tokens,
+                empty_reason=f"Teilwortsuche braucht mindestens {SUBSTRING_MIN_LEN} Zeichen.",
+            )
+        return SearchPlan(mode=mode, fts_query=" AND ".join(f'"{tok}"' for tok in parts), tokens=parts)
+
     prefix_len = max(1, int(prefix_min_len or 1))
     terms = [_term_for_mode(tok, mode, prefix_len) for tok in tokens]
     operator = " OR " if mode == SearchMode.LOOSE else " AND "
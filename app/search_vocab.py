@@ -0,0 +1,301 @@
+"""
+Begriffsstatistik aus documents_fts_vocab für die Begrenzung von Präfix-Anfragen.
+
+FTS5 liest für `re*` die Doclist jeder Erweiterung und führt sie zusammen; bei kurzen Präfixen
+sind das zehntausende Begriffe. Die Statistik (Begriff, Dokumente) liegt sortiert im Speicher,
+damit Anzahl und Summe der Erweiterungen eines Präfixes per Binärsuche feststehen. Sie wird nach
+jedem abgeschlossenen Indexlauf (und nach Schattentausch/Reset) im Hintergrund neu geladen; bis
+dahin gilt die vorige. Vor dem ersten Laden und nach einem Wechsel der DB wird nichts eingeschränkt.
+
+Kosten eines Präfixes = Erweiterungen × PREFIX_TERM_COST + Summe der Dokumente je Erweiterung
+(gemessen mit bench_prefix_limits.py). Über SEARCH_PREFIX_MAX_COST bleiben die häufigsten
+Erweiterungen (höchstens SEARCH_PREFIX_TOP_N, das exakte Wort zuerst), solange sie ins Budget
+passen; SEARCH_PREFIX_TOP_N=0 lässt nur das exakte Wort.
+
+Dieselbe Statistik liefert die Vorschläge für /api/suggest: häufigste Erweiterungen des letzten
+Worts (für Präfixe mit vielen Erweiterungen beim Laden vorberechnet) und Titel der zuletzt
+geänderten Dokumente (SEARCH_SUGGEST_TITLES), die mit der Eingabe beginnen.
+"""
+import bisect
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.db import datenbank as db
+
+logger = logging.getLogger(__name__)
+
+PREFIX_TERM_COST = 4
+TOP_CACHE_ENTRIES = 4096
+# Präfixe mit mehr Erweiterungen bekommen ihre häufigsten beim Laden vorberechnet (Vorschläge, Begrenzung)
+HEAVY_RANGE = 256
+HEAVY_TOP = 16
+SUGGEST_MIN_LEN = 2
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(0, int(os.getenv(name, "") or default))
+    except ValueError:
+        return default
+
+
+def max_cost() -> int:
+    return _env_int("SEARCH_PREFIX_MAX_COST", 200000)
+
+
+def top_n() -> int:
+    return _env_int("SEARCH_PREFIX_TOP_N", 10)
+
+
+def suggest_titles() -> int:
+    return _env_int("SEARCH_SUGGEST_TITLES", 50000)
+
+
+fold = db.fold_term
+
+
+class VocabStats:
+    """
+    Sortierte Begriffe mit Dokumentzahl und kumulierter Summe; Präfix-Bereiche per bisect. Dazu die
+    Titel der zuletzt geänderten Dokumente für /api/suggest.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, int]], titles: Iterable[str] = ()):
+        self.terms: List[str] = []
+        self.docs = array("q")
+        for term, docs in rows:
+            self.terms.append(term)
+            self.docs.append(int(docs))
+        self.cumulative = array("q", [0])
+        total = 0
+        for docs in self.docs:
+            total += docs
+            self.cumulative.append(total)
+        self._top: Dict[Tuple[str, int], List[Tuple[str, int]]] = {}
+        self._heavy: Dict[str, List[int]] = {}
+        if len(self.terms) > HEAVY_RANGE:
+            self._collect_heavy("", 0, len(self.terms))
+        folded = sorted({(fold(title), title) for title in titles if title})
+        self.title_keys = [key for key, _title in folded]
+        self.titles = [title for _key, title in folded]
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def _range(self, prefix: str) -> Tuple[int, int]:
+        return bisect.bisect_left(self.terms, prefix), bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+
+    def _collect_heavy(self, prefix: str, lo: int, hi: int) -> List[int]:
+        # Bereich nach dem nächsten Zeichen teilen; kleine Bereiche direkt, große aus den Kindern zusammenführen
+        if hi - lo <= HEAVY_RANGE:
+            return heapq.nlargest(HEAVY_TOP, range(lo, hi), key=self.docs.__getitem__)
+        depth = len(prefix)
+        candidates: List[int] = []
+        pos = lo
+        if self.terms[pos] == prefix:
+            candidates.append(pos)
+            pos += 1
+        while pos < hi:
+            child = self.terms[pos][:depth + 1]
+            end = bisect.bisect_left(self.terms, child + "\U0010ffff", pos, hi)
+            candidates += self._collect_heavy(child, pos, end)
+            pos = end
+        best = heapq.nlargest(HEAVY_TOP, candidates, key=self.docs.__getitem__)
+        self._heavy[prefix] = best
+        return best
+
+    def expansions(self, prefix: str) -> Tuple[int, int]:
+        """
+        (Anzahl Erweiterungen, Summe ihrer Dokumentzahlen).
+        """
+        lo, hi = self._range(prefix)
+        return hi - lo, self.cumulative[hi] - self.cumulative[lo]
+
+    def docs_of(self, term: str) -> int:
+        pos = bisect.bisect_left(self.terms, term)
+        return self.docs[pos] if pos < len(self.terms) and self.terms[pos] == term else 0
+
+    def top(self, prefix: str, n: int) -> List[Tuple[str, int]]:
+        """
+        Die n häufigsten Erweiterungen, absteigend; große Bereiche vorberechnet, sonst je Präfix
+        zwischengespeichert.
+        """
+        heavy = self._heavy.get(prefix)
+        if heavy is not None and n <= HEAVY_TOP:
+            return [(self.terms[i], self.docs[i]) for i in heavy[:n]]
+        key = (prefix, n)
+        cached = self._top.get(key)
+        if cached is None:
+            lo, hi = self._range(prefix)
+            order = heapq.nlargest(n, range(lo, hi), key=self.docs.__getitem__) if n else []
+            cached = [(self.terms[i], self.docs[i]) for i in order]
+            if len(self._top) >= TOP_CACHE_ENTRIES:
+                self._top.clear()
+            self._top[key] = cached
+        return cached
+
+    def titles_for(self, prefix: str, n: int) -> List[str]:
+        """
+        Bis zu n Titel, die mit prefix beginnen (ohne Groß-/Kleinschreibung und Akzente).
+        """
+        pos = bisect.bisect_left(self.title_keys, prefix)
+        found = []
+        while pos < len(self.title_keys) and len(found) < n and self.title_keys[pos].startswith(prefix):
+            found.append(self.titles[pos])
+            pos += 1
+        return found
+
+
+def narrow_term(vocab: VocabStats, term: str, budget: int, limit: int) -> Optional[Dict[str, Any]]:
+    """
+    Ersatz für einen Präfix-Begriff (`abc*`) über dem Budget, sonst None.
+    """
+    prefix = fold(term[:-1])
+    if not prefix or not prefix.isalnum():
+        # Trennzeichen zerlegt FTS5 in mehrere Begriffe, dafür gibt es keine Erweiterungen
+        return None
+    count, postings = vocab.expansions(prefix)
+    cost = count * PREFIX_TERM_COST + postings
+    if cost <= budget:
+        return None
+    candidates = [(prefix, vocab.docs_of(prefix))] if vocab.docs_of(prefix) else []
+    candidates += [item for item in vocab.top(prefix, limit) if item[0] != prefix]
+    kept: List[str] = []
+    spent = 0
+    for candidate, docs in candidates[:max(1, limit)]:
+        step = PREFIX_TERM_COST + docs
+        if kept and spent + step > budget:
+            continue
+        kept.append(candidate)
+        spent += step
+    if not kept:
+        # keine Erweiterung bekannt (Index seit dem Laden gewachsen): exakt suchen
+        kept = [prefix]
+    query = " OR ".join(f'"{word}"' for word in kept)
+    return {
+        "term": term,
+        "expansions": count,
+        "kept": kept,
+        "query": f"({query})" if len(kept) > 1 else query,
+    }
+
+
+def narrow_query(vocab: Optional[VocabStats], fts_query: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """
+    Ersetzt teure Präfixe im FTS-Ausdruck aus build_search_plan (Begriffe mit AND oder OR);
+    liefert den neuen Ausdruck und die eingeschränkten Begriffe.
+    """
+    budget = max_cost()
+    if vocab is None or not budget or "*" not in fts_query:
+        return fts_query, []
+    operator = " OR " if " OR " in fts_query else " AND "
+    terms = fts_query.split(operator)
+    narrowed = []
+    for pos, term in enumerate(terms):
+        if not term.endswith("*"):
+            continue
+        replacement = narrow_term(vocab, term, budget, top_n())
+        if replacement is not None:
+            terms[pos] = replacement.pop("query")
+            narrowed.append(replacement)
+    if narrowed:
+        _record(len(narrowed))
+    return operator.join(terms), narrowed
+
+
+def suggest(vocab: Optional[VocabStats], text: str, limit: int) -> Dict[str, Any]:
+    """
+    Vervollständigungen des letzten Worts (häufigste zuerst, mit dem übrigen Text als `query`) und
+    Titel, die mit der ganzen Eingabe beginnen.
+    """
+    head, last = re.match(r"(.*?)([^\s,]*)$", text or "", re.S).groups()
+    prefix = fold(last.replace('"', "").replace("*", ""))
+    terms: List[Dict[str, Any]] = []
+    titles: List[str] = []
+    if vocab is None:
+        return {"terms": terms, "titles": titles}
+    if len(prefix) >= SUGGEST_MIN_LEN and prefix.isalnum():
+        terms = [{"term": term, "docs": docs, "query": head + term} for term, docs in vocab.top(prefix, limit)]
+    whole = fold(" ".join((text or "").split()))
+    if len(whole) >= SUGGEST_MIN_LEN:
+        titles = vocab.titles_for(whole, limit)
+    return {"terms": terms, "titles": titles}
+
+
+_vocab: Optional[VocabStats] = None
+_vocab_key: Any = None
+_loading = False
+_lock = threading.Lock()
+_stats: Dict[str, Any] = {"loads": 0, "load_ms": None, "loaded_at": None, "narrowed_terms": 0}
+
+
+def _record(count: int) -> None:
+    with _lock:
+        _stats["narrowed_terms"] += count
+
+
+def refresh(conn, key: Any = None) -> VocabStats:
+    """
+    Lädt die Statistik synchron aus conn (Hintergrund-Thread, Tests, Benchmarks).
+    """
+    global _vocab, _vocab_key
+    key = key if key is not None else db.vocab_generation(conn)
+    started = time.perf_counter()
+    vocab = VocabStats(db.iter_vocab(conn), db.iter_recent_titles(conn, suggest_titles()))
+    elapsed = (time.perf_counter() - started) * 1000
+    with _lock:
+        _vocab, _vocab_key = vocab, key
+        _stats.update(loads=_stats["loads"] + 1, load_ms=round(elapsed, 1), loaded_at=time.time())
+    logger.info("Begriffsstatistik geladen: %s Begriffe in %.0f ms", len(vocab), elapsed)
+    return vocab
+
+
+def _refresh_in_background(key: Any) -> None:
+    global _loading
+    try:
+        with db.read_conn() as conn:
+            refresh(conn, key)
+    except Exception as exc:
+        logger.warning("Begriffsstatistik nicht geladen: %s", exc)
+    finally:
+        with _lock:
+            _loading = False
+
+
+def get_vocab(conn) -> Optional[VocabStats]:
+    """
+    Aktuelle Statistik; nach einem Indexlauf startet ein Neuladen im Hintergrund, bis dahin gilt
+    die bisherige (None vor dem ersten Laden).
+    """
+    global _loading
+    key = db.vocab_generation(conn)
+    with _lock:
+        if key != _vocab_key and not _loading:
+            _loading = True
+            threading.Thread(target=_refresh_in_background, args=(key,), name="search-vocab", daemon=True).start()
+        # Statistik einer anderen DB (Schattentausch, Reset) passt nicht, auch nicht übergangsweise
+        return _vocab if _vocab_key is not None and _vocab_key[0] == key[0] else None
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        return {
+            "max_cost": max_cost(),
+            "top_n": top_n(),
+            "terms": len(_vocab) if _vocab is not None else None,
+            "titles": len(_vocab.titles) if _vocab is not None else None,
+            "loading": _loading,
+            **_stats,
+        }
+
+
+def reset() -> None:
+    global _vocab, _vocab_key
+    with _lock:
+        _vocab, _vocab_key = None, None
@@ -557,7 +557,7 @@ def rename_file(doc_id: int, new_name: str, actor: str = "admin") -> Dict[str, o
 
             stat_result = target_path.stat()
             try:
-                with db.get_conn() as conn:
+                with db.file_action_conn(abs_path, target_path) as conn:
                     updated = db.update_document_metadata(
                         conn,
                         doc_id,
@@ -696,7 +696,7 @@ def move_file(doc_id: int, target_dir: str, target_source: Optional[str] = None,
             target_base.mkdir(parents=True, exist_ok=True)
             if conflict_mode == "overwrite" and target_path.exists():
                 try:
-                    with db.get_conn() as conn:
+                    with db.file_action_conn(target_path) as conn:
                         existing = db.get_document_by_path(conn, str(target_path))
                         if existing:
                             db.remove_document_by_id(conn, existing["id"])
@@ -710,7 +710,7 @@ def move_file(doc_id: int, target_dir: str, target_source: Optional[str] = None,
             _move_file(abs_path, target_path)
             moved = True
             stat_result = target_path.stat()
-            with db.get_conn() as conn:
+            with db.file_action_conn(abs_path, target_path) as conn:
                 updated = db.update_document_metadata(
                     conn,
                     doc_id,
@@ -820,7 +820,7 @@ def copy_file(doc_id: int, target_dir: str, target_source: Optional[str] = None,
         try:
             if conflict_mode == "overwrite" and target_path.exists():
                 try:
-                    with db.get_conn() as conn:
+                    with db.file_action_conn(target_path) as conn:
                         existing = db.get_document_by_path(conn, str(target_path))
                         if existing:
                             db.remove_document_by_id(conn, existing["id"])
@@ -858,7 +858,7 @@ def copy_file(doc_id: int, target_dir: str, target_source: Optional[str] = None,
                 content=content or "",
                 title_or_subject=title or target_path.name,
             )
-            with db.get_conn() as conn:
+            with db.file_action_conn(target_path) as conn:
                 new_doc_id = db.upsert_document(conn, meta)
         except FileOpError as exc:
             if copied and target_path.exists():
@@ -1166,7 +1166,7 @@ def quarantine_delete(doc_id: int, actor: str = "admin") -> Dict[str, object]:
             size_bytes=doc.get("size_bytes"),
         )
         try:
-            with db.get_conn() as conn:
+            with db.file_action_conn(abs_path) as conn:
                 entry_id = db.insert_quarantine_entry(conn, entry)
                 db.remove_document_by_id(conn, doc_id)
                 _move_file(abs_path, target_path)
@@ -0,0 +1,91 @@
+"""
+Benchmark: inkrementeller Schreibpfad (upsert_document, Commit je Dokument) gegen Bulk-Load
+(insert_document_bulk, große Transaktionen, verzögerte Indizes, FTS-optimize) auf leerer DB.
+
+    python scripts/bench_bulk_load.py [anzahl_dokumente]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.db.datenbank import DocumentMeta  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "20000") or 20000)
+WORDS = [f"wort{i}" for i in range(5000)] + ["rechnung", "vertrag", "angebot", "mahnung", "protokoll"]
+BULK_COMMIT_ITEMS = 2000
+
+
+def make_docs(count: int):
+    rnd = random.Random(42)
+    for i in range(count):
+        text = " ".join(rnd.choice(WORDS) for _ in range(400))
+        yield DocumentMeta(
+            source="bench",
+            path=f"/bench/{i // 1000}/dok_{i}.txt",
+            filename=f"dok_{i}.txt",
+            extension=".txt",
+            size_bytes=len(text),
+            ctime=1_700_000_000.0 + i,
+            mtime=1_700_000_000.0 + i,
+            atime=None,
+            owner="bench",
+            last_editor="bench",
+            content=text,
+            title_or_subject=f"Dokument {i}",
+        )
+
+
+def run_incremental(path: Path) -> float:
+    db.init_db(path)
+    conn = db.connect(path)
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    start = time.perf_counter()
+    for meta in make_docs(DOCS):
+        db.upsert_document(conn, meta)
+        conn.commit()
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def run_bulk(path: Path) -> float:
+    db.init_db(path)
+    conn = db.connect(path)
+    start = time.perf_counter()
+    db.begin_bulk_load(conn)
+    for i, meta in enumerate(make_docs(DOCS), start=1):
+        db.insert_document_bulk(conn, meta)
+        if i % BULK_COMMIT_ITEMS == 0:
+            conn.commit()
+    conn.commit()
+    db.finish_bulk_load(conn)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def db_size(path: Path) -> int:
+    wal = path.with_suffix(path.suffix + "-wal")
+    return path.stat().st_size + (wal.stat().st_size if wal.exists() else 0)
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        inc = run_incremental(Path(tmp) / "inkrementell.db")
+        bulk = run_bulk(Path(tmp) / "bulk.db")
+        size_inc = db_size(Path(tmp) / "inkrementell.db")
+        size_bulk = db_size(Path(tmp) / "bulk.db")
+    print(f"Dokumente: {DOCS}")
+    print(f"inkrementell: {inc:8.2f}s  {DOCS / inc:10.0f} Dok/s  DB {size_inc / 1e6:.1f} MB")
+    print(f"bulk:         {bulk:8.2f}s  {DOCS / bulk:10.0f} Dok/s  DB {size_bulk / 1e6:.1f} MB")
+    print(f"Faktor:       {inc / bulk:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: Verbindung je Anfrage (connect + Pragmas + close) gegen Verbindungs-Pool.
+Misst eine typische Such-Anfrage bzw. Vorschau seriell und mit mehreren Threads.
+
+    python scripts/bench_db_pool.py [anzahl_dokumente]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.db import pool  # noqa: E402
+from bench_bulk_load import WORDS, make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "20000") or 20000)
+REQUESTS = 2000
+THREADS = 8
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+@contextmanager
+def fresh_conn(path: Path):
+    # bisheriges Verhalten von get_conn: je Anfrage öffnen, konfigurieren, schließen
+    conn = db.connect(path)
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def request(open_conn, path: Path, rnd: random.Random, kind: str) -> float:
+    start = time.perf_counter()
+    with open_conn(path) as conn:
+        if kind == "search":
+            db.search_documents(conn, f'"{rnd.choice(WORDS)}"', limit=20)
+        else:
+            db.get_document(conn, rnd.randint(1, DOCS))
+            db.get_document_content(conn, rnd.randint(1, DOCS))
+    return (time.perf_counter() - start) * 1000
+
+
+def run(open_conn, path: Path, kind: str, threads: int) -> dict:
+    rnd = random.Random(3)
+    start = time.perf_counter()
+    if threads == 1:
+        latencies = [request(open_conn, path, rnd, kind) for _ in range(REQUESTS)]
+    else:
+        with ThreadPoolExecutor(threads) as ex:
+            latencies = list(ex.map(lambda _: request(open_conn, path, random.Random(), kind), range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+        "rps": REQUESTS / elapsed,
+    }
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        print(f"Dokumente: {DOCS}, {REQUESTS} Anfragen je Messung")
+        for kind in ("search", "preview"):
+            for threads in (1, THREADS):
+                for label, open_conn in (("ohne Pool", fresh_conn), ("Pool", db.read_conn)):
+                    res = run(open_conn, path, kind, threads)
+                    print(
+                        f"{kind:8} {threads} Thread(s) {label:10} p50 {res['p50']:7.3f} ms  "
+                        f"p95 {res['p95']:7.3f} ms  {res['rps']:8.0f} Anfragen/s"
+                    )
+        for stats in pool.all_stats():
+            print(
+                f"{stats['name']}: Trefferquote {stats['hit_rate']}, Wartezeit max {stats['wait_ms_max']} ms, "
+                f"Überlauf {stats['overflow']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Benchmark: alte Tabelle documents (Quelle, Endung, Besitzer, absoluter Pfad als Text je Zeile)
+gegen documents_data mit Lookup-Tabellen. Vergleicht Größe der Dokument-Tabellen samt Indizes
+und die Latenz gefilterter Abfragen.
+
+    python scripts/bench_dictionary_schema.py [anzahl_dokumente]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.db.datenbank import DocumentMeta  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "200000") or 200000)
+REPEAT = 20
+SOURCES = ["Buchhaltung", "Personalabteilung", "Projekte-Archiv", "Vertrieb-Angebote", "Technik-Dokumentation"]
+EXTENSIONS = [".pdf", ".docx", ".xlsx", ".msg", ".txt", ".eml", ".pptx"]
+OWNERS = [f"FIRMA\\mitarbeiter{i:03d}" for i in range(60)]
+TOPICS = ["Rechnungen", "Verträge", "Korrespondenz", "Protokolle", "Angebote", "Berichte"]
+
+LEGACY_SQL = """
+CREATE TABLE documents_legacy (
+    id INTEGER PRIMARY KEY, source TEXT NOT NULL, path TEXT NOT NULL UNIQUE, filename TEXT NOT NULL,
+    extension TEXT NOT NULL, size_bytes INTEGER NOT NULL, ctime REAL NOT NULL, mtime REAL NOT NULL, atime REAL,
+    owner TEXT, last_editor TEXT, msg_from TEXT, msg_to TEXT, msg_cc TEXT, msg_subject TEXT, msg_date TEXT,
+    msg_message_id TEXT, msg_attachments TEXT, tags TEXT
+);
+INSERT INTO documents_legacy SELECT * FROM documents;
+DROP VIEW documents;
+DROP TABLE documents_data;
+DROP TABLE doc_sources;
+DROP TABLE doc_extensions;
+DROP TABLE doc_owners;
+DROP TABLE doc_dirs;
+ALTER TABLE documents_legacy RENAME TO documents;
+"""
+
+LEGACY_TABLES = ("documents",)
+
+
+def make_docs(count: int):
+    rnd = random.Random(11)
+    for i in range(count):
+        source = rnd.choice(SOURCES)
+        ext = rnd.choice(EXTENSIONS)
+        owner = rnd.choice(OWNERS)
+        folder = f"/mnt/fileserver/{source}/{2015 + i % 10}/{rnd.choice(TOPICS)}/Kunde_{rnd.randint(1, 400):04d}"
+        name = f"Vorgang_{i:07d}{ext}"
+        yield DocumentMeta(
+            source=source,
+            path=f"{folder}/{name}",
+            filename=name,
+            extension=ext,
+            size_bytes=rnd.randint(1_000, 5_000_000),
+            ctime=1_500_000_000.0 + i * 60,
+            mtime=1_500_000_000.0 + i * 60,
+            atime=None,
+            owner=owner,
+            last_editor=rnd.choice(OWNERS),
+            content=f"vorgang {i} {rnd.choice(TOPICS).lower()}",
+            title_or_subject=name,
+        )
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+def to_legacy(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SQL)
+    conn.commit()
+    conn.close()
+
+
+def table_bytes(path: Path, tables) -> int:
+    # Tabellen samt ihrer Indizes
+    conn = sqlite3.connect(path)
+    conn.execute("VACUUM")
+    placeholders = ",".join("?" * len(tables))
+    row = conn.execute(
+        f"SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name IN ({placeholders}))",
+        list(tables),
+    ).fetchone()
+    conn.close()
+    return int(row[0] or 0)
+
+
+def timed(conn, sql: str, params) -> float:
+    conn.execute(sql, params).fetchall()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def legacy_queries():
+    return {
+        "Quelle+Endung, neueste 50": (
+            "SELECT * FROM documents WHERE source IN (?) AND extension = ? ORDER BY mtime DESC LIMIT 50",
+            ["Buchhaltung", ".pdf"],
+        ),
+        "Treffer je Quelle": ("SELECT source, COUNT(*) FROM documents GROUP BY source", []),
+        "Endungen (Status)": ("SELECT extension, COUNT(*) AS c FROM documents GROUP BY extension", []),
+        "Pfade einer Quelle": ("SELECT path FROM documents WHERE source = ?", ["Vertrieb-Angebote"]),
+    }
+
+
+def measure_current(path: Path) -> dict:
+    conn = db.connect(path)
+    result = {}
+    filters = {"source_labels": ["Buchhaltung"], "extension": ".pdf"}
+
+    def run(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            fn()
+        return (time.perf_counter() - start) / REPEAT * 1000
+
+    result["Quelle+Endung, neueste 50"] = run(lambda: db.search_documents(conn, "*", limit=50, filters=filters))
+    result["Treffer je Quelle"] = timed(
+        conn, "SELECT s.name, COUNT(*) FROM documents_data d JOIN doc_sources s ON s.id = d.source_id GROUP BY s.name", []
+    )
+    result["Endungen (Status)"] = run(lambda: db.get_status(conn))
+    result["Pfade einer Quelle"] = run(lambda: db.list_paths_by_sources(conn, ["Vertrieb-Angebote"]))
+    conn.close()
+    return result
+
+
+def measure_legacy(path: Path) -> dict:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    result = {label: timed(conn, sql, params) for label, (sql, params) in legacy_queries().items()}
+    conn.close()
+    return result
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        current = Path(tmp) / "current.db"
+        legacy = Path(tmp) / "legacy.db"
+        build(current)
+        shutil.copy(current, legacy)
+        to_legacy(legacy)
+        sizes = (table_bytes(legacy, LEGACY_TABLES), table_bytes(current, db.DOCUMENT_TABLES))
+        files = (legacy.stat().st_size, current.stat().st_size)
+        old = measure_legacy(legacy)
+        new = measure_current(current)
+    print(f"Dokumente: {DOCS}")
+    print(f"Dokument-Tabellen inkl. Indizes: alt {sizes[0] / 1e6:.1f} MB, neu {sizes[1] / 1e6:.1f} MB")
+    print(f"DB-Datei gesamt:                 alt {files[0] / 1e6:.1f} MB, neu {files[1] / 1e6:.1f} MB")
+    for label in old:
+        print(f"{label:28} alt {old[label]:8.2f} ms   neu {new[label]:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: alter FTS-Aufbau (Text als gespeicherte FTS-Spalte) gegen komprimierten External-Content
+(documents_content + documents_fts mit content=). Vergleicht DB-Größe, Vorschau- und Snippet-Latenz.
+
+    python scripts/bench_fts_content.py [anzahl_dokumente]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from bench_bulk_load import make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "20000") or 20000)
+PREVIEWS = 500
+QUERIES = ["rechnung", "vertrag", "angebot", "mahnung", "protokoll"]
+
+LEGACY_SQL = """
+CREATE TABLE documents (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE VIRTUAL TABLE documents_fts USING fts5(
+    doc_id UNINDEXED, content, title_or_subject, tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def build_legacy(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.executescript(LEGACY_SQL)
+    for i, meta in enumerate(make_docs(DOCS), start=1):
+        conn.execute("INSERT INTO documents (id, path) VALUES (?, ?)", (i, meta.path))
+        conn.execute(
+            "INSERT INTO documents_fts (doc_id, content, title_or_subject) VALUES (?, ?, ?)",
+            (i, meta.content, meta.title_or_subject),
+        )
+    conn.execute("INSERT INTO documents_fts(documents_fts) VALUES ('optimize')")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def build_current(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def timed(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) / count * 1000
+
+
+def measure(path: Path, legacy: bool) -> dict:
+    conn = sqlite3.connect(path) if legacy else db.connect(path)
+    rnd = random.Random(7)
+    ids = [rnd.randint(1, DOCS) for _ in range(PREVIEWS)]
+
+    def previews():
+        for doc_id in ids:
+            if legacy:
+                conn.execute("SELECT content FROM documents_fts WHERE doc_id = ?", (doc_id,)).fetchone()
+            else:
+                db.get_document_content(conn, doc_id)
+
+    def snippets():
+        for term in QUERIES:
+            conn.execute(
+                """
+                SELECT snippet(documents_fts, 1, '<mark>', '</mark>', '...', 10)
+                FROM documents_fts WHERE documents_fts MATCH ? ORDER BY bm25(documents_fts) LIMIT 50
+                """,
+                (term,),
+            ).fetchall()
+
+    result = {
+        "size": path.stat().st_size,
+        "preview_ms": timed(previews, len(ids)),
+        "snippet_ms": timed(snippets, len(QUERIES)),
+    }
+    conn.close()
+    return result
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = Path(tmp) / "legacy.db"
+        current_path = Path(tmp) / "external.db"
+        build_legacy(legacy_path)
+        build_current(current_path)
+        legacy = measure(legacy_path, legacy=True)
+        current = measure(current_path, legacy=False)
+    print(f"Dokumente: {DOCS}")
+    for label, res in (("alt (FTS-Spalte)", legacy), ("external+zlib", current)):
+        print(
+            f"{label:18} DB {res['size'] / 1e6:8.1f} MB  Vorschau {res['preview_ms']:8.3f} ms  "
+            f"Snippet-Suche (50 Treffer) {res['snippet_ms']:8.2f} ms"
+        )
+    print(f"Größe: {current['size'] / legacy['size'] * 100:.0f} % des alten Aufbaus")
+
+
+if __name__ == "__main__":
+    main()
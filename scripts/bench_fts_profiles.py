@@ -0,0 +1,84 @@
+"""
+Benchmark der FTS-Profile (INDEX_FTS_PROFILE): Indexgröße, Aufbauzeit und Suchlatenz
+für die Such-Modi strict, standard und loose.
+
+    python scripts/bench_fts_profiles.py [anzahl_dokumente]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.search_modes import DEFAULT_PREFIX_MINLEN, SearchMode, build_search_plan  # noqa: E402
+from bench_bulk_load import WORDS, make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "20000") or 20000)
+QUERIES_PER_MODE = 40
+RESULT_LIMIT = 50
+
+
+def build(path: Path, profile: str) -> float:
+    db.init_db(path, fts_profile=profile)
+    conn = db.connect(path)
+    start = time.perf_counter()
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def fts_bytes(path: Path) -> int:
+    with db.get_conn(path) as conn:
+        row = conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name LIKE 'documents_fts%' AND name != 'documents_fts_content'"
+        ).fetchone()
+    return int(row[0] or 0)
+
+
+def queries(mode: SearchMode) -> list[str]:
+    rnd = random.Random(mode.value)
+    result = []
+    for _ in range(QUERIES_PER_MODE):
+        a, b = rnd.choice(WORDS), rnd.choice(WORDS)
+        # zweites Wort angetippt (ein Zeichen fehlt), wie es im Suchfeld entsteht
+        result.append(f"{a} {b[:max(DEFAULT_PREFIX_MINLEN, len(b) - 1)]}")
+    return result
+
+
+def search_latency(path: Path, mode: SearchMode) -> float:
+    conn = db.connect(path)
+    plans = [build_search_plan(q, mode, DEFAULT_PREFIX_MINLEN) for q in queries(mode)]
+    start = time.perf_counter()
+    for plan in plans:
+        db.search_documents(conn, plan.fts_query, limit=RESULT_LIMIT)
+    elapsed = (time.perf_counter() - start) / len(plans) * 1000
+    conn.close()
+    return elapsed
+
+
+def main() -> None:
+    print(f"Dokumente: {DOCS}, je Modus {QUERIES_PER_MODE} Anfragen, LIMIT {RESULT_LIMIT}")
+    print(f"{'Profil':8} {'FTS-Index':>10} {'Aufbau':>8}  " + "  ".join(f"{m.value:>9}" for m in SearchMode))
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in db.FTS_PROFILES:
+            path = Path(tmp) / f"{profile}.db"
+            elapsed = build(path, profile)
+            size = fts_bytes(path)
+            latencies = [search_latency(path, mode) for mode in SearchMode]
+            print(
+                f"{profile:8} {size / 1e6:8.1f}MB {elapsed:7.1f}s  "
+                + "  ".join(f"{lat:7.1f}ms" for lat in latencies)
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark: Verlaufstabellen (index_run_events, file_errors) ohne und mit den Indizes aus
+Schema-Version 5, danach Aufbewahrung (retention) im Modus delete bzw. compact.
+
+    python scripts/bench_history.py [anzahl_läufe]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+
+RUNS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_RUNS", "300") or 300)
+EVENTS_PER_RUN = 2000
+ERRORS_PER_RUN = 400
+REPEAT = 20
+NEW_INDEXES = (
+    "idx_file_errors_run_created",
+    "idx_file_errors_created",
+    "idx_file_errors_open",
+    "idx_index_run_events_run_action",
+    "idx_index_runs_started",
+)
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    rnd = random.Random(5)
+    for i in range(RUNS):
+        day = f"2024-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:00:00+00:00"
+        run_id = db.record_index_run_start(conn, day)
+        db.record_index_run_finish(conn, run_id, day, "completed", EVENTS_PER_RUN, EVENTS_PER_RUN, 0, 0, ERRORS_PER_RUN)
+        conn.executemany(
+            "INSERT INTO index_run_events (run_id, action, path, source, ts) VALUES (?, ?, ?, 'archiv', ?)",
+            [
+                (run_id, rnd.choice(("added", "updated", "removed")), f"/mnt/archiv/{i}/ordner/datei_{n}.pdf", day)
+                for n in range(EVENTS_PER_RUN)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO file_errors (run_id, path, error_type, message, created_at, ignored) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (run_id, f"/mnt/archiv/{i}/ordner/defekt_{n}.pdf", "pdf", "PDF nicht lesbar: EOF marker not found",
+                 f"{day[:11]}{n % 24:02d}:{n % 60:02d}:00+00:00", n % 5 == 0)
+                for n in range(ERRORS_PER_RUN)
+            ],
+        )
+        conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def drop_new_indexes(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    for name in NEW_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute("CREATE INDEX idx_index_run_events_run_id ON index_run_events(run_id)")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def measure(path: Path) -> dict:
+    conn = db.connect(path)
+    run_id = RUNS // 2
+    checks = {
+        "list_errors (neueste 50)": lambda: db.list_errors(conn, limit=50),
+        "list_errors (Seite 100)": lambda: db.list_errors(conn, limit=50, offset=5000),
+        "error_count": lambda: db.error_count(conn),
+        "list_run_errors": lambda: db.list_run_errors(conn, run_id, limit=200),
+        "summarize_run": lambda: db.summarize_run(conn, run_id),
+        "get_status (Läufe)": lambda: db.get_last_run(conn),
+    }
+    result = {}
+    for label, fn in checks.items():
+        fn()
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            fn()
+        result[label] = (time.perf_counter() - start) / REPEAT * 1000
+    conn.close()
+    return result
+
+
+def retention(path: Path, compact: bool) -> dict:
+    conn = db.connect(path)
+    start = time.perf_counter()
+    runs = db.history_prune_candidates(conn, keep_runs=30, keep_days=0, compact=compact)
+    deleted = 0
+    for run_id in runs:
+        deleted += db.prune_run_history(conn, run_id, compact=compact)[0]
+    elapsed = time.perf_counter() - start
+    conn.execute("VACUUM")
+    conn.close()
+    return {"runs": len(runs), "rows": deleted, "seconds": elapsed, "size": path.stat().st_size}
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        indexed = Path(tmp) / "indexed.db"
+        plain = Path(tmp) / "plain.db"
+        build(indexed)
+        shutil.copy(indexed, plain)
+        drop_new_indexes(plain)
+        before = measure(plain)
+        after = measure(indexed)
+        size = indexed.stat().st_size
+        compacted = Path(tmp) / "compacted.db"
+        shutil.copy(indexed, compacted)
+        deleted = retention(indexed, compact=False)
+        compact = retention(compacted, compact=True)
+    print(f"Läufe: {RUNS}, je Lauf {EVENTS_PER_RUN} Ereignisse und {ERRORS_PER_RUN} Fehler")
+    for label in before:
+        print(f"{label:26} ohne Indizes {before[label]:8.2f} ms   mit {after[label]:8.2f} ms")
+    print(f"DB vor Aufbewahrung: {size / 1e6:.1f} MB")
+    for label, res in (("delete", deleted), ("compact", compact)):
+        print(
+            f"retention {label:8} (30 Läufe behalten): {res['runs']} Läufe, {res['rows']} Zeilen in "
+            f"{res['seconds']:.1f}s, danach {res['size'] / 1e6:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
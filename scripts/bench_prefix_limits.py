@@ -0,0 +1,98 @@
+"""
+Benchmark: Präfix-Anfragen ohne und mit Begrenzung über die Begriffsstatistik (search_vocab):
+Latenz je Präfix, p50/p99 einer gemischten Anfragefolge sowie Ladezeit und Größe der Statistik.
+
+    python scripts/bench_prefix_limits.py [anzahl_dokumente]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import search_vocab  # noqa: E402
+from app.db import datenbank as db  # noqa: E402
+from app.search_modes import SearchMode, build_search_plan  # noqa: E402
+from bench_search_cache import build  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+REQUESTS = 200
+# (Eingabe, Modus) – loose macht ab 2 Zeichen, standard ab 4 Zeichen Präfixe
+PREFIXES = (
+    ("rech", SearchMode.STANDARD),
+    ("wort123", SearchMode.STANDARD),
+    ("wort12", SearchMode.STANDARD),
+    ("wort1", SearchMode.STANDARD),
+    ("wo", SearchMode.LOOSE),
+    ("wo re", SearchMode.LOOSE),
+)
+
+
+def run(conn, fts_query: str) -> float:
+    start = time.perf_counter()
+    db.search_documents(conn, fts_query, limit=51, snippets=False)
+    return (time.perf_counter() - start) * 1000
+
+
+def workload():
+    # überwiegend schmale Anfragen, vereinzelt breite Präfixe wie beim Tippen
+    rnd = random.Random(5)
+    narrow = [(f"wort{rnd.randint(100, 4999)}", SearchMode.STANDARD) for _ in range(50)]
+    narrow += [("rechnung", SearchMode.STANDARD), ("vertrag", SearchMode.STANDARD)]
+    broad = [item for item in PREFIXES if item[0] not in ("rech", "wort123")]
+    return [rnd.choice(broad) if rnd.random() < 0.05 else rnd.choice(narrow) for _ in range(REQUESTS)]
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        conn = db.connect(path)
+        tracemalloc.start()
+        vocab = search_vocab.refresh(conn)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        load_ms = search_vocab.stats()["load_ms"]
+        print(f"Dokumente: {DOCS}, Begriffe: {len(vocab)}, Laden {load_ms} ms, Speicher {size / 1e6:.1f} MB")
+        print(
+            f"Budget SEARCH_PREFIX_MAX_COST={search_vocab.max_cost()}, "
+            f"SEARCH_PREFIX_TOP_N={search_vocab.top_n()}"
+        )
+        for raw, mode in PREFIXES:
+            fts_query = build_search_plan(raw, mode, 4).fts_query
+            narrowed_query, narrowed = search_vocab.narrow_query(vocab, fts_query)
+            start = time.perf_counter()
+            search_vocab.narrow_query(vocab, fts_query)
+            planning = (time.perf_counter() - start) * 1000
+            terms = fts_query.replace(" OR ", " AND ").split(" AND ")
+            expansions = "+".join(str(vocab.expansions(term.strip("*"))[0]) for term in terms)
+            print(
+                f"{fts_query:14} Erweiterungen {expansions:>10}  ohne {run(conn, fts_query):8.1f} ms  "
+                f"mit {run(conn, narrowed_query):7.1f} ms  (Planung {planning:.2f} ms, "
+                f"{'eingeschränkt auf ' + str(sum(len(n['kept']) for n in narrowed)) if narrowed else 'unverändert'})"
+            )
+        # abwechselnd ohne/mit Begrenzung, damit Cache- und Lastschwankungen beide Reihen gleich treffen
+        latencies = {"ohne Begrenzung": [], "mit Begrenzung": []}
+        for raw, mode in workload():
+            fts_query = build_search_plan(raw, mode, 4).fts_query
+            latencies["ohne Begrenzung"].append(run(conn, fts_query))
+            start = time.perf_counter()
+            narrowed_query, _ = search_vocab.narrow_query(vocab, fts_query)
+            planning = (time.perf_counter() - start) * 1000
+            latencies["mit Begrenzung"].append(planning + run(conn, narrowed_query))
+        for label, values in latencies.items():
+            values.sort()
+            print(
+                f"{label:16} p50 {statistics.median(values):7.1f} ms  "
+                f"p99 {values[int(len(values) * 0.99)]:8.1f} ms  Summe {sum(values) / 1000:6.1f} s"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
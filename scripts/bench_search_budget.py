@@ -0,0 +1,86 @@
+"""
+Benchmark: Kosten des Progress-Handlers (search_budget) bei normalen Suchen und Reaktionszeit
+des Abbruchs bei breiten Präfix-Anfragen (Modus loose).
+
+    python scripts/bench_search_budget.py [anzahl_dokumente]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import search_budget  # noqa: E402
+from app.db import datenbank as db  # noqa: E402
+from bench_search_cache import build  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+REPEAT = 5
+BUDGET_SEC = 0.5
+# (Anfrage, Beschreibung, ganz ausführen) – wo* OR re* läuft ungebremst über 10 s
+QUERIES = (
+    ("rechnung*", "schmal", True),
+    ("wort12*", "Präfix, ~110 Begriffe", True),
+    ("wort1* OR ve*", "loose, ~1100 Begriffe", True),
+    ("wo* OR re*", "loose, alle Begriffe", False),
+)
+
+
+def timed(conn, query: str, budget) -> float:
+    db.search_documents(conn, query, limit=51, snippets=False)
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        if budget is None:
+            db.search_documents(conn, query, limit=51, snippets=False)
+        else:
+            with search_budget.Budget(seconds=3600, cancel=threading.Event()).guard(conn):
+                db.search_documents(conn, query, limit=51, snippets=False)
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def abort_latency(conn, query: str) -> tuple:
+    # Zeit bis QueryAborted bei BUDGET_SEC und längster Abstand zwischen zwei Prüfungen
+    budget = search_budget.Budget(seconds=BUDGET_SEC)
+    gaps = []
+    last = [time.perf_counter()]
+    check = budget._check
+
+    def traced() -> int:
+        now = time.perf_counter()
+        gaps.append(now - last[0])
+        last[0] = now
+        return check()
+
+    budget._check = traced
+    start = time.perf_counter()
+    try:
+        with budget.guard(conn):
+            db.search_documents(conn, query, limit=51, snippets=False)
+        reason = None
+    except search_budget.QueryAborted as exc:
+        reason = exc.reason
+    return (time.perf_counter() - start) * 1000, max(gaps, default=0) * 1000, reason
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        conn = db.connect(path)
+        print(f"Dokumente: {DOCS}, Prüfung alle {search_budget.PROGRESS_INTERVAL} VM-Schritte, Budget {BUDGET_SEC}s")
+        for query, label, full in QUERIES:
+            plain = f"{timed(conn, query, None):8.1f} ms" if full else "       –   "
+            guarded = f"{timed(conn, query, True):8.1f} ms" if full else "       –   "
+            aborted_ms, gap_ms, reason = abort_latency(conn, query)
+            print(
+                f"{query:16} ({label:22}) ohne {plain}  mit Handler {guarded}  "
+                f"Abbruch nach {aborted_ms:7.1f} ms ({reason or 'fertig'}), max. Prüfabstand {gap_ms:6.1f} ms"
+            )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: Such-Anfragen ohne und mit Ergebnis-Cache (search_cache) bei einer Zipf-verteilten
+Anfragemischung und gelegentlichen Commits des Indexers; dazu die Kosten des Generationszählers
+je geschriebenem Dokument.
+
+    python scripts/bench_search_cache.py [anzahl_dokumente]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import search_cache  # noqa: E402
+from app.db import datenbank as db  # noqa: E402
+from bench_bulk_load import WORDS, make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+REQUESTS = 5000
+DISTINCT = 300
+WRITE_EVERY = 250
+LIMIT = 50
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+def bump_cost(path: Path, count: int = 50000) -> float:
+    # Zählerpflege je geschriebenem Dokument (ganze Bulk-Loads streuen stärker als der Unterschied)
+    conn = db.connect(path)
+    start = time.perf_counter()
+    for _ in range(count):
+        db._bump_doc_generation(conn)
+    elapsed = time.perf_counter() - start
+    conn.rollback()
+    conn.close()
+    return elapsed / count * 1e6
+
+
+def workload():
+    rnd = random.Random(9)
+    queries = [
+        (f'"{rnd.choice(WORDS)}"', rnd.choice((0, 0, 0, LIMIT)), rnd.choice((None, "mtime")))
+        for _ in range(DISTINCT)
+    ]
+    weights = [1 / (rank + 1) for rank in range(DISTINCT)]
+    return rnd.choices(queries, weights=weights, k=REQUESTS)
+
+
+def search(cache, fts_query: str, offset: int, sort_key) -> list:
+    # entspricht /api/search ohne HTTP-Schicht
+    with db.read_conn() as conn:
+        key = search_cache.make_key(fts_query, "standard", {}, sort_key, None, LIMIT, offset)
+        generation = db.cache_generation(conn) if cache else None
+        cached = cache.get(generation, key) if cache else None
+        if cached is not None:
+            return cached[0]
+        started = time.perf_counter()
+        rows = db.search_documents(conn, fts_query, limit=LIMIT + 1, offset=offset, sort_key=sort_key)
+        results = [dict(row) for row in rows[:LIMIT]]
+        if cache:
+            cache.put(generation, key, (results, len(rows) > LIMIT), search_cache.estimate_size(results),
+                      time.perf_counter() - started)
+        return results
+
+
+def run(path: Path, cache) -> dict:
+    db.DB_PATH = path
+    latencies = []
+    for i, (fts_query, offset, sort_key) in enumerate(workload()):
+        if i and i % WRITE_EVERY == 0:
+            with db.get_conn() as conn:
+                meta = next(make_docs(1))
+                meta.path = f"/bench/neu_{i}.txt"
+                db.upsert_document(conn, meta)
+        start = time.perf_counter()
+        search(cache, fts_query, offset, sort_key)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mean": statistics.fmean(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        cost = bump_cost(path)
+        cache = search_cache.SearchCache(max_bytes=64 * 1024 * 1024)
+        without = run(path, None)
+        with_cache = run(path, cache)
+    stats = cache.stats()
+    print(f"Dokumente: {DOCS}, {REQUESTS} Anfragen ({DISTINCT} verschiedene), Commit alle {WRITE_EVERY} Anfragen")
+    print(f"Generationszähler je geschriebenem Dokument: {cost:.1f} µs")
+    for label, res in (("ohne Cache", without), ("mit Cache", with_cache)):
+        print(f"{label:11} Mittel {res['mean']:7.3f} ms  p50 {res['p50']:7.3f} ms  p95 {res['p95']:7.3f} ms")
+    print(
+        f"Trefferquote {stats['hit_rate']}, gespart {stats['saved_ms']} ms, verworfen {stats['invalidations']}, "
+        f"Einträge {stats['entries']} ({stats['bytes'] / 1e6:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    main()
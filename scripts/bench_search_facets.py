@@ -0,0 +1,77 @@
+"""
+Benchmark: Facetten (Quelle, Endung, Jahr) zu einer Suche – ein Durchlauf (search_facets)
+gegen je eine GROUP-BY-Abfrage pro Facette, exakt und als Stichprobe.
+
+    python scripts/bench_search_facets.py [anzahl_dokumente]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from bench_dictionary_schema import build  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "200000") or 200000)
+REPEAT = 10
+QUERIES = ('"rechnungen"', '"rechnungen" OR "verträge" OR "angebote"', "*")
+SEPARATE_SQL = {
+    "source": "SELECT s.name, COUNT(*) {from_sql} JOIN doc_sources s ON s.id = d.source_id {where} GROUP BY 1",
+    "extension": "SELECT e.name, COUNT(*) {from_sql} JOIN doc_extensions e ON e.id = d.extension_id {where} GROUP BY 1",
+    "year": "SELECT strftime('%Y', d.mtime, 'unixepoch'), COUNT(*) {from_sql} {where} GROUP BY 1",
+}
+
+
+def timed(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def separate(conn, query: str) -> None:
+    if query == "*":
+        from_sql, where, params = "FROM documents_data d", "", []
+    else:
+        from_sql = "FROM documents_fts JOIN documents_data d ON d.id = documents_fts.rowid"
+        where, params = "WHERE documents_fts MATCH ?", [query]
+    for sql in SEPARATE_SQL.values():
+        conn.execute(sql.format(from_sql=from_sql, where=where), params).fetchall()
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        conn = db.connect(path)
+        print(f"Dokumente: {DOCS}")
+        for query in QUERIES:
+            if query == "*":
+                matches = DOCS
+            else:
+                matches = conn.execute(
+                    "SELECT COUNT(*) FROM documents_fts WHERE documents_fts MATCH ?", (query,)
+                ).fetchone()[0]
+            search = timed(lambda: db.search_documents(conn, query, limit=51))
+            three = timed(lambda: separate(conn, query))
+            one = timed(lambda: db.search_facets(conn, query, sample_above=0))
+            sampled = timed(lambda: db.search_facets(conn, query))
+            print(
+                f"{query:45} {matches:7} Treffer  Suche {search:7.1f} ms  3 Abfragen {three:7.1f} ms  "
+                f"ein Durchlauf {one:7.1f} ms  Stichprobe {sampled:7.1f} ms"
+            )
+        exact = db.search_facets(conn, "*", sample_above=0)["year"]
+        approx = db.search_facets(conn, "*")["year"]
+        worst = max(
+            abs(a["count"] - e["count"]) / e["count"] for a, e in zip(approx, exact) if a["value"] == e["value"]
+        )
+        print(f"Stichprobe ab {db.FACETS_SAMPLE_ABOVE} Treffern: größte Abweichung je Jahr {worst * 100:.1f} %")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
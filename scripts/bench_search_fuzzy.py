@@ -0,0 +1,138 @@
+"""
+Benchmark: tippfehlertolerante Suche (Modus fuzzy) – Bau, Größe und Ladezeit des Wörterbuchs,
+Nachschlagen je Wort sowie Suchlatenz gegen strict (richtig geschrieben) und loose (verkürzter
+Präfix, wie Nutzer sich bei Tippfehlern behelfen); dazu der Anteil wiedergefundener Wörter.
+
+    python scripts/bench_search_fuzzy.py [anzahl_dokumente]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import search_fuzzy  # noqa: E402
+from app.db import datenbank as db  # noqa: E402
+from app.db.datenbank import DocumentMeta  # noqa: E402
+from app.search_modes import SearchMode, build_search_plan  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+VOCAB = 100000
+QUERIES = 300
+LIMIT = 51
+SYLLABLES = [
+    "an", "be", "ber", "bau", "da", "der", "ein", "er", "fa", "ge", "gen", "hal", "haus", "in", "kauf",
+    "keit", "la", "lung", "ma", "mei", "mer", "na", "ner", "or", "ra", "rech", "ri", "sch", "schaft",
+    "sen", "sta", "ster", "te", "ten", "ter", "to", "trag", "tung", "un", "ver", "wal", "we", "zu",
+]
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def make_vocab(rnd: random.Random) -> list:
+    words = set()
+    while len(words) < VOCAB:
+        words.add("".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return sorted(words)
+
+
+def make_docs(words: list, count: int):
+    rnd = random.Random(31)
+    # Zipf-artig: wenige häufige, viele seltene Wörter (Namen, Fachbegriffe)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    for i in range(count):
+        text = " ".join(rnd.choices(words, weights=weights, k=200))
+        yield DocumentMeta(
+            source="bench",
+            path=f"/bench/{i // 1000}/dok_{i}.txt",
+            filename=f"dok_{i}.txt",
+            extension=".txt",
+            size_bytes=len(text),
+            ctime=1_600_000_000.0 + i,
+            mtime=1_600_000_000.0 + i,
+            atime=None,
+            owner=None,
+            last_editor=None,
+            content=text,
+            title_or_subject=f"dok_{i}",
+        )
+
+
+def typo(rnd: random.Random, word: str) -> str:
+    pos = rnd.randrange(len(word) - 1)
+    kind = rnd.choice(("swap", "replace", "drop", "insert"))
+    if kind == "swap":
+        return word[:pos] + word[pos + 1] + word[pos] + word[pos + 2:]
+    if kind == "replace":
+        return word[:pos] + rnd.choice(LETTERS) + word[pos + 1:]
+    if kind == "drop":
+        return word[:pos] + word[pos + 1:]
+    return word[:pos] + rnd.choice(LETTERS) + word[pos:]
+
+
+def build(path: Path, words: list) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(words, DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main() -> None:
+    rnd = random.Random(7)
+    words = make_vocab(rnd)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path, words)
+        conn = db.connect(path)
+        found = {term for term, _docs in db.iter_vocab(conn)}
+        samples = rnd.sample(sorted(w for w in found if len(w) >= 6), QUERIES)
+        built = search_fuzzy.build(conn, search_fuzzy.index_path(path))
+        start = time.perf_counter()
+        index = search_fuzzy.FuzzyIndex(search_fuzzy.index_path(path))
+        load_ms = (time.perf_counter() - start) * 1000
+        print(
+            f"Dokumente: {DOCS}, Begriffe: {built['terms']}, Einträge {built['entries']}, "
+            f"Datei {built['bytes'] / 1e6:.1f} MB, Bau {built['ms'] / 1000:.1f} s, Laden (mmap) {load_ms:.2f} ms"
+        )
+        latencies = {"strict (richtig)": [], "fuzzy (Tippfehler)": [], "loose (4 Zeichen*)": []}
+        lookups = []
+        hits = 0
+        for word in samples:
+            wrong = typo(rnd, word)
+            strict = build_search_plan(word, SearchMode.STRICT, 4).fts_query
+            loose = build_search_plan(wrong[:4], SearchMode.LOOSE, 4).fts_query
+            start = time.perf_counter()
+            fuzzy, _expanded = search_fuzzy.expand_query(index, build_search_plan(wrong, SearchMode.FUZZY, 4).fts_query)
+            lookups.append((time.perf_counter() - start) * 1000)
+            hits += f'"{word}"' in fuzzy
+            for label, query, extra in (
+                ("strict (richtig)", strict, 0.0),
+                ("fuzzy (Tippfehler)", fuzzy, lookups[-1]),
+                ("loose (4 Zeichen*)", loose, 0.0),
+            ):
+                start = time.perf_counter()
+                db.search_documents(conn, query, limit=LIMIT, snippets=False)
+                latencies[label].append(extra + (time.perf_counter() - start) * 1000)
+        conn.close()
+    print(
+        f"Nachschlagen je Wort: p50 {statistics.median(lookups):.2f} ms, p99 {percentile(lookups, 0.99):.2f} ms; "
+        f"richtiges Wort unter den Erweiterungen: {hits}/{QUERIES}"
+    )
+    for label, values in latencies.items():
+        print(f"{label:20} p50 {statistics.median(values):7.2f} ms  p99 {percentile(values, 0.99):8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
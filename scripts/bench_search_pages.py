@@ -0,0 +1,78 @@
+"""
+Benchmark: tiefe Seiten einer breiten Suche per OFFSET gegen Cursor (Keyset), für bm25 und
+die Sortierungen der Ergebnisliste.
+
+    python scripts/bench_search_pages.py [anzahl_dokumente]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from bench_bulk_load import make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+QUERY = "rechnung OR vertrag OR angebot"
+PAGE = 50
+PAGES = (1, 20, 100)
+REPEAT = 5
+ORDERS = ((None, None), ("mtime", "desc"), ("filename", "asc"), ("size_bytes", "desc"))
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+def timed(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def cursor_before(conn, page: int, sort_key, sort_dir):
+    if page == 1:
+        return None
+    rows = db.search_documents(conn, QUERY, limit=(page - 1) * PAGE, sort_key=sort_key, sort_dir=sort_dir)
+    return db.encode_search_cursor(QUERY, sort_key, sort_dir, rows[-1])
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        conn = db.connect(path)
+        matches = conn.execute("SELECT COUNT(*) FROM documents_fts WHERE documents_fts MATCH ?", (QUERY,)).fetchone()[0]
+        print(f"Dokumente: {DOCS}, Treffer für '{QUERY}': {matches}, Seitengröße {PAGE}")
+        for sort_key, sort_dir in ORDERS:
+            label = f"{sort_key or 'bm25'} {sort_dir or ''}".strip()
+            for page in PAGES:
+                offset = timed(
+                    lambda: db.search_documents(
+                        conn, QUERY, limit=PAGE + 1, offset=(page - 1) * PAGE, sort_key=sort_key, sort_dir=sort_dir
+                    )
+                )
+                cursor = cursor_before(conn, page, sort_key, sort_dir)
+                keyset = timed(
+                    lambda: db.search_documents(
+                        conn, QUERY, limit=PAGE + 1, sort_key=sort_key, sort_dir=sort_dir, cursor=cursor
+                    )
+                )
+                print(f"{label:15} Seite {page:3}  offset {offset:8.1f} ms   cursor {keyset:8.1f} ms")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
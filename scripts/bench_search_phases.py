@@ -0,0 +1,77 @@
+"""
+Benchmark: Suche in einer Abfrage mit Snippet im sortierten SELECT (bisher) gegen die zweiphasige
+Ausführung (IDs ranken, dann Spalten/Snippets der Seite) sowie ohne Snippets mit Nachladen
+per search_snippets.
+
+    python scripts/bench_search_phases.py [anzahl_dokumente]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from bench_search_pages import DOCS, build  # noqa: E402
+
+PAGE = 50
+REPEAT = 10
+QUERIES = ("rechnung OR vertrag OR angebot", "rechnung", "wort17 wort18")
+ORDERS = (None, "filename", "mtime")
+LEGACY_ORDER = {None: "bm25(documents_fts)", "filename": "COALESCE(d.filename, d.name)", "mtime": "d.mtime DESC"}
+
+
+def legacy(conn, query: str, sort_key) -> list:
+    return conn.execute(
+        f"""
+        SELECT {db.DOCUMENT_COLUMNS_SQL}, {db.SNIPPET_SQL} AS snippet
+        FROM documents_fts
+        JOIN documents_data d ON d.id = documents_fts.rowid
+        {db.DOCUMENT_JOINS_SQL}
+        WHERE documents_fts MATCH ?
+        ORDER BY {LEGACY_ORDER[sort_key]}
+        LIMIT ?;
+        """,
+        (query, PAGE + 1),
+    ).fetchall()
+
+
+def timed(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path)
+        conn = db.connect(path)
+        print(f"Dokumente: {DOCS}, Seitengröße {PAGE}")
+        for query in QUERIES:
+            for sort_key in ORDERS:
+                sort_dir = "desc" if sort_key == "mtime" else None
+                page = db.search_documents(conn, query, limit=PAGE, sort_key=sort_key, sort_dir=sort_dir)
+                ids = [row["id"] for row in page]
+                old = timed(lambda: legacy(conn, query, sort_key))
+                two_phase = timed(
+                    lambda: db.search_documents(conn, query, limit=PAGE + 1, sort_key=sort_key, sort_dir=sort_dir)
+                )
+                lazy = timed(
+                    lambda: db.search_documents(
+                        conn, query, limit=PAGE + 1, sort_key=sort_key, sort_dir=sort_dir, snippets=False
+                    )
+                )
+                batch = timed(lambda: db.search_snippets(conn, query, ids))
+                print(
+                    f"{query:32} {sort_key or 'bm25':9} bisher {old:7.1f} ms  zweiphasig {two_phase:7.1f} ms  "
+                    f"ohne Snippets {lazy:7.1f} ms  + Snippets nachladen {batch:6.1f} ms"
+                )
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark: gefilterte und sortierte Suchen ohne und mit den Indizes aus Schema-Version 8 sowie
+FTS-first gegen filter-first bei selektiven Filtern und häufigen Begriffen.
+
+    python scripts/bench_search_planner.py [anzahl_dokumente]
+"""
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.db.datenbank import DocumentMeta  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "200000") or 200000)
+REPEAT = 10
+# schiefe Verteilung: eine große Quelle, eine kleine, eine winzige
+SOURCES = [("archiv", 0.9), ("projekte", 0.09), ("vorstand", 0.01)]
+EXTENSIONS = [(".pdf", 0.6), (".docx", 0.3), (".msg", 0.095), (".dwg", 0.005)]
+# Anteil der Dokumente je Begriff
+TERMS = [("dokument", 0.8), ("rechnung", 0.3), ("vertrag", 0.05), ("gutachten", 0.005)]
+NEW_INDEXES = ("idx_documents_data_mtime", "idx_documents_data_source_mtime", "idx_documents_data_extension_mtime")
+START = 1_420_070_400.0  # 2015-01-01
+SPAN = 10 * 365 * 86400
+
+
+def _pick(rnd: random.Random, choices) -> str:
+    return rnd.choices([name for name, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def make_docs(count: int):
+    rnd = random.Random(17)
+    for i in range(count):
+        source = _pick(rnd, SOURCES)
+        ext = _pick(rnd, EXTENSIONS)
+        words = [term for term, share in TERMS if rnd.random() < share]
+        words += [f"wort{rnd.randint(0, 20000)}" for _ in range(30)]
+        name = f"datei_{i:07d}{ext}"
+        mtime = START + rnd.random() * SPAN
+        yield DocumentMeta(
+            source=source,
+            path=f"/mnt/{source}/{i // 1000}/{name}",
+            filename=name,
+            extension=ext,
+            size_bytes=rnd.randint(1_000, 5_000_000),
+            ctime=mtime,
+            mtime=mtime,
+            atime=None,
+            owner=None,
+            last_editor=None,
+            content=" ".join(rnd.sample(words, len(words))),
+            title_or_subject=name,
+        )
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def drop_new_indexes(path: Path) -> None:
+    conn = sqlite3.connect(path)
+    for name in NEW_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.execute("CREATE INDEX idx_documents_data_source ON documents_data(source_id)")
+    conn.execute("CREATE INDEX idx_documents_data_extension ON documents_data(extension_id)")
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+CASES = [
+    ("* neueste", "*", {}, None),
+    ("* vorstand", "*", {"source_labels": ["vorstand"]}, None),
+    ("* .dwg", "*", {"extension": ".dwg"}, None),
+    ("* 2019", "*", {"time_filter": "2019"}, None),
+    ("* vorstand, Größe", "*", {"source_labels": ["vorstand"]}, "size_bytes"),
+    ("dokument + vorstand, Rang", "dokument", {"source_labels": ["vorstand"]}, None),
+    ("dokument + vorstand", "dokument", {"source_labels": ["vorstand"]}, "mtime"),
+    ("dokument", "dokument", {}, "mtime"),
+    ("dokument + 2019", "dokument", {"time_filter": "2019"}, "mtime"),
+    ("rechnung + .dwg", "rechnung", {"extension": ".dwg"}, "mtime"),
+    ("vertrag + projekte", "vertrag", {"source_labels": ["projekte"]}, "mtime"),
+    ("gutachten + archiv", "gutachten", {"source_labels": ["archiv"]}, "mtime"),
+    ("gutachten", "gutachten", {}, "mtime"),
+]
+
+
+def measure(path: Path, strategy=None) -> dict:
+    conn = db.connect(path)
+    result = {}
+    for label, query, filters, sort_key in CASES:
+
+        def run():
+            return db.search_documents(
+                conn, query, limit=51, filters=filters, sort_key=sort_key, sort_dir="desc", snippets=False,
+                strategy=None if query == "*" else strategy,
+            )
+
+        run()
+        start = time.perf_counter()
+        for _ in range(REPEAT):
+            run()
+        result[label] = (time.perf_counter() - start) / REPEAT * 1000
+    conn.close()
+    return result
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        indexed = Path(tmp) / "indexed.db"
+        plain = Path(tmp) / "plain.db"
+        build(indexed)
+        shutil.copy(indexed, plain)
+        drop_new_indexes(plain)
+        before = measure(plain, strategy="fts")
+        after_fts = measure(indexed, strategy="fts")
+        after_filter = measure(indexed, strategy="filter")
+        after_auto = measure(indexed)
+        conn = db.connect(indexed)
+        chosen = {}
+        for label, query, filters, sort_key in CASES:
+            steps = db.explain_search(conn, query, limit=51, filters=filters, sort_key=sort_key, sort_dir="desc")
+            chosen[label] = "–" if query == "*" else "filter" if any("LIST SUBQUERY" in s for s in steps) else "fts"
+        conn.close()
+    print(f"Dokumente: {DOCS}")
+    print(f"{'Anfrage':28} {'ohne Indizes':>12} {'FTS-first':>10} {'filter-first':>12} {'automatisch':>12}  Wahl")
+    for label in before:
+        print(
+            f"{label:28} {before[label]:9.2f} ms {after_fts[label]:7.2f} ms {after_filter[label]:9.2f} ms "
+            f"{after_auto[label]:9.2f} ms  {chosen[label]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark: Teilwortsuche über den Trigramm-Index (Modus substring) gegen LIKE-Scans auf Titel und
+Inhalt; dazu Größe des Trigramm-Index und Bulk-Load-Zeit ohne, mit Titel- und mit Inhalts-Trigrammen.
+
+    python scripts/bench_search_trigram.py [anzahl_dokumente]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.db.datenbank import DocumentMeta  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+REPEAT = 5
+LIMIT = 51
+HEADS = ["eingangs", "ausgangs", "sammel", "abschlags", "schluss", "gut", "teil", "jahres", "miet", "wartungs"]
+TAILS = ["rechnung", "vertrag", "angebot", "mahnung", "protokoll", "bestellung", "lieferschein", "gutachten"]
+SUFFIXES = ["", "s", "snummer", "sentwurf", "skopie", "en"]
+WORDS = [f"wort{i}" for i in range(5000)]
+# (Beschreibung, Teilzeichenkette)
+QUERIES = (
+    ("Wortteil, häufig", "rechnung"),
+    ("Wortteil, selten", "wartungsgutachten"),
+    ("Rechnungsnummer", "2023-0047"),
+    ("Teilenummer", "xk-44"),
+)
+CONFIGS = (
+    ("ohne", {"INDEX_TRIGRAM_SOURCES": "", "INDEX_TRIGRAM_CONTENT_SOURCES": ""}),
+    ("Titel", {"INDEX_TRIGRAM_SOURCES": "*", "INDEX_TRIGRAM_CONTENT_SOURCES": ""}),
+    ("Titel+Inhalt", {"INDEX_TRIGRAM_SOURCES": "*", "INDEX_TRIGRAM_CONTENT_SOURCES": "*"}),
+)
+
+
+def compound(rnd: random.Random) -> str:
+    return rnd.choice(HEADS) + rnd.choice(TAILS) + rnd.choice(SUFFIXES)
+
+
+def make_docs(count: int):
+    rnd = random.Random(23)
+    for i in range(count):
+        number = f"RE-{rnd.randint(2015, 2024)}-{rnd.randint(0, 99999):05d}"
+        part = f"XK-{rnd.randint(0, 9999):04d}"
+        words = [rnd.choice(WORDS) for _ in range(300)] + [compound(rnd) for _ in range(20)] + [number, part]
+        rnd.shuffle(words)
+        title = f"{compound(rnd).capitalize()} {number}"
+        yield DocumentMeta(
+            source="bench",
+            path=f"/bench/{i // 1000}/dok_{i}.pdf",
+            filename=f"{title}.pdf",
+            extension=".pdf",
+            size_bytes=rnd.randint(1_000, 5_000_000),
+            ctime=1_600_000_000.0 + i,
+            mtime=1_600_000_000.0 + i,
+            atime=None,
+            owner=None,
+            last_editor=None,
+            content=" ".join(words),
+            title_or_subject=title,
+        )
+
+
+def build(path: Path) -> float:
+    db.init_db(path)
+    conn = db.connect(path)
+    start = time.perf_counter()
+    db.begin_bulk_load(conn)
+    for i, meta in enumerate(make_docs(DOCS), start=1):
+        db.insert_document_bulk(conn, meta)
+        if i % 2000 == 0:
+            conn.commit()
+    conn.commit()
+    db.finish_bulk_load(conn)
+    elapsed = time.perf_counter() - start
+    conn.close()
+    return elapsed
+
+
+def trigram_bytes(conn) -> int:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    pages = conn.execute("SELECT COUNT(*) FROM dbstat WHERE name LIKE 'documents_trigram%'").fetchone()[0]
+    return pages * page_size
+
+
+def timed(run) -> tuple:
+    found = len(run())
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        run()
+    return (time.perf_counter() - start) / REPEAT * 1000, found
+
+
+def like_scan(conn, column: str, needle: str) -> list:
+    # gleiche Seite wie die Suche: neueste zuerst, LIMIT-Treffer
+    return conn.execute(
+        f"""
+        SELECT d.id FROM documents_data d JOIN documents_content c ON c.id = d.id
+        WHERE {column} LIKE ? ORDER BY d.mtime DESC LIMIT ?
+        """,
+        (f"%{needle}%", LIMIT),
+    ).fetchall()
+
+
+def main() -> None:
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, env in CONFIGS:
+            os.environ.update(env)
+            path = Path(tmp) / f"{label}.db"
+            seconds = build(path)
+            conn = db.connect(path)
+            size = trigram_bytes(conn)
+            latency = {}
+            if label != "ohne":
+                for _, needle in QUERIES:
+                    query = f'"{needle}"'
+                    latency[needle] = timed(lambda: db.search_documents(
+                        conn, query, limit=LIMIT, sort_key="mtime", sort_dir="desc", snippets=False,
+                        table=db.TRIGRAM_TABLE,
+                    ))
+            else:
+                for _, needle in QUERIES:
+                    latency[needle] = (
+                        timed(lambda: like_scan(conn, "c.title_or_subject", needle)),
+                        timed(lambda: like_scan(conn, "zdecompress(c.content)", needle)),
+                    )
+            results[label] = (seconds, size, path.stat().st_size, latency)
+            conn.close()
+    print(f"Dokumente: {DOCS}, Trefferseite {LIMIT} nach mtime")
+    for label, (seconds, size, total, _) in results.items():
+        print(f"{label:13} Bulk-Load {seconds:6.1f} s  Trigramm-Index {size / 1e6:7.1f} MB  DB {total / 1e6:7.1f} MB")
+    plain = results["ohne"][3]
+    print(f"{'Anfrage':36} {'LIKE Titel':>12} {'LIKE Inhalt':>12} {'Tri. Titel':>12} {'Tri. +Inhalt':>12}")
+    for description, needle in QUERIES:
+        (like_title, hits_title), (like_content, hits_content) = plain[needle]
+        tri_title = results["Titel"][3][needle]
+        tri_content = results["Titel+Inhalt"][3][needle]
+        print(
+            f"{description + ' (' + needle + ')':36} {like_title:9.2f} ms {like_content:9.1f} ms "
+            f"{tri_title[0]:9.2f} ms {tri_content[0]:9.2f} ms  Treffer {hits_title}/{tri_title[1]}, "
+            f"{hits_content}/{tri_content[1]}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: Veröffentlichen eines Index-Snapshots (Backup-API) mit und ohne parallelen Writer
+sowie Übernahme durch einen Follower.
+
+    python scripts/bench_snapshot.py [anzahl_dokumente]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from app.db import snapshot  # noqa: E402
+from bench_bulk_load import make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+WRITES = 2000
+
+
+def build(path: Path) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+def writer(path: Path, result: dict) -> None:
+    # Einzel-Commits wie der inkrementelle Indexer
+    conn = db.connect(path)
+    start = time.perf_counter()
+    for meta in make_docs(WRITES):
+        db.upsert_document(conn, meta)
+        conn.commit()
+    result["seconds"] = time.perf_counter() - start
+    conn.close()
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / "index.db"
+        published = Path(tmp) / "snapshots"
+        build(source)
+        idle = snapshot.publish_snapshot(source, published)
+
+        alone: dict = {}
+        writer(source, alone)
+        concurrent: dict = {}
+        thread = threading.Thread(target=writer, args=(source, concurrent))
+        thread.start()
+        busy = snapshot.publish_snapshot(source, published)
+        thread.join()
+
+        follower = snapshot.SnapshotFollower(published, Path(tmp) / "local")
+        start = time.perf_counter()
+        follower.adopt_latest()
+        adopt_ms = (time.perf_counter() - start) * 1000
+    print(f"Dokumente: {DOCS}, Snapshot {idle['size_bytes'] / 1e6:.1f} MB")
+    print(f"Veröffentlichen ohne Writer:  {idle['duration_ms']:8.1f} ms")
+    print(f"Veröffentlichen mit Writer:   {busy['duration_ms']:8.1f} ms")
+    print(f"{WRITES} Commits allein {alone['seconds']:.2f}s, während Snapshot {concurrent['seconds']:.2f}s")
+    print(f"Übernahme im Follower (Kopie + Umschalten): {adopt_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: Status-Abfragen per Aggregat über documents_data/file_errors (bisher) gegen die
+mitgezählte Statistik (doc_stats, index_counters) sowie deren Kosten im Bulk-Load.
+
+    python scripts/bench_stats.py [anzahl_dokumente]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db import datenbank as db  # noqa: E402
+from bench_dictionary_schema import SOURCES, make_docs  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "200000") or 200000)
+ERRORS = DOCS // 10
+REPEAT = 20
+
+LEGACY_QUERIES = {
+    "Gesamtzahl": "SELECT COUNT(*), SUM(size_bytes) FROM documents_data",
+    "Endungen": (
+        "SELECT e.name, COUNT(*) FROM documents_data d JOIN doc_extensions e ON e.id = d.extension_id GROUP BY e.name"
+    ),
+    "Offene Fehler": "SELECT COUNT(*) FROM file_errors WHERE ignored = 0",
+    "Dokumente je Quelle": (
+        "SELECT s.name, COUNT(*) FROM documents_data d JOIN doc_sources s ON s.id = d.source_id GROUP BY s.name"
+    ),
+}
+
+
+def build(path: Path, counted: bool) -> float:
+    db.init_db(path)
+    conn = db.connect(path)
+    original = db._stats_add
+    if not counted:
+        db._stats_add = lambda *args: None
+    try:
+        start = time.perf_counter()
+        db.begin_bulk_load(conn)
+        for meta in make_docs(DOCS):
+            db.insert_document_bulk(conn, meta)
+        conn.commit()
+        db.finish_bulk_load(conn)
+        elapsed = time.perf_counter() - start
+    finally:
+        db._stats_add = original
+    run_id = db.record_index_run_start(conn, "2024-01-01T00:00:00+00:00")
+    for i in range(ERRORS):
+        db.record_file_error(conn, run_id, f"/mnt/x/{i}.pdf", "pdf", "kaputt", "2024-01-01T00:00:00+00:00", i % 4 == 0)
+    conn.commit()
+    conn.close()
+    return elapsed
+
+
+def timed(fn) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = Path(tmp) / "plain.db"
+        counted = Path(tmp) / "counted.db"
+        load_plain = build(plain, counted=False)
+        load_counted = build(counted, counted=True)
+        conn = db.connect(counted)
+        old = {label: timed(lambda sql=sql: conn.execute(sql).fetchall()) for label, sql in LEGACY_QUERIES.items()}
+        new = {
+            "Gesamtzahl": timed(lambda: db._stats_snapshot(conn)),
+            "Endungen": timed(
+                lambda: conn.execute(
+                    "SELECT e.name, SUM(st.docs) FROM doc_stats st JOIN doc_extensions e ON e.id = st.extension_id"
+                    " GROUP BY st.extension_id"
+                ).fetchall()
+            ),
+            "Offene Fehler": timed(lambda: db.error_count(conn)),
+            "Dokumente je Quelle": timed(lambda: db.count_documents_by_source(conn, SOURCES)),
+        }
+        status = timed(lambda: db.get_status(conn))
+        start = time.perf_counter()
+        drift = db.reconcile_stats(conn)
+        conn.commit()
+        reconcile = time.perf_counter() - start
+        conn.close()
+    print(f"Dokumente: {DOCS}, Fehler: {ERRORS}")
+    print(f"Bulk-Load ohne Zählung {load_plain:.1f}s, mit Zählung {load_counted:.1f}s")
+    for label in old:
+        print(f"{label:22} Aggregat {old[label]:8.2f} ms   Statistik {new[label]:8.3f} ms")
+    print(f"get_status gesamt: {status:.3f} ms")
+    print(f"reconcile_stats: {reconcile * 1000:.0f} ms, Abweichung {drift}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: Vorschläge (/api/suggest) aus der Begriffsstatistik im Speicher gegen eine Abfrage auf
+documents_fts_vocab je Tastendruck; dazu Ladezeit und Speicher von Begriffen und Titeln.
+
+    python scripts/bench_suggest.py [anzahl_dokumente]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app import search_vocab  # noqa: E402
+from app.db import datenbank as db  # noqa: E402
+from app.db.datenbank import DocumentMeta  # noqa: E402
+from bench_search_fuzzy import make_vocab  # noqa: E402
+
+DOCS = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_DOCS", "50000") or 50000)
+WORDS = 300
+LIMIT = 8
+
+
+def make_docs(words: list, count: int):
+    rnd = random.Random(13)
+    weights = [1 / (rank + 1) for rank in range(len(words))]
+    for i in range(count):
+        text = " ".join(rnd.choices(words, weights=weights, k=200))
+        title = " ".join(w.capitalize() for w in rnd.choices(words, weights=weights, k=3)) + f" {rnd.randint(2015, 2024)}"
+        yield DocumentMeta(
+            source="bench",
+            path=f"/bench/{i // 1000}/dok_{i}.txt",
+            filename=f"dok_{i}.txt",
+            extension=".txt",
+            size_bytes=len(text),
+            ctime=1_600_000_000.0 + i,
+            mtime=1_600_000_000.0 + i,
+            atime=None,
+            owner=None,
+            last_editor=None,
+            content=text,
+            title_or_subject=title,
+        )
+
+
+def build(path: Path, words: list) -> None:
+    db.init_db(path)
+    conn = db.connect(path)
+    db.begin_bulk_load(conn)
+    for meta in make_docs(words, DOCS):
+        db.insert_document_bulk(conn, meta)
+    conn.commit()
+    db.finish_bulk_load(conn)
+    conn.close()
+
+
+def keystrokes(rnd: random.Random, words: list) -> list:
+    # jedes Wort Buchstabe für Buchstabe ab 2 Zeichen, teils hinter einem ersten Wort
+    inputs = []
+    for word in rnd.sample(words, WORDS):
+        head = f"{rnd.choice(words)} " if rnd.random() < 0.5 else ""
+        inputs += [head + word[:end] for end in range(2, len(word) + 1)]
+    return inputs
+
+
+def vocab_query(conn, text: str) -> list:
+    prefix = search_vocab.fold(text.split()[-1])
+    return conn.execute(
+        "SELECT term, doc FROM documents_fts_vocab WHERE term >= ? AND term < ? ORDER BY doc DESC LIMIT ?",
+        (prefix, prefix + "\U0010ffff", LIMIT),
+    ).fetchall()
+
+
+def percentile(values: list, share: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main() -> None:
+    rnd = random.Random(11)
+    words = make_vocab(rnd)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "index.db"
+        build(path, words)
+        db.DB_PATH = path
+        with db.read_conn() as conn:
+            tracemalloc.start()
+            vocab = search_vocab.refresh(conn)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+        print(
+            f"Dokumente: {DOCS}, Begriffe: {len(vocab)}, Titel: {len(vocab.titles)}, "
+            f"Laden {search_vocab.stats()['load_ms']} ms, Speicher {size / 1e6:.1f} MB"
+        )
+        inputs = keystrokes(rnd, words)
+        latencies = {"Speicher (/api/suggest)": [], "documents_fts_vocab": []}
+        for text in inputs:
+            # wie der Endpunkt: Verbindung aus dem Pool, Stand prüfen, nachschlagen
+            start = time.perf_counter()
+            with db.read_conn() as conn:
+                current = search_vocab.get_vocab(conn)
+            search_vocab.suggest(current, text, LIMIT)
+            latencies["Speicher (/api/suggest)"].append((time.perf_counter() - start) * 1000)
+        with db.read_conn() as conn:
+            for text in inputs[:200]:
+                start = time.perf_counter()
+                vocab_query(conn, text)
+                latencies["documents_fts_vocab"].append((time.perf_counter() - start) * 1000)
+    print(f"Eingaben: {len(inputs)} (je Tastendruck, {WORDS} Wörter; Abfrage nur für die ersten 200)")
+    for label, values in latencies.items():
+        print(
+            f"{label:24} p50 {statistics.median(values):8.3f} ms  p99 {percentile(values, 0.99):8.3f} ms  "
+            f"max {max(values):8.3f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: verteilter Indexlauf (Koordinator + lokale Worker-Prozesse) mit 1, 2 und 4 Workern
+auf demselben synthetischen Baum; jede Variante baut eine eigene, leere Index-DB auf.
+
+    python scripts/bench_work_coordinator.py [anzahl_dateien] [worker,...]
+
+BENCH_KIND=pdf (Standard) erzeugt einfache PDFs (Extraktion teuer), BENCH_KIND=txt reine Textdateien.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO))
+
+FILES = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv("BENCH_FILES", "4000") or 4000)
+WORKERS = [int(w) for w in (sys.argv[2] if len(sys.argv) > 2 else "1,2,4").split(",")]
+KIND = os.getenv("BENCH_KIND", "pdf")
+PAGES = 4
+WORDS = [f"wort{i}" for i in range(5000)] + ["rechnung", "vertrag", "angebot", "mahnung", "protokoll"]
+
+
+def make_pdf(lines_per_page):
+    # minimales PDF mit Standardschrift, ohne zusätzliche Bibliothek
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in lines_per_page:
+        body = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+def make_tree(root: Path) -> None:
+    # zwei Ebenen Verzeichnisse, damit genug Arbeitspakete entstehen
+    rnd = random.Random(42)
+    for i in range(FILES):
+        folder = root / f"bereich_{i % 8}" / f"ordner_{i % 64}"
+        folder.mkdir(parents=True, exist_ok=True)
+        if KIND == "pdf":
+            pages = [[" ".join(rnd.choice(WORDS) for _ in range(10)) for _ in range(60)] for _ in range(PAGES)]
+            (folder / f"dok_{i}.pdf").write_bytes(make_pdf(pages))
+        else:
+            text = " ".join(rnd.choice(WORDS) for _ in range(2000))
+            (folder / f"dok_{i}.txt").write_text(text, encoding="utf-8")
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp)
+        # Status-, Log- und Konfigurationsdateien landen im Temp-Verzeichnis, Worker finden das Paket
+        os.chdir(base)
+        os.environ["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO), os.getenv("PYTHONPATH")]))
+        os.environ["CONFIG_DB_PATH"] = str(base / "config.db")
+        os.environ["LOG_DIR"] = str(base / "logs")
+        os.environ["DATA_CONTAINER_PATH"] = str(base / "data")
+        os.environ.pop("INDEX_ROOTS", None)
+
+        from app import config_db
+        from app.config_loader import load_config
+        from app.db import datenbank as db
+        from app.index_runner import resolve_active_roots
+        from app.indexer import work_coordinator as wc
+
+        root = base / "data" / "archiv"
+        make_tree(root)
+        config_db.set_setting("base_data_root", str(base / "data"))
+        config_db.add_root(str(root), "archiv", True)
+        config = load_config()
+        config.paths.roots = resolve_active_roots(config)
+
+        # Schreibanteil des Koordinators messen: er ist seriell und begrenzt die Skalierung
+        ingest = {"seconds": 0.0}
+        original_ingest = wc._ingest
+
+        def timed_ingest(*args):
+            started = time.perf_counter()
+            try:
+                return original_ingest(*args)
+            finally:
+                ingest["seconds"] += time.perf_counter() - started
+
+        wc._ingest = timed_ingest
+        results = []
+        for workers in WORKERS:
+            ingest["seconds"] = 0.0
+            db.DB_PATH = base / f"index_{workers}.db"
+            start = time.perf_counter()
+            counters = wc.run_distributed_index(config, workers=workers, work_db=base / f"work_{workers}.db", poll_interval=0.1)
+            elapsed = time.perf_counter() - start
+            results.append((workers, elapsed, ingest["seconds"], counters.get("added", 0)))
+
+    print(f"Dateien: {FILES} ({KIND}), CPUs: {os.cpu_count()}")
+    single = results[0][1]
+    for workers, elapsed, written, added in results:
+        print(
+            f"{workers} Worker: {elapsed:8.2f}s  {added / elapsed:8.0f} Dok/s  Faktor {single / elapsed:4.2f}x  "
+            f"Schreiben {written:6.2f}s  (added={added})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,23 @@ def pytest_runtest_makereport(item, call):
     setattr(item, f"rep_{rep.when}", rep)
 
 
+@pytest.fixture(autouse=True)
+def _index_status_files(tmp_path, monkeypatch):
+    # Lauf- und Live-Status nicht nach data/ im Repo schreiben
+    from app import index_runner
+    from app.indexer import index_lauf_service
+
+    for name in ("RUN_STATUS_FILE", "HEARTBEAT_FILE", "LIVE_STATUS_FILE", "LIVE_RUNS_FILE"):
+        path = tmp_path / "status" / getattr(index_lauf_service, name).name
+        monkeypatch.setattr(index_lauf_service, name, path)
+        monkeypatch.setattr(index_runner, name, path)
+    yield
+    # im Test gestartete Läufe beenden, solange die Pfade noch umgebogen sind
+    deadline = time.time() + 10
+    while index_runner.active_runs() and time.time() < deadline:
+        time.sleep(0.05)
+
+
 @pytest.fixture(scope="session")
 def artifacts_dir():
     root = Path(os.getenv("E2E_ARTIFACT_DIR", "test-artifacts")) / time.strftime("%Y%m%d-%H%M%S")
@@ -1,6 +1,8 @@
 from pathlib import Path
 import os
+import threading
 
+import pytest
 from fastapi.testclient import TestClient
 
 from app.config_loader import load_config
@@ -8,6 +10,7 @@ from app.db import datenbank as db
 from app.main import create_app
 from app import config_db
 from app import index_runner
+from app import search_budget, search_fuzzy, search_vocab
 
 
 def test_search_endpoint(tmp_path, monkeypatch):
@@ -168,3 +171,313 @@ def test_sources_follow_active_roots(tmp_path, monkeypatch):
     assert resp2.status_code == 200
     labels2 = set(resp2.json().get("labels", []))
     assert labels2 == {"R1"}
+
+
+def test_follower_adopts_snapshots_and_rejects_writes(tmp_path, monkeypatch):
+    from app import main
+    from app.db import snapshot
+
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    primary = tmp_path / "primary.db"
+    published = tmp_path / "snapshots"
+    db.init_db(primary)
+
+    def add(name: str) -> None:
+        conn = db.connect(primary)
+        db.upsert_document(
+            conn,
+            db.DocumentMeta(
+                source="test", path=f"/srv/{name}.txt", filename=f"{name}.txt", extension=".txt", size_bytes=1,
+                ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None, content=name, title_or_subject=None,
+            ),
+        )
+        conn.commit()
+        conn.close()
+
+    add("erstens")
+    with db.read_conn(primary) as conn:
+        search_fuzzy.build(conn, search_fuzzy.index_path(primary))
+    assert snapshot.publish_snapshot(primary, published)["generation"] == 1
+    # unverändert: keine neue Generation
+    assert snapshot.publish_snapshot(primary, published) is None
+
+    monkeypatch.setenv("APP_ROLE", "follower")
+    monkeypatch.setenv("INDEX_SNAPSHOT_DIR", str(published))
+    monkeypatch.setenv("INDEX_SNAPSHOT_LOCAL_DIR", str(tmp_path / "local"))
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "follower.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    client = TestClient(create_app())
+
+    def hits(term: str) -> int:
+        return len(client.get("/api/search", params={"q": term}, headers=headers).json()["results"])
+
+    assert hits("erstens") == 1
+    assert client.post("/api/admin/index/run", headers=headers).status_code == 409
+    # Tippfehlersuche mit dem mitkopierten Wörterbuch, ohne eigenen Bau
+    search_fuzzy.reset()
+    builds = search_fuzzy.stats()["builds"]
+    resp = client.get("/api/search", params={"q": "erstnes", "mode": "fuzzy"}, headers=headers)
+    assert len(resp.json()["results"]) == 1
+    assert search_fuzzy.stats()["builds"] == builds and not search_fuzzy.stats()["building"]
+
+    add("zweitens")
+    snapshot.publish_snapshot(primary, published)
+    assert main._snapshot_worker.adopt_latest()
+    assert hits("zweitens") == 1
+    status = main._snapshot_worker.status()
+    assert (status["generation"], status["behind"]) == (2, 0)
+    assert status["lag_seconds"] is not None
+    search_fuzzy.reset()
+
+
+def test_follower_never_rebuilds_adopted_snapshot(tmp_path, monkeypatch):
+    from app.db import migrations, snapshot
+
+    primary = tmp_path / "primary.db"
+    published = tmp_path / "snapshots"
+    db.init_db(primary)
+    conn = db.connect(primary)
+    db.upsert_document(
+        conn,
+        db.DocumentMeta(
+            source="test", path="/srv/a.txt", filename="a.txt", extension=".txt", size_bytes=1,
+            ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None, content="eintrag", title_or_subject=None,
+        ),
+    )
+    conn.commit()
+    fts_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'documents_fts'").fetchone()[0]
+    conn.close()
+    snapshot.publish_snapshot(primary, published)
+
+    # andere Profile beim Follower: melden, aber nicht neu tokenisieren
+    monkeypatch.setenv("INDEX_FTS_PROFILE", "minimal")
+    monkeypatch.setenv("INDEX_TRIGRAM_CONTENT_SOURCES", "*")
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "follower.db")
+    follower = snapshot.SnapshotFollower(published, tmp_path / "local")
+    assert follower.adopt_latest()
+    with db.read_conn() as conn:
+        assert conn.execute("SELECT sql FROM sqlite_master WHERE name = 'documents_fts'").fetchone()[0] == fts_sql
+        assert len(db.search_documents(conn, "eintrag")) == 1
+
+    # anderes Schema wird abgelehnt
+    conn = db.connect(primary)
+    conn.execute(f"PRAGMA user_version = {migrations.latest_version(db.MIGRATIONS) + 1}")
+    conn.commit()
+    conn.close()
+    snapshot.publish_snapshot(primary, published, force=True)
+    with pytest.raises(RuntimeError):
+        follower.adopt_latest()
+    assert follower.generation == 1
+
+
+def test_search_cache_hits_until_index_changes(tmp_path, monkeypatch):
+    from app import search_cache
+
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "cache.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    search_cache.reset_cache()
+    client = TestClient(create_app())
+
+    def add(name: str) -> None:
+        with db.get_conn() as conn:
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="test", path=f"/srv/{name}.txt", filename=f"{name}.txt", extension=".txt", size_bytes=1,
+                    ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None, content=f"angebot {name}",
+                    title_or_subject=None,
+                ),
+            )
+
+    def hits() -> int:
+        return len(client.get("/api/search", params={"q": "angebot"}, headers=headers).json()["results"])
+
+    add("eins")
+    assert hits() == 1
+    assert hits() == 1
+    stats = client.get("/api/admin/metrics/search_cache", headers=headers).json()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+
+    # Commit erhöht die Generation: kein veraltetes Ergebnis
+    add("zwei")
+    assert hits() == 2
+    with db.get_conn() as conn:
+        db.remove_documents_by_paths(conn, ["/srv/eins.txt"])
+    assert hits() == 1
+    stats = client.get("/api/admin/metrics/search_cache", headers=headers).json()
+    assert stats["hits"] == 1 and stats["invalidations"] == 2
+    search_cache.reset_cache()
+
+
+def test_search_cursor_pagination_and_facets(tmp_path, monkeypatch):
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "cursor.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    client = TestClient(create_app())
+    with db.get_conn() as conn:
+        for i in range(5):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="test", path=f"/srv/bericht_{i}.txt", filename=f"bericht_{i}.txt", extension=".txt",
+                    size_bytes=i, ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None,
+                    content="quartalsbericht", title_or_subject=None,
+                ),
+            )
+
+    params = {"q": "quartalsbericht", "limit": 2, "sort_key": "size_bytes", "sort_dir": "desc"}
+    seen = []
+    cursor = None
+    while True:
+        data = client.get("/api/search", params={**params, "cursor": cursor} if cursor else params, headers=headers).json()
+        assert "sort_value" not in data["results"][0]
+        seen.extend(row["size_bytes"] for row in data["results"])
+        cursor = data["next_cursor"]
+        if not data["has_more"]:
+            assert cursor is None
+            break
+    assert seen == [4, 3, 2, 1, 0]
+    resp = client.get("/api/search", params={**params, "cursor": "ungültig"}, headers=headers)
+    assert resp.status_code == 400
+
+    data = client.get("/api/search", params={**params, "facets": "source,year"}, headers=headers).json()
+    assert data["facets"]["source"] == [{"value": "test", "count": 5}]
+    assert "extension" not in data["facets"]
+    assert "facets" not in client.get("/api/search", params=params, headers=headers).json()
+    assert client.get("/api/search", params={**params, "facets": "autor"}, headers=headers).status_code == 400
+
+    # getrennt nachgeladene Trefferzahlen, ohne Trefferseite
+    data = client.get("/api/search/facets", params={"q": "quartalsbericht"}, headers=headers).json()
+    assert data["facets"]["source"] == [{"value": "test", "count": 5}]
+    assert data["facets"]["extension"] == [{"value": ".txt", "count": 5}]
+    assert "results" not in data
+    resp = client.get("/api/search/facets", params={"q": "quartalsbericht", "facets": "autor"}, headers=headers)
+    assert resp.status_code == 400
+
+
+def test_search_snippets_endpoint(tmp_path, monkeypatch):
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "snippets.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    client = TestClient(create_app())
+    with db.get_conn() as conn:
+        doc_id = db.upsert_document(
+            conn,
+            db.DocumentMeta(
+                source="test", path="/srv/vertrag.txt", filename="vertrag.txt", extension=".txt", size_bytes=1,
+                ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None,
+                content="dieser mietvertrag endet", title_or_subject=None,
+            ),
+        )
+
+    data = client.get("/api/search", params={"q": "mietvertrag", "snippets": "false"}, headers=headers).json()
+    assert data["results"][0]["snippet"] == ""
+    resp = client.get("/api/search/snippets", params={"q": "mietvertrag", "ids": [doc_id]}, headers=headers)
+    assert "<mark>mietvertrag</mark>" in resp.json()["snippets"][str(doc_id)]
+    resp = client.get("/api/search/snippets", params={"q": "*", "ids": [doc_id]}, headers=headers)
+    assert resp.json() == {"snippets": {}}
+
+
+def test_search_budget_aborts_broad_queries(tmp_path, monkeypatch):
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "budget.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    monkeypatch.setattr(search_budget, "PROGRESS_INTERVAL", 1)
+    search_budget.reset_stats()
+    client = TestClient(create_app())
+    with db.get_conn() as conn:
+        for i in range(3):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="test", path=f"/srv/bericht_{i}.txt", filename=f"bericht_{i}.txt", extension=".txt",
+                    size_bytes=1, ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None,
+                    content=f"quartalsbericht nummer {i}", title_or_subject=None,
+                ),
+            )
+
+    assert len(client.get("/api/search", params={"q": "quartalsbericht"}, headers=headers).json()["results"]) == 3
+    monkeypatch.setenv("SEARCH_MAX_STEPS", "5")
+    data = client.get("/api/search", params={"q": "nummer"}, headers=headers).json()
+    assert data["results"] == [] and data["too_broad"] and data["reason"] == "steps"
+    stats = client.get("/api/admin/metrics/search_budget", headers=headers).json()
+    assert stats["searches"] == 2 and stats["steps"] == 1 and stats["max_steps"] == 5
+
+    cancel = threading.Event()
+    cancel.set()
+    with db.read_conn() as conn:
+        with pytest.raises(search_budget.QueryAborted) as exc:
+            with search_budget.Budget(cancel=cancel).guard(conn):
+                db.search_documents(conn, "nummer")
+        assert exc.value.reason == "cancelled"
+        # Verbindung bleibt nach dem Abbruch nutzbar
+        assert len(db.search_documents(conn, "nummer")) == 3
+
+
+def test_search_narrows_expensive_prefixes(tmp_path, monkeypatch):
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "vocab.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    monkeypatch.setenv("SEARCH_PREFIX_MAX_COST", "20")
+    monkeypatch.setenv("SEARCH_PREFIX_TOP_N", "2")
+    search_vocab.reset()
+    client = TestClient(create_app())
+    words = ["rechnung"] * 3 + ["rechnungen"] * 2 + ["rechteck", "rechner"]
+    with db.get_conn() as conn:
+        for i, word in enumerate(words):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="test", path=f"/srv/doc_{i}.txt", filename=f"doc_{i}.txt", extension=".txt",
+                    size_bytes=1, ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None,
+                    content=f"{word} nummer {i}", title_or_subject=None,
+                ),
+            )
+        # 4 Erweiterungen x 4 + 7 Dokumente = 23 > 20: die zwei häufigsten bleiben, solange sie ins Budget passen
+        search_vocab.refresh(conn)
+
+    data = client.get("/api/search", params={"q": "rech", "mode": "standard"}, headers=headers).json()
+    assert data["narrowed"] == [{"term": "rech*", "expansions": 4, "kept": ["rechnung", "rechnungen"]}]
+    assert len(data["results"]) == 5
+    # günstige Präfixe bleiben unverändert
+    data = client.get("/api/search", params={"q": "rechnungen", "mode": "standard"}, headers=headers).json()
+    assert "narrowed" not in data and len(data["results"]) == 2
+    stats = client.get("/api/admin/metrics/search_vocab", headers=headers).json()
+    # 4 Wörter, "nummer", Ziffern 0-6
+    assert stats["terms"] == 12 and stats["narrowed_terms"] == 1
+    search_vocab.reset()
+
+
+def test_suggest_completes_last_word(tmp_path, monkeypatch):
+    os.environ["APP_SECRET"] = "testsecret"
+    headers = {"X-App-Secret": "testsecret"}
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "suggest.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    search_vocab.reset()
+    client = TestClient(create_app())
+    docs = [("rechnung", "Rechnung Müller 2023"), ("rechnung", "Rechnung Meier"), ("rechteck", "Skizze")]
+    with db.get_conn() as conn:
+        for i, (word, title) in enumerate(docs):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="test", path=f"/srv/doc_{i}.txt", filename=f"doc_{i}.txt", extension=".txt",
+                    size_bytes=1, ctime=1.0, mtime=float(i), atime=None, owner=None, last_editor=None,
+                    content=f"{word} vom amt", title_or_subject=title,
+                ),
+            )
+        search_vocab.refresh(conn)
+
+    data = client.get("/api/suggest", params={"q": "Angebot Rech"}, headers=headers).json()
+    assert [item["term"] for item in data["terms"]] == ["rechnung", "rechteck"]
+    assert data["terms"][0] == {"term": "rechnung", "docs": 2, "query": "Angebot rechnung"}
+    data = client.get("/api/suggest", params={"q": "rechnung mu", "limit": 1}, headers=headers).json()
+    assert data == {"terms": [{"term": "muller", "docs": 1, "query": "rechnung muller"}], "titles": ["Rechnung Müller 2023"]}
+    search_vocab.reset()
@@ -1,4 +1,5 @@
 import os
+import threading
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
@@ -7,7 +8,7 @@ from fastapi.testclient import TestClient
 
 from app import config_db
 from app.auto_index_scheduler import AutoIndexConfig, compute_next_run
-from app.index_runner import index_lock, start_index_run
+from app.index_runner import _source_lock, index_lock, start_index_run
 from app.main import create_app
 
 
@@ -83,6 +84,60 @@ def test_start_index_run_busy(monkeypatch, tmp_path):
         index_lock.release()
 
 
+def test_start_index_run_skips_busy_source(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    seen = []
+    done = threading.Event()
+
+    def dummy_run(cfg):
+        seen.append([label for _, label, _ in cfg.paths.roots])
+
+    monkeypatch.setattr("app.index_runner.run_index_lauf", dummy_run)
+    roots = [(tmp_path / "a", "quelle_a", "file"), (tmp_path / "b", "quelle_b", "file")]
+    lock = _source_lock("quelle_a")
+    lock.acquire()
+    try:
+        res = start_index_run(
+            resolve_roots=lambda cfg: roots,
+            on_finish=lambda *args: done.set(),
+        )
+        assert res == "started"
+        assert done.wait(5)
+    finally:
+        lock.release()
+    assert seen == [["quelle_b"]]
+
+
+def test_exclusive_and_source_runs_never_start_together(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    release = threading.Event()
+    monkeypatch.setattr("app.index_runner.run_index_lauf", lambda cfg: release.wait(5))
+    monkeypatch.setattr("app.index_runner.index_lauf_service.run_shadow_rebuild", lambda cfg: release.wait(5))
+    monkeypatch.setattr("app.index_runner._maintain_after_runs", lambda: None)
+    roots = [(tmp_path, "root", "file")]
+
+    for _ in range(20):
+        release.clear()
+        barrier = threading.Barrier(2)
+        finished = threading.Event()
+        results = {}
+
+        def start(full_reset):
+            barrier.wait()
+            results[full_reset] = start_index_run(
+                full_reset=full_reset, roots_override=roots, on_finish=lambda *args: finished.set(), shadow=True
+            )
+
+        threads = [threading.Thread(target=start, args=(flag,)) for flag in (True, False)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert sorted(results.values()) == ["busy", "started"]
+        release.set()
+        assert finished.wait(5)
+
+
 def test_auto_index_config_endpoints(monkeypatch, tmp_path):
     setup_env(monkeypatch, tmp_path)
     monkeypatch.setattr("app.db.datenbank.DB_PATH", tmp_path / "index.db")
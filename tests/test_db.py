@@ -1,3 +1,5 @@
+import sqlite3
+
 from app.db import datenbank as db
 
 
@@ -64,3 +66,443 @@ def test_delete_documents_by_source(tmp_path, monkeypatch):
         assert removed == 1
         paths = [row["path"] for row in conn.execute("SELECT path FROM documents").fetchall()]
         assert paths == ["a.txt"]
+
+
+def test_content_is_compressed_and_reindexed_on_update(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    text = "rechnung " * 200
+    meta = db.DocumentMeta(
+        source="A",
+        path="r.txt",
+        filename="r.txt",
+        extension=".txt",
+        size_bytes=len(text),
+        ctime=1.0,
+        mtime=1.0,
+        atime=None,
+        owner=None,
+        last_editor=None,
+        content=text,
+        title_or_subject="alt",
+    )
+    with db.get_conn() as conn:
+        doc_id = db.upsert_document(conn, meta)
+        stored = conn.execute("SELECT content FROM documents_content WHERE id = ?", (doc_id,)).fetchone()[0]
+        assert isinstance(stored, bytes) and len(stored) < len(text)
+        assert db.get_document_content(conn, doc_id) == text
+        assert "<mark>rechnung</mark>" in db.search_documents(conn, "rechnung")[0]["snippet"]
+
+        meta.content = "vertrag"
+        db.upsert_document(conn, meta)
+        db.update_document_metadata(conn, doc_id, title_or_subject="neu")
+        assert db.search_documents(conn, "rechnung") == []
+        assert len(db.search_documents(conn, "vertrag")) == 1
+        assert db.get_document_title(conn, doc_id) == "neu"
+        conn.execute("INSERT INTO documents_fts(documents_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_migrates_legacy_fts_layout(tmp_path, monkeypatch):
+    path = tmp_path / "index.db"
+    monkeypatch.setattr(db, "DB_PATH", path)
+    legacy = sqlite3.connect(path)
+    legacy.executescript(
+        """
+        CREATE TABLE documents (
+            id INTEGER PRIMARY KEY, source TEXT NOT NULL, path TEXT NOT NULL UNIQUE, filename TEXT NOT NULL,
+            extension TEXT NOT NULL, size_bytes INTEGER NOT NULL, ctime REAL NOT NULL, mtime REAL NOT NULL,
+            atime REAL, owner TEXT, last_editor TEXT
+        );
+        CREATE VIRTUAL TABLE documents_fts USING fts5(
+            doc_id UNINDEXED, content, title_or_subject, tokenize = 'unicode61 remove_diacritics 2'
+        );
+        INSERT INTO documents VALUES (7, 'A', 'a.txt', 'a.txt', '.txt', 1, 1.0, 1.0, NULL, NULL, NULL);
+        INSERT INTO documents_fts (doc_id, content, title_or_subject) VALUES (7, 'alte mahnung', 'a');
+        INSERT INTO documents_fts (doc_id, content, title_or_subject) VALUES (99, 'verwaist', 'x');
+        """
+    )
+    legacy.commit()
+    legacy.close()
+
+    db.init_db()
+
+    with db.get_conn() as conn:
+        rows = db.search_documents(conn, "mahnung")
+        assert [r["id"] for r in rows] == [7]
+        assert db.get_document_content(conn, 7) == "alte mahnung"
+        assert conn.execute("SELECT COUNT(*) FROM documents_content").fetchone()[0] == 1
+        assert db.search_documents(conn, "verwaist") == []
+
+
+def test_fts_profile_switch_rebuilds_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    meta = db.DocumentMeta(
+        source="A",
+        path="m.txt",
+        filename="m.txt",
+        extension=".txt",
+        size_bytes=1,
+        ctime=1.0,
+        mtime=1.0,
+        atime=None,
+        owner=None,
+        last_editor=None,
+        content="quartalsbericht umsatz",
+        title_or_subject="m",
+    )
+    with db.get_conn() as conn:
+        db.upsert_document(conn, meta)
+
+    # Profilwechsel greift beim nächsten Start (Migrationslauf)
+    monkeypatch.setenv("INDEX_FTS_PROFILE", "minimal")
+    db.migrate()
+
+    with db.get_conn() as conn:
+        sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'documents_fts'").fetchone()[0]
+        assert "detail = none" in sql
+        assert len(db.search_documents(conn, "quartal*")) == 1
+
+
+def test_compact_schema_encodes_lookups_and_keeps_api_rows(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+
+    def meta(path, source, ext, filename=None):
+        return db.DocumentMeta(
+            source=source,
+            path=path,
+            filename=filename or path.rsplit("/", 1)[-1],
+            extension=ext,
+            size_bytes=1,
+            ctime=1.0,
+            mtime=1.0,
+            atime=None,
+            owner="FIRMA\\anna",
+            last_editor=None,
+            content="angebot",
+            title_or_subject="t",
+        )
+
+    with db.get_conn() as conn:
+        first = db.upsert_document(conn, meta("/srv/a/eins.pdf", "A", ".pdf"))
+        db.upsert_document(conn, meta("/srv/a/zwei.txt", "A", ".txt"))
+        db.upsert_document(conn, meta("/srv/b/mail.eml", "B", ".eml", filename="Betreff.eml"))
+
+        assert conn.execute("SELECT COUNT(*) FROM doc_dirs").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM doc_sources").fetchone()[0] == 2
+        row = db.get_document_by_path(conn, "/srv/a/eins.pdf")
+        assert (row["id"], row["source"], row["filename"], row["owner"]) == (first, "A", "eins.pdf", "FIRMA\\anna")
+
+        hits = db.search_documents(conn, "angebot", filters={"source_labels": ["A"], "extension": ".pdf"})
+        assert [r["path"] for r in hits] == ["/srv/a/eins.pdf"]
+        assert db.search_documents(conn, "angebot", filters={"source": "unbekannt"}) == []
+
+        # Umbenennen behält abweichenden Anzeigenamen, sonst folgt filename dem Pfad
+        mail_id = db.get_document_by_path(conn, "/srv/b/mail.eml")["id"]
+        db.update_document_metadata(conn, mail_id, path="/srv/c/mail2.eml")
+        db.update_document_metadata(conn, first, path="/srv/a/umbenannt.pdf", filename="umbenannt.pdf")
+        assert db.get_document(conn, mail_id)["filename"] == "Betreff.eml"
+        assert db.get_document(conn, first)["path"] == "/srv/a/umbenannt.pdf"
+        assert conn.execute("SELECT filename FROM documents_data WHERE id = ?", (first,)).fetchone()[0] is None
+        assert db.remove_documents_by_paths(conn, ["/srv/c/mail2.eml", "/fehlt.txt"]) == 1
+        assert db.get_size_mtime_by_path(conn, "/srv/a/zwei.txt") == (1, 1.0)
+
+
+def test_stats_follow_writes_without_drift(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+
+    def meta(path, source, size):
+        return db.DocumentMeta(
+            source=source,
+            path=path,
+            filename=path.rsplit("/", 1)[-1],
+            extension="." + path.rsplit(".", 1)[-1],
+            size_bytes=size,
+            ctime=1.0,
+            mtime=1.0,
+            atime=None,
+            owner=None,
+            last_editor=None,
+            content="x",
+            title_or_subject=None,
+        )
+
+    def grouped(conn):
+        return conn.execute(
+            "SELECT s.name, st.docs, st.bytes FROM doc_stats st JOIN doc_sources s ON s.id = st.source_id"
+            " WHERE st.docs > 0 ORDER BY s.name"
+        ).fetchall()
+
+    with db.get_conn() as conn:
+        first = db.upsert_document(conn, meta("/a/eins.pdf", "A", 10))
+        db.upsert_document(conn, meta("/a/eins.pdf", "A", 15))
+        db.insert_document_bulk(conn, meta("/a/zwei.txt", "A", 5))
+        db.upsert_document(conn, meta("/b/drei.pdf", "B", 7))
+        db.update_document_metadata(conn, first, source="B", size_bytes=20)
+        db.remove_documents_by_paths(conn, ["/a/zwei.txt"])
+        run_id = db.record_index_run_start(conn, "2024-01-01T00:00:00+00:00")
+        db.record_file_error(conn, run_id, "/a/x.pdf", "pdf", "kaputt", "2024-01-01T00:00:00+00:00")
+        db.record_file_error(conn, run_id, "/a/y.pdf", "pdf", "leer", "2024-01-01T00:00:00+00:00", ignored=True)
+
+        status = db.get_status(conn)
+        assert (status["total_docs"], status["total_bytes"]) == (2, 27)
+        assert [tuple(r) for r in grouped(conn)] == [("B", 2, 27)]
+        assert db.count_documents_by_source(conn, ["A", "B"]) == {"B": 2}
+        assert db.error_count(conn) == 1
+
+        db.prune_run_history(conn, run_id, compact=False)
+        assert db.error_count(conn) == 0
+        db.delete_documents_by_source(conn, ["B"])
+        assert db.get_status(conn)["total_docs"] == 0
+        assert not any(db.reconcile_stats(conn).values())
+
+
+def test_search_cursor_pages_match_offset_pages(tmp_path, monkeypatch):
+    import pytest
+
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    with db.get_conn() as conn:
+        for i in range(23):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="quelle", path=f"/srv/akte_{i % 7}_{i}.txt", filename=f"akte_{i % 7}_{i}.txt",
+                    extension=".txt", size_bytes=100 * (i % 5), ctime=1.0, mtime=float(i % 4), atime=None,
+                    owner=None, last_editor=None, content="vertrag " * (1 + i % 3) + f"nr{i}",
+                    title_or_subject=None,
+                ),
+            )
+        # gleiche Sortierwerte kommen vor: id entscheidet, kein Treffer doppelt oder verloren
+        for query, sort_key, sort_dir in (
+            ("vertrag", None, None),
+            ("vertrag", "size_bytes", "desc"),
+            ("vertrag", "filename", "asc"),
+            ("*", None, None),
+            ("*", "mtime", "asc"),
+        ):
+            rows = db.search_documents(conn, query, limit=100, sort_key=sort_key, sort_dir=sort_dir)
+            expected = [row["id"] for row in rows]
+            assert len(expected) == 23
+            pages, cursor = [], None
+            while True:
+                rows = db.search_documents(conn, query, limit=5, sort_key=sort_key, sort_dir=sort_dir, cursor=cursor)
+                pages.extend(row["id"] for row in rows)
+                if len(rows) < 5:
+                    break
+                cursor = db.encode_search_cursor(query, sort_key, sort_dir, rows[-1])
+            assert pages == expected
+            offset_page = db.search_documents(conn, query, limit=5, offset=10, sort_key=sort_key, sort_dir=sort_dir)
+            assert [row["id"] for row in offset_page] == expected[10:15]
+
+        cursor = db.encode_search_cursor("vertrag", "size_bytes", "desc", rows[-1])
+        with pytest.raises(ValueError):
+            db.search_documents(conn, "vertrag", sort_key="mtime", cursor=cursor)
+        with pytest.raises(ValueError):
+            db.search_documents(conn, "vertrag", cursor="kein-cursor")
+
+
+def test_search_facets_count_per_source_extension_year(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    year_2022, year_2023 = 1656633600.0, 1688169600.0  # Mitte 2022 bzw. 2023
+    docs = [
+        ("archiv", ".pdf", year_2022), ("archiv", ".pdf", year_2023), ("archiv", ".msg", year_2023),
+        ("technik", ".pdf", year_2023), ("technik", ".txt", year_2022), ("technik", ".txt", year_2022),
+    ]
+    with db.get_conn() as conn:
+        for i, (source, ext, mtime) in enumerate(docs):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source=source, path=f"/srv/{source}/d{i}{ext}", filename=f"d{i}{ext}", extension=ext,
+                    size_bytes=1, ctime=mtime, mtime=mtime, atime=None, owner=None, last_editor=None,
+                    content="protokoll", title_or_subject=None,
+                ),
+            )
+
+        facets = db.search_facets(conn, "protokoll")
+        assert facets["approximate"] is False
+        assert facets["source"] == [{"value": "archiv", "count": 3}, {"value": "technik", "count": 3}]
+        assert facets["extension"][0] == {"value": ".pdf", "count": 3}
+        assert facets["year"] == [{"value": 2023, "count": 3}, {"value": 2022, "count": 3}]
+
+        # eigener Filter gilt nicht für die eigene Facette
+        facets = db.search_facets(conn, "protokoll", {"source_labels": ["technik"], "extension": ".pdf"})
+        assert facets["source"] == [{"value": "archiv", "count": 2}, {"value": "technik", "count": 1}]
+        assert {f["value"]: f["count"] for f in facets["extension"]} == {".pdf": 1, ".txt": 2}
+        assert facets["year"] == [{"value": 2023, "count": 1}]
+
+        facets = db.search_facets(conn, "*", {"time_filter": "2022"}, names=["year"])
+        assert facets == {"approximate": False, "year": [{"value": 2022, "count": 3}]}
+
+        # Stichprobe: jede zweite ID, hochgerechnet
+        facets = db.search_facets(conn, "protokoll", names=["source"], sample_above=3)
+        assert facets["approximate"] is True
+        assert sum(f["count"] for f in facets["source"]) == 6
+
+
+def test_search_facets_sampling_from_estimate_without_count_pass(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    with db.get_conn() as conn:
+        for i, content in enumerate(["alpha"] * 4 + ["beta"] * 4 + ["alpha beta"]):
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="archiv", path=f"/srv/d{i}.txt", filename=f"d{i}.txt", extension=".txt",
+                    size_bytes=1, ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None,
+                    content=content, title_or_subject=None,
+                ),
+            )
+        statements = []
+        conn.set_trace_callback(statements.append)
+        # Schätzung 5 (AND = Minimum), tatsächlich 1 Treffer: der begrenzte Lauf verhindert die Stichprobe
+        facets = db.search_facets(conn, "alpha AND beta", names=["source"], sample_above=3)
+        conn.set_trace_callback(None)
+        assert facets == {"approximate": False, "source": [{"value": "archiv", "count": 1}]}
+        assert not [sql for sql in statements if "SELECT COUNT(*) FROM documents_fts WHERE" in sql]
+
+        # breite Treffermenge: Schrittweite aus der Schätzung, ohne vollständige Zählung
+        facets = db.search_facets(conn, "alpha OR beta", names=["source"], sample_above=3)
+        assert facets["approximate"] is True
+        # unterhalb der Schwelle: kein Probelauf, exakte Zählung
+        assert db.search_facets(conn, "beta", names=["source"], sample_above=10)["approximate"] is False
+
+
+def test_search_without_snippets_and_batch_snippets(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    with db.get_conn() as conn:
+        ids = [
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source="quelle", path=f"/srv/brief_{i}.txt", filename=f"brief_{i}.txt", extension=".txt",
+                    size_bytes=i, ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None,
+                    content=f"einleitung {i} mahnung schluss", title_or_subject=None,
+                ),
+            )
+            for i in range(4)
+        ]
+        with_snippets = db.search_documents(conn, "mahnung", sort_key="size_bytes")
+        without = db.search_documents(conn, "mahnung", sort_key="size_bytes", snippets=False)
+        assert [row["id"] for row in without] == [row["id"] for row in with_snippets] == ids
+        assert all(row["snippet"] == "" for row in without)
+        assert "<mark>mahnung</mark>" in with_snippets[0]["snippet"]
+
+        snippets = db.search_snippets(conn, "mahnung", [ids[2], ids[0], 999])
+        assert set(snippets) == {ids[0], ids[2]}
+        assert snippets[ids[2]] == with_snippets[2]["snippet"]
+        assert db.search_snippets(conn, "*", ids) == {}
+
+
+def test_search_plans_use_indexes_and_keep_fts_outer(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+    with db.get_conn() as conn:
+        for i in range(40):
+            source = "vorstand" if i % 4 == 0 else "archiv"
+            ext = ".msg" if i % 3 == 0 else ".pdf"
+            db.upsert_document(
+                conn,
+                db.DocumentMeta(
+                    source=source, path=f"/srv/{source}/d{i}{ext}", filename=f"d{i}{ext}", extension=ext,
+                    size_bytes=i, ctime=1e9 + i * 1000, mtime=1e9 + i * 1000, atime=None, owner=None,
+                    last_editor=None, content="protokoll sitzung übergabe" if i % 2 else "protokoll", title_or_subject=None,
+                ),
+            )
+
+    with db.read_conn() as conn:
+        # "*" sortiert nach mtime: Index liefert die Reihenfolge, kein Sortierschritt
+        for filters, index in (
+            ({}, "idx_documents_data_mtime"),
+            ({"time_filter": "2001"}, "idx_documents_data_mtime"),
+            ({"source_labels": ["vorstand"]}, "idx_documents_data_source_mtime"),
+            ({"extension": ".msg"}, "idx_documents_data_extension_mtime"),
+        ):
+            plan = db.explain_search(conn, "*", filters=filters)
+            assert any(index in step for step in plan), plan
+            assert not any("TEMP B-TREE" in step for step in plan), plan
+
+        # FTS zuerst: nie FTS5-Abfrage je Zeile per rowid (":=M" = rowid-Gleichheit plus MATCH)
+        for sort_key in (None, "mtime", "size_bytes"):
+            plan = db.explain_search(
+                conn, "protokoll", filters={"source_labels": ["vorstand"]}, sort_key=sort_key, sort_dir="desc",
+                strategy="fts",
+            )
+            assert not any("LIST SUBQUERY" in step or ":=M" in step for step in plan), plan
+        # filter zuerst: Index in Sortierreihenfolge, Treffermenge als Liste
+        plan = db.explain_search(
+            conn, "protokoll", filters={"source_labels": ["vorstand"]}, sort_key="mtime", sort_dir="desc",
+            strategy="filter",
+        )
+        assert any("idx_documents_data_source_mtime" in step for step in plan), plan
+        assert any("LIST SUBQUERY" in step for step in plan), plan
+        assert not any("TEMP B-TREE" in step for step in plan), plan
+
+        assert db.estimate_matches(conn, "protokoll") == 40
+        assert db.estimate_matches(conn, "protokoll AND sitzung") == 20
+        assert db.estimate_matches(conn, "unbekannt OR sitz*") == 20
+        # gefaltet wie unicode61, Klammergruppen aus narrow_query/expand_query, Phrasen
+        assert db.estimate_matches(conn, "Übergabe") == db.estimate_matches(conn, "ubergab*") == 20
+        assert db.estimate_matches(conn, 'protokoll AND ("sitzung" OR "sitzungen")') == 20
+        assert db.estimate_matches(conn, 'unbekannt OR ("sitzung" OR "protokoll")') == 40
+        assert db.estimate_matches(conn, '"sitzung-übergabe" AND protokoll') == 20
+        # beide Strategien liefern dieselbe Seite
+        by_fts = db.search_documents(conn, "sitzung", limit=5, sort_key="mtime", sort_dir="desc", strategy="fts")
+        by_filter = db.search_documents(conn, "sitzung", limit=5, sort_key="mtime", sort_dir="desc", strategy="filter")
+        chosen = db.search_documents(conn, "sitzung", limit=5, sort_key="mtime", sort_dir="desc")
+        assert [r["id"] for r in by_fts] == [r["id"] for r in by_filter] == [r["id"] for r in chosen]
+
+
+def test_bulk_load_restores_indexes_after_abort(tmp_path, monkeypatch):
+    from app.db import migrations
+
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+
+    def meta(i):
+        return db.DocumentMeta(
+            source="A", path=f"/a/{i}.txt", filename=f"{i}.txt", extension=".txt", size_bytes=1,
+            ctime=1.0, mtime=1.0, atime=None, owner=None, last_editor=None, content=f"wort{i}", title_or_subject=None,
+        )
+
+    def indexes(conn):
+        placeholders = ",".join("?" * len(db.BULK_DEFERRED_INDEX_TABLES))
+        return {
+            row[0] for row in conn.execute(
+                f"SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({placeholders})",
+                db.BULK_DEFERRED_INDEX_TABLES,
+            )
+        }
+
+    conn = db.connect()
+    expected = indexes(conn)
+    assert expected
+    # regulärer Bulk-Load
+    assert set(db.begin_bulk_load(conn)) == expected
+    assert indexes(conn) == set()
+    for i in range(10):
+        db.insert_document_bulk(conn, meta(i))
+    conn.commit()
+    db.finish_bulk_load(conn)
+    assert indexes(conn) == expected
+    assert conn.execute("SELECT COUNT(*) FROM bulk_deferred_indexes").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 10
+
+    # Abbruch ohne finish_bulk_load: der nächste Start legt die Indizes wieder an
+    db.begin_bulk_load(conn)
+    for i in range(10, 15):
+        db.insert_document_bulk(conn, meta(i))
+    conn.commit()
+    conn.close()
+    migrations.reset_cache()
+    db.init_db()
+    with db.get_conn() as conn:
+        assert indexes(conn) == expected
+        assert conn.execute("SELECT COUNT(*) FROM bulk_deferred_indexes").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 15
+        assert db.get_status(conn)["total_docs"] == 15
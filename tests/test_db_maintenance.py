@@ -0,0 +1,157 @@
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from app import config_db, db_maintenance
+from app.config_loader import load_config
+from app.db import datenbank as db
+from app.db.datenbank import DocumentMeta
+from app.main import create_app
+
+
+def setup_env(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+
+
+def add_docs(count: int):
+    for i in range(count):
+        with db.get_conn() as conn:
+            db.upsert_document(
+                conn,
+                DocumentMeta(
+                    source="data",
+                    path=f"/data/dok_{i}.txt",
+                    filename=f"dok_{i}.txt",
+                    extension=".txt",
+                    size_bytes=10,
+                    ctime=1.0,
+                    mtime=1.0,
+                    atime=None,
+                    owner=None,
+                    last_editor=None,
+                    content=f"rechnung nummer {i}",
+                    title_or_subject=None,
+                ),
+            )
+
+
+def test_maintenance_merges_segments_and_checkpoints(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    # offene Verbindung hält das WAL am Leben
+    reader = db.connect()
+    add_docs(20)
+    before = db_maintenance.collect_stats()
+    assert before["fts_segments"] > 1
+    assert before["wal_bytes"] > 0
+    assert before["auto_vacuum"] == "incremental"
+
+    result = db_maintenance.run_maintenance(budget_seconds=30)
+    reader.close()
+
+    assert result["status"] == "completed"
+    assert result["after"]["fts_segments"] == 1
+    assert result["after"]["wal_bytes"] == 0
+    assert set(result["tasks"]) == set(db_maintenance.TASKS)
+    assert db_maintenance.load_last_result()["status"] == "completed"
+    with db.get_conn() as conn:
+        hits = conn.execute("SELECT count(*) FROM documents_fts WHERE documents_fts MATCH 'rechnung'").fetchone()[0]
+    assert hits == 20
+
+
+def test_after_run_respects_config_and_active_runs(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    add_docs(3)
+    assert db_maintenance.run_after_index(lambda: 1) is None
+    db_maintenance.persist_config(db_maintenance.MaintenanceConfig(after_run=False))
+    assert db_maintenance.run_after_index(lambda: 0) is None
+    db_maintenance.persist_config(db_maintenance.MaintenanceConfig(after_run=True))
+    result = db_maintenance.run_after_index(lambda: 0)
+    assert result["reason"] == "after_run"
+    assert "vacuum" not in result["tasks"]
+
+
+def add_runs(count: int, events: int = 3):
+    with db.get_conn() as conn:
+        for i in range(count):
+            run_id = db.record_index_run_start(conn, f"2024-01-{i + 1:02d}T00:00:00+00:00")
+            db.record_index_run_finish(conn, run_id, f"2024-01-{i + 1:02d}T00:10:00+00:00", "completed", 3, events, 0, 0, 1)
+            for n in range(events):
+                db.record_index_event(conn, run_id, "added", f"/data/{i}/{n}.txt", "data")
+            db.record_file_error(conn, run_id, f"/data/{i}/x.pdf", "pdf", "kaputt", f"2024-01-{i + 1:02d}T00:05:00+00:00")
+
+
+def test_retention_compacts_or_deletes_old_runs(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    add_runs(5)
+    db_maintenance.persist_config(
+        db_maintenance.MaintenanceConfig(history_keep_runs=2, history_keep_days=0, history_mode="compact")
+    )
+    result = db_maintenance.run_maintenance(["retention"], budget_seconds=30)
+    assert result["tasks"]["retention"]["runs"] == 3
+    with db.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM index_runs").fetchone()[0] == 5
+        assert conn.execute("SELECT COUNT(DISTINCT run_id) FROM index_run_events").fetchone()[0] == 2
+        summary = db.summarize_run(conn, 1)
+        assert summary["actions"] == {"added": 3}
+        assert summary["error_count"] == 1
+        plan = " ".join(str(r[3]) for r in conn.execute("EXPLAIN QUERY PLAN SELECT COUNT(*) FROM file_errors WHERE ignored = 0"))
+        assert "idx_file_errors_open" in plan
+    # bereits verdichtete Läufe werden nicht erneut angefasst
+    assert db_maintenance.run_maintenance(["retention"], budget_seconds=30)["tasks"]["retention"]["runs"] == 0
+
+    db_maintenance.persist_config(db_maintenance.MaintenanceConfig(history_keep_runs=2, history_keep_days=0))
+    db_maintenance.run_maintenance(["retention"], budget_seconds=30)
+    with db.get_conn() as conn:
+        assert [r[0] for r in conn.execute("SELECT id FROM index_runs ORDER BY id")] == [4, 5]
+        assert conn.execute("SELECT COUNT(*) FROM index_run_counts").fetchone()[0] == 0
+        assert db.error_count(conn) == 2
+
+
+def test_config_endpoint_stores_history_mode(monkeypatch, tmp_path):
+    os.environ["APP_SECRET"] = "testsecret"
+    os.environ["ADMIN_PASSWORD"] = "admin"
+    setup_env(monkeypatch, tmp_path)
+    client = TestClient(create_app(load_config(use_env=True)))
+    headers = {"X-App-Secret": os.environ["APP_SECRET"]}
+    payload = {"enabled": True, "mode": "weekly", "weekday": 2, "history_keep_runs": 10, "history_mode": "compact"}
+    resp = client.post("/api/admin/maintenance/config", json=payload, headers=headers)
+    assert resp.status_code == 200
+    assert resp.json()["config"]["history_mode"] == "compact"
+    stored = db_maintenance.load_config_from_db()
+    assert (stored.mode, stored.weekday, stored.history_keep_runs, stored.history_mode) == ("weekly", 2, 10, "compact")
+    assert client.get("/api/admin/maintenance/config", headers=headers).json()["config"]["history_mode"] == "compact"
+
+    payload["history_mode"] = "archive"
+    resp = client.post("/api/admin/maintenance/config", json=payload, headers=headers)
+    assert resp.status_code == 400
+    assert db_maintenance.load_config_from_db().history_mode == "compact"
+
+
+def test_scheduler_replans_config_change_during_index_run(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    calls = []
+    active = [1]
+    monkeypatch.setattr(db_maintenance, "run_maintenance", lambda **kwargs: calls.append((active[0], kwargs)))
+    monkeypatch.setattr(db_maintenance, "compute_next_run", lambda cfg: datetime.now(timezone.utc) if cfg.enabled else None)
+    db_maintenance.persist_config(db_maintenance.MaintenanceConfig(enabled=True, budget_seconds=5))
+    scheduler = db_maintenance.MaintenanceScheduler(lambda: active[0])
+    scheduler.start()
+    try:
+        time.sleep(1.5)
+        scheduler.update_config(db_maintenance.MaintenanceConfig(enabled=True, budget_seconds=7))
+        time.sleep(1.5)
+        assert calls == []
+        active[0] = 0
+        scheduler.update_config(db_maintenance.MaintenanceConfig(enabled=True, budget_seconds=7))
+        deadline = time.time() + 5
+        while not calls and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        scheduler.stop()
+    assert calls and calls[0][0] == 0
+    assert calls[0][1]["budget_seconds"] == 7
@@ -0,0 +1,35 @@
+import sqlite3
+
+from app.db import datenbank as db
+from app.db import pool
+
+
+def test_pool_reuses_connections_and_overflows(tmp_path):
+    conns = pool.ConnectionPool("test", tmp_path / "p.db", lambda p: sqlite3.connect(p, check_same_thread=False), size=1, timeout=0.01)
+    with conns.connection() as first:
+        # erschöpft: Überlauf statt Verklemmung, wird beim Zurückgeben geschlossen
+        with conns.connection() as second:
+            assert second is not first
+    with conns.connection() as again:
+        assert again is first
+    stats = conns.stats()
+    assert stats["acquires"] == 3
+    assert stats["hits"] == 1
+    assert stats["overflow"] == 1
+    assert stats["open"] == 1 and stats["idle"] == 1
+    conns.close()
+
+
+def test_read_pool_is_query_only_and_follows_reset(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    with db.get_conn() as conn:
+        conn.execute("INSERT INTO scanned_paths (run_id, path) VALUES (1, '/x')")
+    with db.read_conn() as conn:
+        assert conn.execute("SELECT path FROM scanned_paths").fetchone()["path"] == "/x"
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+
+    db.remove_db_files(db.DB_PATH)
+    with db.read_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM scanned_paths").fetchone()[0] == 0
+    names = {s["name"] for s in pool.all_stats() if s["path"] == str(db.DB_PATH)}
+    assert "index-read" in names
@@ -244,6 +244,44 @@ def test_rename_success_with_backup(monkeypatch, tmp_path):
     assert row["extension"] == ".txt"
 
 
+def test_rename_during_shadow_build_survives_swap(monkeypatch, tmp_path):
+    from app.index_runner import resolve_active_roots
+    from app.indexer import index_lauf_service
+
+    client, headers, root = create_admin_client(monkeypatch, tmp_path)
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    (root / "doc.txt").write_text("umbenannt waehrend aufbau", encoding="utf-8")
+    (root / "weg.txt").write_text("kommt in quarantaene", encoding="utf-8")
+    config = load_config(use_env=True)
+    config.paths.roots = resolve_active_roots(config)
+    index_lauf_service.run_index_lauf(config)
+    with db.get_conn() as conn:
+        doc_id = db.get_document_by_path(conn, str(root / "doc.txt"))["id"]
+        gone_id = db.get_document_by_path(conn, str(root / "weg.txt"))["id"]
+    original = index_lauf_service.run_index_lauf
+
+    def run_then_act(cfg, db_path=None):
+        # der Schattenlauf hat die alten Pfade gesehen; Aktionen danach, vor dem Umschalten
+        counters = original(cfg, db_path=db_path)
+        resp = client.post(f"/api/files/{doc_id}/rename", json={"new_name": "neu.txt"}, headers=headers)
+        assert resp.status_code == 200
+        resp = client.post(f"/api/files/{gone_id}/quarantine-delete", headers=headers)
+        assert resp.status_code == 200
+        return counters
+
+    monkeypatch.setattr(index_lauf_service, "run_index_lauf", run_then_act)
+    index_lauf_service.run_shadow_rebuild(config)
+    with db.get_conn() as conn:
+        assert db.get_document_by_path(conn, str(root / "doc.txt")) is None
+        renamed = db.get_document_by_path(conn, str(root / "neu.txt"))
+        assert renamed is not None
+        assert db.get_document_content(conn, renamed["id"]) == "umbenannt waehrend aufbau"
+        assert db.get_document_by_path(conn, str(root / "weg.txt")) is None
+        assert len(db.search_documents(conn, "aufbau")) == 1
+        assert db.search_documents(conn, "quarantaene") == []
+        assert db.get_status(conn)["total_docs"] == 1
+
+
 def test_upload_session_flow_success(monkeypatch, tmp_path):
     root = setup_env(monkeypatch, tmp_path)
     (root / "seed.txt").write_text("seed", encoding="utf-8")
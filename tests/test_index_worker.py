@@ -0,0 +1,111 @@
+import threading
+import time
+from pathlib import Path
+
+from app import config_db, index_runner
+from app.db import datenbank as db
+
+
+def setup_env(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    monkeypatch.setenv("AUTO_INDEX_DISABLE", "1")
+    monkeypatch.setenv("INDEXER_MODE", "external")
+    base = tmp_path / "data"
+    base.mkdir()
+    config_db.set_setting("base_data_root", str(base))
+    config_db.add_root(str(base), "data", True)
+    return base
+
+
+def wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_external_mode_only_enqueues(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    called = []
+    monkeypatch.setattr("app.index_runner.run_index_lauf", lambda cfg: called.append(cfg))
+
+    assert index_runner.start_index_run(resolve_roots=index_runner.resolve_active_roots) == "queued"
+    # gleichartiger Lauf wird zusammengefasst
+    assert index_runner.start_index_run(resolve_roots=index_runner.resolve_active_roots) == "queued"
+    commands = config_db.list_index_commands()
+    assert [c["command"] for c in commands] == ["run"]
+    assert commands[0]["status"] == "queued"
+    assert called == []
+    assert index_runner.worker_status()["alive"] is False
+
+
+def test_worker_executes_queued_run(monkeypatch, tmp_path):
+    base = setup_env(monkeypatch, tmp_path)
+    seen = []
+    monkeypatch.setattr("app.index_runner.run_index_lauf", lambda cfg: seen.append(cfg.paths.roots))
+
+    index_runner.start_index_run(resolve_roots=index_runner.resolve_active_roots)
+    stop = threading.Event()
+    worker = threading.Thread(target=index_runner.serve, kwargs={"poll_interval": 0.05, "stop": stop}, daemon=True)
+    worker.start()
+    try:
+        assert wait_for(lambda: config_db.list_index_commands()[0]["status"] == "done")
+        assert wait_for(lambda: bool(seen))
+        assert index_runner.worker_status()["alive"] is True
+    finally:
+        stop.set()
+        worker.join(timeout=5)
+    assert seen[0][0][1] == "data"
+    assert Path(seen[0][0][0]) == base.resolve()
+    assert config_db.list_index_commands()[0]["result"] == "started"
+    assert index_runner.worker_status()["alive"] is False
+
+
+def test_reset_command_holds_lock_while_clearing(monkeypatch, tmp_path):
+    base = setup_env(monkeypatch, tmp_path)
+    monkeypatch.delenv("INDEXER_MODE")
+    monkeypatch.setattr("app.index_runner.run_index_lauf", lambda cfg: None)
+    during = []
+    monkeypatch.setattr(
+        index_runner, "clear_index_files", lambda: during.append(index_runner.start_index_run(roots_override=[(base, "data")]))
+    )
+    assert index_runner._handle_command("reset", {}, None) == "cleared"
+    assert during == ["busy"]
+    assert not index_runner.index_lock.locked()
+    source = index_runner._source_lock("data")
+    source.acquire()
+    try:
+        assert index_runner._handle_command("reset", {}, None) == "busy"
+    finally:
+        source.release()
+    assert len(during) == 1
+
+
+def test_bulk_load_is_assigned_under_start_guard(monkeypatch, tmp_path):
+    base = setup_env(monkeypatch, tmp_path)
+    monkeypatch.delenv("INDEXER_MODE")
+    monkeypatch.setattr(index_runner, "_maintain_after_runs", lambda: None)
+    release = threading.Event()
+    runs = []
+
+    def fake_run(cfg):
+        label = cfg.paths.roots[0][1]
+        runs.append((label, cfg.indexer.bulk_load, index_runner.running_sources()))
+        if cfg.indexer.bulk_load:
+            release.wait(5)
+
+    monkeypatch.setattr("app.index_runner.run_index_lauf", fake_run)
+    (base / "b").mkdir()
+    roots = [(base, "data", "file"), (base / "b", "b", "file")]
+    assert index_runner.start_index_run(roots_override=roots) == "started"
+    assert wait_for(lambda: len(runs) == 1)
+    # während des Bulk-Loads startet nichts weiter, auch nicht die zweite Quelle desselben Aufrufs
+    assert index_runner.start_index_run(roots_override=[(tmp_path, "andere", "file")]) == "busy"
+    assert runs == [("data", True, ["b", "data"])]
+    release.set()
+    assert wait_for(lambda: index_runner.active_runs() == 0)
+    assert runs[1][:2] == ("b", False)
+    assert index_runner._bulk_source is None
@@ -1,3 +1,7 @@
+import dataclasses
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
 import pytest
@@ -121,3 +125,129 @@ def test_resolve_roots_skips_missing(monkeypatch, tmp_path):
     cfg = load_config()
     roots = resolve_active_roots(cfg)
     assert roots == [(existing.resolve(), "ok")]
+
+
+def test_shadow_rebuild_swaps_without_downtime(tmp_path, monkeypatch):
+    from app.indexer.index_lauf_service import run_shadow_rebuild
+
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    base = tmp_path / "data"
+    docs = base / "docs"
+    docs.mkdir(parents=True)
+    (docs / "bleibt.txt").write_text("unveraendert bleibt")
+    config_db.set_setting("base_data_root", str(base))
+    config_db.add_root(str(docs), "docs", True)
+    monkeypatch.delenv("INDEX_ROOTS", raising=False)
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("INDEX_WORKER_COUNT", "1")
+    monkeypatch.setenv("DATA_CONTAINER_PATH", str(base))
+    config = load_config()
+    config.paths.roots = resolve_active_roots(config)
+    run_index_lauf(config)
+    (docs / "weg.txt").write_text("wird geloescht")
+    run_index_lauf(config)
+    with db.get_conn() as conn:
+        kept_id = db.get_document_by_path(conn, str(docs / "bleibt.txt"))["id"]
+
+    (docs / "weg.txt").unlink()
+    (docs / "neu.txt").write_text("frisch dazu")
+    reader = db.connect()
+    try:
+        assert len(db.search_documents(reader, "geloescht")) == 1
+        generation = db.index_generation()
+        counters = run_shadow_rebuild(config)
+        assert counters["added"] == 1
+        assert counters["removed"] == 1
+        assert counters["skipped"] == 1
+        assert db.index_generation() == generation + 1
+        # bestehende Verbindung sieht nach dem Umschalten den neuen Stand
+        assert db.search_documents(reader, "geloescht") == []
+        assert len(db.search_documents(reader, "frisch")) == 1
+        row = db.get_document_by_path(reader, str(docs / "bleibt.txt"))
+        assert row["id"] == kept_id
+        assert len(db.search_documents(reader, "unveraendert")) == 1
+        runs = reader.execute("SELECT status FROM index_runs ORDER BY id").fetchall()
+        assert [r["status"] for r in runs] == ["completed", "completed", "completed"]
+    finally:
+        reader.close()
+    assert not db.shadow_db_path().exists()
+
+
+def test_bulk_item_error_keeps_pending_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    config_db.set_setting("base_data_root", str(tmp_path))
+    data_dir = tmp_path / "docs"
+    data_dir.mkdir()
+    config_db.add_root(str(data_dir), "docs", True)
+    for i in range(20):
+        (data_dir / f"datei_{i:02d}.txt").write_text(f"inhalt nummer {i}")
+    monkeypatch.setenv("INDEX_WORKER_COUNT", "1")
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("DATA_CONTAINER_PATH", str(tmp_path))
+    original = db.record_index_event
+
+    def flaky(conn, run_id, action, path, *args, **kwargs):
+        # Fehler nach dem Einfügen des Dokuments, mitten im offenen Bulk-Batch
+        if path.endswith("_07.txt"):
+            raise sqlite3.OperationalError("simuliert")
+        return original(conn, run_id, action, path, *args, **kwargs)
+
+    monkeypatch.setattr(db, "record_index_event", flaky)
+    config = load_config()
+    config.paths.roots = resolve_active_roots(config)
+    counters = run_index_lauf(config)
+    assert (counters["added"], counters["errors"]) == (19, 1)
+    with db.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 19
+        assert conn.execute("SELECT COUNT(*) FROM documents WHERE path LIKE '%_07.txt'").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM file_errors").fetchone()[0] == 1
+
+
+def test_stop_one_source_keeps_other_run(tmp_path, monkeypatch):
+    from app.indexer import index_lauf_service as lauf
+
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    config_db.set_setting("base_data_root", str(tmp_path))
+    for label in ("alpha", "beta"):
+        (tmp_path / label).mkdir()
+        config_db.add_root(str(tmp_path / label), label, True)
+        for i in range(5):
+            (tmp_path / label / f"datei_{i}.txt").write_text(f"{label} nummer {i}")
+    monkeypatch.setenv("INDEX_WORKER_COUNT", "1")
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("DATA_CONTAINER_PATH", str(tmp_path))
+    gate = threading.Event()
+    original = lauf.fill_content
+
+    def gated(meta, real_path, ext):
+        # Extraktion wartet, bis beide Läufe angemeldet sind und alpha gestoppt ist
+        gate.wait(10)
+        return original(meta, real_path, ext)
+
+    monkeypatch.setattr(lauf, "fill_content", gated)
+    config = load_config()
+    config.indexer.bulk_load = False
+    roots = resolve_active_roots(config)
+    results = {}
+    threads = []
+    for entry in roots:
+        cfg = dataclasses.replace(config, paths=config.paths.model_copy(update={"roots": [entry]}))
+        threads.append(threading.Thread(target=lambda c=cfg, label=entry[1]: results.update({label: run_index_lauf(c)})))
+    for thread in threads:
+        thread.start()
+    deadline = time.time() + 10
+    while lauf.active_run_count() < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    assert lauf.request_stop("alpha") == 1
+    gate.set()
+    for thread in threads:
+        thread.join(20)
+
+    assert results["beta"]["added"] == 5
+    assert results["alpha"]["added"] < 5
+    assert lauf.get_live_status("alpha")["status"] == "stopped"
+    assert lauf.get_live_status("beta")["status"] == "completed"
+    assert lauf.request_stop() == 0
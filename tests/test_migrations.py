@@ -0,0 +1,53 @@
+import sqlite3
+
+from app import config_db, metrics_db
+from app.db import datenbank as db
+from app.db import migrations
+
+
+def user_version(path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return migrations.schema_version(conn)
+    finally:
+        conn.close()
+
+
+def test_migrations_run_once_and_set_user_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    monkeypatch.setattr(metrics_db, "METRICS_DB_PATH", tmp_path / "metrics.db")
+
+    assert migrations.main([]) == 0
+    assert user_version(db.DB_PATH) == migrations.latest_version(db.MIGRATIONS)
+    assert user_version(config_db.CONFIG_DB_PATH) == migrations.latest_version(config_db.MIGRATIONS)
+    assert user_version(metrics_db.METRICS_DB_PATH) == migrations.latest_version(metrics_db.MIGRATIONS)
+    assert config_db.get_setting("auto_index_time") == "02:00"
+
+    calls = []
+    monkeypatch.setattr(db, "migrate", lambda *a, **kw: calls.append(a))
+    db.init_db()
+    with db.get_conn():
+        pass
+    assert calls == []
+
+    # neu angelegte Datei (Reset) wird wieder migriert
+    db.remove_db_files(db.DB_PATH)
+    monkeypatch.undo()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    with db.get_conn() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0] == 0
+
+
+def test_pending_migrations_apply_in_order(tmp_path):
+    conn = sqlite3.connect(tmp_path / "x.db")
+    applied = []
+    steps = [
+        (2, "zwei", lambda c: applied.append(2) or c.execute("ALTER TABLE t ADD COLUMN b TEXT")),
+        (1, "eins", lambda c: applied.append(1) or c.execute("CREATE TABLE t (a TEXT)")),
+    ]
+    assert migrations.apply_migrations(conn, steps, "test") == [1, 2]
+    assert migrations.apply_migrations(conn, steps, "test") == []
+    assert applied == [1, 2]
+    assert migrations.schema_version(conn) == 2
+    conn.close()
@@ -0,0 +1,91 @@
+import os
+from pathlib import Path
+
+from app import config_db, index_runner, reconciler
+from app.config_loader import load_config
+from app.db import datenbank as db
+from app.indexer.index_lauf_service import extract_work_item
+
+
+def setup_env(monkeypatch, tmp_path: Path):
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    db.init_db()
+
+
+def index_files(paths, source: str):
+    with db.get_conn() as conn:
+        for path in paths:
+            item = extract_work_item(path, path, source, path.suffix.lower(), None)
+            db.upsert_document(conn, item["meta"])
+
+
+def test_reconcile_repairs_sampled_drift(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    root = tmp_path / "quelle"
+    (root / "akten").mkdir(parents=True)
+    files = []
+    for i in range(6):
+        path = root / "akten" / f"vorgang_{i}.txt"
+        path.write_text(f"vorgang {i}")
+        files.append(path)
+    index_files(files, "quelle")
+    offline = tmp_path / "offline" / "alt.txt"
+    offline.parent.mkdir()
+    offline.write_text("alt")
+    index_files([offline], "offline")
+    offline.unlink()
+
+    files[0].unlink()
+    files[1].write_text("geändert und länger")
+    os.utime(files[1], (1, 1))
+    (root / "akten" / "neu.txt").write_text("neu hinzugekommen")
+
+    config = load_config(use_env=False)
+    cfg = reconciler.ReconcileConfig(sample_docs=5, sample_dirs=10)
+    roots = [(root, "quelle", "file")]
+    first = reconciler.run_reconcile(config, roots, cfg)
+    # rotierend: erster Durchgang sieht 5 Dokumente und das Verzeichnis, zweiter den Rest
+    assert first["checked_docs"] == 5
+    assert first["drift"] == {"missing": 1, "changed": 1, "new": 1}
+    second = reconciler.run_reconcile(config, roots, cfg)
+    assert second["window"]["coverage"] == 1.0
+    assert reconciler.load_state()["cycles"] == 1
+
+    with db.read_conn() as conn:
+        assert db.get_document_by_path(conn, str(files[0])) is None
+        assert db.get_document_by_path(conn, str(root / "akten" / "neu.txt")) is not None
+        assert db.get_size_mtime_by_path(conn, str(files[1]))[1] == 1
+        # nicht übergebene (nicht bereite) Quelle bleibt unangetastet
+        assert db.get_document_by_path(conn, str(offline)) is not None
+
+    third = reconciler.run_reconcile(config, roots, cfg)
+    assert sum(third["drift"].values()) == 0
+    assert third["window"]["drift_rate"] > 0
+
+
+def test_reconcile_runs_under_source_locks(monkeypatch, tmp_path):
+    setup_env(monkeypatch, tmp_path)
+    root = tmp_path / "quelle"
+    root.mkdir()
+    monkeypatch.setattr(index_runner, "resolve_active_roots", lambda cfg: [(root, "quelle", "file")])
+    seen = []
+
+    def fake_reconcile(cfg, roots, reason):
+        seen.append(index_runner.running_sources())
+        return {"status": "completed"}
+
+    monkeypatch.setattr(reconciler, "run_reconcile", fake_reconcile)
+
+    assert index_runner.run_reconcile()["status"] == "completed"
+    assert seen == [["quelle"]]
+    assert index_runner.running_sources() == []
+    # exklusiver Lauf (Schattenaufbau) oder Lauf derselben Quelle, auch wenn er nach der ersten Prüfung startet
+    monkeypatch.setattr(index_runner, "active_runs", lambda: 0)
+    for lock in (index_runner.index_lock, index_runner._source_lock("quelle")):
+        lock.acquire()
+        try:
+            assert index_runner.run_reconcile()["status"] == "busy"
+        finally:
+            lock.release()
+    assert len(seen) == 1
@@ -1,5 +1,8 @@
+import time
+
 import pytest
 
+from app import search_fuzzy
 from app.db import datenbank as db
 from app.search_modes import SearchMode, build_search_plan
 
@@ -86,3 +89,103 @@ def test_loose_or_matches_single_token(db_setup):
     names = {row["filename"] for row in rows}
     assert "test-only.txt" in names
     assert "thomas-only.txt" in names
+
+
+def test_substring_uses_trigram_index_per_source(db_setup, monkeypatch):
+    add_doc, _ = db_setup
+    add_doc("Bestellung ohne Nummer", title="Eingangsrechnungsnummer", filename="title.txt")
+    add_doc("Im Inhalt: Eingangsrechnung 4711", title="Notiz", filename="content-default.txt")
+    monkeypatch.setenv("INDEX_TRIGRAM_CONTENT_SOURCES", "test")
+    add_doc("Im Inhalt: Eingangsrechnung 4712", title="Notiz", filename="content-enabled.txt")
+
+    plan = build_search_plan("Rechnung", SearchMode.SUBSTRING, 4)
+    assert plan.fts_query == '"rechnung"'
+    assert build_search_plan("re", SearchMode.SUBSTRING, 4).empty_reason
+
+    def names() -> set:
+        with db.get_conn() as conn:
+            return {row["filename"] for row in db.search_documents(conn, plan.fts_query, table=db.TRIGRAM_TABLE)}
+
+    # Inhalt nur für Quellen aus INDEX_TRIGRAM_CONTENT_SOURCES, Titel immer
+    assert names() == {"title.txt", "content-enabled.txt"}
+    # geänderte Konfiguration gilt nach dem nächsten Start auch für vorhandene Dokumente
+    db.migrate()
+    assert names() == {"title.txt", "content-default.txt", "content-enabled.txt"}
+
+
+def test_fuzzy_expands_to_similar_terms(db_setup):
+    add_doc, run_search = db_setup
+    add_doc("Rechnung von Herrn Meier", title="Rechnung", filename="meier.txt")
+    add_doc("Angebot für Frau Mayer", title="Angebot", filename="mayer.txt")
+    add_doc("Lieferschein ohne Namen", title="Lieferschein", filename="other.txt")
+
+    # ohne Wörterbuch sucht fuzzy wie strict
+    assert run_search("Rechnugn", SearchMode.FUZZY) == []
+    with db.get_conn() as conn:
+        search_fuzzy.build(conn)
+    index = search_fuzzy.FuzzyIndex(search_fuzzy.index_path())
+    plan = build_search_plan("Rechnugn Meier", SearchMode.FUZZY, 4)
+    query, expanded = search_fuzzy.expand_query(index, plan.fts_query)
+    assert expanded == [
+        {"term": "rechnugn", "similar": ["rechnung"]},
+        {"term": "meier", "similar": ["mayer"]},
+    ]
+    with db.get_conn() as conn:
+        assert {row["filename"] for row in db.search_documents(conn, query)} == {"meier.txt"}
+        _, mayer = search_fuzzy.expand_query(index, "mayer")
+        assert mayer == [{"term": "mayer", "similar": ["meier"]}]
+        # kurze Wörter bleiben exakt
+        assert search_fuzzy.expand_query(index, "von") == ("von", [])
+
+
+def test_fuzzy_index_maps_once_and_backs_off(db_setup, monkeypatch):
+    add_doc, _run_search = db_setup
+    add_doc("Rechnung von Herrn Meier", title="Rechnung", filename="meier.txt")
+    search_fuzzy.reset()
+    build = search_fuzzy.build
+    builds = []
+
+    def broken(conn, path=None):
+        builds.append(path)
+        raise OSError("Platte voll")
+
+    def wait_idle():
+        deadline = time.time() + 5
+        while search_fuzzy.stats()["building"] and time.time() < deadline:
+            time.sleep(0.01)
+
+    monkeypatch.setattr(search_fuzzy, "build", broken)
+    try:
+        with db.get_conn() as conn:
+            # fehlgeschlagener Bau wird nicht bei jeder Suche wiederholt
+            for _ in range(3):
+                assert search_fuzzy.get_index(conn) is None
+                time.sleep(0.05)
+                wait_idle()
+            assert len(builds) == 1
+            monkeypatch.setattr(search_fuzzy, "REBUILD_RETRY_SECONDS", -1)
+            search_fuzzy.get_index(conn)
+            time.sleep(0.05)
+            wait_idle()
+            assert len(builds) == 2
+
+            # veraltete Datei wird einmal gemappt und bis zum neuen Bau weiter genutzt
+            monkeypatch.setattr(search_fuzzy, "build", build)
+            monkeypatch.setattr(search_fuzzy, "REBUILD_RETRY_SECONDS", 300)
+            search_fuzzy.build(conn)
+            search_fuzzy.reset()
+            db_id, run_id = search_fuzzy.index_key(conn)
+            started = []
+            monkeypatch.setattr(search_fuzzy, "index_key", lambda conn: (db_id, run_id + 1))
+            monkeypatch.setattr(search_fuzzy, "rebuild", lambda path=None: started.append(path))
+            loads = search_fuzzy.stats()["loads"]
+            # ohne Bauerlaubnis (externer Indexer, Follower) nur mappen
+            assert search_fuzzy.get_index(conn, build=False) is not None
+            assert started == []
+            stale = [search_fuzzy.get_index(conn) for _ in range(3)]
+            time.sleep(0.05)
+            assert stale[0] is not None and all(index is stale[0] for index in stale)
+            assert search_fuzzy.stats()["loads"] == loads + 1
+            assert len(started) == 1
+    finally:
+        search_fuzzy.reset()
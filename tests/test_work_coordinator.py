@@ -0,0 +1,157 @@
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from app import config_db, index_runner
+from app.config_loader import load_config
+from app.db import datenbank as db
+from app.indexer import work_coordinator as wc
+from app.index_runner import resolve_active_roots
+
+
+def setup_tree(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "index.db")
+    monkeypatch.setattr(config_db, "CONFIG_DB_PATH", tmp_path / "config.db")
+    base = tmp_path / "data"
+    root = base / "archiv"
+    for sub in ["a/x/tief", "a/y", "b"]:
+        (root / sub).mkdir(parents=True)
+    (root / "oben.txt").write_text("oben liegt etwas")
+    (root / "a" / "x" / "tief" / "unten.txt").write_text("ganz unten")
+    (root / "a" / "y" / "mitte.txt").write_text("in der mitte")
+    (root / "b" / "rechts.txt").write_text("rechts daneben")
+    config_db.set_setting("base_data_root", str(base))
+    config_db.add_root(str(root), "archiv", True)
+    monkeypatch.delenv("INDEX_ROOTS", raising=False)
+    monkeypatch.setenv("LOG_DIR", str(tmp_path / "logs"))
+    monkeypatch.setenv("DATA_CONTAINER_PATH", str(base))
+    config = load_config()
+    config.paths.roots = resolve_active_roots(config)
+    return config, root
+
+
+def test_partition_root_splits_by_depth(tmp_path, monkeypatch):
+    _config, root = setup_tree(tmp_path, monkeypatch)
+    units = list(wc.partition_root(root, "file", []))
+    assert (root, False) in units
+    assert (root / "a", False) in units
+    assert (root / "a" / "x", True) in units
+    assert (root / "b", False) in units
+
+
+def test_expired_lease_is_reclaimed(tmp_path, monkeypatch):
+    config, root = setup_tree(tmp_path, monkeypatch)
+    conn = wc.connect_work_db(tmp_path / "work.db")
+    wc.create_work_run(conn, config, 1, [(root, "archiv", "file")])
+    first = wc.claim_unit(conn, "host-a", lease_seconds=-1)
+    second = wc.claim_unit(conn, "host-b")
+    assert second["id"] == first["id"]
+    assert second["attempts"] == 2
+    assert not wc.complete_unit(conn, first["id"], "host-a", first["attempts"], 0)
+    assert wc.complete_unit(conn, second["id"], "host-b", second["attempts"], 0)
+    conn.close()
+
+
+def test_expired_lease_stops_after_max_attempts(tmp_path, monkeypatch):
+    config, root = setup_tree(tmp_path, monkeypatch)
+    conn = wc.connect_work_db(tmp_path / "work.db")
+    work_run_id = wc.create_work_run(conn, config, 1, [(root, "archiv", "file")])
+    conn.execute("DELETE FROM work_units WHERE id != (SELECT MIN(id) FROM work_units)")
+    for attempt in range(1, wc.MAX_ATTEMPTS + 1):
+        unit = wc.claim_unit(conn, f"host-{attempt}", lease_seconds=-1)
+        assert unit["attempts"] == attempt
+    # abgelaufen, aber ausgereizt: nicht mehr vergeben, sondern als fehlgeschlagen markieren
+    assert wc.claim_unit(conn, "host-x") is None
+    assert wc.fail_expired_units(conn, work_run_id) == 1
+    assert conn.execute("SELECT status FROM work_units").fetchone()["status"] == "failed"
+    conn.close()
+
+
+def test_distributed_run_indexes_all_units(tmp_path, monkeypatch):
+    config, _root = setup_tree(tmp_path, monkeypatch)
+    work_db = tmp_path / "work.db"
+    workers = [
+        threading.Thread(target=wc.run_worker, kwargs={"work_db": work_db, "owner": f"w{i}", "idle_exit": 5.0}, daemon=True)
+        for i in range(2)
+    ]
+    for t in workers:
+        t.start()
+    counters = wc.run_distributed_index(config, workers=0, work_db=work_db, poll_interval=0.05)
+    for t in workers:
+        t.join(timeout=10)
+    assert counters["added"] == 4
+    assert counters["errors"] == 0
+    with db.get_conn() as conn:
+        assert len(db.search_documents(conn, "unten")) == 1
+        last = db.get_last_run(conn)
+    assert last["status"] == "completed"
+
+
+def test_failing_unit_stops_after_max_attempts(tmp_path, monkeypatch):
+    config, root = setup_tree(tmp_path, monkeypatch)
+    work_db = tmp_path / "work.db"
+    conn = wc.connect_work_db(work_db)
+    wc.create_work_run(conn, config, 1, [(root, "archiv", "file")])
+    tries = []
+
+    def broken(conn, unit, owner, lease_seconds, stop=None):
+        tries.append(unit["id"])
+        raise OSError("Freigabe weg")
+
+    monkeypatch.setattr(wc, "process_unit", broken)
+    assert wc.run_worker(work_db, owner="w1", idle_exit=0.5) == 0
+    units = conn.execute("SELECT status, attempts, error FROM work_units").fetchall()
+    assert {(row["status"], row["attempts"], row["error"]) for row in units} == {("failed", wc.MAX_ATTEMPTS, "Freigabe weg")}
+    assert len(tries) == len(units) * wc.MAX_ATTEMPTS
+    conn.close()
+
+
+def test_distributed_run_claims_sources_and_maintains(tmp_path, monkeypatch):
+    config, _root = setup_tree(tmp_path, monkeypatch)
+    maintained = []
+    monkeypatch.setattr(index_runner, "_maintain_after_runs", lambda: maintained.append(index_runner.running_sources()))
+    lock = index_runner._source_lock("archiv")
+    lock.acquire()
+    try:
+        with pytest.raises(RuntimeError):
+            wc.run_distributed_index(config, workers=0, work_db=tmp_path / "work.db")
+    finally:
+        lock.release()
+    assert maintained == []
+
+    # Lauf in einem anderen Prozess (Web oder Worker) hält die geteilte Sperre
+    holder = subprocess.Popen(
+        [
+            sys.executable, "-c",
+            "import fcntl, os, sys; fd = os.open(sys.argv[1], os.O_RDWR | os.O_CREAT); "
+            "fcntl.flock(fd, fcntl.LOCK_SH); print('ok', flush=True); sys.stdin.read()",
+            str(index_runner.lease_path()),
+        ],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == "ok"
+        with pytest.raises(RuntimeError):
+            wc.run_distributed_index(config, workers=0, work_db=tmp_path / "work.db")
+    finally:
+        holder.communicate("", timeout=10)
+    assert maintained == []
+
+    seen = []
+
+    def coordinate(*args):
+        # währenddessen startet hier weder ein Lauf noch ein Reset
+        seen.append((index_runner.running_sources(), index_runner.start_index_run(roots_override=[(_root, "neu")])))
+        seen.append(index_runner.reset_index())
+        return {}
+
+    monkeypatch.setattr(wc, "_coordinate", coordinate)
+    wc.run_distributed_index(config, workers=0, work_db=tmp_path / "work.db")
+    assert seen == [(["archiv"], "busy"), "busy"]
+    assert maintained == [[]]
+    lease = index_runner.acquire_lease()
+    assert lease is not None
+    index_runner.release_lease(lease)